@@ -12,13 +12,15 @@
 
 # Standard modules
 import os
+import math
+import time
 import logging
 import pprint
 
 __author__ = 'Frank Brehm <frank.brehm@profitbricks.com>'
 __copyright__ = '© 2010 - 2015 by profitbricks.com'
 __contact__ = 'frank.brehm@profitbricks.com'
-__version__ = '0.1.2'
+__version__ = '0.3.0'
 __license__ = 'GPL3'
 
 log = logging.getLogger(__name__)
@@ -26,6 +28,34 @@ log = logging.getLogger(__name__)
 # -----------------------------------------------------------------------------
 # Module variables
 
+# The reversed polynomial of the CRC-64 of ISO 3309, which gives the names
+# of the SCST devices of ProfitBricks volumes
+CRC64_POLY = 0xd800000000000000
+
+# A clock for measuring durations, which is not affected by changes of the
+# system time, time.time() is taken on Python < 3.3
+if hasattr(time, 'monotonic'):
+    monotonic = time.monotonic
+else:
+    monotonic = time.time
+
+
+# =============================================================================
+def _crc64_table():
+
+    table = []
+    for i in range(256):
+        crc = i
+        for j in range(8):
+            if crc & 1:
+                crc = (crc >> 1) ^ CRC64_POLY
+            else:
+                crc >>= 1
+        table.append(crc)
+    return table
+
+
+CRC64_TABLE = _crc64_table()
 
 # =============================================================================
 # Currently the only function
@@ -107,6 +137,98 @@ def caller_search_path(prepend=None, append=None):
 
     return path_list
 
+# =============================================================================
+def _to_bytes(data):
+
+    if isinstance(data, bytearray):
+        return data
+    if not isinstance(data, bytes):
+        data = data.encode('utf-8')
+    return bytearray(data)
+
+
+# =============================================================================
+def crc64(data, crc=0):
+    """
+    Computes the CRC-64 (ISO 3309) of the given data by a lookup table,
+    byte by byte. This is the CRC of pb_base.crc.crc64_digest().
+
+    @param data: the data, a text is encoded as UTF-8
+    @type data: str or bytes
+    @param crc: the CRC of the preceding data
+    @type crc: int
+
+    @return: the CRC as an unsigned 64 bit integer
+    @rtype: int
+
+    """
+
+    table = CRC64_TABLE
+    for byte in _to_bytes(data):
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xff]
+    return crc
+
+
+# =============================================================================
+def crc64_digest(data):
+    """
+    Gives back the CRC-64 of the given data as 16 lowercase hex digits,
+    e.g. the name of the SCST device of a ProfitBricks volume by its GUID.
+    """
+
+    return '%016x' % (crc64(data))
+
+
+# =============================================================================
+def crc64_digests(items):
+    """
+    Computes the CRC-64 digests (see crc64_digest()) of all given items in
+    a single loop without a function call per item.
+
+    @param items: the data to digest
+    @type items: iterable of str
+
+    @return: the digests with the items as keys
+    @rtype: dict
+
+    """
+
+    table = CRC64_TABLE
+    result = {}
+    for item in items:
+        crc = 0
+        for byte in _to_bytes(item):
+            crc = (crc >> 8) ^ table[(crc ^ byte) & 0xff]
+        result[item] = '%016x' % (crc)
+    return result
+
+
+# =============================================================================
+def percentile(values, percent):
+    """
+    Gives back the percentile of the given values by the nearest rank
+    method, so it is always one of the values.
+
+    @raise ValueError: if no values are given
+
+    @param values: the values, e.g. the measured response times
+    @type values: iterable of float
+    @param percent: the percent of the values, which are lower or equal
+                    than the percentile (0 gives the minimum, 100 the maximum)
+    @type percent: float
+
+    @return: the percentile
+    @rtype: float
+
+    """
+
+    values = sorted(values)
+    if not values:
+        raise ValueError("No values given for a percentile.")
+
+    rank = int(math.ceil(percent / 100.0 * len(values)))
+    return values[min(max(rank, 1), len(values)) - 1]
+
 # =============================================================================
 
 if __name__ == "__main__":
@@ -37,10 +37,14 @@ from nagios.plugin.threshold import NagiosThreshold
 
 from nagios.plugin.performance import NagiosPerformance
 
+from nagios.plugin.fixtures import get_fixture_archive, MODE_REPLAY
+
+from nagios.plugin.workers import in_main_thread, call_with_timeout, WorkerTimeoutError
+
 # --------------------------------------------
 # Some module variables
 
-__version__ = '0.5.1'
+__version__ = '0.6.3'
 
 log = logging.getLogger(__name__)
 
@@ -546,10 +550,14 @@ class NagiosPlugin(object):
         return nagios.plugin.functions.check_messages(**args)
 
     # -------------------------------------------------------------------------
-    def read_file(self, filename, timeout=2, quiet=False):
+    def read_file(self, filename, timeout=2, quiet=False, fixture_name=None):
         """
         Reads the content of the given filename.
 
+        If a fixture archive is given by $NAGIOS_PLUGIN_REPLAY, the recorded
+        content is given back instead, with $NAGIOS_PLUGIN_RECORD the content
+        is recorded in the fixture archive.
+
         @raise IOError: if file doesn't exists or isn't readable
         @raise PbReadTimeoutError: on timeout reading the file
 
@@ -560,6 +568,10 @@ class NagiosPlugin(object):
         @param quiet: increases the necessary verbosity level to
                       put some debug messages
         @type quiet: bool
+        @param fixture_name: the name of the content in a fixture archive
+                             instead of the filename (e.g. of temporary
+                             files with random names)
+        @type fixture_name: str or None
 
         @return: file content
         @rtype:  str
@@ -579,6 +591,14 @@ class NagiosPlugin(object):
             raise NPReadTimeoutError(timeout, filename)
 
         timeout = abs(int(timeout))
+        if fixture_name is None:
+            fixture_name = filename
+
+        archive = get_fixture_archive()
+        if archive and archive.mode == MODE_REPLAY:
+            if not quiet:
+                log.debug("Replaying file content of %r ...", fixture_name)
+            return archive.replay_file(fixture_name)
 
         if not os.path.isfile(filename):
             raise IOError(errno.ENOENT, "File doesn't exists", filename)
@@ -588,16 +608,31 @@ class NagiosPlugin(object):
         if not quiet:
             log.debug("Reading file content of %r ...", filename)
 
-        signal.signal(signal.SIGALRM, read_alarm_caller)
-        signal.alarm(timeout)
-
-        content = ''
-        fh = open(filename, 'r')
-        for line in fh.readlines():
-            content += line
-        fh.close()
+        def read_content():
+            content = ''
+            fh = open(filename, 'r')
+            for line in fh.readlines():
+                content += line
+            fh.close()
+            return content
+
+        # Signal handlers can only be installed in the main thread, worker
+        # threads read the file in a helper thread with a timeout
+        if in_main_thread():
+            signal.signal(signal.SIGALRM, read_alarm_caller)
+            signal.alarm(timeout)
+            try:
+                content = read_content()
+            finally:
+                signal.alarm(0)
+        else:
+            try:
+                content = call_with_timeout(read_content, timeout or None)
+            except WorkerTimeoutError:
+                raise NPReadTimeoutError(timeout, filename)
 
-        signal.alarm(0)
+        if archive:
+            archive.record_file(fixture_name, content)
 
         return content
 
@@ -29,10 +29,14 @@ from nagios.plugin import NagiosPlugin
 
 from nagios.plugin.argparser import lgpl3_licence_text, default_timeout
 
+from nagios.plugin.fixtures import get_fixture_archive, MODE_REPLAY
+
+from nagios.plugin.workers import in_main_thread, call_with_timeout, WorkerTimeoutError
+
 # --------------------------------------------
 # Some module variables
 
-__version__ = '0.3.1'
+__version__ = '0.5.1'
 
 log = logging.getLogger(__name__)
 
@@ -290,6 +294,8 @@ class ExtNagiosPlugin(NagiosPlugin):
         normalized position of this command.
         If the command is given as an absolute path, it check the existence
         of this command.
+        On replaying a fixture archive the command is taken as found,
+        if there are recorded results of it.
 
         @param cmd: the command to search
         @type cmd: str
@@ -305,6 +311,10 @@ class ExtNagiosPlugin(NagiosPlugin):
         if self.verbose > 2:
             log.debug("Searching for command %r ..." % (cmd))
 
+        archive = get_fixture_archive()
+        if archive and archive.mode == MODE_REPLAY and archive.has_command(cmd):
+            return cmd
+
         if os.path.isabs(cmd):
             if not os.path.exists(cmd):
                 log.warning("Command %r doesn't exists." % (cmd))
@@ -339,10 +349,20 @@ class ExtNagiosPlugin(NagiosPlugin):
     # -------------------------------------------------------------------------
     def exec_cmd(
         self, cmd, shell=False, stdout=None, stderr=None, bufsize=0,
-            drop_stderr=False, close_fds=False, **kwargs):
+            drop_stderr=False, close_fds=False, timeout=None, **kwargs):
         """
         Executing a OS command.
 
+        If a fixture archive is given by $NAGIOS_PLUGIN_REPLAY, the recorded
+        result of the command is given back instead of executing it, with
+        $NAGIOS_PLUGIN_RECORD the result is recorded in the fixture archive.
+
+        The command is limited by the given timeout. In the main
+        thread the plugin dies on a timeout, in worker threads the command
+        is killed and an ExecutionTimeoutError is raised.
+
+        @raise ExecutionTimeoutError: on a timeout in a worker thread
+
         @param cmd: the cmd you wanne call
         @type cmd: list of strings or str
         @param shell: execute the command with a shell
@@ -361,6 +381,9 @@ class ExtNagiosPlugin(NagiosPlugin):
         @param close_fds: closing all open file descriptors
                           (except 0, 1 and 2) on calling subprocess.Popen()
         @type close_fds: bool
+        @param timeout: the timeout of the command in seconds, if not given,
+                        the timeout of the plugin is used
+        @type timeout: int or None
         @param kwargs: any optional named parameter (must be one
             of the supported suprocess.Popen arguments)
         @type kwargs: dict
@@ -385,6 +408,12 @@ class ExtNagiosPlugin(NagiosPlugin):
         if self.verbose > 1:
             log.debug("Executing: %s", cmd_str)
 
+        archive = get_fixture_archive()
+        if archive and archive.mode == MODE_REPLAY:
+            if self.verbose > 1:
+                log.debug("Replaying recorded result of the command.")
+            return archive.replay_command(cmd_list)
+
         used_stdout = subprocess.PIPE
         if stdout is not None:
             used_stdout = stdout
@@ -398,7 +427,9 @@ class ExtNagiosPlugin(NagiosPlugin):
         stdoutdata = ''
         stderrdata = ''
         ret = None
-        timeout = abs(int(self.timeout))
+        if timeout is None:
+            timeout = self.timeout
+        timeout = abs(int(timeout))
 
         def exec_alarm_caller(signum, sigframe):
             '''
@@ -412,8 +443,13 @@ class ExtNagiosPlugin(NagiosPlugin):
 
             raise ExecutionTimeoutError(timeout, cmd_str)
 
-        signal.signal(signal.SIGALRM, exec_alarm_caller)
-        signal.alarm(timeout)
+        # Signal handlers can only be installed in the main thread, in worker
+        # threads the output is read in a helper thread, which is waited for
+        # until the timeout, then the command is killed
+        use_alarm = in_main_thread()
+        if use_alarm:
+            signal.signal(signal.SIGALRM, exec_alarm_caller)
+            signal.alarm(timeout)
 
         # And execute it ...
         try:
@@ -427,14 +463,29 @@ class ExtNagiosPlugin(NagiosPlugin):
                 **kwargs
             )
 
-            (stdoutdata, stderrdata) = cmd_obj.communicate()
+            if use_alarm:
+                (stdoutdata, stderrdata) = cmd_obj.communicate()
+            else:
+                try:
+                    (stdoutdata, stderrdata) = call_with_timeout(
+                        cmd_obj.communicate, timeout or None)
+                except WorkerTimeoutError:
+                    log.debug("Killing process %d after %d seconds.", cmd_obj.pid, timeout)
+                    try:
+                        cmd_obj.kill()
+                    except OSError:
+                        pass
+                    raise ExecutionTimeoutError(timeout, cmd_str)
             ret = cmd_obj.wait()
 
         except ExecutionTimeoutError as e:
+            if not use_alarm:
+                raise
             self.die(str(e))
 
         finally:
-            signal.alarm(0)
+            if use_alarm:
+                signal.alarm(0)
 
         if self.verbose > 1:
             log.debug("Returncode: %s" % (ret))
@@ -449,6 +500,9 @@ class ExtNagiosPlugin(NagiosPlugin):
             msg = "Output on StdErr: %r." % (stderrdata.strip())
             log.debug(msg)
 
+        if archive:
+            archive.record_command(cmd_list, ret, stdoutdata, stderrdata)
+
         return (ret, stdoutdata, stderrdata)
 
     # -------------------------------------------------------------------------
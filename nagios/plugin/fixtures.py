@@ -0,0 +1,439 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@copyright: © 2010 - 2016 by Frank Brehm, Berlin
+@summary: Module for recording and replaying the outputs of executed
+          commands and the contents of read files of plugins in
+          a fixture archive for testing and benchmarking without hardware
+"""
+
+# Standard modules
+import os
+import gzip
+import json
+import logging
+import tempfile
+import threading
+
+# Third party modules
+
+# Own modules
+
+from nagios import BaseNagiosError
+
+# --------------------------------------------
+# Some module variables
+
+__version__ = '0.1.2'
+
+ARCHIVE_VERSION = 1
+
+# The environment variables to enable recording or replaying
+ENV_RECORD = 'NAGIOS_PLUGIN_RECORD'
+ENV_REPLAY = 'NAGIOS_PLUGIN_REPLAY'
+
+MODE_RECORD = 'record'
+MODE_REPLAY = 'replay'
+
+# The placeholder of the paths of output files (mostly temporary files with
+# random names) in the keys of commands
+OUTPUT_FILE = '<file>'
+
+log = logging.getLogger(__name__)
+
+_archive = None
+_archive_env = None
+
+
+# =============================================================================
+class FixtureError(BaseNagiosError):
+    """Base exception class for all errors in this module."""
+
+    pass
+
+
+# =============================================================================
+class FixtureNotFoundError(FixtureError):
+    """
+    Special error class indicating, that there is no recorded fixture
+    for a command or a file.
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, what, key):
+        """
+        Constructor.
+
+        @param what: the type of the fixture ('command' or 'file')
+        @type what: str
+        @param key: the command line or the filename
+        @type key: str
+
+        """
+
+        self.what = what
+        self.key = key
+
+    # -------------------------------------------------------------------------
+    def __str__(self):
+        """Typecasting into a string for error output."""
+
+        return "No recorded fixture found for %s %r." % (self.what, self.key)
+
+
+# =============================================================================
+def command_key(cmd):
+    """
+    Gives back the key of the given command line in the fixture archive.
+    The path of the executable is reduced to its basename, so the fixtures
+    are independent of the installation path of the tools. Absolute paths
+    of output files given by '-f <file>' (MegaCli) or 'file=<file>'
+    (storcli) are replaced by a placeholder, so commands writing into
+    temporary files are reproducible.
+
+    @param cmd: the command line
+    @type cmd: list of str or str
+
+    @return: the key
+    @rtype: str
+
+    """
+
+    if isinstance(cmd, str):
+        cmd = [cmd]
+    cmd = [str(x) for x in cmd]
+    if cmd:
+        cmd[0] = os.path.basename(cmd[0])
+    for i in range(1, len(cmd)):
+        if cmd[i - 1] == '-f' and os.path.isabs(cmd[i]):
+            cmd[i] = OUTPUT_FILE
+        elif cmd[i].lower().startswith('file=') and os.path.isabs(cmd[i][5:]):
+            cmd[i] = cmd[i][:5] + OUTPUT_FILE
+    return ' '.join(cmd)
+
+
+# =============================================================================
+class FixtureArchive(object):
+    """
+    A JSON archive (gzipped, if the filename ends with '.gz') of the outputs
+    and return codes of executed commands and the contents of read files.
+
+    In record mode every new fixture is written immediately into the
+    archive. In replay mode the fixtures are served in the recorded order,
+    if a command was recorded several times, the last recording is repeated
+    after all recordings were served. Recording and replaying is thread safe.
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, filename, mode=MODE_REPLAY):
+        """
+        Constructor.
+
+        @raise FixtureError: on an invalid mode or archive
+
+        @param filename: the filename of the archive
+        @type filename: str
+        @param mode: the mode of the archive ('record' or 'replay')
+        @type mode: str
+
+        """
+
+        if mode not in (MODE_RECORD, MODE_REPLAY):
+            raise FixtureError("Invalid mode %r of a fixture archive." % (mode))
+
+        self._filename = filename
+        """
+        @ivar: the filename of the archive
+        @type: str
+        """
+
+        self._mode = mode
+        """
+        @ivar: the mode of the archive ('record' or 'replay')
+        @type: str
+        """
+
+        self.commands = {}
+        """
+        @ivar: the recorded commands, the keys are the command keys,
+               the values are lists of dicts with the keys 'ret', 'stdout'
+               and 'stderr'
+        @type: dict
+        """
+
+        self.files = {}
+        """
+        @ivar: the recorded file contents with the filenames as keys
+        @type: dict
+        """
+
+        self._served = {}
+        self._lock = threading.Lock()
+
+        if mode == MODE_REPLAY or os.path.exists(filename):
+            self.load()
+
+    # -----------------------------------------------------------
+    @property
+    def filename(self):
+        """The filename of the archive."""
+        return self._filename
+
+    # -----------------------------------------------------------
+    @property
+    def mode(self):
+        """The mode of the archive ('record' or 'replay')."""
+        return self._mode
+
+    # -------------------------------------------------------------------------
+    def __repr__(self):
+        """Typecasting into a string for reproduction."""
+
+        return "%s(%r, mode=%r)" % (self.__class__.__name__, self.filename, self.mode)
+
+    # -------------------------------------------------------------------------
+    def _open(self, mode):
+
+        if self.filename.endswith('.gz'):
+            return gzip.open(self.filename, mode + 'b')
+        return open(self.filename, mode)
+
+    # -------------------------------------------------------------------------
+    def load(self):
+        """
+        Reads the fixtures from the archive.
+
+        @raise FixtureError: if the archive could not be read
+        """
+
+        try:
+            fh = self._open('r')
+            try:
+                content = fh.read()
+            finally:
+                fh.close()
+            if isinstance(content, bytes) and not isinstance(content, str):
+                content = content.decode('utf-8')
+            data = json.loads(content)
+        except (IOError, OSError, ValueError) as e:
+            raise FixtureError("Could not read fixture archive %r: %s" % (self.filename, e))
+
+        if not isinstance(data, dict) or data.get('version') != ARCHIVE_VERSION:
+            raise FixtureError("Invalid fixture archive %r." % (self.filename))
+
+        self.commands = data.get('commands', {})
+        self.files = data.get('files', {})
+        self._served = {}
+
+    # -------------------------------------------------------------------------
+    def save(self):
+        """
+        Writes all fixtures atomically into the archive.
+
+        @raise FixtureError: if the archive could not be written
+        """
+
+        data = {
+            'version': ARCHIVE_VERSION,
+            'commands': self.commands,
+            'files': self.files,
+        }
+        content = json.dumps(data, indent=1, sort_keys=True)
+
+        dirname = os.path.dirname(os.path.abspath(self.filename))
+        try:
+            (fd, tmp_file) = tempfile.mkstemp(
+                prefix=('.' + os.path.basename(self.filename) + '.'), dir=dirname)
+            os.close(fd)
+            if self.filename.endswith('.gz'):
+                fh = gzip.open(tmp_file, 'wb')
+                content = content.encode('utf-8')
+            else:
+                fh = open(tmp_file, 'w')
+            try:
+                fh.write(content)
+            finally:
+                fh.close()
+            os.rename(tmp_file, self.filename)
+        except (IOError, OSError) as e:
+            raise FixtureError("Could not write fixture archive %r: %s" % (self.filename, e))
+
+    # -------------------------------------------------------------------------
+    def add_command(self, cmd, ret=0, stdout='', stderr=''):
+        """
+        Adds the result of a command to the fixtures without saving the
+        archive, e.g. for building synthetic fixtures.
+
+        @param cmd: the command line
+        @type cmd: list of str or str
+        @param ret: the return value of the command
+        @type ret: int
+        @param stdout: the output on STDOUT
+        @type stdout: str
+        @param stderr: the output on STDERR
+        @type stderr: str
+
+        """
+
+        key = command_key(cmd)
+        if key not in self.commands:
+            self.commands[key] = []
+        self.commands[key].append({
+            'ret': ret,
+            'stdout': stdout,
+            'stderr': stderr,
+        })
+
+    # -------------------------------------------------------------------------
+    def add_file(self, filename, content):
+        """
+        Adds the content of a file to the fixtures without saving the archive.
+        """
+
+        self.files[filename] = content
+
+    # -------------------------------------------------------------------------
+    def record_command(self, cmd, ret, stdout, stderr):
+        """Records the result of an executed command in the archive."""
+
+        log.debug("Recording command %r into %r.", command_key(cmd), self.filename)
+        self._lock.acquire()
+        try:
+            self.add_command(cmd, ret, stdout, stderr)
+            self.save()
+        finally:
+            self._lock.release()
+
+    # -------------------------------------------------------------------------
+    def record_file(self, filename, content):
+        """Records the content of a read file in the archive."""
+
+        log.debug("Recording file %r into %r.", filename, self.filename)
+        self._lock.acquire()
+        try:
+            self.add_file(filename, content)
+            self.save()
+        finally:
+            self._lock.release()
+
+    # -------------------------------------------------------------------------
+    def has_command(self, name):
+        """
+        Checks, whether there are recorded results of the given executable
+        (independent of its path and of the arguments).
+
+        @param name: the name or the path of the executable
+        @type name: str
+
+        @return: there are recorded results of this executable
+        @rtype: bool
+
+        """
+
+        name = os.path.basename(name)
+        for key in self.commands:
+            if key.split(' ', 1)[0] == name:
+                return True
+        return False
+
+    # -------------------------------------------------------------------------
+    def replay_command(self, cmd):
+        """
+        Gives back the recorded result of the given command.
+
+        @raise FixtureNotFoundError: if the command was not recorded
+
+        @param cmd: the command line
+        @type cmd: list of str or str
+
+        @return: tuple of the return value, the output on STDOUT and
+                 the output on STDERR (like ExtNagiosPlugin.exec_cmd())
+        @rtype: tuple
+
+        """
+
+        key = command_key(cmd)
+        results = self.commands.get(key)
+        if not results:
+            raise FixtureNotFoundError('command', key)
+
+        self._lock.acquire()
+        try:
+            idx = self._served.get(key, 0)
+            self._served[key] = idx + 1
+        finally:
+            self._lock.release()
+        result = results[min(idx, len(results) - 1)]
+
+        return (result['ret'], result['stdout'], result['stderr'])
+
+    # -------------------------------------------------------------------------
+    def replay_file(self, filename):
+        """
+        Gives back the recorded content of the given file.
+
+        @raise FixtureNotFoundError: if the file was not recorded
+        """
+
+        if filename not in self.files:
+            raise FixtureNotFoundError('file', filename)
+        return self.files[filename]
+
+
+# =============================================================================
+def get_fixture_archive():
+    """
+    Gives back the fixture archive given by the environment variables
+    $NAGIOS_PLUGIN_REPLAY or $NAGIOS_PLUGIN_RECORD, replaying takes
+    precedence.
+
+    @return: the fixture archive or None, if none is configured
+    @rtype: FixtureArchive or None
+
+    """
+
+    global _archive, _archive_env
+
+    env = (os.environ.get(ENV_REPLAY), os.environ.get(ENV_RECORD))
+    if env == _archive_env:
+        return _archive
+
+    _archive_env = env
+    _archive = None
+    if env[0]:
+        _archive = FixtureArchive(env[0], MODE_REPLAY)
+    elif env[1]:
+        _archive = FixtureArchive(env[1], MODE_RECORD)
+    if _archive:
+        log.debug("Using fixture archive %r.", _archive)
+
+    return _archive
+
+
+# =============================================================================
+def set_fixture_archive(archive):
+    """
+    Sets the fixture archive used by all plugins independent of the
+    environment, e.g. in tests and benchmarks. None disables it.
+
+    @param archive: the fixture archive
+    @type archive: FixtureArchive or None
+
+    """
+
+    global _archive, _archive_env
+
+    _archive = archive
+    _archive_env = (os.environ.get(ENV_REPLAY), os.environ.get(ENV_RECORD))
+
+# =============================================================================
+
+if __name__ == "__main__":
+
+    pass
+
+# =============================================================================
+
+# vim: fileencoding=utf-8 filetype=python ts=4 expandtab
@@ -0,0 +1,195 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@copyright: © 2010 - 2016 by Frank Brehm, Berlin
+@summary: Module for decoding a JSON array incrementally from a stream
+          (e.g. a HTTP response), so only one element at a time is held
+          in memory instead of the whole decoded array
+"""
+
+# Standard modules
+import io
+import json
+import codecs
+import logging
+
+# Third party modules
+
+# Own modules
+
+# --------------------------------------------
+# Some module variables
+
+__version__ = '0.1.0'
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+WHITESPACE = ' \t\n\r'
+DELIMITERS = WHITESPACE + ',]'
+
+log = logging.getLogger(__name__)
+
+
+# =============================================================================
+class _ChunkReader(object):
+    """
+    Reads a stream chunk by chunk into a text buffer, byte streams are
+    decoded incrementally as UTF-8.
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, stream, chunk_size):
+
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    # -------------------------------------------------------------------------
+    def fill(self):
+        """Reads the next chunk, gives back False at the end of the stream."""
+
+        if self.eof:
+            return False
+
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            chunk = self.decoder.decode(b'', True)
+        elif isinstance(chunk, bytes) and not isinstance(chunk, str):
+            chunk = self.decoder.decode(chunk)
+
+        # drop the already consumed part of the buffer
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += chunk
+        return True
+
+    # -------------------------------------------------------------------------
+    def next_char(self):
+        """
+        Skips whitespace and gives back the next character without consuming
+        it, None at the end of the stream.
+        """
+
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return None
+
+
+# =============================================================================
+def iter_json_array(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Decodes the JSON array in the given stream incrementally and yields
+    its elements one by one.
+
+    @raise ValueError: if the stream doesn't contain a valid JSON array
+
+    @param stream: a file like object giving text or UTF-8 encoded bytes
+    @type stream: file
+    @param chunk_size: the size of the chunks to read from the stream
+    @type chunk_size: int
+
+    @return: the elements of the array
+    @rtype: iterator
+
+    """
+
+    decoder = json.JSONDecoder()
+    reader = _ChunkReader(stream, chunk_size)
+
+    if reader.next_char() != '[':
+        raise ValueError("The stream doesn't contain a JSON array.")
+    reader.pos += 1
+
+    if reader.next_char() == ']':
+        reader.pos += 1
+    else:
+        while True:
+            if reader.next_char() is None:
+                raise ValueError("Unexpected end of the JSON array.")
+
+            # a value not followed by a delimiter may be incomplete
+            # (e.g. a number), so it is decoded again after reading more
+            while True:
+                try:
+                    (value, end) = decoder.raw_decode(reader.buf, reader.pos)
+                    if reader.eof or (end < len(reader.buf) and reader.buf[end] in DELIMITERS):
+                        break
+                except ValueError:
+                    if reader.eof:
+                        raise
+                reader.fill()
+
+            reader.pos = end
+            yield value
+
+            char = reader.next_char()
+            reader.pos += 1
+            if char == ']':
+                break
+            if char != ',':
+                raise ValueError("Expected ',' or ']' after an element of the JSON array, "
+                                 "got %r." % (char))
+
+    if reader.next_char() is not None:
+        raise ValueError("Extra data after the JSON array.")
+
+
+# =============================================================================
+def iter_objects(response, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Iterates over the elements of a list response of a REST API client,
+    which may be a file like object, the undecoded JSON text or an already
+    decoded list. A decoded list is emptied during the iteration, so every
+    element can be freed after its processing.
+
+    @raise ValueError: if the response is not a valid JSON array
+
+    @param response: the response of the client
+    @type response: file, str, bytes or list
+    @param chunk_size: the size of the chunks to read from a stream
+    @type chunk_size: int
+
+    @return: the elements of the list
+    @rtype: iterator
+
+    """
+
+    if hasattr(response, 'read'):
+        return iter_json_array(response, chunk_size)
+    if isinstance(response, bytes):
+        return iter_json_array(io.BytesIO(response), chunk_size)
+    if not isinstance(response, list):
+        try:
+            return iter_json_array(io.StringIO(response), chunk_size)
+        except TypeError:
+            raise ValueError("Invalid response type %r." % (response.__class__.__name__))
+    return _consume_list(response)
+
+
+# =============================================================================
+def _consume_list(objects):
+
+    objects.reverse()
+    while objects:
+        yield objects.pop()
+
+# =============================================================================
+
+if __name__ == "__main__":
+
+    pass
+
+# =============================================================================
+
+# vim: fileencoding=utf-8 filetype=python ts=4 expandtab
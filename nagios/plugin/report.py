@@ -0,0 +1,340 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@copyright: © 2010 - 2016 by Frank Brehm, Berlin
+@summary: Module for the ReportParser class for a single pass parsing
+          of 'Key : Value' reports of tools like MegaCli or smartctl
+"""
+
+# Standard modules
+import re
+import logging
+
+# Third party modules
+
+# Own modules
+
+# --------------------------------------------
+# Some module variables
+
+__version__ = '0.1.0'
+
+log = logging.getLogger(__name__)
+
+re_first_int = re.compile(r'^\s*(\d+)')
+re_first_number = re.compile(r'^\s*(\d+(?:\.\d*)?)')
+
+
+# =============================================================================
+def normalize_key(key):
+    """
+    Normalizes the key of a report line for looking up its handler:
+    lowercased and all whitespaces collapsed into one blank.
+
+    @param key: the key to normalize
+    @type key: str
+
+    @return: the normalized key
+    @rtype: str
+
+    """
+
+    return ' '.join(key.lower().split())
+
+
+# =============================================================================
+def first_word(value):
+    """
+    Converter giving back the first word of the value.
+
+    @raise ValueError: if the value is empty
+    """
+
+    words = value.split(None, 1)
+    if not words:
+        raise ValueError("Empty value.")
+    return words[0]
+
+
+# =============================================================================
+def lower_word(value):
+    """Converter giving back the lowercased first word of the value."""
+
+    return first_word(value).lower()
+
+
+# =============================================================================
+def first_int(value):
+    """
+    Converter giving back the leading integer of the value,
+    e.g. 0 of '0 (Target Id: 0)'.
+
+    @raise ValueError: if the value doesn't start with digits
+    """
+
+    match = re_first_int.search(value)
+    if not match:
+        raise ValueError("Value %r doesn't start with an integer." % (value))
+    return int(match.group(1))
+
+
+# =============================================================================
+def first_number(value):
+    """
+    Converter giving back the leading number of the value as float.
+
+    @raise ValueError: if the value doesn't start with a number
+    """
+
+    match = re_first_number.search(value)
+    if not match:
+        raise ValueError("Value %r doesn't start with a number." % (value))
+    return float(match.group(1))
+
+
+# =============================================================================
+class ReportParser(object):
+    """
+    Parses a text report line by line in a single pass. Every line is split
+    once into key and value, the normalized key is looked up in a dict of
+    field handlers, so the costs per line don't depend on the number of
+    fields (in opposite to testing each line against a cascade of regular
+    expressions).
+
+    The field handlers are given as a dict of normalized keys to:
+        - a str: the value is stored stripped under this name in the record
+        - a tuple (name, converter): the value is converted by the
+          converter before storing, lines with values raising a ValueError
+          or IndexError on conversion are ignored
+        - a callable: it is called with the record and the value
+
+    If a start key is given, every line with this key starts a new record,
+    all lines before the first record are ignored.
+
+    If a table column is given, lines without a known key are split into
+    whitespace separated columns and dispatched on the normalized content
+    of this column (e.g. the attribute name in the attribute table of
+    smartctl), the value given to the handler is the list of columns.
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(
+            self, fields, start_key=None, defaults=None, separators=(':',),
+            table_column=None):
+        """
+        Constructor.
+
+        @param fields: the field handlers with the normalized keys as keys
+        @type fields: dict
+        @param start_key: the (normalized) key starting a new record
+        @type start_key: str or None
+        @param defaults: the default values of a new record
+        @type defaults: dict or None
+        @param separators: the possible separators between key and value,
+                           they are tried in the given order
+        @type separators: tuple of str
+        @param table_column: the number of the column of a table row
+                             to dispatch on
+        @type table_column: int or None
+
+        """
+
+        self._handlers = {}
+        """
+        @ivar: the compiled field handlers
+        @type: dict
+        """
+        for key in fields:
+            self._handlers[normalize_key(key)] = self._make_handler(fields[key])
+
+        self._start_key = None
+        """
+        @ivar: the normalized key starting a new record
+        @type: str or None
+        """
+        if start_key:
+            self._start_key = normalize_key(start_key)
+
+        self._defaults = {}
+        """
+        @ivar: the default values of a new record
+        @type: dict
+        """
+        if defaults:
+            self._defaults = dict(defaults)
+
+        self._separators = tuple(separators)
+        """
+        @ivar: the possible separators between key and value
+        @type: tuple of str
+        """
+
+        self._table_column = table_column
+        """
+        @ivar: the number of the column of a table row to dispatch on
+        @type: int or None
+        """
+
+    # -----------------------------------------------------------
+    @property
+    def fields(self):
+        """The normalized keys of all field handlers."""
+        return sorted(self._handlers.keys())
+
+    # -----------------------------------------------------------
+    @property
+    def start_key(self):
+        """The normalized key starting a new record."""
+        return self._start_key
+
+    # -------------------------------------------------------------------------
+    def __repr__(self):
+        """Typecasting into a string for reproduction."""
+
+        return "<%s(fields=%r, start_key=%r, separators=%r, table_column=%r)>" % (
+            self.__class__.__name__, self.fields, self.start_key,
+            self._separators, self._table_column)
+
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _make_handler(spec):
+
+        if callable(spec):
+            return spec
+
+        converter = None
+        if isinstance(spec, tuple):
+            (name, converter) = spec
+        else:
+            name = spec
+
+        if converter is None:
+            def handler(record, value):
+                record[name] = value
+        else:
+            def handler(record, value):
+                try:
+                    record[name] = converter(value)
+                except (ValueError, IndexError):
+                    pass
+
+        return handler
+
+    # -------------------------------------------------------------------------
+    def _dispatch(self, line):
+        """
+        Finds the handler and the value of the given (stripped) line.
+
+        @return: a tuple of the normalized key, the handler and the value,
+                 or None, if there is no handler for the line
+        @rtype: tuple or None
+
+        """
+
+        handlers = self._handlers
+
+        for sep in self._separators:
+            (key, found, value) = line.partition(sep)
+            if not found:
+                continue
+            key = ' '.join(key.lower().split())
+            handler = handlers.get(key)
+            if handler is not None:
+                return (key, handler, value.strip())
+
+        if self._table_column is not None:
+            columns = line.split()
+            if len(columns) > self._table_column:
+                key = columns[self._table_column].lower()
+                handler = handlers.get(key)
+                if handler is not None:
+                    return (key, handler, columns)
+
+        return None
+
+    # -------------------------------------------------------------------------
+    def parse(self, text):
+        """
+        Parses the given report into records.
+
+        @param text: the text of the report
+        @type text: str
+
+        @return: all found records, if no start key is given, the list
+                 contains exactly one record
+        @rtype: list of dict
+
+        """
+
+        records = []
+        record = None
+        if not self._start_key:
+            record = dict(self._defaults)
+            records.append(record)
+
+        start_key = self._start_key
+        dispatch = self._dispatch
+
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+
+            result = dispatch(line)
+            if result is None:
+                continue
+            (key, handler, value) = result
+
+            if key == start_key:
+                record = dict(self._defaults)
+                records.append(record)
+            elif record is None:
+                continue
+
+            handler(record, value)
+
+        return records
+
+    # -------------------------------------------------------------------------
+    def parse_record(self, text, record=None):
+        """
+        Parses the given report into one record, record boundaries
+        are ignored.
+
+        @param text: the text of the report
+        @type text: str
+        @param record: an existing record to update
+        @type record: dict or None
+
+        @return: the record
+        @rtype: dict
+
+        """
+
+        if record is None:
+            record = dict(self._defaults)
+
+        dispatch = self._dispatch
+
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+
+            result = dispatch(line)
+            if result is not None:
+                result[1](record, result[2])
+
+        return record
+
+# =============================================================================
+
+if __name__ == "__main__":
+
+    pass
+
+# =============================================================================
+
+# vim: fileencoding=utf-8 filetype=python ts=4 expandtab
@@ -0,0 +1,347 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@copyright: © 2010 - 2016 by Frank Brehm, Berlin
+@summary: Module for the NagiosStateFile class for keeping data of
+          a plugin persistent between two plugin runs
+"""
+
+# Standard modules
+import os
+import errno
+import fcntl
+import json
+import time
+import logging
+import tempfile
+
+# Third party modules
+
+# Own modules
+
+from nagios import BaseNagiosError
+
+# --------------------------------------------
+# Some module variables
+
+__version__ = '0.1.1'
+
+# /var/cache/nagios
+DEFAULT_STATE_DIR = os.sep + os.path.join('var', 'cache', 'nagios')
+
+log = logging.getLogger(__name__)
+
+
+# =============================================================================
+class NagiosStateFileError(BaseNagiosError):
+    """Special exceptions, which are raised in this module."""
+
+    pass
+
+
+# =============================================================================
+def get_state_dir(state_dir=None):
+    """
+    Gives back the directory for state files of plugins. The directory is
+    taken from the given parameter, from environment $NAGIOS_STATE_DIR
+    or it is DEFAULT_STATE_DIR.
+
+    @param state_dir: a possibly given directory
+    @type state_dir: str or None
+
+    @return: the directory for state files
+    @rtype: str
+
+    """
+
+    if state_dir:
+        return state_dir
+    if os.environ.get('NAGIOS_STATE_DIR'):
+        return os.environ['NAGIOS_STATE_DIR']
+    return DEFAULT_STATE_DIR
+
+
+# =============================================================================
+class NagiosStateFile(object):
+    """
+    Encapsulates a JSON file in the state directory, which is used to keep
+    data (caches, checkpoints, histories) of a plugin between two runs.
+
+    Writing is done atomically by renaming a temporary file, so readers
+    never see a partial written file. With lock() concurrent plugins
+    can serialize expensive operations on the same data (single-flight).
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, filename, state_dir=None, max_age=None):
+        """
+        Constructor.
+
+        @param filename: the basename of the state file
+        @type filename: str
+        @param state_dir: the directory of the state file, if not given
+                          it is evaluated by get_state_dir()
+        @type state_dir: str or None
+        @param max_age: the maximum age of the file content in seconds,
+                        older content is ignored by load(). If None,
+                        the content never expires.
+        @type max_age: float or None
+
+        """
+
+        self._filename = filename
+        """
+        @ivar: the basename of the state file
+        @type: str
+        """
+
+        self._state_dir = get_state_dir(state_dir)
+        """
+        @ivar: the directory of the state file
+        @type: str
+        """
+
+        self._max_age = None
+        """
+        @ivar: the maximum age of the file content in seconds
+        @type: float or None
+        """
+        if max_age is not None:
+            self._max_age = float(max_age)
+
+        self._lock_fh = None
+
+    # -----------------------------------------------------------
+    @property
+    def filename(self):
+        """The basename of the state file."""
+        return self._filename
+
+    # -----------------------------------------------------------
+    @property
+    def state_dir(self):
+        """The directory of the state file."""
+        return self._state_dir
+
+    # -----------------------------------------------------------
+    @property
+    def path(self):
+        """The complete path of the state file."""
+        return os.path.join(self.state_dir, self.filename)
+
+    # -----------------------------------------------------------
+    @property
+    def lock_path(self):
+        """The complete path of the lock file."""
+        return self.path + '.lock'
+
+    # -----------------------------------------------------------
+    @property
+    def max_age(self):
+        """The maximum age of the file content in seconds."""
+        return self._max_age
+
+    # -------------------------------------------------------------------------
+    def as_dict(self):
+        """
+        Typecasting into a dictionary.
+
+        @return: structure as dict
+        @rtype:  dict
+
+        """
+
+        d = {
+            '__class__': self.__class__.__name__,
+            'filename': self.filename,
+            'state_dir': self.state_dir,
+            'path': self.path,
+            'max_age': self.max_age,
+        }
+
+        return d
+
+    # -------------------------------------------------------------------------
+    def __repr__(self):
+        """Typecasting into a string for reproduction."""
+
+        return "%s(%r, state_dir=%r, max_age=%r)" % (
+            self.__class__.__name__, self.filename, self.state_dir, self.max_age)
+
+    # -------------------------------------------------------------------------
+    def age(self):
+        """
+        The age of the state file in seconds.
+
+        @return: the age or None, if the file doesn't exists
+        @rtype: float or None
+
+        """
+
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+        return time.time() - mtime
+
+    # -------------------------------------------------------------------------
+    def is_fresh(self):
+        """
+        Checks, whether the state file exists and is not older than max_age.
+
+        @rtype: bool
+
+        """
+
+        age = self.age()
+        if age is None:
+            return False
+        if self.max_age is None:
+            return True
+        return age <= self.max_age
+
+    # -------------------------------------------------------------------------
+    def load(self, ignore_age=False):
+        """
+        Reads the content of the state file.
+
+        @param ignore_age: return the content regardless of max_age
+        @type ignore_age: bool
+
+        @return: the decoded content or None, if the file doesn't exists,
+                 is expired or has an invalid content
+        @rtype: object or None
+
+        """
+
+        if not ignore_age and not self.is_fresh():
+            log.debug("State file %r doesn't exists or is expired.", self.path)
+            return None
+
+        try:
+            fh = open(self.path, 'r')
+        except IOError as e:
+            log.debug("Could not open state file %r: %s", self.path, e)
+            return None
+
+        try:
+            data = json.load(fh)
+        except ValueError as e:
+            log.warning("Invalid content in state file %r: %s", self.path, e)
+            return None
+        finally:
+            fh.close()
+
+        return data
+
+    # -------------------------------------------------------------------------
+    def save(self, data):
+        """
+        Writes the given data atomically into the state file.
+
+        @raise NagiosStateFileError: on errors writing the file
+
+        @param data: the data to save, must be JSON serializable
+        @type data: object
+
+        """
+
+        self._ensure_dir()
+
+        try:
+            (fd, tmp_file) = tempfile.mkstemp(
+                prefix=('.' + self.filename + '.'), dir=self.state_dir)
+        except (IOError, OSError) as e:
+            raise NagiosStateFileError(
+                "Could not create temporary file in %r: %s" % (self.state_dir, e))
+
+        try:
+            fh = os.fdopen(fd, 'w')
+            try:
+                # json.dumps() uses the C encoder, json.dump() does not
+                fh.write(json.dumps(data, separators=(',', ':')))
+            finally:
+                fh.close()
+            os.rename(tmp_file, self.path)
+        except (IOError, OSError, TypeError, ValueError) as e:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise NagiosStateFileError(
+                "Could not write state file %r: %s" % (self.path, e))
+
+        log.debug("Saved state file %r.", self.path)
+
+    # -------------------------------------------------------------------------
+    def remove(self):
+        """Removes the state file, if it exists."""
+
+        try:
+            os.remove(self.path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
+    # -------------------------------------------------------------------------
+    def lock(self):
+        """
+        Acquires an exclusive lock on the lock file of the state file.
+        Blocks until the lock is granted. The timeout is ensured by the
+        alarm signal of the plugin.
+        """
+
+        if self._lock_fh:
+            return
+
+        self._ensure_dir()
+        fh = open(self.lock_path, 'a')
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        self._lock_fh = fh
+        log.debug("Got lock on %r.", self.lock_path)
+
+    # -------------------------------------------------------------------------
+    def unlock(self):
+        """Releases a lock acquired by lock()."""
+
+        if not self._lock_fh:
+            return
+
+        fcntl.flock(self._lock_fh.fileno(), fcntl.LOCK_UN)
+        self._lock_fh.close()
+        self._lock_fh = None
+
+    # -------------------------------------------------------------------------
+    def __enter__(self):
+
+        self.lock()
+        return self
+
+    # -------------------------------------------------------------------------
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.unlock()
+
+    # -------------------------------------------------------------------------
+    def _ensure_dir(self):
+
+        if os.path.isdir(self.state_dir):
+            return
+
+        try:
+            os.makedirs(self.state_dir, 0o755)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise NagiosStateFileError(
+                    "Could not create state directory %r: %s" % (self.state_dir, e))
+
+# =============================================================================
+
+if __name__ == "__main__":
+
+    pass
+
+# =============================================================================
+
+# vim: fileencoding=utf-8 filetype=python ts=4 expandtab
@@ -0,0 +1,344 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@copyright: © 2010 - 2016 by Frank Brehm, Berlin
+@summary: Module for running tasks of a plugin concurrently in a bounded
+          pool of worker threads with an optional limit per group
+          (e.g. per controller)
+"""
+
+# Standard modules
+import sys
+import time
+import logging
+import threading
+
+# Third party modules
+
+# Own modules
+
+# --------------------------------------------
+# Some module variables
+
+__version__ = '0.3.1'
+
+DEFAULT_MAX_WORKERS = 8
+
+log = logging.getLogger(__name__)
+
+
+# =============================================================================
+def in_main_thread():
+    """
+    Checks, whether the current thread is the main thread. Only the main
+    thread may install signal handlers (e.g. SIGALRM for timeouts).
+
+    @rtype: bool
+    """
+
+    return threading.current_thread().name == 'MainThread'
+
+
+# =============================================================================
+class WorkerTimeoutError(Exception):
+    """
+    Special error class indicating, that a task of a WorkerPool couldn't
+    be finished before the deadline.
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, item):
+        """
+        Constructor.
+
+        @param item: the item of the unfinished task
+        @type item: object
+
+        """
+
+        self.item = item
+
+    # -------------------------------------------------------------------------
+    def __str__(self):
+        """Typecasting into a string for error output."""
+
+        return "Task for %r not finished before the deadline." % (self.item)
+
+
+# =============================================================================
+class WorkerPool(object):
+    """
+    Runs a function for all given items in a bounded pool of worker threads.
+
+    If a group function and a limit per group is given, not more than this
+    limit of items of the same group are processed at the same time, the
+    other workers take items of other groups meanwhile.
+
+    The results are given back in the order of the items as tuples of the
+    return value and the exception info (sys.exc_info()), one of them is
+    always None. A SystemExit raised by a task (e.g. by die()) is caught
+    like an exception, so it can't leave the pool in a hanging state.
+
+    If a deadline is given, the pool doesn't wait for tasks beyond it, the
+    results of all unfinished tasks are a WorkerTimeoutError then. Their
+    worker threads are daemon threads, which don't block the exit of the
+    plugin. With only one worker the items are processed in the current
+    thread, no item is started after the deadline then.
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(
+            self, func, max_workers=DEFAULT_MAX_WORKERS, group=None,
+            max_per_group=None):
+        """
+        Constructor.
+
+        @param func: the function to call with every item
+        @type func: callable
+        @param max_workers: the maximum number of concurrent worker threads
+        @type max_workers: int
+        @param group: a function giving back the group of an item
+        @type group: callable or None
+        @param max_per_group: the maximum number of concurrently processed
+                              items of the same group
+        @type max_per_group: int or None
+
+        """
+
+        if max_workers < 1:
+            raise ValueError("The number of workers must be at least 1.")
+        if max_per_group is not None and max_per_group < 1:
+            raise ValueError("The number of workers per group must be at least 1.")
+
+        self.func = func
+        self.max_workers = max_workers
+        self.group = group
+        self.max_per_group = max_per_group
+
+        self._cond = threading.Condition()
+        self._pending = []
+        self._active = {}
+        self._results = []
+        self._done = []
+        self._expired = False
+
+    # -------------------------------------------------------------------------
+    def __repr__(self):
+        """Typecasting into a string for reproduction."""
+
+        return "%s(%r, max_workers=%r, group=%r, max_per_group=%r)" % (
+            self.__class__.__name__, self.func, self.max_workers, self.group,
+            self.max_per_group)
+
+    # -------------------------------------------------------------------------
+    def _next(self):
+        """
+        Takes the next pending item, which group isn't exhausted, waits,
+        until such an item is available.
+
+        @return: a tuple of the index, the item and its group, or None,
+                 if there are no more pending items
+        @rtype: tuple or None
+
+        """
+
+        self._cond.acquire()
+        try:
+            while self._pending and not self._expired:
+                for i in range(len(self._pending)):
+                    (idx, item, grp) = self._pending[i]
+                    if (self.max_per_group is None or
+                            self._active.get(grp, 0) < self.max_per_group):
+                        del self._pending[i]
+                        self._active[grp] = self._active.get(grp, 0) + 1
+                        return (idx, item, grp)
+                self._cond.wait()
+            return None
+        finally:
+            self._cond.release()
+
+    # -------------------------------------------------------------------------
+    def _worker(self):
+
+        while True:
+            task = self._next()
+            if task is None:
+                return
+            (idx, item, grp) = task
+            try:
+                result = (self.func(item), None)
+            except (Exception, SystemExit):
+                result = (None, sys.exc_info())
+            self._cond.acquire()
+            try:
+                if not self._expired:
+                    self._results[idx] = result
+                    self._done[idx] = True
+                self._active[grp] -= 1
+                self._cond.notify_all()
+            finally:
+                self._cond.release()
+
+    # -------------------------------------------------------------------------
+    def run(self, items, deadline=None):
+        """
+        Processes all given items.
+
+        @param items: the items to process
+        @type items: list
+        @param deadline: the time (as time.time()), until the pool waits for
+                         the tasks, a task already running in the current
+                         thread of a single worker isn't interrupted
+        @type deadline: float or None
+
+        @return: a list of tuples of the return value and the exception info
+                 in the order of the items
+        @rtype: list of tuple
+
+        """
+
+        items = list(items)
+        self._pending = []
+        for idx in range(len(items)):
+            grp = None
+            if self.group is not None:
+                grp = self.group(items[idx])
+            self._pending.append((idx, items[idx], grp))
+        self._active = {}
+        self._results = [(None, None)] * len(items)
+        self._done = [False] * len(items)
+        self._expired = False
+
+        nr_workers = min(self.max_workers, len(items))
+        if nr_workers == 1:
+            return self._run_serially(items, deadline)
+
+        log.debug("Processing %d items with %d workers ...", len(items), nr_workers)
+        threads = []
+        for i in range(nr_workers):
+            thread = threading.Thread(target=self._worker, name='worker-%d' % (i))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        # Joining with a timeout keeps the main thread responsive for signals
+        # (e.g. the SIGALRM of the plugin timeout)
+        for thread in threads:
+            while thread.is_alive():
+                wait = 0.2
+                if deadline is not None:
+                    wait = min(wait, deadline - time.time())
+                    if wait <= 0:
+                        self._expire(items)
+                        return self._results
+                thread.join(wait)
+
+        return self._results
+
+    # -------------------------------------------------------------------------
+    def _run_serially(self, items, deadline):
+        """
+        Processes the items one by one in the current thread, the items not
+        started before the deadline are a WorkerTimeoutError.
+        """
+
+        for idx in range(len(items)):
+            if deadline is not None and time.time() >= deadline:
+                self._expire(items)
+                break
+            try:
+                self._results[idx] = (self.func(items[idx]), None)
+            except (Exception, SystemExit):
+                self._results[idx] = (None, sys.exc_info())
+            self._done[idx] = True
+
+        return self._results
+
+    # -------------------------------------------------------------------------
+    def _expire(self, items):
+
+        self._cond.acquire()
+        try:
+            self._expired = True
+            self._pending = []
+            for idx in range(len(items)):
+                if not self._done[idx]:
+                    try:
+                        raise WorkerTimeoutError(items[idx])
+                    except WorkerTimeoutError:
+                        self._results[idx] = (None, sys.exc_info())
+            self._cond.notify_all()
+        finally:
+            self._cond.release()
+        log.debug("Deadline of the worker pool expired.")
+
+
+# =============================================================================
+def call_with_timeout(func, timeout):
+    """
+    Calls the function in a daemon thread and waits for it not longer than
+    the timeout. It gives worker threads, which can't use SIGALRM, a timeout
+    on blocking calls. An unfinished call is left behind in its daemon
+    thread, which doesn't block the exit of the plugin.
+
+    @raise WorkerTimeoutError: if the call isn't finished before the timeout
+
+    @param func: the function to call without arguments
+    @type func: callable
+    @param timeout: the timeout in seconds, None for no timeout
+    @type timeout: float or None
+
+    @return: the return value of the function, exceptions of the function
+             are raised again
+    @rtype: object
+
+    """
+
+    results = []
+
+    def call():
+        try:
+            results.append((func(), None))
+        except (Exception, SystemExit):
+            results.append((None, sys.exc_info()))
+
+    thread = threading.Thread(target=call, name='call-with-timeout')
+    thread.daemon = True
+    thread.start()
+    thread.join(timeout)
+    if not results:
+        raise WorkerTimeoutError(func)
+
+    (result, exc_info) = results[0]
+    if exc_info:
+        raise exc_info[1]
+    return result
+
+
+# =============================================================================
+def run_concurrently(
+        func, items, max_workers=DEFAULT_MAX_WORKERS, group=None, max_per_group=None,
+        deadline=None):
+    """
+    Convenience function to process all items with a WorkerPool.
+
+    @return: a list of tuples of the return value and the exception info
+             in the order of the items
+    @rtype: list of tuple
+
+    """
+
+    pool = WorkerPool(func, max_workers=max_workers, group=group, max_per_group=max_per_group)
+    return pool.run(items, deadline=deadline)
+
+# =============================================================================
+
+if __name__ == "__main__":
+
+    pass
+
+# =============================================================================
+
+# vim: fileencoding=utf-8 filetype=python ts=4 expandtab
@@ -0,0 +1,585 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@copyright: © 2010 - 2016 by Frank Brehm, Berlin
+@summary: Module for a persistent cache of the responses of the DcManager
+          API on the host with a time to live, shared by all DcManager
+          checks, in front of the REST API client
+"""
+
+# Standard modules
+import os
+import json
+import errno
+import zlib
+import hashlib
+import logging
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    from urllib.parse import urlencode
+except ImportError:
+    from urllib import urlencode
+
+# Third party modules
+
+# Own modules
+
+from nagios.plugin.statefile import get_state_dir
+
+# --------------------------------------------
+# Some module variables
+
+__version__ = '0.3.3'
+
+# The directory of the cached responses below the state directory
+CACHE_SUBDIR = 'pb-dcm-responses'
+CACHE_VERSION = 3
+
+# The time in seconds, a cached response is used without any request
+DEFAULT_CACHE_TTL = 0
+
+# The maximum time in seconds to wait for the lock of an expired response,
+# after it the response is fetched without the lock
+DEFAULT_LOCK_TIMEOUT = 10.0
+
+# The time in seconds between two attempts to get the lock
+LOCK_POLL_INTERVAL = 0.05
+
+# The zlib compression level of the cached bodies, the JSON listings
+# are compressed to about an eighth already by the fastest level
+COMPRESS_LEVEL = 1
+
+# The listing methods of the client, whose responses are cached, all other
+# attributes of the client are passed through unchanged
+LISTING_METHODS = (
+    'pservers', 'pstorages', 'vimage_maps', 'vimages', 'vsnapshots',
+    'vstorage_maps', 'vstorages',
+)
+
+# The size of the chunks of a response read from the client or from a
+# cache file, so a large listing is never held completely in memory
+CHUNK_SIZE = 64 * 1024
+
+log = logging.getLogger(__name__)
+
+
+# =============================================================================
+class ChunkStream(object):
+    """
+    A file like object reading the bytes given by an iterator of chunks,
+    e.g. a response of the client, which could not be cached.
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, chunks):
+
+        self.chunks = iter(chunks)
+        self.buf = b''
+
+    # -------------------------------------------------------------------------
+    def next_chunk(self):
+        """Gives back the next chunk, an empty one at the end."""
+
+        try:
+            return next(self.chunks)
+        except StopIteration:
+            return b''
+
+    # -------------------------------------------------------------------------
+    def read(self, size=-1):
+        """Reads at most size bytes, all remaining bytes if size is negative."""
+
+        if self.chunks is None:
+            data = self.buf
+            self.buf = b''
+            return data
+
+        if size < 0:
+            parts = [self.buf]
+            self.buf = b''
+            chunk = self.next_chunk()
+            while chunk:
+                parts.append(chunk)
+                chunk = self.next_chunk()
+            self.close()
+            return b''.join(parts)
+
+        while len(self.buf) < size:
+            chunk = self.next_chunk()
+            if not chunk:
+                self.close()
+                break
+            self.buf += chunk
+
+        data = self.buf[:size]
+        self.buf = self.buf[size:]
+        return data
+
+    # -------------------------------------------------------------------------
+    def close(self):
+
+        if self.chunks is not None:
+            if hasattr(self.chunks, 'close'):
+                self.chunks.close()
+            self.chunks = None
+
+
+# =============================================================================
+class CachedResponse(ChunkStream):
+    """
+    A file like object reading the decompressed body of an opened cache
+    file chunk by chunk. The file is closed at its end.
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, fh, key):
+
+        self.fh = fh
+        self.key = key
+        self.decompressor = zlib.decompressobj()
+        super(CachedResponse, self).__init__(iter(()))
+
+    # -------------------------------------------------------------------------
+    def next_chunk(self):
+        """
+        Gives back the next decompressed chunk of the file.
+
+        @raise ValueError: if the cache file is damaged
+
+        """
+
+        chunk = b''
+        try:
+            while not chunk and self.fh is not None:
+                data = self.fh.read(CHUNK_SIZE)
+                if data:
+                    chunk = self.decompressor.decompress(data)
+                else:
+                    chunk = self.decompressor.flush()
+                    self.fh.close()
+                    self.fh = None
+        except zlib.error as e:
+            self.close()
+            raise ValueError("Invalid cache file of %r: %s" % (self.key, e))
+        return chunk
+
+    # -------------------------------------------------------------------------
+    def close(self):
+
+        if self.fh is not None:
+            self.fh.close()
+            self.fh = None
+        super(CachedResponse, self).close()
+
+
+# =============================================================================
+class ResponseCache(object):
+    """
+    Keeps the JSON encoded responses of the REST API. Every response is
+    saved in its own file below the state directory, so all checks on the
+    host share them. The files are replaced atomically, concurrent writers
+    don't need a lock.
+
+    A response younger than the time to live (the age is the modification
+    time of its file) is used without any request. Expired responses are
+    fetched by only one check at a time (single flight), concurrent checks
+    wait on the lock file of the key and take the refreshed response. They
+    wait only a bounded time, a check hanging on its refresh doesn't block
+    the other checks, they fetch the response themselves then.
+
+    A cache file consists of a line with the JSON encoded version and key
+    followed by the zlib compressed body.
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, state_dir=None, ttl=DEFAULT_CACHE_TTL, lock_timeout=DEFAULT_LOCK_TIMEOUT):
+        """
+        Constructor.
+
+        @param state_dir: the state directory, below it the cache files
+                          are placed
+        @type state_dir: str or None
+        @param ttl: the time to live of the responses in seconds, with 0
+                    no cached response is used
+        @type ttl: int
+        @param lock_timeout: the maximum time in seconds to wait for the
+                             lock of an expired response
+        @type lock_timeout: float
+
+        """
+
+        self.cache_dir = os.path.join(get_state_dir(state_dir), CACHE_SUBDIR)
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+
+    # -------------------------------------------------------------------------
+    def __repr__(self):
+        """Typecasting into a string for reproduction."""
+
+        return "%s(state_dir=%r, ttl=%r, lock_timeout=%r)" % (
+            self.__class__.__name__, os.path.dirname(self.cache_dir), self.ttl,
+            self.lock_timeout)
+
+    # -------------------------------------------------------------------------
+    def filename(self, key, suffix='.cache'):
+        """The cache file (or with suffix '.lock' the lock file) of the given key."""
+
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest + suffix)
+
+    # -------------------------------------------------------------------------
+    def open(self, key, now=None):
+        """
+        Opens the cached response of the given key, a cache file with an
+        invalid header is ignored. The body is decompressed while reading,
+        so it is never held completely in memory.
+
+        @param key: the key of the response, see CachedRestApi.cache_key()
+        @type key: str
+        @param now: the current timestamp
+        @type now: float or None
+
+        @return: the opened response and whether it is within its time to
+                 live, or None
+        @rtype: tuple of (CachedResponse, bool) or None
+
+        """
+
+        if now is None:
+            now = time.time()
+
+        try:
+            fh = open(self.filename(key), 'rb')
+        except (IOError, OSError):
+            return None
+
+        try:
+            mtime = os.fstat(fh.fileno()).st_mtime
+            info = json.loads(fh.readline().decode('utf-8'))
+        except (IOError, OSError, ValueError):
+            fh.close()
+            return None
+        if (not isinstance(info, dict) or info.get('version') != CACHE_VERSION or
+                info.get('key') != key):
+            fh.close()
+            return None
+
+        fresh = bool(self.ttl) and 0 <= now - mtime < self.ttl
+        return (CachedResponse(fh, key), fresh)
+
+    # -------------------------------------------------------------------------
+    def lock(self, key):
+        """
+        Waits for the exclusive lock of the given key at most the lock
+        timeout. A timeout and errors on locking are only logged, the
+        response is fetched without the lock then.
+
+        @param key: the key of the response
+        @type key: str
+
+        @return: the file descriptor of the locked file to give to unlock()
+        @rtype: int or None
+
+        """
+
+        if fcntl is None:
+            return None
+
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir, 0o755)
+            fd = os.open(self.filename(key, '.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+        except (IOError, OSError) as e:
+            log.debug("Could not open lock file of %r: %s", key, e)
+            return None
+
+        deadline = time.time() + self.lock_timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except (IOError, OSError) as e:
+                if e.errno not in (errno.EAGAIN, errno.EACCES, errno.EWOULDBLOCK):
+                    log.debug("Could not lock %r: %s", key, e)
+                    break
+            if time.time() >= deadline:
+                log.debug("Timeout after %0.1f seconds on locking %r.", self.lock_timeout, key)
+                break
+            time.sleep(LOCK_POLL_INTERVAL)
+
+        os.close(fd)
+        return None
+
+    # -------------------------------------------------------------------------
+    def unlock(self, fd):
+        """Releases a lock given by lock()."""
+
+        if fd is None:
+            return
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    # -------------------------------------------------------------------------
+    def save(self, key, chunks):
+        """
+        Saves the response of the given key, the chunks are compressed one
+        by one into the cache file. If the cache file can't be created,
+        it's only logged and the chunks are not touched. On errors while
+        writing the cache file is removed and the error is raised.
+
+        @param key: the key of the response
+        @type key: str
+        @param chunks: the JSON encoded response in chunks
+        @type chunks: iterator of bytes
+
+        @return: whether the response was saved
+        @rtype: bool
+
+        """
+
+        header = json.dumps({'version': CACHE_VERSION, 'key': key}).encode('utf-8') + b'\n'
+
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir, 0o755)
+            (fd, tmp_name) = tempfile.mkstemp(prefix='.response.', dir=self.cache_dir)
+        except (IOError, OSError) as e:
+            log.warning("Could not create cache file in %r: %s", self.cache_dir, e)
+            return False
+
+        compressor = zlib.compressobj(COMPRESS_LEVEL)
+        try:
+            fh = os.fdopen(fd, 'wb')
+            try:
+                fh.write(header)
+                for chunk in chunks:
+                    fh.write(compressor.compress(chunk))
+                fh.write(compressor.flush())
+            finally:
+                fh.close()
+            os.chmod(tmp_name, 0o644)
+            os.rename(tmp_name, self.filename(key))
+        except Exception:
+            try:
+                os.remove(tmp_name)
+            except OSError:
+                pass
+            raise
+
+        return True
+
+
+# =============================================================================
+class CachedRestApi(object):
+    """
+    A REST API client with the same listing methods as the given RestApi of
+    the DcManager client (e.g. api.vstorages(pstorage='storage201')), which
+    takes the responses from a shared ResponseCache. Only expired or missing
+    responses are requested, always by the methods of the given client, so
+    its configuration, authentication and error handling stay untouched.
+    Only the given listing methods are cached, all other attributes are
+    the unchanged ones of the client.
+
+    The methods give back the decoded objects, get() gives back the JSON
+    encoded response as a file like object for incremental decoding. The
+    response of the client is written chunk by chunk into the cache and
+    read back the same way.
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, api, cache, listing_methods=LISTING_METHODS):
+        """
+        Constructor.
+
+        @param api: the client object doing the requests
+        @type api: RestApi
+        @param cache: the shared cache of the responses
+        @type cache: ResponseCache
+        @param listing_methods: the names of the methods of the client,
+                                whose responses are cached
+        @type listing_methods: iterable of str
+
+        """
+
+        self.api = api
+        self.cache = cache
+        self.listing_methods = frozenset(listing_methods)
+        self.url = getattr(api, 'url', None)
+
+        self.requests = 0
+        self.cache_hits = 0
+        self._lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    def __repr__(self):
+        """Typecasting into a string for reproduction."""
+
+        return "%s(%r, %r)" % (self.__class__.__name__, self.api, self.cache)
+
+    # -------------------------------------------------------------------------
+    def _count(self, counter):
+        """Increments the given counter ('requests' or 'cache_hits')."""
+
+        self._lock.acquire()
+        try:
+            setattr(self, counter, getattr(self, counter) + 1)
+        finally:
+            self._lock.release()
+
+    # -------------------------------------------------------------------------
+    def cache_key(self, method_name, params):
+        """
+        The key of the response of the given method and parameters, it
+        contains the URL of the API, so different APIs don't share responses.
+
+        @param method_name: the name of the method of the client (e.g. 'vstorages')
+        @type method_name: str
+        @param params: the keyword arguments of the method
+        @type params: dict
+
+        @return: the key of the response
+        @rtype: str
+
+        """
+
+        items = []
+        for (param, value) in sorted(params.items()):
+            items.append((param, json.dumps(value)))
+        return '%s %s?%s' % (self.url, method_name, urlencode(items))
+
+    # -------------------------------------------------------------------------
+    def _fetch(self, method_name, params):
+        """
+        Calls the given method of the client.
+
+        @return: the JSON encoded response in chunks
+        @rtype: iterator of bytes
+
+        """
+
+        self._count('requests')
+        return self._encode(getattr(self.api, method_name)(**params))
+
+    # -------------------------------------------------------------------------
+    def _encode(self, result):
+        """
+        Gives back the chunks of the given response of the client. A response
+        stream is read chunk by chunk, an already decoded response is encoded
+        chunk by chunk.
+        """
+
+        if hasattr(result, 'read'):
+            chunk = result.read(CHUNK_SIZE)
+            while chunk:
+                if not isinstance(chunk, bytes):
+                    chunk = chunk.encode('utf-8')
+                yield chunk
+                chunk = result.read(CHUNK_SIZE)
+            return
+
+        if isinstance(result, bytes):
+            yield result
+            return
+        if hasattr(result, 'encode'):
+            yield result.encode('utf-8')
+            return
+
+        parts = []
+        size = 0
+        for part in json.JSONEncoder().iterencode(result):
+            parts.append(part)
+            size += len(part)
+            if size >= CHUNK_SIZE:
+                yield ''.join(parts).encode('utf-8')
+                parts = []
+                size = 0
+        if parts:
+            yield ''.join(parts).encode('utf-8')
+
+    # -------------------------------------------------------------------------
+    def get(self, method_name, **params):
+        """
+        Gives back the response of the given method of the client. A cached
+        response within its time to live is taken directly, an expired one
+        is requested again under the lock of its key. The responses of
+        methods not in listing_methods are always requested.
+
+        @param method_name: the name of the method of the client (e.g. 'vstorages')
+        @type method_name: str
+        @param params: the keyword arguments of the method
+        @type params: dict
+
+        @return: the JSON encoded response
+        @rtype: file
+
+        """
+
+        if not self.cache.ttl or method_name not in self.listing_methods:
+            return ChunkStream(self._fetch(method_name, params))
+
+        key = self.cache_key(method_name, params)
+        response = self._open_fresh(key)
+        if response is not None:
+            return response
+
+        fd = self.cache.lock(key)
+        try:
+            # refreshed by another check, while waiting for the lock
+            response = self._open_fresh(key)
+            if response is not None:
+                return response
+            if self.cache.save(key, self._fetch(method_name, params)):
+                opened = self.cache.open(key)
+                if opened is not None:
+                    return opened[0]
+            return ChunkStream(self._fetch(method_name, params))
+        finally:
+            self.cache.unlock(fd)
+
+    # -------------------------------------------------------------------------
+    def _open_fresh(self, key):
+        """The opened cached response of the given key, if it is within its time to live."""
+
+        opened = self.cache.open(key)
+        if opened is None:
+            return None
+        if not opened[1]:
+            opened[0].close()
+            return None
+
+        log.debug("Taking response of %r from cache.", key)
+        self._count('cache_hits')
+        return opened[0]
+
+    # -------------------------------------------------------------------------
+    def __getattr__(self, name):
+
+        if name.startswith('_') or name not in self.listing_methods:
+            return getattr(self.api, name)
+
+        def listing(**params):
+            return json.loads(self.get(name, **params).read().decode('utf-8'))
+
+        return listing
+
+# =============================================================================
+
+if __name__ == "__main__":
+
+    pass
+
+# =============================================================================
+
+# vim: fileencoding=utf-8 filetype=python ts=4 expandtab
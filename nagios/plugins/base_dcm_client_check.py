@@ -30,13 +30,18 @@ from nagios.plugin.extended import ExtNagiosPlugin
 from nagios.plugin.config import NoConfigfileFound
 from nagios.plugin.config import NagiosPluginConfig
 
+from nagios.plugin.jsonstream import iter_objects
+
+from nagios.plugins.api_cache import ResponseCache, CachedRestApi
+from nagios.plugins.api_cache import DEFAULT_CACHE_TTL, DEFAULT_LOCK_TIMEOUT
+
 from dcmanagerclient.client import DEFAULT_CFG_FILES, DEFAULT_API_URL
 from dcmanagerclient.client import RestApi
 
 # --------------------------------------------
 # Some module variables
 
-__version__ = '0.3.2'
+__version__ = '0.7.4'
 __copyright__ = 'Copyright (c) 2015 Frank Brehm, Berlin.'
 
 DEFAULT_TIMEOUT = 60
@@ -97,7 +102,7 @@ class BaseDcmClientPlugin(ExtNagiosPlugin):
         self, usage=None, shortname=None, version=nagios.__version__, url=None,
             blurb=None, licence=lgpl3_licence_text, extra=None, plugin=None,
             timeout=default_timeout, verbose=0, prepend_searchpath=None,
-            append_searchpath=None):
+            append_searchpath=None, api_cache=True):
         """
         Constructor of the BaseDcmClientPlugin class.
 
@@ -144,6 +149,10 @@ class BaseDcmClientPlugin(ExtNagiosPlugin):
         @param append_searchpath: a single path oor a list of paths to append
                                   to the search path list
         @type append_searchpath: str or list of str
+        @param api_cache: whether the responses of the REST API may be taken
+                          from the cache shared by the DcManager checks of
+                          the host (--api-cache-ttl)
+        @type api_cache: bool
 
         """
 
@@ -165,11 +174,24 @@ class BaseDcmClientPlugin(ExtNagiosPlugin):
         self.api = None
         """
         @ivar: an initialized REST API client object
-        @type: RestApi
+        @type: RestApi or CachedRestApi
+        """
+
+        self._api_cache = bool(api_cache)
+        """
+        @ivar: whether the responses of the REST API may be taken from the
+               shared cache
+        @type: bool
         """
 
         self.add_args()
 
+    # -----------------------------------------------------------
+    @property
+    def api_cache(self):
+        """Whether the responses of the REST API may be taken from the shared cache."""
+        return self._api_cache
+
     # -------------------------------------------------------------------------
     def as_dict(self):
         """
@@ -181,6 +203,7 @@ class BaseDcmClientPlugin(ExtNagiosPlugin):
         """
 
         d = super(BaseDcmClientPlugin, self).as_dict()
+        d['api_cache'] = self.api_cache
 
         d['api'] = None
         if self.api:
@@ -212,6 +235,19 @@ class BaseDcmClientPlugin(ExtNagiosPlugin):
                 'default': DEFAULT_API_URL}),
         )
 
+        self.add_arg(
+            '--api-cache-ttl',
+            dest='api_cache_ttl',
+            metavar='SECONDS',
+            type=int,
+            default=DEFAULT_CACHE_TTL,
+            help=(
+                "The time in seconds, the cached responses of the REST API are used "
+                "by all DcManager checks of the host without any request, only one "
+                "check at a time refreshes an expired response, 0 disables it "
+                "(Default: %(default)d)."),
+        )
+
     # -------------------------------------------------------------------------
     def parse_args(self, args=None):
         """
@@ -225,6 +261,11 @@ class BaseDcmClientPlugin(ExtNagiosPlugin):
 
         super(BaseDcmClientPlugin, self).parse_args(args)
 
+        if not self.api_cache and getattr(self.argparser.args, 'api_cache_ttl', None):
+            self.die(
+                "The check needs the current responses of the DcManager API, it can't "
+                "take them from the cache (--api-cache-ttl).")
+
     # -------------------------------------------------------------------------
     def parse_args_second(self):
         """
@@ -283,11 +324,7 @@ class BaseDcmClientPlugin(ExtNagiosPlugin):
             self.parse_args_second()
 
             log.debug("Creating REST API client object ...")
-            self.api = RestApi.from_config(
-                extra_config_file=self.argparser.args.extra_config_file,
-                api_url=self.argparser.args.api_url,
-                timeout=self.timeout,
-            )
+            self.api = self.create_api()
 
             if self.verbose > 2:
                 log.debug("Current object:\n%s", pp(self.as_dict()))
@@ -305,6 +342,75 @@ class BaseDcmClientPlugin(ExtNagiosPlugin):
 
             self.exit(state, out)
 
+    # -------------------------------------------------------------------------
+    def create_api(self, timeout=None):
+        """
+        Creates a new REST API client object from the configuration and the
+        command line parameters. Concurrent requests should use their own
+        client objects.
+
+        With --api-cache-ttl the client object takes the responses from
+        the cache shared by all DcManager checks of the host. The requests
+        themselves are done by the transport of the DcManager client, so
+        their connections aren't pooled or kept alive and the listings
+        aren't revalidated conditionally (ETag/If-Modified-Since).
+
+        @param timeout: the timeout of the requests in seconds, the timeout
+                        of the plugin, if None
+        @type timeout: float or None
+
+        @return: the client object
+        @rtype: RestApi or CachedRestApi
+
+        """
+
+        if timeout is None:
+            timeout = self.timeout
+
+        api = RestApi.from_config(
+            extra_config_file=self.argparser.args.extra_config_file,
+            api_url=self.argparser.args.api_url,
+            timeout=timeout,
+        )
+        cache_ttl = getattr(self.argparser.args, 'api_cache_ttl', None)
+        if not self.api_cache or not cache_ttl or cache_ttl < 0:
+            return api
+
+        lock_timeout = min(DEFAULT_LOCK_TIMEOUT, self.timeout / 4.0)
+        return CachedRestApi(api, ResponseCache(ttl=cache_ttl, lock_timeout=lock_timeout))
+
+    # -------------------------------------------------------------------------
+    def iter_api_objects(self, name, api=None, **params):
+        """
+        Iterates over the objects of a listing method of the REST API client
+        (e.g. 'vstorages'), so the caller can keep only the data it needs.
+
+        If the client gives back the undecoded response (a file like object
+        or the JSON text), the JSON array is decoded incrementally, so only
+        one object at a time is held in memory. An already decoded list is
+        emptied during the iteration.
+
+        @raise ValueError: if the response is not a valid JSON array
+
+        @param name: the name of the method of the client object
+        @type name: str
+        @param api: the client object to use, self.api, if None
+        @type api: RestApi, CachedRestApi or None
+        @param params: the keyword arguments of the method
+        @type params: dict
+
+        @return: the objects from API
+        @rtype: iterator
+
+        """
+
+        if api is None:
+            api = self.api
+
+        if isinstance(api, CachedRestApi):
+            return iter_objects(api.get(name, **params))
+        return iter_objects(getattr(api, name)(**params))
+
     # -------------------------------------------------------------------------
     def pre_run(self):
         """
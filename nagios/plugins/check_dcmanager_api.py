@@ -13,7 +13,10 @@ import logging
 import textwrap
 import time
 
-from numbers import Number
+try:
+    from urllib.parse import parse_qsl
+except ImportError:
+    from urlparse import parse_qsl
 
 # Third party modules
 
@@ -21,8 +24,12 @@ from numbers import Number
 
 import nagios
 
+from nagios.common import monotonic, percentile
+
 from nagios.plugin.range import NagiosRange
 
+from nagios.plugin.workers import run_concurrently, WorkerTimeoutError
+
 from nagios.plugins.base_dcm_client_check import BaseDcmClientPlugin
 
 from dcmanagerclient.client import RestApiError
@@ -30,7 +37,7 @@ from dcmanagerclient.client import RestApiError
 # --------------------------------------------
 # Some module variables
 
-__version__ = '0.2.1'
+__version__ = '0.3.3'
 __copyright__ = 'Copyright (c) 2015 Frank Brehm, Berlin.'
 
 DEFAULT_TIMEOUT = 60
@@ -38,6 +45,15 @@ DEFAULT_TIMEOUT = 60
 DEFAULT_WARN_TIME = 10.0
 DEFAULT_CRIT_TIME = 20.0
 
+DEFAULT_REQUESTS = 1
+DEFAULT_CONCURRENCY = 1
+DEFAULT_ENDPOINTS = 'clusters'
+DEFAULT_PERCENTILE = 95.0
+
+# The percentiles of the response times given as performance data
+# additionally to the thresholded one
+PERF_PERCENTILES = (('resp_min', 0), ('resp_p50', 50), ('resp_p95', 95), ('resp_max', 100))
+
 log = logging.getLogger(__name__)
 
 
@@ -56,18 +72,22 @@ class CheckDcmanagerApiPlugin(BaseDcmClientPlugin):
 
         usage = """\
                 %(prog)s [options] [--api-url <api_url>] [-c <critical_time>] [-w <warning_time>]
+                    [--requests <nr>] [--concurrency <nr>] [--endpoints <list>]
+                    [--percentile <percent>]
                 """
         usage = textwrap.dedent(usage).strip()
         usage += '\n       %(prog)s --usage'
         usage += '\n       %(prog)s --help'
 
         blurb = __copyright__ + "\n\n"
-        blurb += "Checks the ability of the DcManager API."
+        blurb += "Checks the ability of the DcManager API. With more than one request "
+        blurb += "the given percentile of the response times is checked."
 
         super(CheckDcmanagerApiPlugin, self).__init__(
             shortname='PB_DCM_API',
             usage=usage, blurb=blurb,
             timeout=DEFAULT_TIMEOUT,
+            api_cache=False,
         )
 
         self._warning = NagiosRange(start=0.0, end=DEFAULT_WARN_TIME)
@@ -84,6 +104,40 @@ class CheckDcmanagerApiPlugin(BaseDcmClientPlugin):
         @type: NagiosRange
         """
 
+        self._requests = DEFAULT_REQUESTS
+        """
+        @ivar: the number of requests of the probe
+        @type: int
+        """
+
+        self._concurrency = DEFAULT_CONCURRENCY
+        """
+        @ivar: the maximum number of concurrent requests
+        @type: int
+        """
+
+        self._endpoints = [('clusters', {})]
+        """
+        @ivar: the requested listings as tuples of the method name of the
+               client and its parameters, the requests are distributed
+               round robin over them
+        @type: list of tuple
+        """
+
+        self._percentile = DEFAULT_PERCENTILE
+        """
+        @ivar: the percentile of the response times checked against
+               the thresholds
+        @type: float
+        """
+
+        self.deadline = None
+        """
+        @ivar: the time (as time.time()), after which no request is started
+               anymore, the remaining time is the timeout of every request
+        @type: float or None
+        """
+
     # -----------------------------------------------------------
     @property
     def warning(self):
@@ -96,6 +150,30 @@ class CheckDcmanagerApiPlugin(BaseDcmClientPlugin):
         """The critical threshold of the test."""
         return self._critical
 
+    # -----------------------------------------------------------
+    @property
+    def requests(self):
+        """The number of requests of the probe."""
+        return self._requests
+
+    # -----------------------------------------------------------
+    @property
+    def concurrency(self):
+        """The maximum number of concurrent requests."""
+        return self._concurrency
+
+    # -----------------------------------------------------------
+    @property
+    def endpoints(self):
+        """The requested listings with their parameters."""
+        return self._endpoints
+
+    # -----------------------------------------------------------
+    @property
+    def percentile(self):
+        """The percentile of the response times checked against the thresholds."""
+        return self._percentile
+
     # -------------------------------------------------------------------------
     def as_dict(self):
         """
@@ -109,6 +187,10 @@ class CheckDcmanagerApiPlugin(BaseDcmClientPlugin):
         d = super(CheckDcmanagerApiPlugin, self).as_dict()
         d['warning'] = self.warning
         d['critical'] = self.critical
+        d['requests'] = self.requests
+        d['concurrency'] = self.concurrency
+        d['endpoints'] = self.endpoints
+        d['percentile'] = self.percentile
 
         return d
 
@@ -128,7 +210,7 @@ class CheckDcmanagerApiPlugin(BaseDcmClientPlugin):
             metavar='SECONDS',
             dest='warning',
             required=True,
-            type=Number,
+            type=float,
             default=DEFAULT_WARN_TIME,
             help=msg,
         )
@@ -138,12 +220,54 @@ class CheckDcmanagerApiPlugin(BaseDcmClientPlugin):
             '-c', '--critical',
             metavar='SECONDS',
             dest='critical',
-            type=Number,
+            type=float,
             required=True,
             default=DEFAULT_CRIT_TIME,
             help=msg,
         )
 
+        self.add_arg(
+            '--requests',
+            metavar='NR',
+            dest='requests',
+            type=int,
+            default=DEFAULT_REQUESTS,
+            help="The number of requests to the API (Default: %(default)d).",
+        )
+
+        self.add_arg(
+            '--concurrency',
+            metavar='NR',
+            dest='concurrency',
+            type=int,
+            default=DEFAULT_CONCURRENCY,
+            help=(
+                "The maximum number of concurrent requests, so the check can be used "
+                "as a light load probe (Default: %(default)d)."),
+        )
+
+        self.add_arg(
+            '--endpoints',
+            metavar='LIST',
+            dest='endpoints',
+            default=DEFAULT_ENDPOINTS,
+            help=(
+                "Comma separated listings of the API to request round robin, optionally "
+                "with query parameters, e.g. 'clusters,pstorages?name=storage201' "
+                "(Default: %(default)r)."),
+        )
+
+        self.add_arg(
+            '--percentile',
+            metavar='PERCENT',
+            dest='percentile',
+            type=float,
+            default=DEFAULT_PERCENTILE,
+            help=(
+                "The percentile of the response times to check against the thresholds "
+                "(Default: %(default)g)."),
+        )
+
         super(CheckDcmanagerApiPlugin, self).add_args()
 
     # -------------------------------------------------------------------------
@@ -161,6 +285,36 @@ class CheckDcmanagerApiPlugin(BaseDcmClientPlugin):
         if self.argparser.args.critical is not None:
             self._critical = NagiosRange(start=0.0, end=self.argparser.args.critical)
 
+        args = self.argparser.args
+
+        if args.requests is not None:
+            if args.requests < 1:
+                self.die("The number of requests must be at least 1.")
+            self._requests = args.requests
+
+        if args.concurrency is not None:
+            if args.concurrency < 1:
+                self.die("The number of concurrent requests must be at least 1.")
+            self._concurrency = args.concurrency
+
+        if args.percentile is not None:
+            if not 0 <= args.percentile <= 100:
+                self.die("The percentile must be between 0 and 100.")
+            self._percentile = args.percentile
+
+        if args.endpoints:
+            self._endpoints = []
+            for endpoint in args.endpoints.split(','):
+                (name, sep, query) = endpoint.strip().partition('?')
+                if not name:
+                    continue
+                params = {}
+                for (key, value) in parse_qsl(query):
+                    params[key] = value
+                self._endpoints.append((name, params))
+            if not self._endpoints:
+                self.die("No endpoints of the API given.")
+
         # set thresholds
         self.set_thresholds(
             warning=self.warning,
@@ -168,31 +322,95 @@ class CheckDcmanagerApiPlugin(BaseDcmClientPlugin):
         )
 
     # -------------------------------------------------------------------------
-    def run(self):
-        """Main execution method."""
+    def probe(self, endpoint):
+        """
+        Requests the given listing with an own client object, the time
+        remaining until the deadline is the timeout of the request.
+
+        @raise WorkerTimeoutError: if the deadline is already exceeded
+
+        @param endpoint: the method name of the client and its parameters
+        @type endpoint: tuple
 
-        state = nagios.state.ok
-        out = "DcManager API %r seems to be okay." % (
-            self.api.url)
+        @return: the response time in seconds and the number of the
+                 received objects
+        @rtype: tuple
 
-        end_time = None
-        start_time = time.time()
-        try:
-            clusters = self.api.clusters()
-        except RestApiError as e:
-            state = nagios.state.critical
-            self.exit(state, str(e))
+        """
+
+        (name, params) = endpoint
+        timeout = None
+        if self.deadline is not None:
+            timeout = self.deadline - time.time()
+            if timeout <= 0:
+                raise WorkerTimeoutError(endpoint)
+        api = self.create_api(timeout=timeout)
+
+        start_time = monotonic()
+        objects = getattr(api, name)(**params)
+        duration = monotonic() - start_time
+
+        return (duration, len(objects))
 
-        end_time = time.time()
-        duration = end_time - start_time
+    # -------------------------------------------------------------------------
+    def run(self):
+        """Main execution method."""
 
-        nr_clusters = len(clusters)
+        endpoints = []
+        for i in range(self.requests):
+            endpoints.append(self.endpoints[i % len(self.endpoints)])
+
+        self.deadline = time.time() + self.timeout
+        results = run_concurrently(
+            self.probe, endpoints, max_workers=self.concurrency, deadline=self.deadline)
+
+        durations = []
+        errors = []
+        nr_clusters = None
+        for (endpoint, (result, exc_info)) in zip(endpoints, results):
+            if exc_info:
+                e = exc_info[1]
+                if isinstance(e, WorkerTimeoutError):
+                    errors.append("Timeout after %d seconds." % (self.timeout))
+                elif isinstance(e, RestApiError):
+                    errors.append(str(e))
+                else:
+                    errors.append("%s: %s" % (e.__class__.__name__, e))
+                continue
+            durations.append(result[0])
+            if endpoint[0] == 'clusters':
+                nr_clusters = result[1]
+
+        error_rate = 100.0 * len(errors) / len(endpoints)
+        if self.requests > 1:
+            self.add_perfdata(
+                label='error_rate', uom='%', value=error_rate, min_data=0, max_data=100)
+
+        if not durations:
+            self.exit(nagios.state.critical, errors[0])
+
+        duration = percentile(durations, self.percentile)
         state = self.threshold.get_status(duration)
+        if errors and state == nagios.state.ok:
+            state = nagios.state.warning
         self.add_perfdata(label='resp_time', uom='s', value=duration, threshold=self.threshold)
-        out = "Response time of DcManager API %r: %0.2f sec, found %d clusters." % (
-            self.api.url, duration, nr_clusters)
 
-        self.exit(state, out)
+        if self.requests == 1:
+            out = "Response time of DcManager API %r: %0.2f sec" % (self.api.url, duration)
+            if nr_clusters is not None:
+                out += ", found %d clusters" % (nr_clusters)
+            self.exit(state, out + ".")
+
+        for (label, percent) in PERF_PERCENTILES:
+            self.add_perfdata(label=label, uom='s', value=percentile(durations, percent))
+
+        out = "Response time (p%g) of DcManager API %r: %0.2f sec of %d requests" % (
+            self.percentile, self.api.url, duration, self.requests)
+        if self.concurrency > 1:
+            out += " (%d concurrent)" % (self.concurrency)
+        if errors:
+            out += ", %d failed: %s" % (len(errors), errors[0].rstrip('.'))
+        self.exit(state, out + ".")
 
 # =============================================================================
 
@@ -23,16 +23,41 @@ from nagios.plugin.argparser import default_timeout
 
 from nagios.plugin.extended import ExtNagiosPlugin
 
+from nagios.plugin.fixtures import get_fixture_archive, MODE_REPLAY
+
+from nagios.plugins.megaraid_collector import DEFAULT_MAX_AGE
+from nagios.plugins.megaraid_collector import MegaRaidCollector
+from nagios.plugins.megaraid_collector import decode_storcli_output
+from nagios.plugins.megaraid_collector import decode_storcli_outputs
+
 # --------------------------------------------
 # Some module variables
 
-__version__ = '0.4.1'
+__version__ = '0.7.1'
 
 log = logging.getLogger(__name__)
 
 re_exit_code = re.compile(r'^\s*Exit\s*Code\s*:\s+0x([0-9a-f]+)', re.IGNORECASE)
 re_no_adapter = re.compile(
     r'^\s*User\s+specified\s+controller\s+is\s+not\s+present', re.IGNORECASE)
+re_storcli_no_adapter = re.compile(r'^\s*Controller\s+\d+\s+not\s+found', re.IGNORECASE)
+
+MEGACLI_NAMES = ('MegaCli64', 'MegaCli', 'megacli')
+STORCLI_NAMES = ('storcli64', 'storcli', 'perccli64', 'perccli')
+
+ALL_ADAPTERS = 'ALL'
+
+
+# =============================================================================
+def adapter_nr_arg(value):
+    """
+    Type of the argument -a/--adapter-nr, the number of an adapter or
+    'ALL' (case insensitive).
+    """
+
+    if value.strip().upper() == ALL_ADAPTERS:
+        return ALL_ADAPTERS
+    return int(value)
 
 
 # =============================================================================
@@ -42,6 +67,12 @@ class CheckMegaRaidPlugin(ExtNagiosPlugin):
     adapter and its connected enclosures, physical drives and logical volumes.
     """
 
+    supports_all_adapters = False
+    """
+    @cvar: whether the plugin is able to check all adapters at once (-a ALL)
+    @type: bool
+    """
+
     # -------------------------------------------------------------------------
     def __init__(
             self, usage=None, shortname=None, version=None, blurb=None,):
@@ -79,18 +110,44 @@ class CheckMegaRaidPlugin(ExtNagiosPlugin):
         @type: str
         """
 
+        self._all_adapters = False
+        """
+        @ivar: check all adapters at once
+        @type: bool
+        """
+
         self._megacli_cmd = None
         """
         @ivar: the path to the executable MegaCli command
         @type: str
         """
 
+        self._storcli_cmd = None
+        """
+        @ivar: the path to the executable storcli (or perccli) command,
+               which is preferred to MegaCli
+        @type: str
+        """
+
         self._timeout = default_timeout
         """
         @ivar: the timeout on execution of MegaCli in seconds
         @type: int
         """
 
+        self._max_age = DEFAULT_MAX_AGE
+        """
+        @ivar: the maximum age in seconds of a snapshot of the adapter
+               shared with the other MegaRaid checks
+        @type: int
+        """
+
+        self._state_dir = None
+        """
+        @ivar: the directory for the snapshot files
+        @type: str or None
+        """
+
         self._init_megacli_cmd()
 
     # -----------------------------------------------------------
@@ -99,18 +156,42 @@ class CheckMegaRaidPlugin(ExtNagiosPlugin):
         """The number of the MegaRaid adapter (e.g. 0)."""
         return self._adapter_nr
 
+    # -----------------------------------------------------------
+    @property
+    def all_adapters(self):
+        """Check all adapters at once."""
+        return self._all_adapters
+
     # -----------------------------------------------------------
     @property
     def megacli_cmd(self):
         """The path to the executable MegaCli command."""
         return self._megacli_cmd
 
+    # -----------------------------------------------------------
+    @property
+    def storcli_cmd(self):
+        """The path to the executable storcli (or perccli) command."""
+        return self._storcli_cmd
+
     # -----------------------------------------------------------
     @property
     def timeout(self):
         """The timeout on execution of MegaCli in seconds."""
         return self._timeout
 
+    # -----------------------------------------------------------
+    @property
+    def max_age(self):
+        """The maximum age in seconds of a shared snapshot of the adapter."""
+        return self._max_age
+
+    # -----------------------------------------------------------
+    @property
+    def state_dir(self):
+        """The directory for the snapshot files."""
+        return self._state_dir
+
     # -------------------------------------------------------------------------
     def as_dict(self):
         """
@@ -124,8 +205,12 @@ class CheckMegaRaidPlugin(ExtNagiosPlugin):
         d = super(CheckMegaRaidPlugin, self).as_dict()
 
         d['adapter_nr'] = self.adapter_nr
+        d['all_adapters'] = self.all_adapters
         d['megacli_cmd'] = self.megacli_cmd
+        d['storcli_cmd'] = self.storcli_cmd
         d['timeout'] = self.timeout
+        d['max_age'] = self.max_age
+        d['state_dir'] = self.state_dir
 
         return d
 
@@ -140,10 +225,10 @@ class CheckMegaRaidPlugin(ExtNagiosPlugin):
             metavar='NR',
             dest='adapter_nr',
             required=True,
-            type=int,
+            type=adapter_nr_arg,
             default=0,
             help=(
-                "The number of the MegaRaid adapter to check (Default: %(default)d)."),
+                "The number of the MegaRaid adapter to check (Default: %(default)r)."),
         )
 
         self.add_arg(
@@ -155,23 +240,62 @@ class CheckMegaRaidPlugin(ExtNagiosPlugin):
                 "The path to the executable MegaCli command (Default: %(default)r)."),
         )
 
+        self.add_arg(
+            '--storcli',
+            metavar='CMD',
+            dest='storcli_cmd',
+            default=self.storcli_cmd,
+            help=(
+                "The path to the executable storcli or perccli command, which is "
+                "preferred to MegaCli (Default: %(default)r)."),
+        )
+
+        self.add_arg(
+            '--no-storcli',
+            action='store_true',
+            dest='no_storcli',
+            help="Don't use storcli or perccli, but only MegaCli.",
+        )
+
+        self.add_arg(
+            '--max-age',
+            metavar='SECONDS',
+            dest='max_age',
+            type=int,
+            default=DEFAULT_MAX_AGE,
+            help=(
+                "The maximum age of a snapshot of the adapter shared with the other "
+                "MegaRaid checks, 0 queries always the adapter (Default: %(default)d)."),
+        )
+
+        self.add_arg(
+            '--state-dir',
+            metavar='DIR',
+            dest='state_dir',
+            help=(
+                "The directory for the shared snapshots of the adapter "
+                "(Default: $NAGIOS_STATE_DIR or '/var/cache/nagios')."),
+        )
+
     # -------------------------------------------------------------------------
     def _init_megacli_cmd(self):
         """
-        Initializes self.megacli_cmd.
+        Initializes self.storcli_cmd and self.megacli_cmd.
         """
 
-        # self._megacli_cmd = self._get_megacli_cmd()
-        self._megacli_cmd = '/usr/bin/storcli'
+        self._storcli_cmd = self._get_megacli_cmd(exe_names=STORCLI_NAMES)
+        self._megacli_cmd = self._get_megacli_cmd()
 
     # -------------------------------------------------------------------------
-    def _get_megacli_cmd(self, given_path=None):
+    def _get_megacli_cmd(self, given_path=None, exe_names=MEGACLI_NAMES):
         """
-        Finding the executable 'MegaCli64', 'MegaCli' or 'megacli' under the
-        search path or the given path.
+        Finding the executable 'MegaCli64', 'MegaCli' or 'megacli' (or one of
+        the given executable names) under the search path or the given path.
 
         @param given_path: a possibly given path to MegaCli
         @type given_path: str
+        @param exe_names: the names of the executable to search for
+        @type exe_names: tuple of str
 
         @return: the found path to the megacli executable.
         @rtype: str or None
@@ -181,7 +305,13 @@ class CheckMegaRaidPlugin(ExtNagiosPlugin):
         def is_exe(fpath):
             return os.path.isfile(fpath) and os.access(fpath, os.X_OK)
 
-        exe_names = ('MegaCli64', 'MegaCli', 'megacli')
+        archive = get_fixture_archive()
+        if archive and archive.mode == MODE_REPLAY:
+            for exe_name in ((given_path,) if given_path else exe_names):
+                if archive.has_command(exe_name):
+                    return exe_name
+            return None
+
         if given_path:
             # Normalize the given path, if it exists.
             if os.path.isabs(given_path):
@@ -197,13 +327,16 @@ class CheckMegaRaidPlugin(ExtNagiosPlugin):
             os.sep + os.path.join('usr', 'local', 'sbin'),
             os.sep + os.path.join('opt', 'bin'),
             os.sep + os.path.join('opt', 'sbin'),
+            os.sep + os.path.join('opt', 'MegaRAID', 'storcli'),
+            os.sep + os.path.join('opt', 'MegaRAID', 'perccli'),
+            os.sep + os.path.join('opt', 'MegaRAID', 'MegaCli'),
         )
         for sbin in sbin_paths:
             if sbin not in search_paths:
                 search_paths.append(sbin)
 
         for exe_name in exe_names:
-            for path in os.environ["PATH"].split(os.pathsep):
+            for path in search_paths:
                 path = path.strip('"')
                 exe_file = os.path.join(path, exe_name)
                 if is_exe(exe_file):
@@ -226,11 +359,26 @@ class CheckMegaRaidPlugin(ExtNagiosPlugin):
 
         super(CheckMegaRaidPlugin, self).parse_args(args)
 
-        self._adapter_nr = self.argparser.args.adapter_nr
+        if self.argparser.args.adapter_nr == ALL_ADAPTERS:
+            if not self.supports_all_adapters:
+                self.die("Checking all adapters at once is not supported by %s." % (
+                    self.__class__.__name__))
+            self._all_adapters = True
+            self._adapter_nr = 0
+        else:
+            self._adapter_nr = self.argparser.args.adapter_nr
 
         if self.argparser.args.timeout:
             self._timeout = self.argparser.args.timeout
 
+        if self.argparser.args.max_age is not None:
+            if self.argparser.args.max_age < 0:
+                self.die("The maximum age of a snapshot may not be negative.")
+            self._max_age = self.argparser.args.max_age
+
+        if self.argparser.args.state_dir:
+            self._state_dir = self.argparser.args.state_dir
+
         if self.argparser.args.megacli_cmd:
 
             megacli_cmd = self._get_megacli_cmd(self.argparser.args.megacli_cmd)
@@ -240,6 +388,16 @@ class CheckMegaRaidPlugin(ExtNagiosPlugin):
                         self.argparser.args.megacli_cmd))
             self._megacli_cmd = megacli_cmd
 
+        if self.argparser.args.no_storcli:
+            self._storcli_cmd = None
+        elif self.argparser.args.storcli_cmd:
+            storcli_cmd = self._get_megacli_cmd(self.argparser.args.storcli_cmd)
+            if not storcli_cmd:
+                self.die(
+                    "Could not find storcli command %r." % (
+                        self.argparser.args.storcli_cmd))
+            self._storcli_cmd = storcli_cmd
+
     # -------------------------------------------------------------------------
     def pre_call(self):
         """
@@ -249,8 +407,8 @@ class CheckMegaRaidPlugin(ExtNagiosPlugin):
         self.parse_args()
         self.init_root_logger()
 
-        if not self.megacli_cmd:
-            self.die("Could not find 'MegaCli64' or 'MegaCli' in OS PATH.")
+        if not self.megacli_cmd and not self.storcli_cmd:
+            self.die("Could not find 'storcli64', 'storcli', 'MegaCli64' or 'MegaCli' in OS PATH.")
 
     # -------------------------------------------------------------------------
     def __call__(self):
@@ -266,12 +424,50 @@ class CheckMegaRaidPlugin(ExtNagiosPlugin):
     def call(self):
         """
         Method to call the plugin directly.
+
+        It evaluates a (possibly shared) snapshot of the adapter and exits.
+        """
+
+        snapshot = self.get_snapshot()
+        (state, out) = self.evaluate(snapshot)
+        self.exit(state, out)
+
+    # -------------------------------------------------------------------------
+    def evaluate(self, snapshot):
+        """
+        Evaluates the given snapshot of the adapter and adds the
+        performance data.
+
+        Must be overridden by inherited classes.
+
+        @param snapshot: the snapshot of the adapter
+                         (see L{MegaRaidCollector})
+        @type snapshot: dict
+
+        @return: the state and the output message
+        @rtype: tuple
+
         """
 
         self.die(
-            "The method call() must be overridden in inherited class %r." % (
+            "The method evaluate() must be overridden in inherited class %r." % (
                 self.__class__.__name__))
 
+    # -------------------------------------------------------------------------
+    def get_snapshot(self):
+        """
+        Retrieves a snapshot of the adapter, either a shared one, which is not
+        older than max_age, or by querying the adapter.
+
+        @return: the snapshot of the adapter
+        @rtype: dict
+
+        """
+
+        collector = MegaRaidCollector(
+            self, max_age=self.max_age, state_dir=self.state_dir)
+        return collector.snapshot()
+
     # -------------------------------------------------------------------------
     def megacli(self, args, nolog=True, no_adapter=False):
         """
@@ -331,6 +527,94 @@ class CheckMegaRaidPlugin(ExtNagiosPlugin):
 
         return (stdoutdata, stderrdata, ret, exit_code)
 
+    # -------------------------------------------------------------------------
+    def storcli(self, args):
+        """
+        Method to call storcli (or perccli) for the current adapter
+        with JSON output.
+
+        @raise ValueError: if storcli gives back an invalid output
+
+        @param args: the arguments given on calling the binary. A leading
+                     object path (e.g. '/vall') is appended to the
+                     controller ('/c0/vall'). If args is of type str,
+                     it will be splitted by whitespaces.
+        @type args: list of str or str
+
+        @return: a tuple with two values:
+                 * the response data as dict
+                 * the exit value, 0 on success
+        @rtype: tuple
+
+        """
+
+        if isinstance(args, str):
+            args = args.split()
+        args = [str(arg) for arg in args]
+
+        ctrl = '/c%d' % (self.adapter_nr)
+        if args and args[0].startswith('/'):
+            ctrl += args.pop(0)
+
+        cmd_list = [self.storcli_cmd, ctrl] + args + ['J']
+
+        (ret, stdoutdata, stderrdata) = self.exec_cmd(cmd_list)
+        if self.verbose > 3:
+            log.debug("Output of %r on StdOut:\n%s", ' '.join(cmd_list[1:]), stdoutdata)
+
+        (status, desc, response) = decode_storcli_output(stdoutdata)
+
+        exit_code = 0
+        if status.lower() != 'success':
+            if re_storcli_no_adapter.search(desc):
+                self.die('The specified controller %d is not present.' % (self.adapter_nr))
+            log.debug("Status of %r: %s - %s", ' '.join(cmd_list[1:]), status, desc)
+            exit_code = ret or 1
+
+        return (response, exit_code)
+
+    # -------------------------------------------------------------------------
+    def storcli_all(self, args):
+        """
+        Method to call storcli (or perccli) for all adapters ('/call')
+        with JSON output.
+
+        @raise ValueError: if storcli gives back an invalid output
+
+        @param args: the arguments given on calling the binary (see storcli())
+        @type args: list of str or str
+
+        @return: a list of tuples with the number of the adapter,
+                 the response data and the exit value (0 on success)
+        @rtype: list of tuple
+
+        """
+
+        if isinstance(args, str):
+            args = args.split()
+        args = [str(arg) for arg in args]
+
+        ctrl = '/call'
+        if args and args[0].startswith('/'):
+            ctrl += args.pop(0)
+
+        cmd_list = [self.storcli_cmd, ctrl] + args + ['J']
+
+        (ret, stdoutdata, stderrdata) = self.exec_cmd(cmd_list)
+        if self.verbose > 3:
+            log.debug("Output of %r on StdOut:\n%s", ' '.join(cmd_list[1:]), stdoutdata)
+
+        result = []
+        for (adapter_nr, status, desc, response) in decode_storcli_outputs(stdoutdata):
+            exit_code = 0
+            if status.lower() != 'success':
+                log.debug("Status of %r on adapter %r: %s - %s",
+                          ' '.join(cmd_list[1:]), adapter_nr, status, desc)
+                exit_code = ret or 1
+            result.append((adapter_nr, response, exit_code))
+
+        return result
+
 
 # =============================================================================
 
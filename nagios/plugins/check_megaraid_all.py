@@ -0,0 +1,385 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@copyright: © 2010 - 2016 by Frank Brehm, Berlin
+@summary: Module for a class for a nagios/icinga plugin to check physical
+          drives, hotspares, logical drives and the BBU of a LSI MegaRaid
+          adapter at once, optionally as passive check results
+"""
+
+# Standard modules
+import sys
+import time
+import socket
+import logging
+import textwrap
+
+# Third party modules
+
+# Own modules
+
+import nagios
+
+from nagios.plugin.functions import max_state, nagios_output, STATUS_TEXT
+
+from nagios.plugin.range import NagiosRange
+
+from nagios.plugins.check_megaraid import CheckMegaRaidPlugin
+from nagios.plugins.check_megaraid_pd import CheckMegaRaidPdPlugin
+from nagios.plugins.check_megaraid_hs import CheckMegaRaidHotsparePlugin
+from nagios.plugins.check_megaraid_ld import CheckMegaRaidLdPlugin
+from nagios.plugins.check_megaraid_bbu import CheckMegaRaidBBUPlugin
+
+# --------------------------------------------
+# Some module variables
+
+__version__ = '0.1.1'
+
+DEFAULT_PD_SERVICE = 'MEGARAID_PD'
+DEFAULT_HS_SERVICE = 'MEGARAID_HOTSPARE'
+DEFAULT_LD_SERVICE = 'MEGARAID_LD_%d'
+DEFAULT_BBU_SERVICE = 'MEGARAID_BBU'
+
+log = logging.getLogger(__name__)
+
+
+# =============================================================================
+class CheckMegaRaidAllPlugin(CheckMegaRaidPlugin):
+    """
+    A special NagiosPlugin class for checking the physical drives, the number
+    of hotspares, all logical drives and the BBU of a LSI MegaRaid adapter
+    from one snapshot of the adapter.
+
+    With --passive the results of all services are written as external
+    commands (PROCESS_SERVICE_CHECK_RESULT) for passive submission.
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self):
+        """
+        Constructor of the CheckMegaRaidAllPlugin class.
+        """
+
+        usage = """\
+                %(prog)s [-v] [-a <adapter_nr>] [--passive [-H <host>] [--command-file <file>]]
+                """
+        usage = textwrap.dedent(usage).strip()
+        usage += '\n       %(prog)s --usage'
+        usage += '\n       %(prog)s --help'
+
+        blurb = "Copyright (c) 2016 Frank Brehm, Berlin.\n\n"
+        blurb += (
+            "Checks physical drives, hotspares, logical drives and the BBU "
+            "of a LSI MegaRaid adapter at once.")
+
+        super(CheckMegaRaidAllPlugin, self).__init__(
+            shortname='MEGARAID',
+            usage=usage, blurb=blurb,
+            version=__version__,
+        )
+
+        self._passive = False
+        """
+        @ivar: write the results as passive check results
+        @type: bool
+        """
+
+        self._host = socket.gethostname().split('.')[0]
+        """
+        @ivar: the hostname used for the passive check results
+        @type: str
+        """
+
+        self._command_file = None
+        """
+        @ivar: the external command file of Nagios/Icinga to write the
+               passive check results, if not given, they are written to STDOUT
+        @type: str or None
+        """
+
+        self._add_args()
+
+    # -----------------------------------------------------------
+    @property
+    def passive(self):
+        """Write the results as passive check results."""
+        return self._passive
+
+    # -----------------------------------------------------------
+    @property
+    def host(self):
+        """The hostname used for the passive check results."""
+        return self._host
+
+    # -----------------------------------------------------------
+    @property
+    def command_file(self):
+        """The external command file to write the passive check results."""
+        return self._command_file
+
+    # -------------------------------------------------------------------------
+    def as_dict(self):
+        """
+        Typecasting into a dictionary.
+
+        @return: structure as dict
+        @rtype:  dict
+
+        """
+
+        d = super(CheckMegaRaidAllPlugin, self).as_dict()
+
+        d['passive'] = self.passive
+        d['host'] = self.host
+        d['command_file'] = self.command_file
+
+        return d
+
+    # -------------------------------------------------------------------------
+    def _add_args(self):
+        """
+        Adding all necessary arguments to the commandline argument parser.
+        """
+
+        self.add_arg(
+            '--passive',
+            action='store_true',
+            dest='passive',
+            help=(
+                "Write the results of all services as external commands "
+                "for passive submission instead of a single check result."),
+        )
+
+        self.add_arg(
+            '-H', '--host',
+            metavar='HOST',
+            dest='host',
+            default=self.host,
+            help="The hostname used for the passive check results (Default: %(default)r).",
+        )
+
+        self.add_arg(
+            '--command-file',
+            metavar='FILE',
+            dest='command_file',
+            help=(
+                "The external command file of Nagios/Icinga to append the passive "
+                "check results (Default: write them to STDOUT)."),
+        )
+
+        self.add_arg(
+            '--hs-warning',
+            metavar='DRIVES:',
+            dest='hs_warning',
+            type=NagiosRange,
+            default=NagiosRange('2:'),
+            help="The warning threshold of the number of hotspares (Default: %(default)s).",
+        )
+
+        self.add_arg(
+            '--hs-critical',
+            metavar='DRIVES:',
+            dest='hs_critical',
+            type=NagiosRange,
+            default=NagiosRange('1:'),
+            help="The critical threshold of the number of hotspares (Default: %(default)s).",
+        )
+
+        self.add_arg(
+            '-W', '--warn_on_consistency_check',
+            action='store_true',
+            dest='wocc',
+            help=(
+                'Emit a warning, if there is currently a '
+                'consitency check on a logical drive.'),
+        )
+
+        for (opt, dest, default, what) in (
+                ('--pd-service', 'pd_service', DEFAULT_PD_SERVICE, 'physical drives'),
+                ('--hs-service', 'hs_service', DEFAULT_HS_SERVICE, 'hotspares'),
+                ('--ld-service', 'ld_service', DEFAULT_LD_SERVICE,
+                    'logical drives, %%d is replaced by the LD number'),
+                ('--bbu-service', 'bbu_service', DEFAULT_BBU_SERVICE, 'the BBU')):
+            self.add_arg(
+                opt,
+                metavar='NAME',
+                dest=dest,
+                default=default,
+                help=("The service description for %s (Default: %%(default)r)." % (what)),
+            )
+
+        super(CheckMegaRaidAllPlugin, self)._add_args()
+
+    # -------------------------------------------------------------------------
+    def parse_args(self, args=None):
+        """
+        Executes self.argparser.parse_args().
+
+        @param args: the argument strings to parse. If not given, they are
+                     taken from sys.argv.
+        @type args: list of str or None
+
+        """
+
+        super(CheckMegaRaidAllPlugin, self).parse_args(args)
+
+        if self.argparser.args.passive:
+            self._passive = True
+        if self.argparser.args.host:
+            self._host = self.argparser.args.host
+        if self.argparser.args.command_file:
+            self._command_file = self.argparser.args.command_file
+
+        if '%d' not in self.argparser.args.ld_service:
+            self.die("The service description for logical drives must contain '%d'.")
+
+    # -------------------------------------------------------------------------
+    def _sub_plugin(self, plugin_class):
+        """
+        Creates a plugin object of the given class for evaluating one service
+        and transfers the common settings to it.
+        """
+
+        plugin = plugin_class()
+        plugin._adapter_nr = self.adapter_nr
+        plugin._megacli_cmd = self.megacli_cmd
+        plugin._storcli_cmd = self.storcli_cmd
+        plugin.verbose = self.verbose
+        return plugin
+
+    # -------------------------------------------------------------------------
+    def evaluate_all(self, snapshot):
+        """
+        Evaluates all services from the given snapshot of the adapter.
+
+        @param snapshot: the snapshot of the adapter
+        @type snapshot: dict
+
+        @return: a list of tuples with the service description, the state and
+                 the complete output line (incl. performance data)
+        @rtype: list of tuple
+
+        """
+
+        args = self.argparser.args
+        results = []
+
+        def add_result(service, plugin, state_out):
+            (state, out) = nagios_output(state_out[0], state_out[1], plugin)
+            results.append((service, state, out))
+
+        pd_plugin = self._sub_plugin(CheckMegaRaidPdPlugin)
+        add_result(args.pd_service, pd_plugin, pd_plugin.evaluate(snapshot))
+
+        hs_plugin = self._sub_plugin(CheckMegaRaidHotsparePlugin)
+        hs_plugin.set_thresholds(warning=args.hs_warning, critical=args.hs_critical)
+        add_result(args.hs_service, hs_plugin, hs_plugin.evaluate(snapshot))
+
+        for ld in snapshot['ld']['drives']:
+            ld_plugin = self._sub_plugin(CheckMegaRaidLdPlugin)
+            ld_plugin._ld_number = ld['number']
+            if args.wocc:
+                ld_plugin._warn_on_consistency_check = True
+            add_result(
+                args.ld_service % (ld['number']), ld_plugin,
+                ld_plugin.evaluate_ld(ld, snapshot['ld']['exit_code']))
+
+        bbu_plugin = self._sub_plugin(CheckMegaRaidBBUPlugin)
+        add_result(args.bbu_service, bbu_plugin, bbu_plugin.evaluate(snapshot))
+
+        return results
+
+    # -------------------------------------------------------------------------
+    def call(self):
+        """
+        Method to call the plugin directly.
+        """
+
+        snapshot = self.get_snapshot()
+        results = self.evaluate_all(snapshot)
+
+        if self.passive:
+            self.submit(results, snapshot['timestamp'])
+
+        (state, out) = self.evaluate(snapshot, results)
+        self.exit(state, out)
+
+    # -------------------------------------------------------------------------
+    def evaluate(self, snapshot, results=None):
+        """
+        Summarizes the results of all services.
+
+        @return: the state and the output message
+        @rtype: tuple
+
+        """
+
+        if results is None:
+            results = self.evaluate_all(snapshot)
+
+        state = nagios.state.ok
+        counts = {}
+        for (service, svc_state, out) in results:
+            state = max_state(state, svc_state)
+            counts[svc_state] = counts.get(svc_state, 0) + 1
+
+        summary = []
+        for svc_state in sorted(counts.keys(), reverse=True):
+            summary.append("%d %s" % (counts[svc_state], STATUS_TEXT[svc_state]))
+        out = "%d services of MegaRaid adapter %d checked: %s." % (
+            len(results), self.adapter_nr, ', '.join(summary))
+
+        if self.passive:
+            out += " Results submitted for host %r." % (self.host)
+        else:
+            for (service, svc_state, svc_out) in results:
+                out += "\n" + svc_out.split(' | ')[0]
+
+        return (state, out)
+
+    # -------------------------------------------------------------------------
+    def submit(self, results, timestamp=None):
+        """
+        Writes the given results as external commands
+        PROCESS_SERVICE_CHECK_RESULT to the command file or to STDOUT.
+
+        @param results: the results of evaluate_all()
+        @type results: list of tuple
+        @param timestamp: the check time as UNIX timestamp
+        @type timestamp: float or None
+
+        """
+
+        if timestamp is None:
+            timestamp = time.time()
+
+        lines = []
+        for (service, state, out) in results:
+            lines.append("[%d] PROCESS_SERVICE_CHECK_RESULT;%s;%s;%d;%s\n" % (
+                timestamp, self.host, service, state, out))
+
+        if not self.command_file:
+            sys.stdout.write(''.join(lines))
+            return
+
+        log.debug("Writing %d check results into %r ...", len(lines), self.command_file)
+        try:
+            fh = open(self.command_file, 'a')
+            try:
+                fh.write(''.join(lines))
+            finally:
+                fh.close()
+        except IOError as e:
+            self.die("Could not write to command file %r: %s" % (self.command_file, e))
+
+# =============================================================================
+
+if __name__ == "__main__":
+
+    pass
+
+# =============================================================================
+
+# vim: fileencoding=utf-8 filetype=python ts=4 et
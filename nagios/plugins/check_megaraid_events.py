@@ -0,0 +1,580 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@copyright: © 2010 - 2016 by Frank Brehm, Berlin
+@summary: Module for a class for a nagios/icinga plugin to check the event log
+          of a LSI MegaRaid adapter incrementally since the last check
+"""
+
+# Standard modules
+import os
+import re
+import time
+import logging
+import tempfile
+import textwrap
+
+# Third party modules
+
+# Own modules
+
+import nagios
+
+from nagios.plugin.functions import max_state
+
+from nagios.plugin.report import ReportParser, first_int, normalize_key
+
+from nagios.plugin.statefile import NagiosStateFile, NagiosStateFileError
+from nagios.plugin.statefile import get_state_dir
+
+from nagios.plugins.check_megaraid import CheckMegaRaidPlugin
+
+# --------------------------------------------
+# Some module variables
+
+__version__ = '0.1.3'
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_EVENTS = 1000
+DEFAULT_HOLD_TIME = 24 * 60 * 60
+DEFAULT_WARNING_CLASS = 1
+DEFAULT_CRITICAL_CLASS = 2
+MAX_DETAIL_LINES = 20
+
+# The classes of events of MegaCli
+EVENT_CLASSES = {
+    -2: 'debug',
+    -1: 'progress',
+    0: 'info',
+    1: 'warning',
+    2: 'critical',
+    3: 'fatal',
+    4: 'dead',
+}
+
+re_hex = re.compile(r'^\s*0x([0-9a-f]+)', re.IGNORECASE)
+
+
+# =============================================================================
+def seq_number(value):
+    """
+    Converter of sequence numbers and codes, which are given hexadecimal
+    ('0x00003039') or decimal.
+
+    @raise ValueError: if the value is not a number
+    """
+
+    if isinstance(value, int):
+        return value
+    value = str(value)
+    match = re_hex.search(value)
+    if match:
+        return int(match.group(1), 16)
+    return first_int(value)
+
+
+# Example output of 'MegaCli -AdpEventLog -GetEventLogInfo -a0'
+"""
+Adapter #0
+
+********************************************
+Event Information
+********************************************
+
+Newest sequence number : 14546
+Oldest sequence number : 0
+Clear sequence number  : 65535
+Shutdown sequence number : 14439
+Reboot sequence number : 14443
+Exit Code: 0x00
+"""
+event_info_parser = ReportParser(
+    {
+        'Newest sequence number': ('newest', seq_number),
+        'Oldest sequence number': ('oldest', seq_number),
+        'Clear sequence number': ('clear', seq_number),
+        'Shutdown sequence number': ('shutdown', seq_number),
+        'Reboot sequence number': ('reboot', seq_number),
+    },
+    defaults={
+        'newest': None,
+        'oldest': None,
+    },
+)
+
+# Example of an event in the file of 'MegaCli -AdpEventLog -GetLatest 1 -f <file> -a0'
+"""
+seqNum: 0x000038d2
+Time: Mon Jan 11 10:12:13 2016
+
+Code: 0x00000071
+Class: 0
+Locale: 0x02
+Event Description: Unexpected sense: PD 0a(e0x20/s10) Path 5000c50056f2ec1d,
+    CDB: 28 00, Sense: 6/29/02
+Event Data:
+===========
+Device ID: 10
+Enclosure Index: 32
+Slot Number: 10
+"""
+event_parser = ReportParser(
+    {
+        'seqNum': ('seq', seq_number),
+        'Time': 'time',
+        'Seconds since last reboot': ('time', lambda x: 'reboot + %s s' % (x)),
+        'Code': ('code', seq_number),
+        'Class': ('class', int),
+        'Event Description': 'description',
+    },
+    start_key='seqNum',
+    defaults={
+        'time': None,
+        'code': None,
+        'class': 0,
+        'description': '',
+    },
+)
+
+
+# =============================================================================
+class CheckMegaRaidEventsPlugin(CheckMegaRaidPlugin):
+    """
+    A special NagiosPlugin class for checking the event log of a LSI MegaRaid
+    adapter.
+
+    Only the events since the sequence number of the last check (the
+    checkpoint kept in a state file) are read, so the costs depend on the
+    number of new events and not on the size of the event log. Events of
+    the warning and critical classes are reported for the hold time.
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self):
+        """
+        Constructor of the CheckMegaRaidEventsPlugin class.
+        """
+
+        usage = """\
+                %(prog)s [-v] [-a <adapter_nr>] [--max-events <count>] [--hold <seconds>]
+                """
+        usage = textwrap.dedent(usage).strip()
+        usage += '\n       %(prog)s --usage'
+        usage += '\n       %(prog)s --help'
+
+        blurb = "Copyright (c) 2016 Frank Brehm, Berlin.\n\n"
+        blurb += (
+            "Checks the event log of a LSI MegaRaid adapter for new "
+            "warning and critical events since the last check.")
+
+        super(CheckMegaRaidEventsPlugin, self).__init__(
+            shortname='MEGARAID_EVENTS',
+            usage=usage, blurb=blurb,
+            version=__version__,
+        )
+
+        self._max_events = DEFAULT_MAX_EVENTS
+        """
+        @ivar: the maximum number of events to read at once
+        @type: int
+        """
+
+        self._hold_time = DEFAULT_HOLD_TIME
+        """
+        @ivar: the time in seconds, how long found events are reported
+        @type: int
+        """
+
+        self._warning_class = DEFAULT_WARNING_CLASS
+        """
+        @ivar: the minimum class of events causing a warning
+        @type: int
+        """
+
+        self._critical_class = DEFAULT_CRITICAL_CLASS
+        """
+        @ivar: the minimum class of events causing a critical state
+        @type: int
+        """
+
+        self._add_args()
+
+    # -----------------------------------------------------------
+    @property
+    def max_events(self):
+        """The maximum number of events to read at once."""
+        return self._max_events
+
+    # -----------------------------------------------------------
+    @property
+    def hold_time(self):
+        """The time in seconds, how long found events are reported."""
+        return self._hold_time
+
+    # -----------------------------------------------------------
+    @property
+    def warning_class(self):
+        """The minimum class of events causing a warning."""
+        return self._warning_class
+
+    # -----------------------------------------------------------
+    @property
+    def critical_class(self):
+        """The minimum class of events causing a critical state."""
+        return self._critical_class
+
+    # -------------------------------------------------------------------------
+    def as_dict(self):
+        """
+        Typecasting into a dictionary.
+
+        @return: structure as dict
+        @rtype:  dict
+
+        """
+
+        d = super(CheckMegaRaidEventsPlugin, self).as_dict()
+
+        d['max_events'] = self.max_events
+        d['hold_time'] = self.hold_time
+        d['warning_class'] = self.warning_class
+        d['critical_class'] = self.critical_class
+
+        return d
+
+    # -------------------------------------------------------------------------
+    def _add_args(self):
+        """
+        Adding all necessary arguments to the commandline argument parser.
+        """
+
+        self.add_arg(
+            '--max-events',
+            metavar='COUNT',
+            dest='max_events',
+            type=int,
+            default=DEFAULT_MAX_EVENTS,
+            help=(
+                "The maximum number of new events to read at once, older "
+                "events are skipped (Default: %(default)d)."),
+        )
+
+        self.add_arg(
+            '--hold',
+            metavar='SECONDS',
+            dest='hold_time',
+            type=int,
+            default=DEFAULT_HOLD_TIME,
+            help=(
+                "The time, how long found warning or critical events are "
+                "reported (Default: %(default)d)."),
+        )
+
+        self.add_arg(
+            '--warning-class',
+            metavar='CLASS',
+            dest='warning_class',
+            type=int,
+            default=DEFAULT_WARNING_CLASS,
+            help=(
+                "The minimum class of events causing a warning, the classes are: "
+                "-2 debug, -1 progress, 0 info, 1 warning, 2 critical, 3 fatal, "
+                "4 dead (Default: %(default)d)."),
+        )
+
+        self.add_arg(
+            '--critical-class',
+            metavar='CLASS',
+            dest='critical_class',
+            type=int,
+            default=DEFAULT_CRITICAL_CLASS,
+            help=(
+                "The minimum class of events causing a critical "
+                "state (Default: %(default)d)."),
+        )
+
+        super(CheckMegaRaidEventsPlugin, self)._add_args()
+
+    # -------------------------------------------------------------------------
+    def parse_args(self, args=None):
+        """
+        Executes self.argparser.parse_args().
+
+        @param args: the argument strings to parse. If not given, they are
+                     taken from sys.argv.
+        @type args: list of str or None
+
+        """
+
+        super(CheckMegaRaidEventsPlugin, self).parse_args(args)
+
+        if self.argparser.args.max_events < 1:
+            self.die("The maximum number of events must be at least 1.")
+        self._max_events = self.argparser.args.max_events
+
+        if self.argparser.args.hold_time < 0:
+            self.die("The hold time may not be negative.")
+        self._hold_time = self.argparser.args.hold_time
+
+        self._warning_class = self.argparser.args.warning_class
+        self._critical_class = self.argparser.args.critical_class
+        if self.critical_class < self.warning_class:
+            self.die("The critical class may not be lower than the warning class.")
+
+    # -------------------------------------------------------------------------
+    def call(self):
+        """
+        Method to call the plugin directly.
+        """
+
+        state_file = NagiosStateFile(
+            'megaraid-events-a%d.json' % (self.adapter_nr), state_dir=self.state_dir)
+
+        with state_file:
+            checkpoint = state_file.load()
+            if not isinstance(checkpoint, dict) or 'seq' not in checkpoint:
+                checkpoint = None
+
+            info = self.get_event_log_info()
+            (checkpoint, new_events, skipped) = self.read_new_events(info, checkpoint)
+            (state, out) = self.evaluate_events(checkpoint, new_events, skipped)
+
+            try:
+                state_file.save(checkpoint)
+            except NagiosStateFileError as e:
+                self.die(str(e))
+
+        self.exit(state, out)
+
+    # -------------------------------------------------------------------------
+    def get_event_log_info(self):
+        """
+        Retrieves the sequence numbers of the event log of the adapter.
+
+        @return: the sequence numbers with the keys 'newest', 'oldest',
+                 'clear', 'shutdown' and 'reboot'
+        @rtype: dict
+
+        """
+
+        if self.storcli_cmd:
+            try:
+                (response, exit_code) = self.storcli('show eventloginfo')
+            except ValueError as e:
+                self.die("Could not evaluate output of %r: %s" % (self.storcli_cmd, e))
+            if exit_code:
+                self.die("Could not retrieve event log info of adapter %d." % (
+                    self.adapter_nr))
+            info = {'newest': None, 'oldest': None}
+            for (key, value) in response.items():
+                key = normalize_key(key)
+                if key.endswith(' sequence number'):
+                    try:
+                        info[key.split()[0]] = seq_number(value)
+                    except ValueError:
+                        pass
+        else:
+            (stdoutdata, stderrdata, ret, exit_code) = self.megacli(
+                ('-AdpEventLog', '-GetEventLogInfo'))
+            if exit_code:
+                self.die("Could not retrieve event log info of adapter %d." % (
+                    self.adapter_nr))
+            info = event_info_parser.parse_record(stdoutdata)
+
+        if info['newest'] is None:
+            self.die("Could not detect the newest sequence number of the "
+                     "event log of adapter %d." % (self.adapter_nr))
+
+        if self.verbose > 1:
+            log.debug("Event log info: %r", info)
+        return info
+
+    # -------------------------------------------------------------------------
+    def read_new_events(self, info, checkpoint):
+        """
+        Reads all events newer than the given checkpoint.
+
+        @param info: the sequence numbers of the event log
+        @type info: dict
+        @param checkpoint: the checkpoint of the last check with the keys
+                           'seq' (the last read sequence number), 'timestamp'
+                           and 'alarms' (the held warning and critical events)
+        @type checkpoint: dict or None
+
+        @return: a tuple with the new checkpoint, the list of new events and
+                 the number of skipped events
+        @rtype: tuple
+
+        """
+
+        newest = info['newest']
+
+        if checkpoint is None:
+            log.debug("No checkpoint found, starting with sequence number %d.", newest)
+            checkpoint = {
+                'seq': newest,
+                'timestamp': time.time(),
+                'alarms': [],
+            }
+            return (checkpoint, [], 0)
+
+        last_seq = checkpoint['seq']
+        if newest < last_seq:
+            # event log cleared or adapter replaced
+            log.info("Event log was resetted (newest sequence number %d < %d).",
+                     newest, last_seq)
+            last_seq = -1
+            if info.get('oldest') is not None and info['oldest'] <= newest:
+                last_seq = info['oldest'] - 1
+
+        count = newest - last_seq
+        skipped = 0
+        if count > self.max_events:
+            skipped = count - self.max_events
+            count = self.max_events
+
+        events = []
+        if count > 0:
+            events = self.get_latest_events(count)
+            events = [x for x in events if x['seq'] > last_seq]
+            events.sort(key=lambda x: x['seq'])
+
+        checkpoint = {
+            'seq': newest,
+            'timestamp': time.time(),
+            'alarms': checkpoint.get('alarms', []),
+        }
+        return (checkpoint, events, skipped)
+
+    # -------------------------------------------------------------------------
+    def get_latest_events(self, count):
+        """
+        Reads the latest events from the event log of the adapter.
+
+        @param count: the number of events to read
+        @type count: int
+
+        @return: the events as dicts with the keys 'seq', 'time', 'code',
+                 'class' and 'description'
+        @rtype: list of dict
+
+        """
+
+        (fd, events_file) = tempfile.mkstemp(
+            prefix='megaraid-events-', suffix='.log', dir=get_state_dir(self.state_dir))
+        os.close(fd)
+
+        try:
+            if self.storcli_cmd:
+                (response, exit_code) = self.storcli((
+                    'show', 'events', 'type=latest=%d' % (count),
+                    'file=%s' % (events_file)))
+            else:
+                (stdoutdata, stderrdata, ret, exit_code) = self.megacli((
+                    '-AdpEventLog', '-GetLatest', count, '-f', events_file))
+            if exit_code:
+                self.die("Could not retrieve the latest %d events of adapter %d." % (
+                    count, self.adapter_nr))
+
+            content = self.read_file(
+                events_file, timeout=self.timeout,
+                fixture_name='megaraid-events-a%d.log' % (self.adapter_nr))
+        finally:
+            if os.path.exists(events_file):
+                os.remove(events_file)
+
+        if self.verbose > 3:
+            log.debug("Got events:\n%s", content)
+
+        return [x for x in event_parser.parse(content) if 'seq' in x]
+
+    # -------------------------------------------------------------------------
+    def event_state(self, event):
+        """
+        Gives back the Nagios state of the given event.
+        """
+
+        if event['class'] >= self.critical_class:
+            return nagios.state.critical
+        if event['class'] >= self.warning_class:
+            return nagios.state.warning
+        return nagios.state.ok
+
+    # -------------------------------------------------------------------------
+    def evaluate_events(self, checkpoint, new_events, skipped=0):
+        """
+        Evaluates the new events and the held events of the checkpoint.
+        New warning and critical events are added to the held events of
+        the checkpoint, expired ones are removed.
+
+        @return: the state and the output message
+        @rtype: tuple
+
+        """
+
+        now = time.time()
+        state = nagios.state.ok
+        counts = {
+            nagios.state.ok: 0,
+            nagios.state.warning: 0,
+            nagios.state.critical: 0,
+        }
+
+        for event in new_events:
+            ev_state = self.event_state(event)
+            counts[ev_state] += 1
+            if ev_state != nagios.state.ok:
+                event = dict(event)
+                event['found'] = now
+                checkpoint['alarms'].append(event)
+
+        alarms = []
+        for event in checkpoint['alarms']:
+            if now - event.get('found', 0) <= self.hold_time:
+                alarms.append(event)
+        checkpoint['alarms'] = alarms
+
+        details = []
+        first_detail = len(alarms) - MAX_DETAIL_LINES
+        if first_detail > 0:
+            details.append("... %d older events." % (first_detail))
+        for (i, event) in enumerate(alarms):
+            ev_state = self.event_state(event)
+            state = max_state(state, ev_state)
+            if i < first_detail:
+                continue
+            details.append("#%d %s [%s]: %s" % (
+                event['seq'], event['time'] or '-',
+                EVENT_CLASSES.get(event['class'], event['class']),
+                ' '.join(event['description'].split())))
+
+        out = "%d new events in event log of MegaRaid adapter %d (%d warning, %d critical)" % (
+            len(new_events), self.adapter_nr, counts[nagios.state.warning],
+            counts[nagios.state.critical])
+        if skipped:
+            out += ", %d events skipped" % (skipped)
+        if alarms:
+            out += ", %d held events of the last %d seconds." % (len(alarms), self.hold_time)
+            out += "\n" + "\n".join(details)
+        else:
+            out += "."
+
+        self.add_perfdata(label='new_events', value=len(new_events))
+        self.add_perfdata(label='warning_events', value=counts[nagios.state.warning])
+        self.add_perfdata(label='critical_events', value=counts[nagios.state.critical])
+        self.add_perfdata(label='skipped_events', value=skipped)
+
+        return (state, out)
+
+# =============================================================================
+
+if __name__ == "__main__":
+
+    pass
+
+# =============================================================================
+
+# vim: fileencoding=utf-8 filetype=python ts=4 et
@@ -17,20 +17,20 @@ import textwrap
 
 # Own modules
 
-import nagios
-
 from nagios.plugin.range import NagiosRange
 
-import nagios.plugins.check_megaraid
 from nagios.plugins.check_megaraid import CheckMegaRaidPlugin
 
 # --------------------------------------------
 # Some module variables
 
-__version__ = '0.3.1'
+__version__ = '0.4.1'
 
 log = logging.getLogger(__name__)
 
+# Firmware state: Hotspare, Spun Up
+re_fw = re.compile(r'^\s*(\w+),?', re.IGNORECASE)
+
 
 # =============================================================================
 class CheckMegaRaidHotsparePlugin(CheckMegaRaidPlugin):
@@ -181,37 +181,25 @@ class CheckMegaRaidHotsparePlugin(CheckMegaRaidPlugin):
         )
 
     # -------------------------------------------------------------------------
-    def call(self):
-        """
-        Method to call the plugin directly.
+    def evaluate(self, snapshot):
         """
+        Evaluates the number of hotspare drives of the given snapshot
+        of the adapter.
 
-        state = nagios.state.ok
-        out = "Number of existing hotspares of MegaRaid adapter %d seems to be okay." % (
-            self.adapter_nr)
+        @param snapshot: the snapshot of the adapter
+        @type snapshot: dict
 
-        # Slot Number: 23
-        re_slot = re.compile(r'^\s*Slot\s+Number\s*:\s*\d+', re.IGNORECASE)
+        @return: the state and the output message
+        @rtype: tuple
 
-        #
-        re_fw = re.compile(r'^\s*Firmware\s+state\s*:\s*(\w+),?', re.IGNORECASE)
+        """
 
         found_hotspares = 0
         drives_total = 0
-        args = ('-PdList',)
-        (stdoutdata, stderrdata, ret, exit_code) = self.megacli(args)
-        if self.verbose > 3:
-            log.debug("Output on StdOut:\n%s", stdoutdata)
-
-        for line in stdoutdata.splitlines():
-
-            line = line.strip()
-
-            if re_slot.search(line):
-                drives_total += 1
-                continue
 
-            match = re_fw.search(line)
+        for drive in snapshot['pd']['drives']:
+            drives_total += 1
+            match = re_fw.search(drive['fw_state'] or '')
             if match and match.group(1).lower() == 'hotspare':
                 found_hotspares += 1
 
@@ -235,7 +223,7 @@ class CheckMegaRaidHotsparePlugin(CheckMegaRaidPlugin):
             uom='',
         )
 
-        self.exit(state, out)
+        return (state, out)
 
 # =============================================================================
 
@@ -5,11 +5,10 @@
 @contact: frank.brehm@profitbricks.com
 @copyright: © 2010 - 2015 by Frank Brehm, Berlin
 @summary: Module for a class for a nagios/icinga plugin to check a particular
-          logical drive on a LSI MegaRaid adapter
+          or all logical drives on one or all LSI MegaRaid adapters
 """
 
 # Standard modules
-import re
 import logging
 import textwrap
 
@@ -25,13 +24,29 @@ from nagios.plugin.functions import max_state
 import nagios.plugins.check_megaraid
 from nagios.plugins.check_megaraid import CheckMegaRaidPlugin
 
+from nagios.plugins.megaraid_collector import MegaRaidCollector
+
 # --------------------------------------------
 # Some module variables
 
-__version__ = '0.2.2'
+__version__ = '0.4.0'
 
 log = logging.getLogger(__name__)
 
+ALL_LDS = 'all'
+
+
+# =============================================================================
+def ld_nr_arg(value):
+    """
+    Type of the argument -l/--ld-nr, the number of a Logical Drive or
+    'all' (case insensitive).
+    """
+
+    if value.strip().lower() == ALL_LDS:
+        return ALL_LDS
+    return int(value)
+
 # Example output
 """
 0 storage208:~ # megacli -LdInfo -L 0 -a0
@@ -99,8 +114,13 @@ class CheckMegaRaidLdPlugin(CheckMegaRaidPlugin):
     """
     A special NagiosPlugin class for checking the state of a Logical Drive of a
     LSI MegaRaid adapter.
+
+    With '-l all' all Logical Drives of the adapter, with '-l all -a ALL'
+    all Logical Drives of all adapters are checked at once.
     """
 
+    supports_all_adapters = True
+
     # -------------------------------------------------------------------------
     def __init__(self):
         """
@@ -108,14 +128,16 @@ class CheckMegaRaidLdPlugin(CheckMegaRaidPlugin):
         """
 
         usage = """\
-                %(prog)s [-v] [-a <adapter_nr>] -l <drive_nr> [--cached]
+                %(prog)s [-v] [-a <adapter_nr>|ALL] -l <drive_nr>|all [--cached]
                 """
         usage = textwrap.dedent(usage).strip()
         usage += '\n       %(prog)s --usage'
         usage += '\n       %(prog)s --help'
 
         blurb = "Copyright (c) 2015 Frank Brehm, Berlin.\n\n"
-        blurb += "Checks the state of a Logical Drive of a LSI MegaRaid adapter."
+        blurb += (
+            "Checks the state of a particular or all Logical Drives "
+            "of one or all LSI MegaRaid adapters.")
 
         super(CheckMegaRaidLdPlugin, self).__init__(
             shortname='MEGARAID_LD',
@@ -129,6 +151,12 @@ class CheckMegaRaidLdPlugin(CheckMegaRaidPlugin):
         @type: int
         """
 
+        self._all_lds = False
+        """
+        @ivar: check all Logical Drives
+        @type: bool
+        """
+
         self._cached = False
         """
         @ivar: checking, whether the LD is cached by CacheCade
@@ -150,6 +178,12 @@ class CheckMegaRaidLdPlugin(CheckMegaRaidPlugin):
         """The number of the Logical Drive to check."""
         return self._ld_number
 
+    # -----------------------------------------------------------
+    @property
+    def all_lds(self):
+        """Check all Logical Drives."""
+        return self._all_lds
+
     # -----------------------------------------------------------
     @property
     def cached(self):
@@ -178,6 +212,7 @@ class CheckMegaRaidLdPlugin(CheckMegaRaidPlugin):
         d = super(CheckMegaRaidLdPlugin, self).as_dict()
 
         d['ld_number'] = self.ld_number
+        d['all_lds'] = self.all_lds
         d['cached'] = self.cached
         d['warn_on_consistency_check'] = self.warn_on_consistency_check
 
@@ -194,8 +229,10 @@ class CheckMegaRaidLdPlugin(CheckMegaRaidPlugin):
             metavar='NR',
             dest='ld_nr',
             required=True,
-            type=int,
-            help="The number of the Logical Drive to check (mandantory).",
+            type=ld_nr_arg,
+            help=(
+                "The number of the Logical Drive to check or 'all' "
+                "for all Logical Drives (mandantory)."),
         )
 
         self.add_arg(
@@ -231,7 +268,12 @@ class CheckMegaRaidLdPlugin(CheckMegaRaidPlugin):
 
         super(CheckMegaRaidLdPlugin, self).parse_args(args)
 
-        self._ld_number = self.argparser.args.ld_nr
+        if self.argparser.args.ld_nr == ALL_LDS:
+            self._all_lds = True
+        else:
+            self._ld_number = self.argparser.args.ld_nr
+            if self.all_adapters:
+                self.die("A particular Logical Drive can only be checked on one adapter.")
         if self.argparser.args.cached:
             self._cached = True
 
@@ -244,92 +286,139 @@ class CheckMegaRaidLdPlugin(CheckMegaRaidPlugin):
         Method to call the plugin directly.
         """
 
+        if not self.all_lds:
+            return super(CheckMegaRaidLdPlugin, self).call()
+
+        if self.all_adapters:
+            collector = MegaRaidCollector(
+                self, max_age=self.max_age, state_dir=self.state_dir)
+            ld_data = collector.collect_ld_all()
+        else:
+            snapshot = self.get_snapshot()
+            ld_data = {self.adapter_nr: snapshot['ld']}
+
+        (state, out) = self.evaluate_lds(ld_data)
+        self.exit(state, out)
+
+    # -------------------------------------------------------------------------
+    def evaluate_lds(self, ld_data):
+        """
+        Evaluates all Logical Drives of the given adapters and adds the
+        counts of optimal, degraded and offline drives as performance data.
+
+        @param ld_data: the Logical Drives (like snapshot['ld']) with
+                        the number of the adapter as key
+        @type ld_data: dict
+
+        @return: the state and the output message with a detail line
+                 for every Logical Drive
+        @rtype: tuple
+
+        """
+
+        state = nagios.state.ok
+        counts = {
+            'optimal': 0,
+            'degraded': 0,
+            'offline': 0,
+            'other': 0,
+        }
+        total = 0
+        details = []
+
+        for adapter_nr in sorted(ld_data.keys()):
+            exit_code = ld_data[adapter_nr]['exit_code']
+            for ld in ld_data[adapter_nr]['drives']:
+                total += 1
+                (ld_state, ld_out) = self.evaluate_ld(ld, exit_code, adapter_nr)
+                state = max_state(state, ld_state)
+                details.append(ld_out)
+
+                cur_state = (ld['state'] or '').lower()
+                if cur_state == 'optimal':
+                    counts['optimal'] += 1
+                elif 'degraded' in cur_state or cur_state == 'partially':
+                    counts['degraded'] += 1
+                elif cur_state == 'offline':
+                    counts['offline'] += 1
+                else:
+                    counts['other'] += 1
+
+        adapters = ', '.join(['%d' % (x) for x in sorted(ld_data.keys())])
+        if not total:
+            state = max_state(state, nagios.state.warning)
+            out = "No Logical Drives found on MegaRaid adapter %s." % (adapters or '-')
+        else:
+            summary = []
+            for key in ('optimal', 'degraded', 'offline', 'other'):
+                if counts[key]:
+                    summary.append("%d %s" % (counts[key], key))
+            out = "%d Logical Drives on MegaRaid adapter %s: %s." % (
+                total, adapters, ', '.join(summary))
+
+        self.add_perfdata(label='lds_total', value=total)
+        self.add_perfdata(label='lds_optimal', value=counts['optimal'])
+        self.add_perfdata(label='lds_degraded', value=counts['degraded'])
+        self.add_perfdata(label='lds_offline', value=counts['offline'])
+
+        if details:
+            out += "\n" + "\n".join(details)
+
+        return (state, out)
+
+    # -------------------------------------------------------------------------
+    def evaluate(self, snapshot):
+        """
+        Evaluates the Logical Drive of the given snapshot of the adapter.
+
+        @param snapshot: the snapshot of the adapter
+        @type snapshot: dict
+
+        @return: the state and the output message
+        @rtype: tuple
+
+        """
+
+        ld = None
+        for cur_ld in snapshot['ld']['drives']:
+            if cur_ld['number'] == self.ld_number:
+                ld = cur_ld
+                break
+
+        if ld is None:
+            self.die("Adapter %d: Virtual Drive %d Does not Exist." % (
+                self.adapter_nr, self.ld_number))
+
+        return self.evaluate_ld(ld, snapshot['ld']['exit_code'])
+
+    # -------------------------------------------------------------------------
+    def evaluate_ld(self, ld, exit_code=0, adapter_nr=None):
+        """
+        Evaluates the data of a particular Logical Drive.
+
+        @param ld: the data of the Logical Drive from the snapshot
+        @type ld: dict
+        @param exit_code: the exit code of MegaCli on retrieving the data
+        @type exit_code: int
+        @param adapter_nr: the number of the adapter of the Logical Drive,
+                           if not given, self.adapter_nr is used
+        @type adapter_nr: int or None
+
+        @return: the state and the output message
+        @rtype: tuple
+
+        """
+
+        if adapter_nr is None:
+            adapter_nr = self.adapter_nr
+
         state = nagios.state.ok
-        out = "LD %d of MegaRaid adapter %d seems to be okay." % (
-            self.ld_number, self.adapter_nr)
-
-        # Adapter 0: Virtual Drive 55 Does not Exist.
-        re_not_exists = re.compile(
-            r'^.*Virtual\s+Drive\s+\d+\s+Does\s+not\s+Exist\.', re.IGNORECASE)
-        # RAID Level          : Primary-1, Secondary-0, RAID Level Qualifier-0
-        re_raid_level = re.compile(
-            r'^\s*RAID\s+Level\s*:\s+Primary-(\d+)', re.IGNORECASE)
-        # Size                : 2.728 TB
-        re_size = re.compile(
-            r'^\s*Size\s*:\s+(\d+(?:\.\d*)?)\s*(\S+)?', re.IGNORECASE)
-        # State               : Optimal
-        re_state = re.compile(r'^\s*State\s*:\s+(\S+)', re.IGNORECASE)
-        # Number Of Drives    : 2
-        re_number = re.compile(
-            r'^\s*Number\s+Of\s+Drives\s*:\s+(\d+)', re.IGNORECASE)
-        # Span Depth          : 1
-        re_span = re.compile(r'^\s*Span\s+Depth\s*:\s+(\d+)', re.IGNORECASE)
-        # Is VD Cached: Yes
-        # Is VD Cached: No
-        re_cached = re.compile(
-            r'^\s*Is\s+VD\s+Cached\s*:\s+(\S+)', re.IGNORECASE)
-        # Check Consistency: Completed 95%, Taken 8 min
-        re_consist = re.compile(
-            r'Check\s+Consistency\s*:\s+Completed\s+(\d+)%,\s+Taken\s+(\d+)\s*min',
-            re.IGNORECASE)
-
-        raid_level = None
-        size_val = None
-        size_unit = None
-        ld_state = None
-        pd_number = None
-        span_depth = None
-        ld_cached = None
-        consist_percent = None
-        consist_min = None
-
-        args = ('-LdInfo', '-L', ("%d" % (self.ld_number)))
-        (stdoutdata, stderrdata, ret, exit_code) = self.megacli(args)
-        if self.verbose > 2:
-            log.debug("Output on StdOut:\n%s", stdoutdata)
-
-        for line in stdoutdata.splitlines():
-
-            line = line.strip()
-
-            # Logical Drive not exists
-            if re_not_exists.search(line):
-                self.die(line)
-
-            match = re_raid_level.search(line)
-            if match:
-                raid_level = int(match.group(1))
-                continue
-
-            match = re_size.search(line)
-            if match:
-                size_val = float(match.group(1))
-                size_unit = match.group(2)
-                continue
-
-            match = re_state.search(line)
-            if match:
-                ld_state = match.group(1)
-                continue
-
-            match = re_number.search(line)
-            if match:
-                pd_number = int(match.group(1))
-                continue
-
-            match = re_span.search(line)
-            if match:
-                span_depth = int(match.group(1))
-                continue
-
-            match = re_cached.search(line)
-            if match:
-                ld_cached = match.group(1)
-
-            match = re_consist.search(line)
-            if match:
-                consist_percent = int(match.group(1))
-                consist_min = int(match.group(2))
+
+        raid_level = ld['raid_level']
+        ld_state = ld['state']
+        pd_number = ld['pd_number']
+        span_depth = ld['span_depth']
+        ld_cached = ld['cached']
 
         if exit_code:
             state = nagios.state.critical
@@ -340,11 +429,14 @@ class CheckMegaRaidLdPlugin(CheckMegaRaidPlugin):
             state = nagios.state.critical
 
         consistency_out = ''
-        if consist_percent is not None:
+        if ld['consist_percent'] is not None:
             if self.warn_on_consistency_check:
                 state = max_state(state, nagios.state.warning)
-            consistency_out = ", consistency check completed: %d%%, taken %d min." % (
-                consist_percent, consist_min)
+            consistency_out = ", consistency check completed: %d%%" % (
+                ld['consist_percent'])
+            if ld['consist_min'] is not None:
+                consistency_out += ", taken %d min" % (ld['consist_min'])
+            consistency_out += "."
 
         cached_out = ', cached: No'
         if ld_cached:
@@ -358,21 +450,25 @@ class CheckMegaRaidLdPlugin(CheckMegaRaidPlugin):
             pd_count = pd_number
             if span_depth and span_depth > 1:
                 pd_count = pd_number * span_depth
-                if raid_level < 10:
+                if raid_level is not None and raid_level < 10:
                     raid_level *= 10
 
         size_out = ''
-        if size_val:
-            if size_unit:
-                size_out = ', %s %s' % (str(size_val), size_unit)
+        if ld['size_val']:
+            if ld['size_unit']:
+                size_out = ', %s %s' % (str(ld['size_val']), ld['size_unit'])
             else:
-                size_out = ', %s' % (str(size_val))
+                size_out = ', %s' % (str(ld['size_val']))
+
+        raid_out = '?'
+        if raid_level is not None:
+            raid_out = '%d' % (raid_level)
 
-        out = "State of LD %d of MegaRaid adapter %d (RAID-%d, %d drives%s%s%s): %s." % (
-            self.ld_number, self.adapter_nr, raid_level, pd_count,
+        out = "State of LD %d of MegaRaid adapter %d (RAID-%s, %d drives%s%s%s): %s." % (
+            ld['number'], adapter_nr, raid_out, pd_count,
             size_out, cached_out, consistency_out, ld_state)
 
-        self.exit(state, out)
+        return (state, out)
 
 # =============================================================================
 
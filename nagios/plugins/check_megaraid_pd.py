@@ -27,13 +27,31 @@ from nagios.plugin.functions import max_state
 import nagios.plugins.check_megaraid
 from nagios.plugins.check_megaraid import CheckMegaRaidPlugin
 
+from nagios.plugins.megaraid_collector import pd_id
+
 # --------------------------------------------
 # Some module variables
 
-__version__ = '0.2.3'
+__version__ = '0.3.0'
 
 log = logging.getLogger(__name__)
 
+good_fw_states = (
+    r'Online,\s+Spun\s+Up',
+    r'Hotspare,\s+Spun\s+Up',
+    r'Hotspare,\s+Spun\s+Down',
+    r'Unconfigured\(good\),\s+Spun\s+Up',
+    r'Unconfigured\(good\),\s+Spun\s+Down',
+)
+warn_fw_states = (
+    r'Rebuild',
+    r'Copyback',
+)
+re_good_fw_state = re.compile(
+    r'^\s*(?:' + r'|'.join(good_fw_states) + r')\s*$', re.IGNORECASE)
+re_warn_fw_state = re.compile(
+    r'^\s*(?:' + r'|'.join(warn_fw_states) + r')\s*$', re.IGNORECASE)
+
 
 # =============================================================================
 class CheckMegaRaidPdPlugin(CheckMegaRaidPlugin):
@@ -107,131 +125,29 @@ class CheckMegaRaidPdPlugin(CheckMegaRaidPlugin):
         super(CheckMegaRaidPdPlugin, self).parse_args(args)
 
     # -------------------------------------------------------------------------
-    def call(self):
+    def evaluate(self, snapshot):
         """
-        Method to call the plugin directly.
+        Evaluates the physical drives of the given snapshot of the adapter.
+
+        @param snapshot: the snapshot of the adapter
+        @type snapshot: dict
+
+        @return: the state and the output message
+        @rtype: tuple
+
         """
 
         state = nagios.state.ok
         out = "State of physical drives of MegaRaid adapter %d seems to be okay." % (
             self.adapter_nr)
 
-        # Enclosure Device ID: 0
-        re_enc = re.compile(r'^\s*Enclosure\s+Device\s+ID\s*:\s*(\d+)', re.IGNORECASE)
-        # Slot Number: 23
-        re_slot = re.compile(r'^\s*Slot\s+Number\s*:\s*(\d+)', re.IGNORECASE)
-        # Device Id: 6
-        re_dev_id = re.compile(r'^\s*Device\s+Id\s*:\s*(\d+)', re.IGNORECASE)
-        # Media Error Count: 0
-        re_media_errors = re.compile(
-            r'^\s*Media\s+Error\s+Count\s*:\s*(\d+)', re.IGNORECASE)
-        # Other Error Count: 0
-        re_other_errors = re.compile(
-            r'^\s*Other\s+Error\s+Count\s*:\s*(\d+)', re.IGNORECASE)
-        # Predictive Failure Count: 0
-        re_pred_failures = re.compile(
-            r'^\s*Predictive\s+Failure\s+Count\s*:\s*(\d+)', re.IGNORECASE)
-        # Firmware state: Online, Spun Up
-        re_fw_state = re.compile(r'^\s*Firmware\s+state\s*:\s*(\S+.*)', re.IGNORECASE)
-        # Foreign State: None
-        re_foreign_state = re.compile(
-            r'^\s*Foreign\s+state\s*:\s*(\S+.*)', re.IGNORECASE)
-
-        good_fw_states = (
-            r'Online,\s+Spun\s+Up',
-            r'Hotspare,\s+Spun\s+Up',
-            r'Hotspare,\s+Spun\s+Down',
-            r'Unconfigured\(good\),\s+Spun\s+Up',
-            r'Unconfigured\(good\),\s+Spun\s+Down',
-        )
-        warn_fw_states = (
-            r'Rebuild',
-            r'Copyback',
-        )
-        good_fw_pattern = r'^\s*(?:' + r'|'.join(good_fw_states) + r')\s*$'
-        warn_fw_pattern = r'^\s*(?:' + r'|'.join(warn_fw_states) + r')\s*$'
-        re_good_fw_state = re.compile(good_fw_pattern, re.IGNORECASE)
-        re_warn_fw_state = re.compile(warn_fw_pattern, re.IGNORECASE)
-
-        drives_total = 0
-        args = ('-PdList',)
-        (stdoutdata, stderrdata, ret, exit_code) = self.megacli(args)
-        if self.verbose > 3:
-            log.debug("Output on StdOut:\n%s", stdoutdata)
-
-        cur_dev = None
-
-        for line in stdoutdata.splitlines():
-
-            line = line.strip()
-            m = re_enc.search(line)
-            if m:
-                if cur_dev:
-                    if ('enclosure' in cur_dev) and ('slot' in cur_dev):
-                        pd_id = '[%d:%d]' % (
-                            cur_dev['enclosure'], cur_dev['slot'])
-                        self.drive_list.append(pd_id)
-                        self.drive[pd_id] = cur_dev
-
-                cur_dev = {}
-                drives_total += 1
-                cur_dev = {
-                    'enclosure': int(m.group(1)),
-                    'media_errors': 0,
-                    'other_errors': 0,
-                    'predictive_failures': 0,
-                    'fw_state': None,
-                    'foreign_state': None,
-                }
-                continue
-
-            m = re_slot.search(line)
-            if m:
-                if cur_dev:
-                    cur_dev['slot'] = int(m.group(1))
-                continue
-
-            m = re_dev_id.search(line)
-            if m:
-                if cur_dev:
-                    cur_dev['dev_id'] = int(m.group(1))
-                continue
-
-            m = re_media_errors.search(line)
-            if m:
-                if cur_dev:
-                    cur_dev['media_errors'] = int(m.group(1))
-                continue
-
-            m = re_other_errors.search(line)
-            if m:
-                if cur_dev:
-                    cur_dev['other_errors'] = int(m.group(1))
-                continue
-
-            m = re_pred_failures.search(line)
-            if m:
-                if cur_dev:
-                    cur_dev['predictive_failures'] = int(m.group(1))
-                continue
-
-            m = re_fw_state.search(line)
-            if m:
-                if cur_dev:
-                    cur_dev['fw_state'] = m.group(1)
-                continue
-
-            m = re_foreign_state.search(line)
-            if m:
-                if cur_dev:
-                    cur_dev['foreign_state'] = m.group(1)
-                continue
-
-        if cur_dev:
-            if ('enclosure' in cur_dev) and ('slot' in cur_dev):
-                pd_id = '[%d:%d]' % (cur_dev['enclosure'], cur_dev['slot'])
-                self.drive_list.append(pd_id)
-                self.drive[pd_id] = cur_dev
+        self.drive_list = []
+        self.drive = {}
+        for cur_dev in snapshot['pd']['drives']:
+            drv_id = pd_id(cur_dev)
+            self.drive_list.append(drv_id)
+            self.drive[drv_id] = cur_dev
+        drives_total = len(self.drive_list)
 
         media_errors = 0
         other_errors = 0
@@ -240,8 +156,8 @@ class CheckMegaRaidPdPlugin(CheckMegaRaidPlugin):
         foreign_state_wrong = 0
         errors = []
 
-        for pd_id in self.drive_list:
-            cur_dev = self.drive[pd_id]
+        for drv_id in self.drive_list:
+            cur_dev = self.drive[drv_id]
             found_errors = False
             drv_desc = []
             disk_state = nagios.state.ok
@@ -260,27 +176,29 @@ class CheckMegaRaidPdPlugin(CheckMegaRaidPlugin):
                 found_errors = True
                 drv_desc.append("%d predictive failures" % (cur_dev['predictive_failures']))
                 predictive_failures += 1
-            if not re_good_fw_state.search(cur_dev['fw_state']):
-                if re_warn_fw_state.search(cur_dev['fw_state']):
+            fw_state = cur_dev['fw_state'] or ''
+            if not re_good_fw_state.search(fw_state):
+                if re_warn_fw_state.search(fw_state):
                     disk_state = max_state(disk_state, nagios.state.warning)
                 else:
                     disk_state = max_state(disk_state, nagios.state.critical)
                 found_errors = True
                 drv_desc.append("wrong firmware state %r" % (cur_dev['fw_state']))
                 fw_state_wrong += 1
-            if cur_dev['foreign_state'].lower() != "none":
+            foreign_state = cur_dev['foreign_state']
+            if foreign_state and foreign_state.lower() != "none":
                 disk_state = max_state(disk_state, nagios.state.critical)
                 found_errors = True
-                drv_desc.append("wrong foreign state %r" % (cur_dev['foreign_state']))
+                drv_desc.append("wrong foreign state %r" % (foreign_state))
                 foreign_state_wrong += 1
             if found_errors:
                 state = max_state(state, disk_state)
-                dd = "drive %s has " % (pd_id)
+                dd = "drive %s has " % (drv_id)
                 dd += ' and '.join(drv_desc)
                 errors.append(dd)
             if found_errors or self.verbose > 1:
                 log.debug(
-                    "State of drive %s is %s.", pd_id,
+                    "State of drive %s is %s.", drv_id,
                     nagios.plugin.functions.STATUS_TEXT[disk_state])
 
         log.debug("Found %d drives.", drives_total)
@@ -298,7 +216,7 @@ class CheckMegaRaidPdPlugin(CheckMegaRaidPlugin):
         self.add_perfdata(label='wrong_fw_state', value=fw_state_wrong, uom='')
         self.add_perfdata(label='wrong_foreign_state', value=foreign_state_wrong, uom='')
 
-        self.exit(state, out)
+        return (state, out)
 
 # =============================================================================
 
@@ -17,12 +17,10 @@ import logging
 import socket
 import uuid
 import math
+import time
 import datetime
 
-try:
-    import configparser as cfgparser
-except ImportError:
-    import ConfigParser as cfgparser
+from collections import namedtuple
 
 # Third party modules
 
@@ -34,19 +32,26 @@ from nagios.common import pp
 
 from nagios.plugin.range import NagiosRange
 
-from nagios.plugin.extended import ExtNagiosPluginError
-from nagios.plugin.extended import CommandNotFoundError
+from nagios.plugin.extended import CommandNotFoundError, ExecutionTimeoutError
+
+from nagios.plugin.workers import run_concurrently, WorkerTimeoutError
 
 from nagios.plugins.base_dcm_client_check import DEFAULT_TIMEOUT, DEFAULT_PB_VG
 from nagios.plugins.base_dcm_client_check import STORAGE_CONFIG_DIR, DUMMY_LV, BACKUP_LV
 from nagios.plugins.base_dcm_client_check import BaseDcmClientPlugin
 
+from nagios.plugins.volume_config import CfgFileNotValidError, VolumeConfigCache
+from nagios.plugins.volume_config import read_remove_timestamp
+
+from nagios.plugins.consistence_snapshot import ConsistenceSnapshot
+from nagios.plugins.consistence_snapshot import DEFAULT_FULL_SWEEP_INTERVAL
+
 from dcmanagerclient.client import RestApiError
 
 # --------------------------------------------
 # Some module variables
 
-__version__ = '0.9.3'
+__version__ = '0.14.4'
 __copyright__ = 'Copyright (c) 2015 Frank Brehm, Berlin.'
 
 DEFAULT_WARN_VOL_ERRORS = 0
@@ -57,30 +62,73 @@ LVM_PATH = os.sep + os.path.join('usr', 'sbin')
 # LVM_BIN_PATH = '/usr/sbin/lvm'
 LVM_BIN_PATH = os.path.join(LVM_PATH, 'lvm')
 
+# The concurrently executed phases of gathering the volumes with their
+# descriptions, the durations are given as performance data 'time_<phase>'
+FETCH_PHASES = (
+    ('api_volumes', 'the storage volumes from API'),
+    ('api_images', 'the image volumes from API'),
+    ('api_snapshots', 'the snapshot volumes from API'),
+    ('lvs', 'the logical volumes from LVM'),
+)
+
+# The categories of results, which are compared again in every run,
+# so their messages are logged every time
+UNCACHED_CATEGORIES = ('error', 'orphans')
+
+# The compact data of a volume from API, which is kept for the comparision
+# instead of the complete decoded API object
+ApiVolume = namedtuple('ApiVolume', ['size', 'type', 'state'])
+
+# The leading part of the GUIDs of all ProfitBricks volumes, which is
+# missing in the names of their logical volumes
+PB_GUID_PREFIX = '600144f0'
+PB_GUID_PREFIX_INT = int(PB_GUID_PREFIX, 16) << 96
+
+# The length of a GUID without its leading part, e.g.
+# '0001-0002-0003-000000000001'
+SHORT_GUID_LEN = 27
+
 log = logging.getLogger(__name__)
 
 
 # =============================================================================
-class CfgFileNotValidError(ExtNagiosPluginError):
+def lv_guid_key(lv_name):
+    """
+    Gives back the key of the given name of a logical volume of a
+    ProfitBricks volume for the comparision with the volumes from API,
+    which are indexed by the integer values of their GUIDs.
 
-    # -------------------------------------------------------------------------
-    def __init__(self, cfg_file, msg):
+    Names with an extension (like '-snap') are kept as they are, so they
+    never match a volume from API. The hexadecimal digits are case
+    insensitive, so logical volumes with upper case names match their
+    volumes from API (earlier versions reported them as orphans).
 
-        self.cfg_file = cfg_file
-        self.msg = None
-        if msg:
-            m = str(msg).strip()
-            if m:
-                self.msg = m
+    @param lv_name: the name of the logical volume (a shortened GUID)
+    @type lv_name: str
 
-    # -------------------------------------------------------------------------
-    def __str__(self):
+    @return: the integer value of the complete GUID or the unchanged name
+    @rtype: int or str
+
+    """
+
+    if len(lv_name) != SHORT_GUID_LEN:
+        return lv_name
+    try:
+        return PB_GUID_PREFIX_INT | int(lv_name.replace('-', ''), 16)
+    except ValueError:
+        return lv_name
+
+
+# =============================================================================
+def guid_str(key):
+    """
+    Gives back the textual GUID of the given key of a volume
+    (see lv_guid_key()).
+    """
 
-        msg = "Invalid configuration file %r" % (self.cfg_file)
-        if self.msg:
-            msg += ": %s" % (self.msg)
-        msg += "."
-        return msg
+    if isinstance(key, str):
+        return key
+    return str(uuid.UUID(int=key))
 
 
 # =============================================================================
@@ -149,16 +197,29 @@ class CheckPbConsistenceStoragePlugin(BaseDcmClientPlugin):
         """
         if not os.path.exists(self.lvm_command):
             self._lvm_command = self.get_command('lvm')
-        if not os.path.exists(self.lvm_command):
+        if not self.lvm_command:
             failed_commands.append('lvm')
 
-        self.api_volumes = []
-        self.api_images = []
-        self.api_snapshots = []
-        self.all_api_volumes = []
+        self._full_sweep_interval = DEFAULT_FULL_SWEEP_INTERVAL
+        """
+        @ivar: the interval in seconds of complete comparisions of all
+               volumes regardless of the snapshot of the last run
+        @type: int
+        """
+
+        self.api_volumes = {}
+        self.api_images = {}
+        self.api_snapshots = {}
+        self.all_api_volumes = {}
         self.lvm_lvs = []
         self.count = {}
 
+        self.durations = {}
+        """
+        @ivar: the durations of the phases of FETCH_PHASES in seconds
+        @type: dict
+        """
+
         # Some commands are missing
         if failed_commands:
             raise CommandNotFoundError(failed_commands)
@@ -187,6 +248,12 @@ class CheckPbConsistenceStoragePlugin(BaseDcmClientPlugin):
         """The critical threshold of the test."""
         return self._critical
 
+    # -----------------------------------------------------------
+    @property
+    def full_sweep_interval(self):
+        """The interval in seconds of complete comparisions of all volumes."""
+        return self._full_sweep_interval
+
     # -----------------------------------------------------------
     @property
     def lvm_command(self):
@@ -210,6 +277,7 @@ class CheckPbConsistenceStoragePlugin(BaseDcmClientPlugin):
         d['pb_vg'] = self.pb_vg
         d['warning'] = self.warning
         d['critical'] = self.critical
+        d['full_sweep_interval'] = self.full_sweep_interval
 
         return d
 
@@ -262,6 +330,18 @@ class CheckPbConsistenceStoragePlugin(BaseDcmClientPlugin):
                     DEFAULT_PB_VG)),
         )
 
+        self.add_arg(
+            '--full-sweep', '--full-sweep-interval',
+            metavar='SECONDS',
+            dest='full_sweep_interval',
+            type=int,
+            default=DEFAULT_FULL_SWEEP_INTERVAL,
+            help=(
+                "The interval of complete comparisions of all volumes, between them "
+                "only volumes changed since the last run are compared, 0 compares "
+                "always all volumes (Default: %(default)d)."),
+        )
+
         super(CheckPbConsistenceStoragePlugin, self).add_args()
 
     # -------------------------------------------------------------------------
@@ -286,6 +366,9 @@ class CheckPbConsistenceStoragePlugin(BaseDcmClientPlugin):
         if not self.pb_vg:
             self._pb_vg = DEFAULT_PB_VG
 
+        if self.argparser.args.full_sweep_interval is not None:
+            self._full_sweep_interval = max(self.argparser.args.full_sweep_interval, 0)
+
         # define warning level
         if self.argparser.args.warning is not None:
             self._warning = NagiosRange(self.argparser.args.warning)
@@ -345,43 +428,19 @@ class CheckPbConsistenceStoragePlugin(BaseDcmClientPlugin):
 
         self.all_api_volumes = {}
 
-        self.get_api_storage_volumes()
-        for vol in self.api_volumes:
-            guid = str(vol['guid'])
-            size = vol['size']
-            self.all_api_volumes[guid] = {
-                'size': size,
-                'type': 'vol',
-                'state': vol['state'],
-            }
-        self.api_volumes = None
+        fetched = self.fetch_all()
 
-        self.get_api_image_volumes()
-        for vol in self.api_images:
-            guid = str(vol['guid'])
-            size = vol['size']
-            self.all_api_volumes[guid] = {
-                'size': size,
-                'type': 'img',
-                'state': vol['state'],
-            }
+        for phase in ('api_volumes', 'api_images', 'api_snapshots'):
+            self.all_api_volumes.update(fetched[phase])
+            fetched[phase] = None
+        self.api_volumes = None
         self.api_images = None
-
-        self.get_api_snapshot_volumes()
-        for vol in self.api_snapshots:
-            guid = str(vol['guid'])
-            size = vol['size']
-            self.all_api_volumes[guid] = {
-                'size': size,
-                'type': 'snap',
-                'state': vol['state'],
-            }
         self.api_snapshots = None
 
         if self.verbose > 2:
             log.debug("All Volumes from API:\n%s", pp(self.all_api_volumes))
 
-        self.get_lvm_lvs()
+        self.get_lvm_lvs(fetched['lvs'])
         if self.verbose > 3:
             log.debug("All Logical Volumes from LVM:\n%s", pp(self.lvm_lvs))
 
@@ -412,167 +471,342 @@ class CheckPbConsistenceStoragePlugin(BaseDcmClientPlugin):
             if key == 'dummy':
                 continue
             self.add_perfdata(label=key, value=self.count[key])
+        for (phase, desc) in FETCH_PHASES:
+            self.add_perfdata(
+                label='time_' + phase, value=round(self.durations[phase], 3), uom='s')
 
         if self.verbose > 1:
             log.debug("Got following counts:\n%s", pp(self.count))
 
         self.exit(state, out)
 
+    # -------------------------------------------------------------------------
+    def fetch_all(self):
+        """
+        Fetches the storage, image and snapshot volumes from API and executes
+        'lvm lvs' concurrently, the timeout of the plugin is the deadline
+        for all of them, a hanging 'lvm lvs' is killed a second before.
+        Dies on errors and on exceeding the deadline.
+
+        @return: the raw results of the phases of FETCH_PHASES
+        @rtype: dict
+
+        """
+
+        # 'lvm lvs' is killed a second before the deadline, so it doesn't
+        # outlive the plugin
+        lvs_timeout = max(self.timeout - 1, 1)
+
+        fetchers = {
+            'api_volumes': self.fetch_api_storage_volumes,
+            'api_images': self.fetch_api_image_volumes,
+            'api_snapshots': self.fetch_api_snapshot_volumes,
+            'lvs': lambda: self.exec_lvm_lvs(timeout=lvs_timeout),
+        }
+
+        def fetch(phase):
+            start = time.time()
+            result = fetchers[phase]()
+            return (result, time.time() - start)
+
+        phases = [x[0] for x in FETCH_PHASES]
+        deadline = time.time() + self.timeout
+        results = run_concurrently(fetch, phases, max_workers=len(phases), deadline=deadline)
+
+        fetched = {}
+        for (phase, desc) in FETCH_PHASES:
+            (result, exc_info) = results[phases.index(phase)]
+            if exc_info:
+                e = exc_info[1]
+                if isinstance(e, WorkerTimeoutError):
+                    self.die("Timeout after %d seconds on getting %s." % (self.timeout, desc))
+                if isinstance(e, (RestApiError, ExecutionTimeoutError)):
+                    self.die(str(e))
+                self.die("%s: %s" % (e.__class__.__name__, e))
+            (fetched[phase], self.durations[phase]) = result
+            if self.verbose > 1:
+                log.debug("Got %s in %0.3f seconds.", desc, self.durations[phase])
+
+        return fetched
+
+    # -------------------------------------------------------------------------
+    def fetch_api_storage_volumes(self):
+        """Fetches the storage volumes of the current storage server from API."""
+
+        return self.get_api_storage_volumes(self.iter_api_objects(
+            'vstorages', api=self.create_api(), pstorage=self.hostname, contract_infos=False))
+
+    # -------------------------------------------------------------------------
+    def fetch_api_image_volumes(self):
+        """Fetches the image volumes of the current storage server from API."""
+
+        return self.get_api_image_volumes(self.iter_api_objects(
+            'vimages', api=self.create_api(), pstorage=self.hostname))
+
+    # -------------------------------------------------------------------------
+    def fetch_api_snapshot_volumes(self):
+        """Fetches the snapshot volumes of the current storage server from API."""
+
+        return self.get_api_snapshot_volumes(self.iter_api_objects(
+            'vsnapshots', api=self.create_api(), pstorage=self.hostname))
+
     # -------------------------------------------------------------------------
     def compare(self):
+        """
+        Compares the logical volumes with the volumes from API. The logical
+        volumes of ProfitBricks volumes are indexed by the integer value of
+        their GUID and reconciled by reconcile(). The results of logical
+        volumes, which are unchanged together with their volumes from API
+        since the last run, are taken from the snapshot of the last run,
+        except erroneous and orphaned volumes.
+        """
 
-        for lv in self.lvm_lvs:
+        api = self.all_api_volumes
 
-            if self.verbose > 3:
-                log.debug("Checking LV %s/%s ...", lv['vgname'], lv['lvname'])
+        snapshot = ConsistenceSnapshot(
+            self.hostname, self.pb_vg, full_sweep_interval=self.full_sweep_interval)
+        snapshot.load()
+        for key in api:
+            snapshot.set_api_volume(key, api[key])
+
+        lvs = {}
+        for lv in self.lvm_lvs:
             self.count['total'] += 1
+            category = self.classify_lv(lv)
+            if category:
+                self.count[category] += 1
+            else:
+                lvs[lv_guid_key(lv['lvname'])] = lv
+
+        results = {}
+        todo = set()
+        for key in lvs:
+            lv = lvs[key]
+            lv_data = [
+                lv['attr'], lv['total'], lv['origin'], lv['cfg_file_exists'],
+                lv['cfg_file_valid'], lv['remove_timestamp']]
+            lv['data'] = lv_data
+            result = snapshot.lookup(lv['vgname'] + '/' + lv['lvname'], lv_data, key)
+            if result is None:
+                todo.add(key)
+            else:
+                results[key] = tuple(result)
 
-            # the Backup volume
-            if lv['lvname'] == BACKUP_LV:
-                self.count['dummy'] += 1
-                log.debug("LV %s/%s is the backup volume.", lv['vgname'], lv['lvname'])
+        if self.verbose > 1:
+            log.debug("Reconciling %d of %d logical volumes.", len(todo), len(lvs))
+        reconciled = self.reconcile(lvs, todo)
+        for key in reconciled:
+            result = reconciled[key]
+            if result[0] not in UNCACHED_CATEGORIES:
+                lv = lvs[key]
+                snapshot.add(lv['vgname'] + '/' + lv['lvname'], lv['data'], result[0], result[1])
+        results.update(reconciled)
+        snapshot.save()
+
+        consumed = set()
+        for key in results:
+            (category, is_consumed) = results[key]
+            self.count[category] += 1
+            if is_consumed:
+                consumed.add(key)
+
+        # Checking for volumes from API without a logical volume
+        for key in set(api).difference(consumed):
+            vol = api[key]
+            guid = guid_str(key)
+            voltype = 'Volume'
+            if vol.type == 'img':
+                voltype = 'Image'
+            elif vol.type == 'snap':
+                voltype = 'Snapshot'
+
+            prov_state = vol.state
+
+            if prov_state and 'delete' in prov_state:
+                # Volume is on deletion
+                if self.verbose > 2:
+                    log.debug(
+                        "%s %s is on deletion in database.", voltype, guid)
+                self.count['zombies'] += 1
                 continue
 
-            # volume group not 'storage' or volume name not a shortened GUID
-            if not lv['is_pb_vol']:
-                self.count['alien'] += 1
-                log.debug(
-                    "LV %s/%s is not a valid Profitbricks volume.", lv['vgname'], lv['lvname'])
+            if prov_state and 'to_be_created' in prov_state:
+                # Volume is on creation
+                if self.verbose > 2:
+                    log.debug(
+                        "%s %s is on creation in database.", voltype, guid)
+                self.count['ok'] += 1
                 continue
 
-            # LVM snapshots don't count
-            if lv['is_snapshot']:
-                self.count['snapshots'] += 1
-                log.debug(
-                    "LV %s/%s is a valid Profitbricks LVM snapshot.", lv['vgname'], lv['lvname'])
-                continue
+            # These volumes should be there
+            log.info(
+                "%s %s with a size of %d MiB doesn't exists.", voltype, guid, vol.size)
+            self.count['missing'] += 1
 
-            # open LVs with extension '-snap' also don't count
-            if lv['has_snap_ext'] and lv['is_open']:
-                self.count['snapshots'] += 1
-                log.debug(
-                    "LV %s/%s is an opened, valid splitted LVM snapshot.",
-                    lv['vgname'], lv['lvname'])
-                continue
+    # -------------------------------------------------------------------------
+    def classify_lv(self, lv):
+        """
+        Classifies the given logical volume, as far as it is possible
+        without its volume from API.
 
-            # our sealed bottled coffee volume
-            if lv['lvname'] == DUMMY_LV:
-                self.count['dummy'] += 1
-                log.debug(
-                    "LV %s/%s is the notorious dummy device.", lv['vgname'], lv['lvname'])
-                continue
+        @param lv: the logical volume from LVM
+        @type lv: dict
 
-            guid = '600144f0-' + lv['lvname']
-            if self.verbose > 3:
-                log.debug("Searching for GUID %r ...", guid)
-
-            if guid not in self.all_api_volumes:
-
-                if lv['cfg_file_exists'] and lv['cfg_file_valid'] and lv['remove_timestamp']:
-                    # Zombie == should be removed sometimes
-                    self.count['zombies'] += 1
-                    if self.verbose > 1:
-                        ts = lv['remove_timestamp']
-                        dd = datetime.datetime.fromtimestamp(ts)
-                        log.debug(
-                            "LV %s/%s has a remove timestamp of %d (%s)" % (
-                                lv['vgname'], lv['lvname'], ts, dd))
-                else:
+        @return: the category of the result (a key of self.count) or None,
+                 if the logical volume has to be reconciled with the volumes
+                 from API
+        @rtype: str or None
 
-                    # Orphaned == existing, should not be removed, but not in DB
-                    self.count['orphans'] += 1
-                    msg = "LV %s/%s is orphaned: " % (lv['vgname'], lv['lvname'])
-                    if not lv['cfg_file_exists']:
-                        msg += "config file %r doesn't exists." % (lv['cfg_file'])
-                    elif not lv['cfg_file_valid']:
-                        msg += "config file %r is invalid." % (lv['cfg_file'])
-                    else:
-                        msg += "No remove timestamp defined in %r." % (lv['cfg_file'])
-                    log.info(msg)
-                continue
+        """
 
-            if not lv['cfg_file_exists']:
-                # No config file found == Error
-                self.count['error'] += 1
-                log.info(
-                    "LV %s/%s has no config file %r.",
-                    lv['vgname'], lv['lvname'], lv['cfg_file'])
-                del self.all_api_volumes[guid]
-                continue
+        if self.verbose > 3:
+            log.debug("Checking LV %s/%s ...", lv['vgname'], lv['lvname'])
+
+        # the Backup volume
+        if lv['lvname'] == BACKUP_LV:
+            log.debug("LV %s/%s is the backup volume.", lv['vgname'], lv['lvname'])
+            return 'dummy'
+
+        # volume group not 'storage' or volume name not a shortened GUID
+        if not lv['is_pb_vol']:
+            log.debug(
+                "LV %s/%s is not a valid Profitbricks volume.", lv['vgname'], lv['lvname'])
+            return 'alien'
+
+        # LVM snapshots don't count
+        if lv['is_snapshot']:
+            log.debug(
+                "LV %s/%s is a valid Profitbricks LVM snapshot.", lv['vgname'], lv['lvname'])
+            return 'snapshots'
+
+        # open LVs with extension '-snap' also don't count
+        if lv['has_snap_ext'] and lv['is_open']:
+            log.debug(
+                "LV %s/%s is an opened, valid splitted LVM snapshot.",
+                lv['vgname'], lv['lvname'])
+            return 'snapshots'
+
+        # our sealed bottled coffee volume
+        if lv['lvname'] == DUMMY_LV:
+            log.debug(
+                "LV %s/%s is the notorious dummy device.", lv['vgname'], lv['lvname'])
+            return 'dummy'
+
+        return None
+
+    # -------------------------------------------------------------------------
+    def reconcile(self, lvs, keys):
+        """
+        Reconciles the given logical volumes with their volumes from API by
+        set operations on the integer values of their GUIDs.
+
+        @param lvs: the logical volumes of ProfitBricks volumes by their keys
+                    (see lv_guid_key())
+        @type lvs: dict
+        @param keys: the keys of the logical volumes to reconcile
+        @type keys: set
+
+        @return: the category of the result (a key of self.count) and a flag,
+                 whether the volume from API was checked by the logical
+                 volume (and is not counted as missing), by the keys of the
+                 logical volumes
+        @rtype: dict
+
+        """
+
+        api = self.all_api_volumes
+        results = {}
 
-            if lv['remove_timestamp']:
-                prov_state = self.all_api_volumes[guid]['state']
-                if prov_state and 'delete' in prov_state:
-                    # Volume is on deletion
-                    if self.verbose > 2:
-                        log.debug(
-                            "LV %s/%s will deleted sometimes.",
-                            lv['vgname'], lv['lvname'])
-                    self.count['zombies'] += 1
-                    continue
-                # Volume should be there, but remove date was set
-                self.count['error'] += 1
-                ts = lv['remove_timestamp']
-                dd = datetime.datetime.fromtimestamp(ts)
-                log.info(
-                    "LV %s/%s is valid, but has a remove timestamp of %d (%s)",
-                    lv['vgname'], lv['lvname'], ts, dd)
-                del self.all_api_volumes[guid]
+        for key in keys.difference(api):
+            lv = lvs[key]
+
+            if lv['cfg_file_exists'] and lv['cfg_file_valid'] and lv['remove_timestamp']:
+                # Zombie == should be removed sometimes
+                if self.verbose > 1:
+                    ts = lv['remove_timestamp']
+                    dd = datetime.datetime.fromtimestamp(ts)
+                    log.debug(
+                        "LV %s/%s has a remove timestamp of %d (%s)" % (
+                            lv['vgname'], lv['lvname'], ts, dd))
+                results[key] = ('zombies', False)
                 continue
 
-            cur_size = lv['total']
-            target_size = self.all_api_volumes[guid]['size']
-            if cur_size != target_size:
-                # different sizes between database and current state
-                self.count['error'] += 1
-                log.info(
-                    "LV %s/%s has a wrong size, current %d MiB, provisioned %d MiB.",
-                    lv['vgname'], lv['lvname'], cur_size, target_size)
-                del self.all_api_volumes[guid]
+            # Orphaned == existing, should not be removed, but not in DB
+            msg = "LV %s/%s is orphaned: " % (lv['vgname'], lv['lvname'])
+            if not lv['cfg_file_exists']:
+                msg += "config file %r doesn't exists." % (lv['cfg_file'])
+            elif not lv['cfg_file_valid']:
+                msg += "config file %r is invalid." % (lv['cfg_file'])
+            else:
+                msg += "No remove timestamp defined in %r." % (lv['cfg_file'])
+            log.info(msg)
+            results[key] = ('orphans', False)
+
+        matched = keys.intersection(api)
+
+        # No config file found == Error
+        no_config = set(k for k in matched if not lvs[k]['cfg_file_exists'])
+        matched -= no_config
+        for key in no_config:
+            lv = lvs[key]
+            log.info(
+                "LV %s/%s has no config file %r.", lv['vgname'], lv['lvname'], lv['cfg_file'])
+            results[key] = ('error', True)
+
+        removing = set(k for k in matched if lvs[k]['remove_timestamp'])
+        matched -= removing
+        for key in removing:
+            lv = lvs[key]
+            prov_state = api[key].state
+            if prov_state and 'delete' in prov_state:
+                # Volume is on deletion
+                if self.verbose > 2:
+                    log.debug("LV %s/%s will deleted sometimes.", lv['vgname'], lv['lvname'])
+                results[key] = ('zombies', False)
                 continue
+            # Volume should be there, but remove date was set
+            ts = lv['remove_timestamp']
+            dd = datetime.datetime.fromtimestamp(ts)
+            log.info(
+                "LV %s/%s is valid, but has a remove timestamp of %d (%s)",
+                lv['vgname'], lv['lvname'], ts, dd)
+            results[key] = ('error', True)
+
+        # different sizes between database and current state
+        wrong_size = set(k for k in matched if lvs[k]['total'] != api[k].size)
+        matched -= wrong_size
+        for key in wrong_size:
+            lv = lvs[key]
+            log.info(
+                "LV %s/%s has a wrong size, current %d MiB, provisioned %d MiB.",
+                lv['vgname'], lv['lvname'], lv['total'], api[key].size)
+            results[key] = ('error', True)
+
+        if self.verbose > 2:
+            log.debug("%d logical volumes seem to be ok.", len(matched))
+        ok = ('ok', True)
+        for key in matched:
+            results[key] = ok
 
-            if self.verbose > 2:
-                log.debug("LV %s/%s seems to be ok.", lv['vgname'], lv['lvname'])
-            self.count['ok'] += 1
-            del self.all_api_volumes[guid]
-
-        # Checking for volumes, they are not in self.all_api_volumes
-        if len(self.all_api_volumes.keys()):
-            for guid in self.all_api_volumes:
-                voltype = 'Volume'
-                if self.all_api_volumes[guid]['type'] == 'img':
-                    voltype = 'Image'
-                elif self.all_api_volumes[guid]['type'] == 'snap':
-                    voltype = 'Snapshot'
-
-                prov_state = self.all_api_volumes[guid]['state']
-
-                if prov_state and 'delete' in prov_state:
-                    # Volume is on deletion
-                    if self.verbose > 2:
-                        log.debug(
-                            "%s %s is on deletion in database.", voltype, guid)
-                    self.count['zombies'] += 1
-                    continue
-
-                if prov_state and 'to_be_created' in prov_state:
-                    # Volume is on creation
-                    if self.verbose > 2:
-                        log.debug(
-                            "%s %s is on creation in database.", voltype, guid)
-                    self.count['ok'] += 1
-                    continue
-
-                # These volumes should be there
-                log.info(
-                    "%s %s with a size of %d MiB doesn't exists.", voltype,
-                    guid, self.all_api_volumes[guid]['size'])
-                self.count['missing'] += 1
+        return results
 
     # -------------------------------------------------------------------------
-    def get_api_storage_volumes(self):
+    def get_api_storage_volumes(self, storages=None):
+        """
+        Evaluates the storage volumes from API, which are read from API,
+        if not given. Only the compact data of the volumes is kept.
+
+        @param storages: the storage volume objects from API
+        @type storages: iterator or None
+
+        @return: the compact data (ApiVolume) of the storage volumes
+                 with the integer value of the GUID of the volume on this
+                 host as key
+        @rtype: dict
+
+        """
 
-        self.api_volumes = []
+        self.api_volumes = {}
 
         key_replicated = 'replicated'
         key_size = 'size'
@@ -588,13 +822,14 @@ class CheckPbConsistenceStoragePlugin(BaseDcmClientPlugin):
             key_guid = key_guid.decode('utf-8')
             key_virtual_state = key_virtual_state.decode('utf-8')
 
-        storages = None
-        try:
-            storages = self.api.vstorages(pstorage=self.hostname, contract_infos=False)
-        except RestApiError as e:
-            self.die(str(e))
-        except Exception as e:
-            self.die("%s: %s" % (e.__class__.__name__, e))
+        if storages is None:
+            try:
+                storages = list(self.iter_api_objects(
+                    'vstorages', pstorage=self.hostname, contract_infos=False))
+            except RestApiError as e:
+                self.die(str(e))
+            except Exception as e:
+                self.die("%s: %s" % (e.__class__.__name__, e))
 
         first_volume = True
         for stor in storages:
@@ -639,26 +874,36 @@ class CheckPbConsistenceStoragePlugin(BaseDcmClientPlugin):
             if state:
                 state = state.lower()
 
-            vol = {
-                'guid': guid,
-                'replicated': replicated,
-                'size': size,
-                'state': state,
-            }
-            self.api_volumes.append(vol)
+            vol = ApiVolume(size, 'vol', state)
+            self.api_volumes[guid.int] = vol
 
             if self.verbose > vl:
-                log.debug("Transferred data of storage volume:\n%s", pp(vol))
+                log.debug("Transferred data of storage volume %s:\n%s", guid, pp(vol))
 
         if self.verbose > 1:
             log.debug("Got %d Storage volumes from API.", len(self.api_volumes))
         if self.verbose > 3:
             log.debug("Got Storage volumes from API:\n%s", pp(self.api_volumes))
 
+        return self.api_volumes
+
     # -------------------------------------------------------------------------
-    def get_api_image_volumes(self):
+    def get_api_image_volumes(self, images=None):
+        """
+        Evaluates the image volumes from API, which are read from API,
+        if not given. Only the compact data of the volumes is kept.
 
-        self.api_images = []
+        @param images: the image volume objects from API
+        @type images: iterator or None
+
+        @return: the compact data (ApiVolume) of the image volumes
+                 with the integer value of the GUID of the volume on this
+                 host as key
+        @rtype: dict
+
+        """
+
+        self.api_images = {}
 
         key_replicated = 'replicate'
         key_size = 'size'
@@ -676,13 +921,13 @@ class CheckPbConsistenceStoragePlugin(BaseDcmClientPlugin):
             key_image_type = key_image_type.decode('utf-8')
             key_virtual_state = key_virtual_state.decode('utf-8')
 
-        images = None
-        try:
-            images = self.api.vimages(pstorage=self.hostname)
-        except RestApiError as e:
-            self.die(str(e))
-        except Exception as e:
-            self.die("%s: %s" % (e.__class__.__name__, e))
+        if images is None:
+            try:
+                images = list(self.iter_api_objects('vimages', pstorage=self.hostname))
+            except RestApiError as e:
+                self.die(str(e))
+            except Exception as e:
+                self.die("%s: %s" % (e.__class__.__name__, e))
 
         first_volume = True
         for stor in images:
@@ -735,27 +980,36 @@ class CheckPbConsistenceStoragePlugin(BaseDcmClientPlugin):
             if state:
                 state = state.lower()
 
-            vol = {
-                'guid': guid,
-                'replicated': replicated,
-                'size': size,
-                'img_type': img_type,
-                'state': state,
-            }
-            self.api_images.append(vol)
+            vol = ApiVolume(size, 'img', state)
+            self.api_images[guid.int] = vol
 
             if self.verbose > vl:
-                log.debug("Transferred data of image volume:\n%s", pp(vol))
+                log.debug(
+                    "Transferred data of image volume %s (%s):\n%s", guid, img_type, pp(vol))
 
         if self.verbose > 1:
             log.debug("Got %d Image volumes from API.", len(self.api_images))
         if self.verbose > 3:
             log.debug("Got Image volumes from API:\n%s", pp(self.api_images))
 
+        return self.api_images
+
     # -------------------------------------------------------------------------
-    def get_api_snapshot_volumes(self):
+    def get_api_snapshot_volumes(self, snapshots=None):
+        """
+        Evaluates the snapshot volumes from API, which are read from API,
+        if not given. Only the compact data of the volumes is kept.
+
+        @param snapshots: the snapshot volume objects from API
+        @type snapshots: iterator or None
+
+        @return: the compact data (ApiVolume) of the snapshot volumes
+                 with the integer value of the GUID of the volume as key
+        @rtype: dict
+
+        """
 
-        self.api_snapshots = []
+        self.api_snapshots = {}
 
         key_replicated = 'replicate'
         key_size = 'size'
@@ -773,13 +1027,13 @@ class CheckPbConsistenceStoragePlugin(BaseDcmClientPlugin):
             key_image_type = key_image_type.decode('utf-8')
             key_virtual_state = key_virtual_state.decode('utf-8')
 
-        snapshots = None
-        try:
-            snapshots = self.api.vsnapshots(pstorage=self.hostname)
-        except RestApiError as e:
-            self.die(str(e))
-        except Exception as e:
-            self.die("%s: %s" % (e.__class__.__name__, e))
+        if snapshots is None:
+            try:
+                snapshots = list(self.iter_api_objects('vsnapshots', pstorage=self.hostname))
+            except RestApiError as e:
+                self.die(str(e))
+            except Exception as e:
+                self.die("%s: %s" % (e.__class__.__name__, e))
 
         first_volume = True
         for stor in snapshots:
@@ -803,32 +1057,37 @@ class CheckPbConsistenceStoragePlugin(BaseDcmClientPlugin):
             if state:
                 state = state.lower()
 
-            vol = {
-                'guid': guid,
-                'size': size,
-                'state': state,
-            }
-            self.api_snapshots.append(vol)
+            vol = ApiVolume(size, 'snap', state)
+            self.api_snapshots[guid.int] = vol
 
             if self.verbose > vl:
-                log.debug("Transferred data of storage volume:\n%s", pp(vol))
+                log.debug("Transferred data of snapshot volume %s:\n%s", guid, pp(vol))
 
         if self.verbose > 1:
             log.debug("Got %d Snapshot volumes from API.", len(self.api_snapshots))
         if self.verbose > 3:
             log.debug("Got Snapshot volumes from API:\n%s", pp(self.api_snapshots))
 
+        return self.api_snapshots
+
     # -------------------------------------------------------------------------
-    def get_lvm_lvs(self):
+    def exec_lvm_lvs(self, timeout=None):
+        """
+        Executes 'lvm lvs' for all logical volumes, it doesn't die on errors,
+        so it can be called in a worker thread.
 
-        self.lvm_lvs = []
+        @raise ExecutionTimeoutError: if 'lvm lvs' was killed after the
+                                      timeout in a worker thread
 
-        pat_pb_vol = (
-            r'^(?:[\da-f]{4}-){3}[\da-f]{12}(-snap)?'
-            r'(-del-\d{4}[-_]?\d{2}[-_]?\d{2}[-_]?\d{2}[-_:]?\d{2}(?:[-_:]?\d{2}))?$')
-        if self.verbose > 3:
-            log.debug("Regex for a PB Volume: %r", pat_pb_vol)
-        re_pb_vol = re.compile(pat_pb_vol, re.IGNORECASE)
+        @param timeout: the timeout of 'lvm lvs' in seconds, if not given,
+                        the timeout of the plugin is used
+        @type timeout: int or None
+
+        @return: a tuple of the return value, the output on STDOUT and the
+                 output on STDERR
+        @rtype: tuple
+
+        """
 
         cmd = [
             self.lvm_command,
@@ -845,15 +1104,34 @@ class CheckPbConsistenceStoragePlugin(BaseDcmClientPlugin):
                 "lv_path,vg_extent_size,lv_size,origin")
         ]
 
-        (ret_code, std_out, std_err) = self.exec_cmd(cmd)
+        return self.exec_cmd(cmd, timeout=timeout)
+
+    # -------------------------------------------------------------------------
+    def get_lvm_lvs(self, lvs_result=None):
+
+        self.lvm_lvs = []
+
+        pat_pb_vol = (
+            r'^(?:[\da-f]{4}-){3}[\da-f]{12}(-snap)?'
+            r'(-del-\d{4}[-_]?\d{2}[-_]?\d{2}[-_]?\d{2}[-_:]?\d{2}(?:[-_:]?\d{2}))?$')
+        if self.verbose > 3:
+            log.debug("Regex for a PB Volume: %r", pat_pb_vol)
+        re_pb_vol = re.compile(pat_pb_vol, re.IGNORECASE)
+
+        if lvs_result is None:
+            lvs_result = self.exec_lvm_lvs()
+        (ret_code, std_out, std_err) = lvs_result
         if ret_code:
             msg = (
                 "Error %d listing LVM logical volumes: %s" % (ret_code, std_err))
             self.die(msg)
 
+        cfg_cache = VolumeConfigCache(STORAGE_CONFIG_DIR)
+        cfg_cache.scan()
+
         lines = std_out.split('\n')
 
-        got_lvs = []
+        got_lvs = set()
 
         for line in lines:
             line = line.strip()
@@ -871,7 +1149,7 @@ class CheckPbConsistenceStoragePlugin(BaseDcmClientPlugin):
             lv_name = "%s/%s" % (lv['vgname'], lv['lvname'])
             if lv_name in got_lvs:
                 continue
-            got_lvs.append(lv_name)
+            got_lvs.add(lv_name)
 
             lv['stripes'] = int(words[2])
             lv['stripesize'] = int(words[3])
@@ -912,43 +1190,24 @@ class CheckPbConsistenceStoragePlugin(BaseDcmClientPlugin):
                     if match.group(1) is not None:
                         lv['has_snap_ext'] = True
             if lv['is_pb_vol'] and not lv['is_snapshot']:
-                lv['cfg_file'] = os.path.join(
-                    STORAGE_CONFIG_DIR, (lv['lvname'] + '.ini'))
-                if os.path.exists(lv['cfg_file']):
+                cfg_name = lv['lvname'] + '.ini'
+                lv['cfg_file'] = os.path.join(STORAGE_CONFIG_DIR, cfg_name)
+                if cfg_cache.exists(cfg_name):
                     lv['cfg_file_exists'] = True
                     try:
-                        lv['remove_timestamp'] = self.get_remove_timestamp(
-                            lv['cfg_file'])
+                        lv['remove_timestamp'] = cfg_cache.remove_timestamp(cfg_name)
                         lv['cfg_file_valid'] = True
                     except CfgFileNotValidError as e:
                         log.debug("Error reading %r: %s", lv['cfg_file'], e)
 
             self.lvm_lvs.append(lv)
 
+        cfg_cache.save()
+
     # -------------------------------------------------------------------------
     def get_remove_timestamp(self, cfg_file):
 
-        cfg = cfgparser.ConfigParser()
-        try:
-            cfg.read(cfg_file)
-        except Exception as e:
-            msg = "%s: %s" % (e.__class__.__name__, e)
-            raise CfgFileNotValidError(cfg_file, msg)
-
-        if not cfg.has_section('Volume'):
-            return None
-
-        if not cfg.has_option('Volume', "remove_object"):
-            return None
-
-        timestamp = cfg.get('Volume', "remove_object")
-        try:
-            timestamp = int(timestamp)
-        except Exception as e:
-            msg = "%s: %s" % (e.__class__.__name__, e)
-            raise CfgFileNotValidError(cfg_file, msg)
-
-        return timestamp
+        return read_remove_timestamp(cfg_file)
 
 # =============================================================================
 
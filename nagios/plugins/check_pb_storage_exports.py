@@ -16,26 +16,30 @@ import re
 import logging
 import socket
 import textwrap
+import time
 import uuid
-import glob
 
 # Own modules
-from pb_base.crc import crc64_digest
-
 import nagios
 from nagios.common import pp
 
 from nagios.plugin.range import NagiosRange
-from nagios.plugin.extended import CommandNotFoundError
+from nagios.plugin.extended import CommandNotFoundError, ExtNagiosPluginError
+
+from nagios.plugin.workers import run_concurrently, WorkerTimeoutError, DEFAULT_MAX_WORKERS
 
 from nagios.plugins.base_dcm_client_check import DEFAULT_TIMEOUT
 from nagios.plugins.base_dcm_client_check import DUMMY_LV, DUMMY_CRC
 from nagios.plugins.base_dcm_client_check import BaseDcmClientPlugin
 
+from nagios.plugins.scst_sysfs import list_dir, scan_device
+from nagios.plugins.scst_digests import ScstDigestCache
+from nagios.plugins.pserver_cache import PserverCache, DEFAULT_PSERVER_CACHE_TTL
+
 from dcmanagerclient.client import RestApiError
 
 # Some module variables
-__version__ = '0.3.1'
+__version__ = '0.7.0'
 __copyright__ = 'Copyright (c) 2015 Frank Brehm, Berlin.'
 
 DEFAULT_WARN_ERRORS = 0
@@ -49,6 +53,15 @@ SCST_SRP_TARGET0_DIR = os.path.join(SCST_SRP_TARGET_DIR, 'ib_srpt_target_0')
 SCST_INI_GROUP_DIR = os.path.join(SCST_SRP_TARGET0_DIR, 'ini_groups')
 DEFAULT_STORAGE_VG = 'storage'
 
+# The concurrently executed phases of gathering the exports with their
+# descriptions, the durations are given as performance data 'time_<phase>'
+FETCH_PHASES = (
+    ('pservers', 'the cluster and its pservers'),
+    ('api_storage_exports', 'the storage exports from API'),
+    ('api_image_exports', 'the image exports from API'),
+    ('scst', 'the SCST devices'),
+)
+
 log = logging.getLogger(__name__)
 
 
@@ -87,6 +100,19 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
         self._may_have_rw_img_exports = False
         self._current_cluster = None
 
+        self._parallel = DEFAULT_MAX_WORKERS
+        """
+        @ivar: the maximum number of concurrently read SCST devices
+        @type: int
+        """
+
+        self._pserver_cache_ttl = DEFAULT_PSERVER_CACHE_TTL
+        """
+        @ivar: the time in seconds, the cluster and its pservers are taken
+               from the cache
+        @type: int
+        """
+
         super(CheckPbStorageExportsPlugin, self).__init__(
             shortname='PB_STORAGE_EXPORTS',
             usage=usage, blurb=blurb,
@@ -114,6 +140,18 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
         self.count = {}
         self.valid_pservers = {}
 
+        self.digest_cache = ScstDigestCache()
+        """
+        @ivar: the persistent cache of the SCST device names of the GUIDs
+        @type: ScstDigestCache
+        """
+
+        self.durations = {}
+        """
+        @ivar: the durations of the phases of FETCH_PHASES in seconds
+        @type: dict
+        """
+
         # Some commands are missing
         if failed_commands:
             raise CommandNotFoundError(failed_commands)
@@ -148,6 +186,16 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
         """Flag indicating, that image volumes may read/write exported."""
         return self._may_have_rw_img_exports
 
+    @property
+    def parallel(self):
+        """The maximum number of concurrently read SCST devices."""
+        return self._parallel
+
+    @property
+    def pserver_cache_ttl(self):
+        """The time in seconds, the cluster and its pservers are cached."""
+        return self._pserver_cache_ttl
+
     def as_dict(self):
         """
         Typecasting into a dictionary.
@@ -165,6 +213,8 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
         d['storage_vg'] = self.storage_vg
         d['may_have_rw_img_exports'] = self.may_have_rw_img_exports
         d['current_cluster'] = self.current_cluster
+        d['parallel'] = self.parallel
+        d['pserver_cache_ttl'] = self.pserver_cache_ttl
 
         return d
 
@@ -208,6 +258,22 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
             help="May image volumes read/write exported?.",
         )
 
+        self.add_arg(
+            '--parallel',
+            metavar='NR', dest='parallel', type=int, default=DEFAULT_MAX_WORKERS,
+            help=("The maximum number of concurrently read SCST devices, because reading "
+                  "their attributes may block on the SCST target lock (Default: %(default)d)."),
+        )
+
+        self.add_arg(
+            '--pserver-cache-ttl',
+            metavar='SECONDS', dest='pserver_cache_ttl', type=int,
+            default=DEFAULT_PSERVER_CACHE_TTL,
+            help=("The time, the cluster of the storage server and its pservers are taken "
+                  "from the cache instead of the API, 0 disables the cache "
+                  "(Default: %(default)d)."),
+        )
+
         super(CheckPbStorageExportsPlugin, self).add_args()
 
     def parse_args_second(self):
@@ -232,6 +298,13 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
         # TODO: delete later
         self._may_have_rw_img_exports = True
 
+        if self.argparser.args.parallel < 1:
+            self.die("The number of concurrently read SCST devices must be at least 1.")
+        self._parallel = self.argparser.args.parallel
+
+        if self.argparser.args.pserver_cache_ttl is not None:
+            self._pserver_cache_ttl = max(self.argparser.args.pserver_cache_ttl, 0)
+
         # define warning level
         if self.argparser.args.warning is not None:
             self._warning = NagiosRange(self.argparser.args.warning)
@@ -279,9 +352,6 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
         state = nagios.state.ok
         out = "Storage exports on %r seems to be okay." % (self.hostname)
 
-        self.get_current_cluster()
-        self.get_cluster_pservers()
-
         self.all_api_exports = {}
         self.existing_exports = {}
 
@@ -296,9 +366,14 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
             'needless': 0,
         }
 
-        self.get_api_storage_exports()
-        self.get_api_image_exports()
-        self.get_existing_exports()
+        fetched = self.fetch_all()
+        (self._current_cluster, self.valid_pservers) = fetched['pservers']
+
+        self.digest_cache.load()
+        self.storage_exports = self.filter_api_exports(fetched['api_storage_exports'], 'Storage')
+        self.image_exports = self.filter_api_exports(fetched['api_image_exports'], 'Image')
+        self.get_existing_exports(fetched['scst'])
+        self.digest_cache.save()
 
         self.check_exports()
         self.check_ini_groups()
@@ -318,23 +393,109 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
             if key == 'dummy':
                 continue
             self.add_perfdata(label=key, value=self.count[key])
+        for (phase, desc) in FETCH_PHASES:
+            self.add_perfdata(
+                label='time_' + phase, value=round(self.durations[phase], 3), uom='s')
 
         self.exit(state, out)
 
-    def get_current_cluster(self):
+    def fetch_all(self):
+        """
+        Fetches the cluster with its pservers and the storage and image
+        exports from API and reads the SCST devices concurrently, the
+        timeout of the plugin is the deadline for all of them. Dies on
+        errors and on exceeding the deadline.
 
-        try:
-            storages = self.api.pstorages(name=self.hostname)
-        except RestApiError as e:
-            self.die(str(e))
-        except Exception as e:
-            self.die("%s: %s" % (e.__class__.__name__, e))
+        @return: the raw results of the phases of FETCH_PHASES
+        @rtype: dict
+
+        """
+
+        fetchers = {
+            'pservers': self.fetch_pservers,
+            'api_storage_exports': self.fetch_api_storage_exports,
+            'api_image_exports': self.fetch_api_image_exports,
+            'scst': self.scan_scst_devices,
+        }
+
+        def fetch(phase):
+            start = time.time()
+            result = fetchers[phase]()
+            return (result, time.time() - start)
+
+        phases = [x[0] for x in FETCH_PHASES]
+        deadline = time.time() + self.timeout
+        results = run_concurrently(fetch, phases, max_workers=len(phases), deadline=deadline)
+
+        fetched = {}
+        for (phase, desc) in FETCH_PHASES:
+            (result, exc_info) = results[phases.index(phase)]
+            if exc_info:
+                e = exc_info[1]
+                if isinstance(e, WorkerTimeoutError):
+                    self.die("Timeout after %d seconds on getting %s." % (self.timeout, desc))
+                if isinstance(e, (RestApiError, ExtNagiosPluginError)):
+                    self.die(str(e))
+                self.die("%s: %s" % (e.__class__.__name__, e))
+            (fetched[phase], self.durations[phase]) = result
+            if self.verbose > 1:
+                log.debug("Got %s in %0.3f seconds.", desc, self.durations[phase])
+
+        return fetched
+
+    def fetch_pservers(self):
+        """
+        Gives back the cluster of the current storage server and the zones
+        of the pservers of this cluster, from the cache, if it is not
+        expired, or from API.
+
+        @return: the cluster and the zones of the pservers by their names
+        @rtype: tuple
+
+        """
+
+        cache = PserverCache(self.hostname, ttl=self.pserver_cache_ttl)
+        cached = cache.load()
+        if cached:
+            log.debug("Cluster %r and its %d pservers taken from cache.",
+                      cached[0], len(cached[1]))
+            return cached
+
+        api = self.create_api()
+        cluster = self.get_current_cluster(api)
+        pservers = self.get_cluster_pservers(cluster, api)
+        cache.save(cluster, pservers)
+        return (cluster, pservers)
+
+    def fetch_api_storage_exports(self):
+        """Fetches the storage exports of the current storage server from API."""
+
+        return self.get_api_storage_exports(api=self.create_api())
+
+    def fetch_api_image_exports(self):
+        """Fetches the image exports of the current storage server from API."""
+
+        return self.get_api_image_exports(api=self.create_api())
+
+    def get_current_cluster(self, api=None):
+        """
+        Gives back the cluster of the current storage server from API.
+
+        @raise ExtNagiosPluginError: if the storage server is unknown
+
+        """
+
+        if api is None:
+            api = self.api
+
+        storages = api.pstorages(name=self.hostname)
 
         log.debug("Info about current storage server from API:\n%s", pp(storages))
 
         if not len(storages):
-            self.die("Could not find information about current storage server %r." %
-                     (self.hostname))
+            raise ExtNagiosPluginError(
+                "Could not find information about current storage server %r." % (
+                    self.hostname))
 
         key_cluster = 'cluster'
         if sys.version_info[0] <= 2:
@@ -343,26 +504,30 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
         if sys.version_info[0] <= 2:
             cluster = cluster.encode('utf-8')
         log.debug("Cluster of current storage server %r: %r", self.hostname, cluster)
-        self._current_cluster = cluster
+        return cluster
 
-    def get_cluster_pservers(self):
+    def get_cluster_pservers(self, cluster, api=None):
+        """
+        Gives back the zones of the pservers of the given cluster from API.
 
-        if not self.current_cluster:
-            self.die("No current cluster defined - cannot get pservers.")
-            return
+        @return: the zones of the pservers by their names
+        @rtype: dict
 
-        self.valid_pservers = {}
+        """
 
-        try:
-            pservers = self.api.pservers(cluster=self.current_cluster)
-        except RestApiError as e:
-            self.die(str(e))
-        except Exception as e:
-            self.die("%s: %s" % (e.__class__.__name__, e))
+        if not cluster:
+            raise ExtNagiosPluginError("No current cluster defined - cannot get pservers.")
+
+        if api is None:
+            api = self.api
+
+        valid_pservers = {}
+
+        pservers = api.pservers(cluster=cluster)
 
         if self.verbose > 3:
             log.debug("Info about pservers in current cluster %r from API:\n%s",
-                      self.current_cluster, pp(pservers))
+                      cluster, pp(pservers))
 
         key_name = 'name'
         key_zone = 'zone'
@@ -403,11 +568,48 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
             except ValueError:
                 pserver_zone = -1
 
-            self.valid_pservers[pserver_name] = pserver_zone
+            valid_pservers[pserver_name] = pserver_zone
 
         if self.verbose > 2:
             log.debug("Found Pservers in current cluster %r from API:\n%s",
-                      self.current_cluster, pp(self.valid_pservers))
+                      cluster, pp(valid_pservers))
+
+        return valid_pservers
+
+    def filter_api_exports(self, exports, voltype):
+        """
+        Filters the given exports from API by the pservers of the current
+        cluster and evaluates the SCST device names of their volumes.
+
+        @param exports: the exports from get_api_storage_exports() or
+                        get_api_image_exports()
+        @type exports: list of dict
+        @param voltype: the type of the volumes for log messages
+                        ('Storage' or 'Image')
+        @type voltype: str
+
+        @return: the exports to the pservers of the current cluster
+        @rtype: list of dict
+
+        """
+
+        result = []
+        for export in exports:
+            if export['pserver'] not in self.valid_pservers:
+                log.debug("%s export to %r not considered.", voltype, export['pserver'])
+                continue
+            if export['guid'] is None:
+                log.error("No volume for mapping of %r found.", export['uuid'])
+                continue
+            result.append(export)
+
+        digests = self.digest_cache.digests([str(x['guid']) for x in result])
+        for export in result:
+            export['scst_devname'] = digests[str(export['guid'])]
+
+        log.debug("Found %d %s exports to pservers of the current cluster.",
+                  len(result), voltype.lower())
+        return result
 
     def check_exports(self):
 
@@ -482,9 +684,22 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
                     log.debug("Found export for image volume %s (%s) to %r (LUN %s).",
                               export['guid'], uuid, ini_group, lun_id)
 
-    def get_api_storage_exports(self):
+    def get_api_storage_exports(self, api=None):
+        """
+        Gives back the exports of the storage volumes of the current storage
+        server from API. They are not filtered by the pservers of the current
+        cluster, see filter_api_exports().
 
-        self.storage_exports = []
+        @param api: the client object to use, self.api, if None
+        @type api: RestApi or None
+
+        @return: the exports with the GUIDs of their volumes (None, if
+                 the volume was not found)
+        @rtype: list of dict
+
+        """
+
+        storage_exports = []
         api_volumes = {}
 
         key_replicated = 'replicated'
@@ -506,13 +721,8 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
             key_pserver_name = key_pserver_name.decode('utf-8')
 
         log.debug("Retrieving storage volumes from API ...")
-        storages = None
-        try:
-            storages = self.api.vstorages(pstorage=self.hostname, contract_infos=False)
-        except RestApiError as e:
-            self.die(str(e))
-        except Exception as e:
-            self.die("%s: %s" % (e.__class__.__name__, e))
+        storages = self.iter_api_objects(
+            'vstorages', api=api, pstorage=self.hostname, contract_infos=False)
 
         first = True
         for stor in storages:
@@ -563,10 +773,8 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
                 log.debug("No valid GUID found for storage volume:\n%s", pp(stor))
                 continue
 
-            vol = {
-                'guid': guid,
-                'replicated': replicated,
-            }
+            # only the GUID and the replication are needed for the mappings
+            vol = (guid, replicated)
             api_volumes[vol_uuid] = vol
 
             if self.verbose > vl:
@@ -576,13 +784,7 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
                 first = False
 
         log.debug("Retrieving storage mappings from API ...")
-        maps = None
-        try:
-            maps = self.api.vstorage_maps(pstorage=self.hostname)
-        except RestApiError as e:
-            self.die(str(e))
-        except Exception as e:
-            self.die("%s: %s" % (e.__class__.__name__, e))
+        maps = self.iter_api_objects('vstorage_maps', api=api, pstorage=self.hostname)
 
         first = True
 
@@ -616,9 +818,6 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
             pserver = mapping[key_pserver_name]
             if pserver is None:
                 continue
-            if pserver not in self.valid_pservers:
-                log.debug("Storage export to %r not considered.", pserver)
-                continue
 
             vl = 4
             if first:
@@ -629,24 +828,18 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
 
             vol_uuid = uuid.UUID(mapping[key_vstorage_uuid])
 
-            if vol_uuid not in api_volumes:
-                log.error("No volume for mapping of %r found.", vol_uuid)
-                continue
-
-            guid = api_volumes[vol_uuid]['guid']
-            scst_devname = crc64_digest(str(guid))
+            (guid, replicated) = api_volumes.get(vol_uuid, (None, None))
             if sys.version_info[0] <= 2:
                 pserver = pserver.encode('utf-8')
 
             m = {
                 'uuid': vol_uuid,
                 'guid': guid,
-                'scst_devname': scst_devname,
-                'replicated': api_volumes[vol_uuid]['replicated'],
+                'replicated': replicated,
                 'pserver': pserver,
                 'checked': False,
             }
-            self.storage_exports.append(m)
+            storage_exports.append(m)
 
             if self.verbose > vl:
                 log.debug("Transformed storage mapping:\n%s", pp(m))
@@ -655,11 +848,25 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
                 first = False
 
         log.debug("Finished retrieving storage mappings from API, found %d mappings.",
-                  len(self.storage_exports))
+                  len(storage_exports))
+        return storage_exports
 
-    def get_api_image_exports(self):
+    def get_api_image_exports(self, api=None):
+        """
+        Gives back the exports of the image volumes of the current storage
+        server from API. They are not filtered by the pservers of the current
+        cluster, see filter_api_exports().
 
-        self.image_exports = []
+        @param api: the client object to use, self.api, if None
+        @type api: RestApi or None
+
+        @return: the exports with the GUIDs of their volumes (None, if
+                 the volume was not found)
+        @rtype: list of dict
+
+        """
+
+        image_exports = []
         api_volumes = {}
 
         key_replicated = 'replicate'
@@ -683,13 +890,7 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
             key_pserver_name = key_pserver_name.decode('utf-8')
 
         log.debug("Retrieving image volumes from API ...")
-        images = None
-        try:
-            images = self.api.vimages(pstorage=self.hostname)
-        except RestApiError as e:
-            self.die(str(e))
-        except Exception as e:
-            self.die("%s: %s" % (e.__class__.__name__, e))
+        images = self.iter_api_objects('vimages', api=api, pstorage=self.hostname)
 
         first = True
         for img in images:
@@ -735,10 +936,8 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
                 log.debug("No valid GUID found for image volume:\n%s", pp(img))
                 continue
 
-            vol = {
-                'guid': guid,
-                'replicated': replicated,
-            }
+            # only the GUID and the replication are needed for the mappings
+            vol = (guid, replicated)
             api_volumes[vol_uuid] = vol
 
             if self.verbose > vl:
@@ -748,13 +947,7 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
                 first = False
 
         log.debug("Retrieving image mappings from API ...")
-        maps = None
-        try:
-            maps = self.api.vimage_maps(pstorage=self.hostname)
-        except RestApiError as e:
-            self.die(str(e))
-        except Exception as e:
-            self.die("%s: %s" % (e.__class__.__name__, e))
+        maps = self.iter_api_objects('vimage_maps', api=api, pstorage=self.hostname)
 
         first = True
 
@@ -792,9 +985,6 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
             pserver = mapping[key_pserver_name]
             if pserver is None:
                 continue
-            if pserver not in self.valid_pservers:
-                log.debug("Image export to %r not considered.", pserver)
-                continue
 
             vl = 4
             if first:
@@ -808,33 +998,63 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
 
             vol_uuid = uuid.UUID(mapping[key_image_uuid])
 
-            if vol_uuid not in api_volumes:
-                log.error("No volume for mapping of %r found.", vol_uuid)
-                continue
-
-            guid = api_volumes[vol_uuid]['guid']
-            scst_devname = crc64_digest(str(guid))
+            (guid, replicated) = api_volumes.get(vol_uuid, (None, None))
             if sys.version_info[0] <= 2:
                 pserver = pserver.encode('utf-8')
 
             m = {
                 'uuid': vol_uuid,
                 'guid': guid,
-                'scst_devname': scst_devname,
-                'replicated': api_volumes[vol_uuid]['replicated'],
+                'replicated': replicated,
                 'pserver': pserver,
                 'checked': False,
             }
-            self.image_exports.append(m)
+            image_exports.append(m)
 
             if self.verbose > vl:
                 log.debug("Transformed storage mapping:\n%s", pp(m))
 
         log.debug("Finished retrieving image mappings from API, found %d mappings.",
-                  len(self.image_exports))
+                  len(image_exports))
+        return image_exports
+
+    def scan_scst_devices(self):
+        """
+        Reads all SCST devices below SCST_DEV_DIR concurrently with not more
+        than self.parallel threads (see scan_device()), because reading
+        their attributes may block on the SCST target lock. The timeout of
+        the plugin is the deadline for all of them.
+
+        @raise WorkerTimeoutError: if the deadline is exceeded
+
+        @return: the data of all exported devices in the order of their names
+        @rtype: list of dict
 
-    def get_existing_exports(self):
-        """ Result of descovering - dict of dicts in the form:
+        """
+
+        log.debug("Searching for SCST devices in %r ...", SCST_DEV_DIR)
+        try:
+            dev_dirs = sorted([x.path for x in list_dir(SCST_DEV_DIR)])
+        except OSError as e:
+            log.debug("Could not read SCST device directory %r: %s", SCST_DEV_DIR, e)
+            return []
+
+        deadline = time.time() + self.timeout
+        results = run_concurrently(
+            scan_device, dev_dirs, max_workers=self.parallel, deadline=deadline)
+
+        devices = []
+        for (device, exc_info) in results:
+            if exc_info:
+                raise exc_info[1]
+            if device is not None:
+                devices.append(device)
+
+        return devices
+
+    def get_existing_exports(self, devices):
+        """ Result of descovering the given SCST devices from
+            scan_scst_devices() - dict of dicts in the form:
                 {   'devicename': '5ce99e968d67ded2',
                     'guid': UUID('600144f0-0001-8aa6-91a2-19f911e39d8f'),
                     'has_errors': False,
@@ -855,50 +1075,31 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
             log.debug("Search pattern for ProfiBricks volumes: %r", pb_lv_pattern)
         pb_lv = re.compile(pb_lv_pattern)
 
-        pattern = os.path.join(SCST_DEV_DIR, '*')
-        log.debug("Searching for SCST devices in %r ...", pattern)
-        dev_dirs = glob.glob(pattern)
-        for dev_dir in dev_dirs:
+        guids = []
+        for device in devices:
+            match = device['filename'] and pb_lv.search(device['filename'])
+            if match:
+                guids.append('600144f0-' + match.group(1))
+        digests = self.digest_cache.digests(guids)
+
+        for device in devices:
 
             vl = 4
             if first:
                 vl = 2
 
-            filename_file = os.path.join(dev_dir, 'filename')
-            handler_link = os.path.join(dev_dir, 'handler')
             has_errors = False
             read_only = False
 
-            if not os.path.exists(filename_file):
-                continue
-            if not os.path.exists(handler_link):
-                continue
-
             self.count['exported_devs'] += 1
 
-            exported_dir = os.path.join(dev_dir, 'exported')
             luns = {}
-            if os.path.isdir(exported_dir):
-                exports = glob.glob(os.path.join(exported_dir, '*'))
-                nr_exports = 0
-                for export_link in exports:
-                    nr_exports += 1
-                    link_target = os.readlink(export_link)
-                    if os.path.isabs(link_target):
-                        lun_dir = os.path.realpath(export_link)
-                    else:
-                        lun_dir = os.path.realpath(os.path.relpath(link_target,
-                                                                   os.path.dirname(export_link)))
-                    ini_group = os.path.basename(os.path.dirname(os.path.dirname(lun_dir)))
-                    lun_nr = os.path.basename(lun_dir)
-                    luns[ini_group] = {'id': lun_nr, 'checked': False}
-                    self.count['exported_luns'] += 1
-
-                # if nr_exports > 1:
-                #     vl = 2
-
-            devname = os.path.basename(dev_dir)
-            export_filename = self.get_scst_export_filename(filename_file)
+            for ini_group in device['luns']:
+                luns[ini_group] = {'id': device['luns'][ini_group], 'checked': False}
+                self.count['exported_luns'] += 1
+
+            devname = device['devicename']
+            export_filename = self.get_device_attribute(device, 'filename')
             if not export_filename:
                 log.info("No devicename found for export %r.", devname)
                 self.count['error'] += 1
@@ -919,7 +1120,7 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
                 continue
 
             guid = '600144f0-' + short_guid
-            digest = crc64_digest(guid)
+            digest = digests[guid]
             if not digest == devname:
                 log.info(("Found mismatch between volume name %r and SCST "
                           "device name %r (should be %r)."), export_filename, devname, digest)
@@ -927,13 +1128,13 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
                 continue
 
             fc_ph_id_expected = guid.replace('-', '')
-            fc_ph_id_current = self.get_fc_ph_id(dev_dir)
+            fc_ph_id_current = self.get_device_attribute(device, 'fc_ph_id')
             if fc_ph_id_expected != fc_ph_id_current:
                 log.info("Export %r for device %r has wrong fc_ph_id %r.",
                          devname, export_filename, fc_ph_id_current)
                 has_errors = True
 
-            read_only = self.get_read_only(dev_dir)
+            read_only = self.get_read_only(device)
             if read_only is None:
                 has_errors = True
 
@@ -962,13 +1163,18 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
 
     def check_ini_groups(self):
 
-        igroup_pattern = os.path.join(SCST_INI_GROUP_DIR, '*')
         if self.verbose > 3:
-            log.debug("Get ini groups with pattern %r ...", igroup_pattern)
-        for ini_group_dir in glob.glob(igroup_pattern):
-            if not os.path.isdir(ini_group_dir):
+            log.debug("Get ini groups in %r ...", SCST_INI_GROUP_DIR)
+        try:
+            ini_group_dirs = list_dir(SCST_INI_GROUP_DIR)
+        except OSError as e:
+            log.debug("Could not read directory of ini groups %r: %s", SCST_INI_GROUP_DIR, e)
+            return
+
+        for ini_group_dir in ini_group_dirs:
+            if not ini_group_dir.is_dir():
                 continue
-            ini_group = os.path.basename(ini_group_dir)
+            ini_group = ini_group_dir.name
             if self.verbose > 3:
                 log.debug("Checking initiator group %r ...", ini_group)
 
@@ -977,16 +1183,18 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
                 self.count['alien'] += 1
                 continue
 
-            luns_dir = os.path.join(ini_group_dir, 'luns')
-            luns_pattern = os.path.join(luns_dir, '*')
+            lun_dirs = []
+            try:
+                lun_dirs = list_dir(os.path.join(ini_group_dir.path, 'luns'))
+            except OSError:
+                pass
             nr_luns = 0
             has_lun_zero = False
-            for lun_dir in glob.glob(luns_pattern):
-                if not os.path.isdir(lun_dir):
+            for lun_dir in lun_dirs:
+                if not lun_dir.is_dir():
                     continue
                 nr_luns += 1
-                lun = os.path.basename(lun_dir)
-                if lun == '0':
+                if lun_dir.name == '0':
                     has_lun_zero = True
             if nr_luns:
                 if not has_lun_zero:
@@ -996,94 +1204,25 @@ class CheckPbStorageExportsPlugin(BaseDcmClientPlugin):
                 log.info("Initiator group %r has no LUNs.", ini_group)
                 self.count['error'] += 1
 
-    def get_fc_ph_id(self, dev_dir):
-
-        fc_ph_id_filename = os.path.join(dev_dir, 'fc_ph_id')
-        if not os.path.exists(fc_ph_id_filename):
-            log.error("File for pc_ph_id %r doesn't exists.", fc_ph_id_filename)
-            return None
-
-        if not os.path.isfile(fc_ph_id_filename):
-            log.error("File for pc_ph_id %r is not a regular file.", fc_ph_id_filename)
-            return None
-
-        if not os.access(fc_ph_id_filename, os.R_OK):
-            log.error("No read access for file for pc_ph_id %r.", fc_ph_id_filename)
-            return None
-
-        fc_ph_id = None
-        fh = None
-        try:
-            fh = open(fc_ph_id_filename, 'r')
-            lines = fh.readlines()
-            if len(lines):
-                fc_ph_id = lines[0].strip()
-            else:
-                log.error("No pc_ph_id found in %r.", fc_ph_id_filename)
-        finally:
-            if fh:
-                fh.close()
-                fh = None
-
-        return fc_ph_id
-
-    def get_read_only(self, dev_dir):
-
-        read_only_filename = os.path.join(dev_dir, 'read_only')
-        if not os.path.exists(read_only_filename):
-            log.error("File for read_only %r doesn't exists.", read_only_filename)
-            return None
-
-        if not os.path.isfile(read_only_filename):
-            log.error("File for read_only %r is not a regular file.", read_only_filename)
-            return None
-
-        if not os.access(read_only_filename, os.R_OK):
-            log.error("No read access for file for read_only %r.", read_only_filename)
-            return None
-
-        read_only = None
-        fh = None
-        try:
-            fh = open(read_only_filename, 'r')
-            lines = fh.readlines()
-            if len(lines):
-                read_only = bool(int(lines[0].strip()))
-            else:
-                log.error("No read_only info found in %r.", read_only_filename)
-        finally:
-            if fh:
-                fh.close()
-                fh = None
-
-        return read_only
+    def get_device_attribute(self, device, attr):
+        """
+        Gives back the given attribute of a SCST device read by
+        scan_device(), an error on reading it is logged.
+        """
 
-    def get_scst_export_filename(self, filename_file):
+        if attr in device['errors']:
+            log.error(str(device['errors'][attr]))
+        return device[attr]
 
-        if not os.path.exists(filename_file):
-            log.error("SCST export filename file %r doesn't exists.", filename_file)
-            return None
+    def get_read_only(self, device):
 
-        if not os.path.isfile(filename_file):
-            log.error("SCST export filename file %r is not a regular file.", filename_file)
+        read_only = self.get_device_attribute(device, 'read_only')
+        if read_only is None:
             return None
 
-        if not os.access(filename_file, os.R_OK):
-            log.error("No read access for SCST export filename file %r.", filename_file)
-            return None
-
-        export_filename = None
-        fh = None
         try:
-            fh = open(filename_file, 'r')
-            lines = fh.readlines()
-            if len(lines):
-                export_filename = lines[0].strip()
-            else:
-                log.error("No devicename found in %r.", filename_file)
-        finally:
-            if fh:
-                fh.close()
-                fh = None
-
-        return export_filename
+            return bool(int(read_only))
+        except ValueError:
+            log.error("Invalid read_only info %r of SCST device %r.",
+                      read_only, device['devicename'])
+        return None
@@ -8,13 +8,9 @@
 """
 
 # Standard modules
-import sys
 import re
 import logging
-import socket
 import textwrap
-import time
-import select
 import signal
 
 # Third party modules
@@ -27,8 +23,11 @@ from nagios.common import pp
 from nagios.plugin import NagiosPluginError
 from nagios.plugin.extended import ExtNagiosPlugin
 
+from nagios.plugins.socket_client import SocketClient
+from nagios.plugins.socket_client import SocketTransportError, NoListeningError
+
 # Some module variables
-__version__ = '0.2.2'
+__version__ = '0.3.1'
 
 log = logging.getLogger(__name__)
 
@@ -71,18 +70,6 @@ re_parse_result = re.compile(r'^([^,]+),(\d+),(\d+),(.*)$')
 re_version = re.compile(r'version\s+\[([^\]]+)\]', re.IGNORECASE)
 
 
-class SocketTransportError(NagiosPluginError):
-    pass
-
-
-class SocketConnectTimeoutError(SocketTransportError):
-    pass
-
-
-class NoListeningError(SocketTransportError):
-    pass
-
-
 class RequestStatusError(NagiosPluginError):
     pass
 
@@ -538,10 +525,25 @@ class CheckPpdInstancePlugin(ExtNagiosPlugin):
 
         self.should_shutdown = True
 
+    def reply_complete(self, data):
+        """
+        Checks, whether the given received line is a complete status reply.
+
+        @param data: a line received without its newline
+        @type data: str
+
+        @return: the reply is complete
+        @rtype: bool
+
+        """
+
+        return bool(re_parse_result.search(data.strip()))
+
     def send(self, message):
         """
         Sends the message over network socket to the recipient.
-        It waits for all replies and gives them back all.
+        It waits for the reply, until it is complete or the PPD closes
+        the connection.
 
         @raise NoListeningError: if PPD isn't listening on the given port
         @raise SocketTransportError: on some communication errors or timeouts
@@ -549,7 +551,7 @@ class CheckPpdInstancePlugin(ExtNagiosPlugin):
         @param message: the message to send over the network
         @type message: str
 
-        @return: response from server, or None
+        @return: response from server
         @rtype: str
 
         """
@@ -558,123 +560,13 @@ class CheckPpdInstancePlugin(ExtNagiosPlugin):
             msg = "Sending message to %r, port %d with a timeout of %d seconds."
             log.debug(msg, self.host_address, self.ppd_port, self.timeout)
 
-        def connect_alarm_caller(signum, sigframe):
-            '''
-            This nested function will be called in event of a timeout
-
-            @param signum:   the signal number (POSIX) which happend
-            @type signum:    int
-            @param sigframe: the frame of the signal
-            @type sigframe:  object
-            '''
-
-            raise SocketConnectTimeoutError("Timeout connecting to %r port %d." %
-                                            (self.host_address, self.ppd_port))
-
-        s = None
-        sa = None
-        for res in socket.getaddrinfo(self.host_address, self.ppd_port,
-                                      socket.AF_UNSPEC, socket.SOCK_STREAM):
-
-            if self.verbose > 3:
-                log.debug("Socket address info: %r", res)
-            af, socktype, proto, canonname, sa = res
-
-            # Get the socket:
-            try:
-                signal.signal(signal.SIGALRM, connect_alarm_caller)
-                signal.alarm(self.timeout)
-                s = socket.socket(af, socktype, proto)
-            except socket.error as msg:
-                s = None
-                continue
-            finally:
-                signal.alarm(0)
-
-            if self.verbose > 3:
-                log.debug("Got a socket: %r.", s)
-
-            # Connect to the socket
-            try:
-                signal.signal(signal.SIGALRM, connect_alarm_caller)
-                signal.alarm(self.timeout)
-                s.connect(sa)
-            except socket.error as msg:
-                s.close()
-                s = None
-                continue
-            finally:
-                signal.alarm(0)
-            break
-
-        if s is None:
-            msg = "PPD seems not to listen on %r, port %d." % (self.host_address, self.ppd_port)
-            raise NoListeningError(msg)
-
-        if self.verbose > 3:
-            msg = ("Got a socket address of %s." % (str(sa)))
-            log.debug(msg)
-
-        # Fileno of client socket
-        s_fn = s.fileno()
-
-        if sys.version_info[0] > 2:
-            if isinstance(message, str):
-                message = message.encode('utf-8')
-        # Sending the message
-        s.send(message)
-
-        # Wait for an answer
-        begin = time.time()
-        data = ''
-        break_on_timeout = False
-        result_line = ''
-        chunk = ''
-
-        try:
-            while not self.should_shutdown:
-
-                cur_time = time.time()
-                secs = cur_time - begin
-                if self.verbose > 2:
-                    log.debug("Current seconds: %0.2f", secs)
-
-                if secs > self.timeout:
-                    break_on_timeout = True
-                    break
-
-                rlist, wlist, elist = select.select([s_fn], [], [], self.polling_interval)
-
-                if s_fn in rlist:
-                    data = s.recv(self.buffer_size)
-                    if sys.version_info[0] > 2:
-                        if isinstance(data, bytes):
-                            data = data.decode('utf-8')
-                    if data == '':
-                        if self.verbose > 3:
-                            log.debug("Socket closed from remote.")
-                        if chunk != '':
-                            break
-                    if self.verbose > 3:
-                        log.debug("Got data %r.", data)
-                    result_line += data
-                    chunk += data
-                else:
-                    if chunk != '':
-                        chunk = ''
-
-        except select.error as e:
-            if e[0] == 4:
-                pass
-            else:
-                log.error("Error in select(): " + str(e))
-
-        s.close()
-
-        if break_on_timeout:
-            secs = time.time() - begin
-            msg = 'Timeout after %0.2f seconds.' % (secs)
-            raise SocketTransportError(msg)
+        client = SocketClient(
+            self.host_address, self.ppd_port, timeout=self.timeout,
+            buffer_size=self.buffer_size, polling_interval=self.polling_interval,
+            name='PPD')
+        result_line = client.request(
+            message, is_complete=self.reply_complete,
+            should_stop=lambda: self.should_shutdown)
 
         if self.verbose > 3:
             log.debug("Got result line: %r", result_line)
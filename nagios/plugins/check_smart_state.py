@@ -9,10 +9,12 @@
 
 # Standard modules
 import os
+import json
 import logging
 import textwrap
 import re
 import stat
+import time
 
 from numbers import Number
 
@@ -23,18 +25,487 @@ from numbers import Number
 import nagios
 
 from nagios.common import pp
+from nagios.plugin.functions import max_state_alt, STATUS_TEXT
 from nagios.plugin.range import NagiosRange
+from nagios.plugin.threshold import NagiosThreshold
 from nagios.plugin.extended import ExtNagiosPluginError
 from nagios.plugin.extended import ExtNagiosPlugin
+from nagios.plugin.report import ReportParser, first_int
+from nagios.plugin.workers import run_concurrently, DEFAULT_MAX_WORKERS
+from nagios.plugin.workers import WorkerTimeoutError
+from nagios.plugin.fixtures import get_fixture_archive, MODE_REPLAY
+from nagios.plugin.statefile import NagiosStateFile, NagiosStateFileError
+
+from nagios.plugins.megaraid_collector import parse_pd_list
+from nagios.plugins.megaraid_collector import MegaRaidDeviceMap, DEFAULT_MAP_TTL
+from nagios.plugins.smart_history import SmartHistory, DEFAULT_RATE_WINDOW
+from nagios.plugins.nvme_health import NVME_CLASS_DIR, parse_health_log, read_health_log
+from nagios.plugins.nvme_health import critical_warnings
 
 # Some module variables
-__version__ = '0.3.1'
+__version__ = '0.10.2'
 
 log = logging.getLogger(__name__)
 
 DEFAULT_MEGARAID_PATH = '/opt/MegaRAID/MegaCli'
 DEFAULT_WARN_SECTORS = 4
 DEFAULT_CRIT_SECTORS = 10
+DEFAULT_PER_CONTROLLER = 2
+DEFAULT_WARN_WEAR = 10
+DEFAULT_CRIT_WEAR = 5
+
+# The first version of smartmontools supporting 'smartctl --json'
+SMARTCTL_JSON_MIN_VERSION = 7
+
+SYS_BLOCK_DIR = os.sep + os.path.join('sys', 'block')
+SCSI_HOST_DIR = os.sep + os.path.join('sys', 'class', 'scsi_host')
+MEGARAID_DRIVER = 'megaraid_sas'
+
+re_is_sas = re.compile(r'^\s*Transport\s+protocol\s*:\s*SAS.*$', (re.IGNORECASE | re.MULTILINE))
+re_is_nvme = re.compile(
+    r'^\s*SMART/Health\s+Information\s+\(NVMe\s+Log', (re.IGNORECASE | re.MULTILINE))
+
+no_smart_patterns = (
+    r'Device\s+does\s+not\s+support\s+SMART',
+    # SMART support is:     Unavailable - device lacks SMART capability.
+    r'SMART\s+support\s+is:\s+Unavailable\s+-\s+.*',
+)
+re_no_smart = re.compile(
+    r'(' + r'|'.join(no_smart_patterns) + r')', (re.IGNORECASE | re.MULTILINE))
+
+re_no_mega_sas = re.compile(r'failed:\s+SATA\s+device\s+detected,', re.IGNORECASE)
+re_scsi_host = re.compile(r'^host(\d+)$')
+re_nvme_controller = re.compile(r'^nvme\d+$')
+re_nvme_namespace = re.compile(r'^nvme\d+n\d+$')
+re_spun_down = re.compile(r'Spun\s+down', re.IGNORECASE)
+re_smartctl_version = re.compile(r'^smartctl\s+(\d+)\.(\d+)', (re.IGNORECASE | re.MULTILINE))
+
+re_first_number = re.compile(r'^\s*(\d+(?:\.\d*)?)')
+re_sas_temp = re.compile(r'^(\d+)(?:\s*([CF]))?', re.IGNORECASE)
+
+
+def sata_attr_raw(name, handler=None):
+    """
+    Gives back a handler for a row of the SMART attribute table of SATA disks,
+    which stores the leading integer of the raw value (8th column) or calls
+    the given handler with the raw value.
+    """
+
+    def attr_handler(record, columns):
+        if len(columns) < 8:
+            return
+        if handler:
+            handler(record, columns[7])
+            return
+        try:
+            record[name] = first_int(columns[7])
+        except ValueError:
+            pass
+
+    return attr_handler
+
+
+def remaining_lifetime(percentage_used):
+    """
+    Gives back the remaining lifetime of a SSD in percent from the used
+    percentage of its endurance, which may exceed 100.
+    """
+
+    return 100 - min(max(percentage_used, 0), 100)
+
+
+def add_wear_level(record, value):
+    """
+    Stores the remaining lifetime of a SSD in percent, if a SSD has more than
+    one wear attribute, the lowest one is taken.
+    """
+
+    value = min(int(value), 100)
+    if record.get('wear_level') is None or value < record['wear_level']:
+        record['wear_level'] = value
+
+
+def sata_wear_level(record, columns):
+    """
+    Handler for the wear attributes of SATA SSDs, which give the remaining
+    lifetime in percent as normalized value (4th column).
+    """
+
+    if len(columns) < 4:
+        return
+    try:
+        add_wear_level(record, columns[3])
+    except ValueError:
+        pass
+
+
+def sas_endurance(record, value):
+    """Handler for the used percentage of the endurance of SAS SSDs, e.g. '3%'."""
+
+    try:
+        record['wear_level'] = remaining_lifetime(first_int(value))
+    except ValueError:
+        pass
+
+
+def lifetime_days(wear_level, rate=None, hours_on=None):
+    """
+    Projects the remaining lifetime of a SSD in days, either by the change
+    rate of its wear level from the history or, if there is no falling
+    rate, by the average wear since power on.
+
+    @param wear_level: the remaining lifetime in percent
+    @type wear_level: int
+    @param rate: the change rate per day of the wear level (see wear_rate())
+    @type rate: float or None
+    @param hours_on: the power on hours of the SSD
+    @type hours_on: int or None
+
+    @return: the projected remaining days or None, if there is no wear yet
+    @rtype: float or None
+
+    """
+
+    if wear_level <= 0:
+        return 0.0
+    if rate is not None and rate < 0:
+        return wear_level / -rate
+
+    used = 100 - wear_level
+    if used > 0 and hours_on:
+        return wear_level * (hours_on / 24.0) / used
+    return None
+
+
+def sata_reported_uncorrect(record, columns):
+    """
+    Handler for the attribute Reported_Uncorrect, which is not counted as
+    grown defect, if it is a prefailure attribute.
+    """
+
+    sata_attr_raw('reported_uncorrect')(record, columns)
+    if 'reported_uncorrect' in record:
+        record['reported_uncorrect_prefail'] = columns[2].lower().startswith('p')
+
+
+def sas_temperature(record, value):
+    """Handler for the current drive temperature of SAS disks, e.g. '34 C'."""
+
+    match = re_sas_temp.search(value)
+    if not match:
+        return
+    temp = float(match.group(1))
+    if match.group(2) and match.group(2).upper() == 'F':
+        temp = ((temp - 32.0) * 5.0 / 9.0) + 0.5
+    record['temperature'] = int(temp)
+
+
+def hours_on(record, value):
+    """Handler for the power on hours, rounded to whole hours."""
+
+    match = re_first_number.search(value)
+    if match:
+        record['hours_on'] = int(float(match.group(1)) + 0.5)
+
+
+# The names of the wear attributes of SATA SSDs (Intel, Samsung, Micron,
+# SandForce), their IDs are used by other vendors for other attributes.
+sata_wear_attributes = (
+    'media_wearout_indicator',
+    'wear_leveling_count',
+    'percent_lifetime_remain',
+    'ssd_life_left',
+)
+
+# SMART overall-health self-assessment test result: PASSED
+# Device Model:     ST4000NM0033-9ZM170
+# Serial Number:    Z1Z0ABCD
+#   5 Reallocated_Sector_Ct   -O--CK   100   100   000    -    0
+# 187 Reported_Uncorrect      -O--CK   100   100   000    -    0
+# 197 Current_Pending_Sector  -O--CK   100   100   000    -    0
+# 198 Offline_Uncorrectable   -O--CK   100   100   000    -    0
+# 196 Reallocated_Event_Count -O--CK   100   100   000    -    0
+# 182 Erase_Fail_Count        -O--CK   100   100   000    -    0
+# 194 Temperature_Celsius     -O---K   100   100   000    -    25
+#   9 Power_On_Hours          -O--CK   100   100   000    -    2139
+# 233 Media_Wearout_Indicator -O--CK   098   098   000    -    0
+sata_parser = ReportParser(
+    {
+        'SMART overall-health self-assessment test result': 'health_state',
+        'Device Model': 'model',
+        'Serial Number': 'serial',
+        'reallocated_sector_ct': sata_attr_raw('realloc_sectors'),
+        'reported_uncorrect': sata_reported_uncorrect,
+        'current_pending_sector': sata_attr_raw('current_pending_sector'),
+        'offline_uncorrectable': sata_attr_raw('offline_uncorretable'),
+        'reallocated_event_count': sata_attr_raw('realloc_event_count'),
+        'erase_fail_count': sata_attr_raw('erase_fail_count'),
+        'temperature_celsius': sata_attr_raw('temperature'),
+        'power_on_hours': sata_attr_raw('hours_on', hours_on),
+        'media_wearout_indicator': sata_wear_level,
+        'wear_leveling_count': sata_wear_level,
+        'percent_lifetime_remain': sata_wear_level,
+        'ssd_life_left': sata_wear_level,
+    },
+    table_column=1,
+)
+
+# SMART Health Status: OK
+# Elements in grown defect list: 0
+# Current Drive Temperature:     34 C
+# number of hours powered up = 2139.45
+# Percentage used endurance indicator: 3%
+sas_parser = ReportParser(
+    {
+        'SMART Health Status': 'health_state',
+        'Elements in grown defect list': ('nr_grown_defects', first_int),
+        'Vendor': 'vendor',
+        'Product': 'product',
+        'Serial number': 'serial',
+        'Non-medium error count': ('non_medium_errors', first_int),
+        'Current Drive Temperature': sas_temperature,
+        'number of hours powered up': hours_on,
+        'Percentage used endurance indicator': sas_endurance,
+    },
+    separators=(':', '='),
+)
+
+
+def nvme_int(value):
+    """
+    Converter for the values of the NVMe health log of smartctl, which are
+    given with thousands separators (e.g. '1,234'), in percent or in hex.
+    """
+
+    value = value.strip()
+    if value.lower().startswith('0x'):
+        return int(value.split()[0], 16)
+    return first_int(value.replace(',', ''))
+
+
+# SMART overall-health self-assessment test result: PASSED
+# Model Number:                       SAMSUNG MZVLB512HAJQ-00000
+# Serial Number:                      S3W8NX0M123456
+# Critical Warning:                   0x00
+# Temperature:                        34 Celsius
+# Available Spare:                    100%
+# Available Spare Threshold:          10%
+# Percentage Used:                    3%
+# Power On Hours:                     1,234
+# Media and Data Integrity Errors:    0
+# Error Information Log Entries:      12
+nvme_parser = ReportParser(
+    {
+        'SMART overall-health self-assessment test result': 'health_state',
+        'Model Number': 'model',
+        'Serial Number': 'serial',
+        'Critical Warning': ('critical_warning', nvme_int),
+        'Temperature': ('temperature', nvme_int),
+        'Available Spare': ('available_spare', nvme_int),
+        'Available Spare Threshold': ('available_spare_threshold', nvme_int),
+        'Percentage Used': ('percentage_used', nvme_int),
+        'Power On Hours': ('power_on_hours', nvme_int),
+        'Media and Data Integrity Errors': ('media_errors', nvme_int),
+        'Error Information Log Entries': ('num_err_log_entries', nvme_int),
+    },
+)
+
+
+# Mapping of the IDs of SATA SMART attributes to the keys of the disk data,
+# the names of the attributes vary by vendor, their IDs don't.
+sata_attribute_ids = {
+    5: 'realloc_sectors',
+    9: 'hours_on',
+    182: 'erase_fail_count',
+    187: 'reported_uncorrect',
+    194: 'temperature',
+    196: 'realloc_event_count',
+    197: 'current_pending_sector',
+    198: 'offline_uncorretable',
+}
+
+
+def new_disk_data():
+    """Gives back the initial data of a disk to evaluate."""
+
+    return {
+        'model': None,
+        'serial': None,
+        'health_state': None,
+        'nr_grown_defects': 0,
+        'temperature': None,
+        'hours_on': None,
+    }
+
+
+def nvme_disk_data(health, disk_data=None):
+    """
+    Completes the disk data of a NVMe controller with the values of its
+    SMART / health information log. The media and data integrity errors
+    are counted as grown defects, the wear level is taken from the used
+    percentage of the endurance.
+
+    @param health: the values of the health log (see parse_health_log())
+    @type health: dict
+    @param disk_data: the disk data to complete, a new one, if None
+    @type disk_data: dict or None
+
+    @return: the disk data
+    @rtype: dict
+
+    """
+
+    if disk_data is None:
+        disk_data = new_disk_data()
+
+    for key in ('critical_warning', 'available_spare', 'available_spare_threshold',
+                'percentage_used', 'media_errors', 'num_err_log_entries'):
+        if health.get(key) is not None:
+            disk_data[key] = health[key]
+
+    disk_data['nr_grown_defects'] = health.get('media_errors') or 0
+    if health.get('percentage_used') is not None:
+        disk_data['wear_level'] = remaining_lifetime(health['percentage_used'])
+    if health.get('temperature') is not None:
+        disk_data['temperature'] = health['temperature']
+    if health.get('power_on_hours') is not None:
+        disk_data['hours_on'] = health['power_on_hours']
+
+    if disk_data['health_state'] is None and health.get('critical_warning') is not None:
+        if health['critical_warning']:
+            disk_data['health_state'] = 'FAILED'
+        else:
+            disk_data['health_state'] = 'PASSED'
+
+    return disk_data
+
+
+def sata_grown_defects(disk_data):
+    """
+    Sums up the number of grown defects of a SATA disk from its attributes.
+    Reported_Uncorrect is not counted, if it is a prefailure attribute.
+    """
+
+    use_uncorrect = not disk_data.pop('reported_uncorrect_prefail', False)
+
+    disk_data['nr_grown_defects'] = 0
+    if 'realloc_sectors' in disk_data:
+        disk_data['nr_grown_defects'] += disk_data['realloc_sectors']
+    if 'reported_uncorrect' in disk_data and use_uncorrect:
+        disk_data['nr_grown_defects'] += disk_data['reported_uncorrect']
+    if 'current_pending_sector' in disk_data:
+        disk_data['nr_grown_defects'] += disk_data['current_pending_sector']
+    if 'offline_uncorretable' in disk_data:
+        disk_data['nr_grown_defects'] += disk_data['offline_uncorretable']
+    if 'realloc_event_count' in disk_data:
+        disk_data['nr_grown_defects'] += disk_data['realloc_event_count']
+    if 'erase_fail_count' in disk_data:
+        disk_data['nr_grown_defects'] += disk_data['erase_fail_count']
+
+
+def parse_smartctl_json(output):
+    """
+    Parses the output of 'smartctl -x --json' (smartmontools 7 and newer).
+    The SATA attributes are mapped by their IDs (see sata_attribute_ids),
+    the wear attributes of SSDs by their names (see sata_wear_attributes).
+
+    @raise ValueError: if the output is not a valid JSON object
+
+    @param output: the output of smartctl
+    @type output: str
+
+    @return: a tuple of three values:
+             * the transport of the disk ('SATA', 'SAS' or 'NVMe')
+             * the reason, why there are no SMART data, or None
+             * the disk data (None, if there are no SMART data)
+    @rtype: tuple
+
+    """
+
+    data = json.loads(output)
+    if not isinstance(data, dict):
+        raise ValueError("The output is not a JSON object.")
+
+    device = data.get('device') or {}
+    protocol = (device.get('protocol') or '').upper()
+    transport = 'SATA'
+    if protocol == 'SCSI':
+        transport = 'SAS'
+    elif protocol == 'NVME':
+        transport = 'NVMe'
+    is_sas = transport == 'SAS'
+
+    support = data.get('smart_support') or {}
+    if not support.get('available', True):
+        return (transport, 'SMART support is: Unavailable - device lacks SMART capability.',
+                None)
+
+    if 'smart_status' not in data:
+        for msg in (data.get('smartctl') or {}).get('messages') or []:
+            if msg.get('severity') == 'error':
+                return (transport, ' '.join(msg.get('string', '').split()), None)
+
+    disk_data = new_disk_data()
+    disk_data['model'] = data.get('model_name')
+    disk_data['serial'] = data.get('serial_number')
+
+    status = data.get('smart_status') or {}
+    if 'passed' in status:
+        if not status['passed']:
+            disk_data['health_state'] = 'FAILED'
+        elif is_sas:
+            disk_data['health_state'] = 'OK'
+        else:
+            disk_data['health_state'] = 'PASSED'
+
+    temperature = (data.get('temperature') or {}).get('current')
+    if temperature is not None:
+        disk_data['temperature'] = int(temperature)
+
+    power_on = data.get('power_on_time') or {}
+    if 'hours' in power_on:
+        disk_data['hours_on'] = int(power_on['hours'] + power_on.get('minutes', 0) / 60.0 + 0.5)
+
+    if transport == 'NVMe':
+        health = data.get('nvme_smart_health_information_log') or {}
+        nvme_disk_data(health, disk_data)
+        return (transport, None, disk_data)
+
+    if is_sas:
+        if 'scsi_vendor' in data:
+            disk_data['vendor'] = data['scsi_vendor']
+        if 'scsi_product' in data:
+            disk_data['product'] = data['scsi_product']
+        if data.get('scsi_model_name'):
+            disk_data['model'] = data['scsi_model_name']
+        disk_data['nr_grown_defects'] = int(data.get('scsi_grown_defect_list', 0))
+        endurance = data.get('scsi_percentage_used_endurance_indicator')
+        if endurance is not None:
+            disk_data['wear_level'] = remaining_lifetime(int(endurance))
+        return (transport, None, disk_data)
+
+    for attr in (data.get('ata_smart_attributes') or {}).get('table') or []:
+        if str(attr.get('name', '')).lower() in sata_wear_attributes:
+            if attr.get('value') is not None:
+                add_wear_level(disk_data, attr['value'])
+            continue
+        name = sata_attribute_ids.get(attr.get('id'))
+        if not name:
+            continue
+        if name in ('temperature', 'hours_on') and disk_data[name] is not None:
+            continue
+        raw = attr.get('raw') or {}
+        try:
+            disk_data[name] = first_int(str(raw.get('string', raw.get('value'))))
+        except ValueError:
+            continue
+        if name == 'reported_uncorrect':
+            flags = attr.get('flags') or {}
+            disk_data['reported_uncorrect_prefail'] = bool(flags.get('prefailure'))
+
+    sata_grown_defects(disk_data)
+
+    return (transport, None, disk_data)
 
 
 class MegaCliExecTimeoutError(ExtNagiosPluginError, IOError):
@@ -83,13 +554,15 @@ class CheckSmartStatePlugin(ExtNagiosPlugin):
 
         usage = """\
         %(prog)s [-v] [-m] -c <critical grown sectors> -w <warn grown sectors> <HD device>
+        %(prog)s [-v] -c <critical grown sectors> -w <warn grown sectors> [--parallel <nr>]
+                    [--per-controller <nr>] [--ssd-only] --all | <HD device> <HD device> ...
         """
         usage = textwrap.dedent(usage).strip()
         usage += '\n       %(prog)s --usage'
         usage += '\n       %(prog)s --help'
 
         blurb = "Copyright (c) 2015 Frank Brehm, Berlin.\n\n"
-        blurb += "Checks the SMART state of a physical hard drive."
+        blurb += "Checks the SMART state of one or more physical hard drives."
 
         super(CheckSmartStatePlugin, self).__init__(
             usage=usage, blurb=blurb,
@@ -153,6 +626,102 @@ class CheckSmartStatePlugin(ExtNagiosPlugin):
         @type: str
         """
 
+        self._all_disks = False
+        """
+        @ivar: check all disks found in /sys/block and on the MegaRaid adapter
+        @type: bool
+        """
+
+        self._devices = []
+        """
+        @ivar: the devices to check in multi-disk mode
+        @type: list of str
+        """
+
+        self._parallel = DEFAULT_MAX_WORKERS
+        """
+        @ivar: the maximum number of concurrent smartctl calls
+        @type: int
+        """
+
+        self._per_controller = DEFAULT_PER_CONTROLLER
+        """
+        @ivar: the maximum number of concurrent smartctl calls per controller
+        @type: int
+        """
+
+        self._smartctl_version = None
+        """
+        @ivar: the version of smartctl as a tuple of major and minor number
+        @type: tuple of int or None
+        """
+
+        self._smartctl_json = False
+        """
+        @ivar: use the JSON output of smartctl
+        @type: bool
+        """
+
+        self._history = False
+        """
+        @ivar: keep a history of the SMART counters and evaluate their growth rates
+        @type: bool
+        """
+
+        self._state_dir = None
+        """
+        @ivar: the directory of the history files of the disks and the Device Id maps
+        @type: str or None
+        """
+
+        self._map_ttl = DEFAULT_MAP_TTL
+        """
+        @ivar: the maximum age of the cached Device Id map of the MegaRaid adapter in seconds
+        @type: int
+        """
+
+        self._device_id_cached = False
+        """
+        @ivar: the MegaRaid Device Id was taken from the cached Device Id map
+        @type: bool
+        """
+
+        self._rate_window = DEFAULT_RATE_WINDOW
+        """
+        @ivar: the window in seconds, over which the growth rates are evaluated
+        @type: int
+        """
+
+        self._rate_threshold = None
+        """
+        @ivar: the thresholds of the growth rate of grown defects per day
+        @type: NagiosThreshold or None
+        """
+
+        self._nvme_smartctl = False
+        """
+        @ivar: read the health log of NVMe controllers with smartctl instead of the ioctl
+        @type: bool
+        """
+
+        self._wear_threshold = None
+        """
+        @ivar: the thresholds of the remaining lifetime of SSDs in percent
+        @type: NagiosThreshold or None
+        """
+
+        self._days_threshold = None
+        """
+        @ivar: the thresholds of the projected remaining lifetime of SSDs in days
+        @type: NagiosThreshold or None
+        """
+
+        self._ssd_only = False
+        """
+        @ivar: check only SSDs and NVMe controllers in multi-disk mode
+        @type: bool
+        """
+
         self._init_megacli_cmd()
 
         self._add_args()
@@ -206,6 +775,86 @@ class CheckSmartStatePlugin(ExtNagiosPlugin):
         """The number of the MegaRaid adapter (e.g. 0)."""
         return self._adapter_nr
 
+    @property
+    def all_disks(self):
+        """Check all disks found in /sys/block and on the MegaRaid adapter."""
+        return self._all_disks
+
+    @property
+    def devices(self):
+        """The devices to check in multi-disk mode."""
+        return self._devices
+
+    @property
+    def multi_disk(self):
+        """Are multiple disks checked at once."""
+        return self.all_disks or len(self.devices) > 1
+
+    @property
+    def parallel(self):
+        """The maximum number of concurrent smartctl calls."""
+        return self._parallel
+
+    @property
+    def per_controller(self):
+        """The maximum number of concurrent smartctl calls per controller."""
+        return self._per_controller
+
+    @property
+    def smartctl_version(self):
+        """The version of smartctl as a tuple of major and minor number."""
+        return self._smartctl_version
+
+    @property
+    def smartctl_json(self):
+        """Use the JSON output of smartctl."""
+        return self._smartctl_json
+
+    @property
+    def history(self):
+        """Keep a history of the SMART counters and evaluate their growth rates."""
+        return self._history
+
+    @property
+    def state_dir(self):
+        """The directory of the history files of the disks and the Device Id maps."""
+        return self._state_dir
+
+    @property
+    def map_ttl(self):
+        """The maximum age of the cached Device Id map of the MegaRaid adapter in seconds."""
+        return self._map_ttl
+
+    @property
+    def rate_window(self):
+        """The window in seconds, over which the growth rates are evaluated."""
+        return self._rate_window
+
+    @property
+    def rate_threshold(self):
+        """The thresholds of the growth rate of grown defects per day."""
+        return self._rate_threshold
+
+    @property
+    def nvme_smartctl(self):
+        """Read the health log of NVMe controllers with smartctl instead of the ioctl."""
+        return self._nvme_smartctl
+
+    @property
+    def wear_threshold(self):
+        """The thresholds of the remaining lifetime of SSDs in percent."""
+        return self._wear_threshold
+
+    @property
+    def days_threshold(self):
+        """The thresholds of the projected remaining lifetime of SSDs in days."""
+        return self._days_threshold
+
+    @property
+    def ssd_only(self):
+        """Check only SSDs and NVMe controllers in multi-disk mode."""
+        return self._ssd_only
+
     def as_dict(self):
         """
         Typecasting into a dictionary.
@@ -226,6 +875,22 @@ class CheckSmartStatePlugin(ExtNagiosPlugin):
         d['device'] = self.device
         d['device_id'] = self.device_id
         d['megaraid_slot'] = self.megaraid_slot
+        d['all_disks'] = self.all_disks
+        d['devices'] = self.devices
+        d['multi_disk'] = self.multi_disk
+        d['parallel'] = self.parallel
+        d['per_controller'] = self.per_controller
+        d['smartctl_version'] = self.smartctl_version
+        d['smartctl_json'] = self.smartctl_json
+        d['history'] = self.history
+        d['state_dir'] = self.state_dir
+        d['map_ttl'] = self.map_ttl
+        d['rate_window'] = self.rate_window
+        d['rate_threshold'] = self.rate_threshold
+        d['nvme_smartctl'] = self.nvme_smartctl
+        d['wear_threshold'] = self.wear_threshold
+        d['days_threshold'] = self.days_threshold
+        d['ssd_only'] = self.ssd_only
 
         return d
 
@@ -309,11 +974,167 @@ class CheckSmartStatePlugin(ExtNagiosPlugin):
                   'pair of the MegaRaid adapter.'),
         )
 
+        self.add_arg(
+            '-a', '--adapter-nr',
+            metavar='NR',
+            dest='adapter_nr',
+            type=int,
+            default=0,
+            help="The number of the MegaRaid adapter (Default: %(default)d).",
+        )
+
+        self.add_arg(
+            '--all',
+            action='store_true',
+            dest='all_disks',
+            help=('Check all disks found in %s, all NVMe controllers and all physical '
+                  'drives of the MegaRaid adapter at once.' % (SYS_BLOCK_DIR)),
+        )
+
+        self.add_arg(
+            '--parallel',
+            metavar='NR',
+            dest='parallel',
+            type=int,
+            default=DEFAULT_MAX_WORKERS,
+            help=("The maximum number of concurrent smartctl calls on checking "
+                  "multiple disks (Default: %(default)d)."),
+        )
+
+        self.add_arg(
+            '--per-controller',
+            metavar='NR',
+            dest='per_controller',
+            type=int,
+            default=DEFAULT_PER_CONTROLLER,
+            help=("The maximum number of concurrent smartctl calls per controller "
+                  "on checking multiple disks (Default: %(default)d)."),
+        )
+
+        self.add_arg(
+            '--no-json',
+            action='store_true',
+            dest='no_json',
+            help=("Don't use the JSON output of smartctl, even if it is supported "
+                  "(smartmontools %d and newer)." % (SMARTCTL_JSON_MIN_VERSION)),
+        )
+
+        self.add_arg(
+            '--nvme-smartctl',
+            action='store_true',
+            dest='nvme_smartctl',
+            help=("Read the health log of NVMe controllers with smartctl instead of "
+                  "reading it directly from the controller."),
+        )
+
+        self.add_arg(
+            '--no-history',
+            action='store_true',
+            dest='no_history',
+            help=("Don't keep a history of the SMART counters of the disks to evaluate "
+                  "their growth rates per day."),
+        )
+
+        self.add_arg(
+            '--rate-window',
+            metavar='HOURS',
+            dest='rate_window',
+            type=int,
+            default=(DEFAULT_RATE_WINDOW // 3600),
+            help=("The window, over which the growth rates of the SMART counters "
+                  "are evaluated (Default: %(default)d)."),
+        )
+
+        self.add_arg(
+            '--rate-warning',
+            metavar='SECTORS',
+            dest='rate_warning',
+            type=float,
+            help="The number of grown defect sectors per day leading to a warning.",
+        )
+
+        self.add_arg(
+            '--rate-critical',
+            metavar='SECTORS',
+            dest='rate_critical',
+            type=float,
+            help="The number of grown defect sectors per day leading to a critical message.",
+        )
+
+        self.add_arg(
+            '--wear-warning',
+            metavar='PERCENT',
+            dest='wear_warning',
+            type=int,
+            default=DEFAULT_WARN_WEAR,
+            help=("The remaining lifetime of a SSD in percent, below which a warning "
+                  "is given (Default: %(default)d)."),
+        )
+
+        self.add_arg(
+            '--wear-critical',
+            metavar='PERCENT',
+            dest='wear_critical',
+            type=int,
+            default=DEFAULT_CRIT_WEAR,
+            help=("The remaining lifetime of a SSD in percent, below which a critical "
+                  "message is given (Default: %(default)d)."),
+        )
+
+        self.add_arg(
+            '--days-warning',
+            metavar='DAYS',
+            dest='days_warning',
+            type=int,
+            help=("The projected remaining lifetime of a SSD in days, below which "
+                  "a warning is given."),
+        )
+
+        self.add_arg(
+            '--days-critical',
+            metavar='DAYS',
+            dest='days_critical',
+            type=int,
+            help=("The projected remaining lifetime of a SSD in days, below which "
+                  "a critical message is given."),
+        )
+
+        self.add_arg(
+            '--ssd-only',
+            action='store_true',
+            dest='ssd_only',
+            help=("Check only SSDs and NVMe controllers on checking multiple disks, "
+                  "e.g. to check the wear level of all SSDs with --all."),
+        )
+
+        self.add_arg(
+            '--state-dir',
+            metavar='DIR',
+            dest='state_dir',
+            help=(
+                "The directory for the history files of the disks and the Device Id "
+                "maps of the MegaRaid adapters "
+                "(Default: $NAGIOS_STATE_DIR or '/var/cache/nagios')."),
+        )
+
+        self.add_arg(
+            '--map-ttl',
+            metavar='SECONDS',
+            dest='map_ttl',
+            type=int,
+            default=DEFAULT_MAP_TTL,
+            help=(
+                "The maximum age of the cached mapping of enclosure/slot pairs to the "
+                "Device Ids of the MegaRaid adapter, 0 queries always the adapter "
+                "(Default: %(default)d)."),
+        )
+
         self.add_arg(
             'device',
             dest='device',
-            nargs='?',
-            help="The device to check (given as 'sdX' or '/dev/sdX', must exists).",
+            nargs='*',
+            help=("The device(s) to check (given as 'sdX' or '/dev/sdX', must exists). "
+                  "If more than one device is given, all of them are checked at once."),
         )
 
     def parse_args(self, args=None):
@@ -335,37 +1156,186 @@ class CheckSmartStatePlugin(ExtNagiosPlugin):
 
         self.set_thresholds(warning=self.warn_sectors, critical=self.crit_sectors)
 
-        if not self.argparser.args.device:
+        self._adapter_nr = self.argparser.args.adapter_nr
+
+        if self.argparser.args.parallel < 1:
+            self.die("The number of concurrent smartctl calls must be at least 1.")
+        self._parallel = self.argparser.args.parallel
+        if self.argparser.args.per_controller < 1:
+            self.die("The number of concurrent smartctl calls per controller must be at least 1.")
+        self._per_controller = self.argparser.args.per_controller
+
+        devices = self.argparser.args.device
+        if self.argparser.args.all_disks:
+            if devices:
+                self.die("No devices may be given together with --all.")
+            self._all_disks = True
+        elif not devices:
             self.die("No device to check given.")
 
-        dev = os.path.basename(self.argparser.args.device)
-        dev_dev = os.sep + os.path.join('dev', dev)
-        sys_dev = os.sep + os.path.join('sys', 'block', dev)
+        self._devices = []
+        for dev in devices:
+            self._devices.append(self._check_block_device(dev))
 
-        if not os.path.isdir(sys_dev):
-            self.die("Device %r is not a block device." % (dev))
+        self._state_dir = self.argparser.args.state_dir
+        if self.argparser.args.map_ttl < 0:
+            self.die("The TTL of the Device Id map may not be negative.")
+        self._map_ttl = self.argparser.args.map_ttl
 
-        if not os.path.exists(dev_dev):
-            self.die("Device %r doesn't exists." % (dev_dev))
+        if not self.argparser.args.no_json:
+            self._init_smartctl_json()
 
-        dev_stat = os.stat(dev_dev)
-        dev_mode = dev_stat.st_mode
-        if not stat.S_ISBLK(dev_mode):
-            self.die("%r is not a block device." % (dev_dev))
+        self._nvme_smartctl = self.argparser.args.nvme_smartctl
+
+        self._init_history()
+        self._init_wear()
+
+        self._ssd_only = self.argparser.args.ssd_only
 
-        self._device = dev_dev
+        if self.multi_disk:
+            if self.argparser.args.megaraid:
+                self.die("A MegaRaid device may only be given on checking a single device.")
+            return
+
+        if self.ssd_only:
+            self.die("The option --ssd-only may only be given on checking multiple disks.")
+
+        self._device = self.devices[0]
 
         if self.argparser.args.megaraid:
             self._init_megacli_dev(self.argparser.args.megaraid)
 
-    def _init_megacli_dev(self, dev):
+    def _init_smartctl_json(self):
         """
-        Initializes self.device_id and self.megaraid_slot in case of checking
-        smartctl on a device on a MagaRaid adpter.
+        Detects the version of smartctl and initializes self.smartctl_json.
+        The version is cached in a state file until the smartctl executable
+        changes, so a check needs no additional call of smartctl.
         """
 
-        self._device_id = None
-        self._megaraid_slot = None
+        version_file = NagiosStateFile('smartctl-version.json', state_dir=self.state_dir)
+        try:
+            mtime = os.stat(self.smartctl_cmd).st_mtime
+        except OSError:
+            mtime = None
+
+        cached = version_file.load()
+        if (mtime is not None and isinstance(cached, dict) and
+                cached.get('path') == self.smartctl_cmd and cached.get('mtime') == mtime and
+                isinstance(cached.get('version'), list) and len(cached['version']) == 2):
+            self._smartctl_version = (cached['version'][0], cached['version'][1])
+        else:
+            (ret, stdoutdata, stderrdata) = self.exec_cmd([self.smartctl_cmd, '--version'])
+            match = re_smartctl_version.search(stdoutdata or '')
+            if not match:
+                log.debug("Could not detect the version of smartctl.")
+                return
+            self._smartctl_version = (int(match.group(1)), int(match.group(2)))
+            if mtime is not None:
+                try:
+                    version_file.save({
+                        'path': self.smartctl_cmd,
+                        'mtime': mtime,
+                        'version': list(self._smartctl_version),
+                    })
+                except NagiosStateFileError as e:
+                    log.debug(str(e))
+
+        self._smartctl_json = self._smartctl_version[0] >= SMARTCTL_JSON_MIN_VERSION
+        log.debug("Found smartctl version %d.%d, using JSON output: %r.",
+                  self._smartctl_version[0], self._smartctl_version[1], self._smartctl_json)
+
+    def _init_history(self):
+        """
+        Initializes the history of the SMART counters and the thresholds
+        of the growth rate of grown defects.
+        """
+
+        args = self.argparser.args
+
+        if args.rate_window < 1:
+            self.die("The window of the growth rates must be at least one hour.")
+
+        if args.no_history:
+            if args.rate_warning is not None or args.rate_critical is not None:
+                self.die("Thresholds of the growth rate may not be given together with "
+                         "--no-history.")
+            return
+
+        self._history = True
+        self._rate_window = args.rate_window * 3600
+
+        warning = None
+        critical = None
+        if args.rate_warning is not None:
+            warning = NagiosRange(start=0, end=args.rate_warning)
+        if args.rate_critical is not None:
+            critical = NagiosRange(start=0, end=args.rate_critical)
+        if warning or critical:
+            self._rate_threshold = NagiosThreshold(warning=warning, critical=critical)
+
+    def _init_wear(self):
+        """
+        Initializes the thresholds of the remaining lifetime of SSDs in percent
+        and of the projected remaining lifetime in days.
+        """
+
+        args = self.argparser.args
+
+        for value in (args.wear_warning, args.wear_critical):
+            if value < 0 or value > 100:
+                self.die("The thresholds of the remaining lifetime must be between 0 and 100.")
+
+        self._wear_threshold = NagiosThreshold(
+            warning=NagiosRange(start=args.wear_warning),
+            critical=NagiosRange(start=args.wear_critical))
+
+        warning = None
+        critical = None
+        if args.days_warning is not None:
+            warning = NagiosRange(start=args.days_warning)
+        if args.days_critical is not None:
+            critical = NagiosRange(start=args.days_critical)
+        if warning or critical:
+            self._days_threshold = NagiosThreshold(warning=warning, critical=critical)
+
+    def _check_block_device(self, dev):
+        """
+        Checks, whether the given device is an existing block device,
+        dies, if not.
+
+        @param dev: the device given as 'sdX' or '/dev/sdX'
+        @type dev: str
+
+        @return: the device as '/dev/sdX'
+        @rtype: str
+
+        """
+
+        dev = os.path.basename(dev)
+        dev_dev = os.sep + os.path.join('dev', dev)
+        sys_dev = os.path.join(SYS_BLOCK_DIR, dev)
+
+        if not os.path.isdir(sys_dev):
+            self.die("Device %r is not a block device." % (dev))
+
+        if not os.path.exists(dev_dev):
+            self.die("Device %r doesn't exists." % (dev_dev))
+
+        dev_stat = os.stat(dev_dev)
+        dev_mode = dev_stat.st_mode
+        if not stat.S_ISBLK(dev_mode):
+            self.die("%r is not a block device." % (dev_dev))
+
+        return dev_dev
+
+    def _init_megacli_dev(self, dev):
+        """
+        Initializes self.device_id and self.megaraid_slot in case of checking
+        smartctl on a device on a MagaRaid adpter.
+        """
+
+        self._device_id = None
+        self._megaraid_slot = None
 
         re_device_id = re.compile(r'^\s*(\d+)\s*$')
         re_slot = re.compile(r'^\s*(?:\[(\d+:\d+)\]|(\d+:\d+))\s*$')
@@ -396,23 +1366,28 @@ class CheckSmartStatePlugin(ExtNagiosPlugin):
 
         return self._init_megaraid_device_id()
 
-    def _init_megaraid_device_id(self):
+    def _init_megaraid_device_id(self, refresh=False):
         """
         Evaluates the Magaraid Device Id from the given Enclosure Id and
-        Slot Id.
-        """
+        Slot Id by the persisted Device Id map of the adapter, MegaCli is
+        only called, if the map is outdated or a refresh is forced.
 
-        stdoutdata = self.get_megaraid_pd_state()
+        @param refresh: don't use the cached Device Id map
+        @type refresh: bool
 
-        # Device Id: 38
-        re_dev_id = re.compile(r'^\s*Device\s+Id\s*:\s*(\d+)', re.IGNORECASE)
-        dev_id = None
+        """
 
-        for line in stdoutdata.splitlines():
-            match = re_dev_id.search(line)
-            if match:
-                dev_id = int(match.group(1))
-                break
+        if not self.megacli_cmd:
+            self.die("Didn't found to MegaCli command to retrieve the "
+                     "Device Id of the Magaraid Physical Device.")
+
+        device_map = MegaRaidDeviceMap(self, ttl=self.map_ttl, state_dir=self.state_dir)
+        try:
+            dev_id = device_map.device_id(
+                self._megaraid_slot[0], self._megaraid_slot[1], refresh=refresh)
+        except IOError as e:
+            self.die(str(e))
+        self._device_id_cached = device_map.cached
 
         if dev_id is None:
             self.die("No device Id found for PhysDrv [%d:%d] on the megaraid adapter." %
@@ -446,7 +1421,7 @@ class CheckSmartStatePlugin(ExtNagiosPlugin):
             self.megacli_cmd,
             '-pdInfo',
             ('-PhysDrv[%d:%d]' % self._megaraid_slot),
-            '-a', '0',
+            '-a', str(self.adapter_nr),
             '-NoLog',
         ]
 
@@ -474,9 +1449,9 @@ class CheckSmartStatePlugin(ExtNagiosPlugin):
                     exit_code = int(match.group(1), 16)
                     continue
 
-        log.debug("Exitcode of '%s -pdInfo -PhysDrv[%d:%d] -a 0': %d.",
+        log.debug("Exitcode of '%s -pdInfo -PhysDrv[%d:%d] -a %d': %d.",
                   self.megacli_cmd, self._megaraid_slot[0],
-                  self._megaraid_slot[1], exit_code)
+                  self._megaraid_slot[1], self.adapter_nr, exit_code)
 
         if not stdoutdata:
             cmd_str = cmd_list[0]
@@ -535,366 +1510,798 @@ class CheckSmartStatePlugin(ExtNagiosPlugin):
         if self.verbose > 2:
             log.debug("Current object:\n%s", pp(self.as_dict()))
 
-        state = nagios.state.ok
-        out = "All seems to be ok."
+        if self.multi_disk:
+            self.check_disks()
+            return
 
-        re_is_sas = re.compile(r'^\s*Transport\s+protocol\s*:\s*SAS.*$',
-                               (re.IGNORECASE | re.MULTILINE))
+        if not self.megaraid and re_nvme_namespace.search(os.path.basename(self.device)):
+            # the health log of the NVMe controller of the namespace
+            (state, out, disk_data) = self.check_disk(self.discover_disks()[0])
+        else:
+            smart_output = self._exec_smartctl()
 
-        no_smart_patterns = (
-            r'Device\s+does\s+not\s+support\s+SMART',
-            # SMART support is:     Unavailable - device lacks SMART capability.
-            r'SMART\s+support\s+is:\s+Unavailable\s+-\s+.*',
-        )
-        pattern = r'(' + r'|'.join(no_smart_patterns) + r')'
-        re_no_smart = re.compile(pattern, (re.IGNORECASE | re.MULTILINE))
-        if self.verbose > 2:
-            log.debug("No SMART pattern: %r", re_no_smart.pattern)
+            if self.megaraid and self.megaraid_slot:
+                dev = "[%d:%d]" % self.megaraid_slot
 
-        smart_output = self._exec_smartctl()
+                # Exit with OK, if the disk is spun down
+                def spun_down():
+                    return self.get_megaraid_pd_spin_state() == 'down'
+            else:
+                dev = self.device
+                spun_down = None
+
+            (state, out, disk_data) = self.evaluate_smart(smart_output, dev, spun_down)
+
+            if (disk_data is None and state == nagios.state.unknown and
+                    self._device_id_cached):
+                # The PD list could have been changed since caching the Device Id
+                old_device_id = self.device_id
+                self._init_megaraid_device_id(refresh=True)
+                if self.device_id != old_device_id:
+                    log.debug("Device Id of %s changed from %d to %d.",
+                              dev, old_device_id, self.device_id)
+                    smart_output = self._exec_smartctl()
+                    (state, out, disk_data) = self.evaluate_smart(smart_output, dev, spun_down)
+
+        if disk_data is None:
+            if state == nagios.state.unknown:
+                self.die(out)
+            self.exit(state, out)
+
+        self.disk_data = disk_data
+        log.debug("Evaluated disk data:\n%s", pp(self.disk_data))
 
-        is_sas = False
-        if re_is_sas.search(smart_output):
-            is_sas = True
+        self.add_disk_perfdata(disk_data)
 
-        match = re_no_smart.search(smart_output)
-        if match:
+        self.exit(state, out)
 
-            msg = ''
-            if is_sas:
-                msg = "SAS "
-            else:
-                msg = "SATA "
-            dev = self.device
-            if self.megaraid:
-                dev = "[%d:%d]" % self.megaraid_slot
+    def evaluate_smart(self, smart_output, dev, spun_down=None):
+        """
+        Evaluates the output of 'smartctl -x' of one disk.
 
-            reason = match.group(1).strip()
-            reason = re.sub(r'\s+', ' ', reason)
-            log.debug("No SMART of Drive %s: %s", dev, reason)
+        @param smart_output: the output of smartctl
+        @type smart_output: str
+        @param dev: the description of the disk used in the output message
+        @type dev: str
+        @param spun_down: a function giving back, whether the disk is spun
+                          down, it is called only, if there are no SMART
+                          data of the disk
+        @type spun_down: callable or None
 
-            if self.megaraid:
+        @return: a tuple of the state, the output message and the evaluated
+                 disk data (None, if the SMART data could not be evaluated)
+        @rtype: tuple
 
-                # Exit with OK, if the disk is spun down
-                spin_state = self.get_megaraid_pd_spin_state()
-                if spin_state and spin_state == 'down':
+        """
 
-                    msg += "Drive %s: Spun Down" % (dev)
-                    self.exit(nagios.state.ok, msg)
+        try:
+            (transport, reason, disk_data) = self.parse_smart_output(smart_output)
+        except ValueError as e:
+            msg = "Could not evaluate JSON output of smartctl for Drive %s: %s" % (dev, e)
+            return (nagios.state.unknown, msg, None)
 
-            msg += "Drive %s: %s" % (dev, reason)
-            self.die(msg)
+        return self.evaluate_disk_data(transport, reason, disk_data, dev, spun_down)
 
-        self.disk_data = {
-            'model': None,
-            'serial': None,
-            'health_state': None,
-            'nr_grown_defects': 0,
-            'temperature': None,
-            'hours_on': None,
-        }
+    def evaluate_disk_data(self, transport, reason, disk_data, dev, spun_down=None):
+        """
+        Evaluates the SMART data of one disk, independent of their source
+        (the text or JSON output of smartctl or the health log of a NVMe
+        controller).
+
+        @param transport: the transport of the disk ('SATA', 'SAS' or 'NVMe')
+        @type transport: str
+        @param reason: the reason, why there are no SMART data, or None
+        @type reason: str or None
+        @param disk_data: the parsed disk data, None, if there are no SMART data
+        @type disk_data: dict or None
+        @param dev: the description of the disk used in the output message
+        @type dev: str
+        @param spun_down: a function giving back, whether the disk is spun
+                          down, it is called only, if there are no SMART
+                          data of the disk
+        @type spun_down: callable or None
+
+        @return: a tuple of the state, the output message and the evaluated
+                 disk data (None, if the SMART data could not be evaluated)
+        @rtype: tuple
 
-        if is_sas:
-            log.debug("Disk is a SAS disk.")
-            self._eval_sas_disk(smart_output)
-        else:
-            log.debug("Disk is a SATA disk.")
-            self._eval_sata_disk(smart_output)
+        """
 
-        log.debug("Evaluated disk data:\n%s", pp(self.disk_data))
+        kind = transport + " "
 
-        err_msgs = []
+        if reason:
 
-        if self.disk_data['health_state'] is None:
-            msg = "Could not detect SMART Health Status of "
-            if is_sas:
-                msg += "SAS "
-            else:
-                msg += "SATA "
-            dev = self.device
-            if self.megaraid:
-                dev = "[%d:%d]" % self.megaraid_slot
-            msg += "Drive %s." % (dev)
-            self.die(msg)
+            log.debug("No SMART of Drive %s: %s", dev, reason)
+
+            if spun_down is not None and spun_down():
+                return (nagios.state.ok, kind + "Drive %s: Spun Down" % (dev), None)
+
+            return (nagios.state.unknown, kind + "Drive %s: %s" % (dev, reason), None)
+
+        if disk_data['health_state'] is None:
+            msg = "Could not detect SMART Health Status of %sDrive %s." % (kind, dev)
+            return (nagios.state.unknown, msg, None)
 
-        if is_sas:
-            if self.disk_data['health_state'].lower() != 'ok':
+        state = nagios.state.ok
+        err_msgs = []
+
+        if transport == 'SAS':
+            if disk_data['health_state'].lower() != 'ok':
                 state = self.max_state(state, nagios.state.critical)
-                err_msgs.append("SMART Health Status is %r." % (self.disk_data['health_state']))
+                err_msgs.append("SMART Health Status is %r." % (disk_data['health_state']))
+        elif disk_data.get('critical_warning'):
+            state = self.max_state(state, nagios.state.critical)
+            err_msgs.append("Critical warning: %s." % (
+                ', '.join(critical_warnings(disk_data['critical_warning']))))
         else:
-            if self.disk_data['health_state'].lower() != 'passed':
+            if disk_data['health_state'].lower() != 'passed':
                 state = self.max_state(state, nagios.state.critical)
                 err_msgs.append("SMART overall-health self-assessment test result is %r." %
-                                (self.disk_data['health_state']))
+                                (disk_data['health_state']))
 
-        gd_count = self.disk_data['nr_grown_defects']
+        gd_count = disk_data['nr_grown_defects']
         if self.threshold:
             gd_state = self.threshold.get_status(gd_count)
             if gd_state != nagios.state.ok:
                 state = self.max_state(state, gd_state)
-                err_msgs.append("%d elements in list of grown defects." % (gd_count))
-            self.add_perfdata(label='gd_list', value=gd_count, threshold=self.threshold)
-        else:
-            self.add_perfdata(label='gd_list', value=gd_count)
-
-        if self.disk_data['temperature'] is not None:
-            self.add_perfdata(
-                label='temperature',
-                value=self.disk_data['temperature'],
-                uom="C",
-            )
-
-        out = ""
-        if is_sas:
-            out = "SAS "
-        else:
-            out = "SATA "
-        dev = self.device
-        if self.megaraid:
-            dev = "[%d:%d]" % self.megaraid_slot
-        out += "Drive %s " % (dev)
+                if transport == 'NVMe':
+                    err_msgs.append("%d media and data integrity errors." % (gd_count))
+                else:
+                    err_msgs.append("%d elements in list of grown defects." % (gd_count))
+
+        if self.history:
+            rate_state = self.evaluate_history(disk_data, dev)
+            if rate_state != nagios.state.ok:
+                state = self.max_state(state, rate_state)
+                err_msgs.append("%0.1f grown defects per day." % (
+                    disk_data['rates']['nr_grown_defects']))
+
+        if disk_data.get('wear_level') is not None:
+            (wear_state, days_state) = self.evaluate_wear(disk_data)
+            if wear_state != nagios.state.ok:
+                state = self.max_state(state, wear_state)
+                err_msgs.append("Only %d%% of lifetime remaining." % (disk_data['wear_level']))
+            if days_state != nagios.state.ok:
+                state = self.max_state(state, days_state)
+                err_msgs.append("Lifetime ends in %d days." % (disk_data['lifetime_days']))
+
+        out = kind + "Drive %s " % (dev)
 
         if err_msgs:
             out += ", ".join(err_msgs)
         else:
             out += "SMART Health Status seems to be okay."
 
-        if (self.disk_data['hours_on'] is not None and
-                isinstance(self.disk_data['hours_on'], Number)):
-            days = self.disk_data['hours_on'] / 24
-            hours = self.disk_data['hours_on'] % 24
+        if (disk_data['hours_on'] is not None and
+                isinstance(disk_data['hours_on'], Number)):
+            days = disk_data['hours_on'] / 24
+            hours = disk_data['hours_on'] % 24
             out += " Power on: %d days, %d hours." % (days, hours)
 
-        self.exit(state, out)
+        if disk_data.get('wear_level') is not None:
+            out += " Remaining lifetime: %d%%" % (disk_data['wear_level'])
+            if disk_data['lifetime_days'] is not None:
+                out += " (~%d days)" % (disk_data['lifetime_days'])
+            out += "."
 
-    def _eval_sata_disk(self, smart_output):
-
-        re_health_state = re.compile(
-            r'^SMART\s+overall-health\s+self-assessment\s+test\s+result\s*:\s*(\S.*)',
-            re.IGNORECASE)
-        re_model = re.compile(r'^Device\s+Model\s*:\s*(\S.*)', re.IGNORECASE)
-        #   5 Reallocated_Sector_Ct   -O--CK   100   100   000    -    0
-        re_realloc = re.compile(
-            r'^\d+\s+Reallocated_Sector_Ct\s+\S+\s+\S+\s+\S+\s+\S+\s+\S+\s+(\d+)',
-            re.IGNORECASE)
-        # 187 Reported_Uncorrect      -O--CK   100   100   000    -    0
-        re_rep_uncorr = re.compile(
-            r'^\d+\s+Reported_Uncorrect\s+(\S+)\s+\S+\s+\S+\s+\S+\s+\S+\s+(\d+)',
-            re.IGNORECASE)
-        # 197 Current_Pending_Sector  -O--CK   100   100   000    -    0
-        re_cur_pend_sect = re.compile(
-            r'^\d+\s+Current_Pending_Sector\s+\S+\s+\S+\s+\S+\s+\S+\s+\S+\s+(\d+)',
-            re.IGNORECASE)
-        # yxz Offline_Uncorrectable   -O--CK   100   100   000    -    0
-        re_offl_uncor = re.compile(
-            r'^\d+\s+Offline_Uncorrectable\s+\S+\s+\S+\s+\S+\s+\S+\s+\S+\s+(\d+)',
-            re.IGNORECASE)
-        # xyz Reallocated_Event_Count -O--CK   100   100   000    -    0
-        re_realloc_evt = re.compile(
-            r'^\d+\s+Reallocated_Event_Count\s+\S+\s+\S+\s+\S+\s+\S+\s+\S+\s+(\d+)',
-            re.IGNORECASE)
-        # zyx Erase_Fail_Count        -O--CK   100   100   000    -    0
-        re_erase_fail_count = re.compile(
-            r'^\d+\s+Erase_Fail_Count\s+\S+\s+\S+\s+\S+\s+\S+\s+\S+\s+(\d+)',
-            re.IGNORECASE)
-        # 194 Temperature_Celsius     -O---K   100   100   000    -    25
-        re_temp = re.compile(r'^\d+\s+Temperature_Celsius\s+\S+\s+\S+\s+\S+\s+\S+\s+\S+\s+(\d+)',
-                             re.IGNORECASE)
-        #   9 Power_On_Hours          -O--CK   100   100   000    -    2139
-        re_hours = re.compile(
-            r'^\d+\s+Power_On_Hours\s+\S+\s+\S+\s+\S+\s+\S+\s+\S+\s+(\d+(?:\.\d*)?)',
-            re.IGNORECASE)
-
-        use_uncorrect = True
-
-        for line in smart_output.splitlines():
-            line = line.strip()
-            if line == '':
-                continue
+        return (state, out, disk_data)
 
-            match = re_health_state.search(line)
-            if match:
-                self.disk_data['health_state'] = match.group(1)
-                continue
+    def evaluate_wear(self, disk_data):
+        """
+        Evaluates the wear level of a SSD (the remaining lifetime in percent)
+        and projects its remaining lifetime in days, which is stored as
+        'lifetime_days' in the disk data. The projection needs the change
+        rate of the wear level from the history (see evaluate_history())
+        or the power on hours.
 
-            match = re_model.search(line)
-            if match:
-                self.disk_data['model'] = match.group(1)
-                continue
+        @param disk_data: the evaluated disk data with a wear level
+        @type disk_data: dict
 
-            match = re_realloc.search(line)
-            if match:
-                self.disk_data['realloc_sectors'] = int(match.group(1))
-                continue
+        @return: the states of the wear level and of the projected days
+        @rtype: tuple of int
 
-            match = re_rep_uncorr.search(line)
-            if match:
-                uncorrect_tags = match.group(1).lower()
-                if uncorrect_tags[0] == 'p':
-                    use_uncorrect = False
-                self.disk_data['reported_uncorrect'] = int(match.group(2))
-                continue
+        """
 
-            match = re_cur_pend_sect.search(line)
-            if match:
-                self.disk_data['current_pending_sector'] = int(match.group(1))
-                continue
+        rate = (disk_data.get('rates') or {}).get('wear_level')
+        hours = disk_data['hours_on']
+        if not isinstance(hours, Number):
+            hours = None
+        disk_data['lifetime_days'] = lifetime_days(disk_data['wear_level'], rate, hours)
 
-            match = re_offl_uncor.search(line)
-            if match:
-                self.disk_data['offline_uncorretable'] = int(match.group(1))
-                continue
+        wear_state = self.wear_threshold.get_status(disk_data['wear_level'])
+        days_state = nagios.state.ok
+        if self.days_threshold and disk_data['lifetime_days'] is not None:
+            days_state = self.days_threshold.get_status(disk_data['lifetime_days'])
 
-            match = re_realloc_evt.search(line)
-            if match:
-                self.disk_data['realloc_event_count'] = int(match.group(1))
-                continue
+        return (wear_state, days_state)
 
-            match = re_erase_fail_count.search(line)
-            if match:
-                self.disk_data['erase_fail_count'] = int(match.group(1))
-                continue
+    def evaluate_history(self, disk_data, dev):
+        """
+        Adds the SMART counters of the disk to its history and evaluates
+        their growth rates per day, which are stored as dict 'rates' in the
+        disk data. Disks without a serial number have no history.
 
-            match = re_temp.search(line)
-            if match:
-                self.disk_data['temperature'] = int(match.group(1))
-                continue
+        @param disk_data: the evaluated disk data
+        @type disk_data: dict
+        @param dev: the description of the disk used in log messages
+        @type dev: str
 
-            match = re_hours.search(line)
-            if match:
-                hours = int(float(match.group(1)) + 0.5)
-                self.disk_data['hours_on'] = hours
-
-        self.disk_data['nr_grown_defects'] = 0
-        if 'realloc_sectors' in self.disk_data:
-            self.disk_data['nr_grown_defects'] += self.disk_data['realloc_sectors']
-        if 'reported_uncorrect' in self.disk_data and use_uncorrect:
-            self.disk_data['nr_grown_defects'] += self.disk_data['reported_uncorrect']
-        if 'current_pending_sector' in self.disk_data:
-            self.disk_data['nr_grown_defects'] += self.disk_data['current_pending_sector']
-        if 'offline_uncorretable' in self.disk_data:
-            self.disk_data['nr_grown_defects'] += self.disk_data['offline_uncorretable']
-        if 'realloc_event_count' in self.disk_data:
-            self.disk_data['nr_grown_defects'] += self.disk_data['realloc_event_count']
-        if 'erase_fail_count' in self.disk_data:
-            self.disk_data['nr_grown_defects'] += self.disk_data['erase_fail_count']
-
-    def _eval_sas_disk(self, smart_output):
-
-        re_health_state = re.compile(r'^SMART\s+Health\s+Status\s*:\s*(\S.*)', re.IGNORECASE)
-        re_el_gd_list = re.compile(r'^Elements\s+in\s+grown\s+defect\s+list\s*:\s*(\d+)',
-                                   re.IGNORECASE)
-        re_vendor = re.compile(r'^Vendor\s*:\s*(\S.*)', re.IGNORECASE)
-        re_product = re.compile(r'^Product\s*:\s*(\S.*)', re.IGNORECASE)
-        re_serial = re.compile(r'^Serial\s+number\s*:\s*(\S.*)', re.IGNORECASE)
-        re_non_medium_errs = re.compile(r'^Non-medium\s+error\s+count\s*:\s*(\d+)',
-                                        re.IGNORECASE)
-        # Current Drive Temperature:     34 C
-        re_temp = re.compile(r'^Current\s+Drive\s+Temperature\s*:\s*(\d+)(?:\s*([CF]))?',
-                             re.IGNORECASE)
-        re_hours = re.compile(r'^number\s+of\s+hours\s+powered\s+up\s*=\s*(\d+(?:\.\d*)?)',
-                              re.IGNORECASE)
-
-        for line in smart_output.splitlines():
-            line = line.strip()
-            if line == '':
-                continue
+        @return: the state of the growth rate of grown defects
+        @rtype: int
 
-            match = re_health_state.search(line)
-            if match:
-                self.disk_data['health_state'] = match.group(1)
-                continue
+        """
 
-            match = re_el_gd_list.search(line)
-            if match:
-                self.disk_data['nr_grown_defects'] = int(match.group(1))
-                continue
+        if not disk_data.get('serial'):
+            log.debug("Drive %s has no serial number, no history is kept.", dev)
+            return nagios.state.ok
 
-            match = re_vendor.search(line)
-            if match:
-                self.disk_data['vendor'] = match.group(1)
-                continue
+        history = SmartHistory(
+            disk_data['serial'], state_dir=self.state_dir, window=self.rate_window)
+        disk_data['rates'] = history.update(disk_data)
+        log.debug("Growth rates per day of Drive %s: %r", dev, disk_data['rates'])
 
-            match = re_product.search(line)
-            if match:
-                self.disk_data['product'] = match.group(1)
-                continue
+        rate = disk_data['rates'].get('nr_grown_defects')
+        if rate is None or not self.rate_threshold:
+            return nagios.state.ok
+        return self.rate_threshold.get_status(rate)
 
-            match = re_serial.search(line)
-            if match:
-                self.disk_data['serial'] = match.group(1)
-                continue
+    def parse_smart_output(self, smart_output):
+        """
+        Parses the output of 'smartctl -x', either the JSON output or
+        the human readable output.
 
-            match = re_non_medium_errs.search(line)
-            if match:
-                self.disk_data['non_medium_errors'] = int(match.group(1))
-                continue
+        @raise ValueError: on an invalid JSON output
 
-            match = re_temp.search(line)
-            if match:
-                unit = 'C'
-                if match.group(2) and match.group(2).upper() == 'F':
-                    unit = 'F'
-                temp = float(match.group(1))
-                if unit == 'F':
-                    temp = ((temp - 32.0) * 5.0 / 9.0) + 0.5
-                self.disk_data['temperature'] = int(temp)
-
-            match = re_hours.search(line)
-            if match:
-                hours = int(float(match.group(1)) + 0.5)
-                self.disk_data['hours_on'] = hours
+        @param smart_output: the output of smartctl
+        @type smart_output: str
+
+        @return: a tuple of three values:
+                 * the transport of the disk ('SATA', 'SAS' or 'NVMe')
+                 * the reason, why there are no SMART data, or None
+                 * the disk data (None, if there are no SMART data)
+        @rtype: tuple
+
+        """
+
+        if smart_output.startswith('{'):
+            return parse_smartctl_json(smart_output)
+
+        transport = 'SATA'
+        if re_is_sas.search(smart_output):
+            transport = 'SAS'
+        elif re_is_nvme.search(smart_output):
+            transport = 'NVMe'
+
+        match = re_no_smart.search(smart_output)
+        if match:
+            reason = match.group(1).strip()
+            reason = re.sub(r'\s+', ' ', reason)
+            return (transport, reason, None)
+
+        disk_data = new_disk_data()
+        if transport == 'SAS':
+            self._eval_sas_disk(smart_output, disk_data)
+        elif transport == 'NVMe':
+            self._eval_nvme_disk(smart_output, disk_data)
+        else:
+            self._eval_sata_disk(smart_output, disk_data)
+
+        return (transport, None, disk_data)
+
+    def add_disk_perfdata(self, disk_data, disk_name=None):
+        """
+        Adds the performance data of the evaluated data of a disk.
+
+        @param disk_data: the evaluated disk data of evaluate_smart()
+        @type disk_data: dict
+        @param disk_name: the name of the disk appended to the labels
+                          of the performance data in multi-disk mode
+        @type disk_name: str or None
+
+        """
 
-        if 'vendor' in self.disk_data:
-            if 'product' in self.disk_data:
-                self.disk_data['model'] = (self.disk_data['vendor'] + ' ' +
-                                           self.disk_data['product'])
+        suffix = ''
+        if disk_name:
+            suffix = '_' + disk_name
+
+        gd_count = disk_data['nr_grown_defects']
+        if self.threshold:
+            self.add_perfdata(label='gd_list' + suffix, value=gd_count, threshold=self.threshold)
+        else:
+            self.add_perfdata(label='gd_list' + suffix, value=gd_count)
+
+        if disk_data['temperature'] is not None:
+            self.add_perfdata(
+                label='temperature' + suffix,
+                value=disk_data['temperature'],
+                uom="C",
+            )
+
+        if disk_data.get('percentage_used') is not None:
+            self.add_perfdata(
+                label='percentage_used' + suffix, value=disk_data['percentage_used'], uom='%')
+        if disk_data.get('available_spare') is not None:
+            self.add_perfdata(
+                label='available_spare' + suffix, value=disk_data['available_spare'], uom='%')
+
+        if disk_data.get('wear_level') is not None:
+            self.add_perfdata(
+                label='wear_level' + suffix, value=disk_data['wear_level'], uom='%',
+                threshold=self.wear_threshold, min_data=0, max_data=100)
+            if disk_data.get('lifetime_days') is not None:
+                self.add_perfdata(
+                    label='lifetime_days' + suffix, value=int(disk_data['lifetime_days']),
+                    threshold=self.days_threshold)
+
+        rates = disk_data.get('rates') or {}
+        if 'nr_grown_defects' in rates:
+            self.add_perfdata(
+                label='gd_rate' + suffix,
+                value=round(rates['nr_grown_defects'], 2),
+                threshold=self.rate_threshold,
+            )
+        if 'realloc_sectors' in rates:
+            self.add_perfdata(
+                label='realloc_rate' + suffix, value=round(rates['realloc_sectors'], 2))
+        if 'current_pending_sector' in rates:
+            self.add_perfdata(
+                label='pending_rate' + suffix, value=round(rates['current_pending_sector'], 2))
+
+    def _eval_sata_disk(self, smart_output, disk_data):
+
+        sata_parser.parse_record(smart_output, disk_data)
+        sata_grown_defects(disk_data)
+
+    def _eval_sas_disk(self, smart_output, disk_data):
+
+        sas_parser.parse_record(smart_output, disk_data)
+
+        if 'vendor' in disk_data:
+            if 'product' in disk_data:
+                disk_data['model'] = (disk_data['vendor'] + ' ' +
+                                      disk_data['product'])
             else:
-                self.disk_data['model'] = self.disk_data['vendor']
-        elif 'product' in self.disk_data:
-            self.disk_data['model'] = self.disk_data['product']
+                disk_data['model'] = disk_data['vendor']
+        elif 'product' in disk_data:
+            disk_data['model'] = disk_data['product']
 
-    def _exec_smartctl(self):
+    def _eval_nvme_disk(self, smart_output, disk_data):
+
+        health = nvme_parser.parse_record(smart_output, {})
+        for key in ('model', 'serial', 'health_state'):
+            if health.get(key):
+                disk_data[key] = health[key]
+        nvme_disk_data(health, disk_data)
+
+    def smartctl(self, device, device_id=None):
         """
-        Execute smartctl with all necessary parameters.
+        Executes 'smartctl -x' for the given device (with '--json', if
+        supported). It doesn't die on errors, so it can be called in
+        worker threads.
 
-        @return: the output on STDOUT
+        @param device: the device to check (e.g. '/dev/sda')
+        @type device: str
+        @param device_id: the MegaRaid Device Id, if the device is a
+                          PhysicalDrive on a MegaRaid adapter
+        @type device_id: int or None
+
+        @return: the stripped output on STDOUT, maybe empty
         @rtype: str
 
         """
 
-        re_no_mega_sas = re.compile(r'failed:\s+SATA\s+device\s+detected,', re.IGNORECASE)
-
         cmd_list = [self.smartctl_cmd, '-x']
-        dev_desc = self.device
-        if self.megaraid:
+        if self.smartctl_json:
+            cmd_list.append('--json')
+        dev_desc = device
+        if device_id is not None:
             cmd_list.append('-d')
-            cmd_list.append('megaraid,%d' % (self.device_id))
-            dev_desc = "%s => megaraid %d" % (self.device, self.device_id)
-        cmd_list.append(self.device)
+            cmd_list.append('megaraid,%d' % (device_id))
+            dev_desc = "%s => megaraid %d" % (device, device_id)
+        cmd_list.append(device)
 
         (ret, stdoutdata, stderrdata) = self.exec_cmd(cmd_list)
-
         if stdoutdata is None:
             stdoutdata = ''
         stdoutdata = stdoutdata.strip()
-        if not stdoutdata:
-            self.die("Got no output from smartctl %s." % (dev_desc))
 
-        if self.megaraid:
-            if re_no_mega_sas.search(stdoutdata):
-                cmd_list = [self.smartctl_cmd, '-x']
-                cmd_list.append('-d')
-                cmd_list.append('sat+megaraid,%d' % (self.device_id))
-                cmd_list.append(self.device)
-                (ret, stdoutdata, stderrdata) = self.exec_cmd(cmd_list)
-                if stdoutdata is None:
-                    stdoutdata = ''
-                stdoutdata = stdoutdata.strip()
-                if not stdoutdata:
-                    self.die("Got no output from smartctl %s is SATA attempt.")
+        if device_id is not None and re_no_mega_sas.search(stdoutdata):
+            cmd_list = [self.smartctl_cmd, '-x']
+            if self.smartctl_json:
+                cmd_list.append('--json')
+            cmd_list.append('-d')
+            cmd_list.append('sat+megaraid,%d' % (device_id))
+            cmd_list.append(device)
+            (ret, stdoutdata, stderrdata) = self.exec_cmd(cmd_list)
+            if stdoutdata is None:
+                stdoutdata = ''
+            stdoutdata = stdoutdata.strip()
 
         if self.verbose > 2:
             log.debug("Got output from smartctl %s:\n%s", dev_desc, stdoutdata)
 
         return stdoutdata
+
+    def _exec_smartctl(self):
+        """
+        Execute smartctl with all necessary parameters.
+
+        @return: the output on STDOUT
+        @rtype: str
+
+        """
+
+        device_id = None
+        dev_desc = self.device
+        if self.megaraid:
+            device_id = self.device_id
+            dev_desc = "%s => megaraid %d" % (self.device, self.device_id)
+
+        stdoutdata = self.smartctl(self.device, device_id)
+        if not stdoutdata:
+            self.die("Got no output from smartctl %s." % (dev_desc))
+
+        return stdoutdata
+
+    def _scsi_host(self, dev):
+        """
+        Gives back the SCSI host (e.g. 'host0') of the given block device
+        (e.g. 'sda') or None, if it isn't a SCSI device.
+        """
+
+        dev_dir = os.path.join(SYS_BLOCK_DIR, dev, 'device')
+        if not os.path.exists(dev_dir):
+            return None
+        for part in os.path.realpath(dev_dir).split(os.sep):
+            if re_scsi_host.search(part):
+                return part
+        return None
+
+    def _scsi_host_driver(self, host):
+        """Gives back the name of the driver of the given SCSI host."""
+
+        proc_name_file = os.path.join(SCSI_HOST_DIR, host, 'proc_name')
+        try:
+            return self.read_file(proc_name_file, quiet=True).strip()
+        except (IOError, OSError):
+            return None
+
+    def _megaraid_hosts(self):
+        """Gives back all SCSI hosts driven by the MegaRaid driver."""
+
+        hosts = []
+        if not os.path.isdir(SCSI_HOST_DIR):
+            return hosts
+        for host in sorted(os.listdir(SCSI_HOST_DIR)):
+            if self._scsi_host_driver(host) == MEGARAID_DRIVER:
+                hosts.append(host)
+        return hosts
+
+    def _nvme_controller(self, dev):
+        """
+        Gives back the NVMe controller (e.g. 'nvme0') of the given namespace
+        block device (e.g. 'nvme0n1') or None.
+        """
+
+        dev_dir = os.path.join(SYS_BLOCK_DIR, dev, 'device')
+        if not os.path.exists(dev_dir):
+            return None
+        ctrl = os.path.basename(os.path.realpath(dev_dir))
+        if re_nvme_controller.search(ctrl):
+            return ctrl
+        return None
+
+    def _nvme_controllers(self):
+        """Gives back all NVMe controllers found in NVME_CLASS_DIR."""
+
+        if not os.path.isdir(NVME_CLASS_DIR):
+            return []
+        ctrls = []
+        for ctrl in sorted(os.listdir(NVME_CLASS_DIR)):
+            if re_nvme_controller.search(ctrl):
+                ctrls.append(ctrl)
+        return ctrls
+
+    def _nvme_namespaces(self, ctrl):
+        """Gives back the namespace block devices of the given NVMe controller."""
+
+        namespaces = []
+        for entry in sorted(os.listdir(os.path.join(NVME_CLASS_DIR, ctrl))):
+            if re_nvme_namespace.search(entry):
+                namespaces.append(entry)
+        return namespaces
+
+    def _new_disk(
+            self, name, desc, device, group, device_id=None, fw_state=None, nvme=None,
+            media_type=None):
+
+        return {
+            'name': name,
+            'desc': desc,
+            'device': device,
+            'group': group,
+            'device_id': device_id,
+            'fw_state': fw_state,
+            'nvme': nvme,
+            'namespaces': [],
+            'media_type': media_type,
+        }
+
+    def _new_nvme_disk(self, ctrl, namespaces):
+
+        disk = self._new_disk(
+            ctrl, None, os.sep + os.path.join('dev', ctrl), ctrl, nvme=ctrl)
+        disk['namespaces'] = namespaces
+        return disk
+
+    def discover_disks(self):
+        """
+        Discovers the disks to check, either the given devices or all disks
+        of /sys/block (without removable devices and virtual drives of a
+        MegaRaid adapter) and all physical drives of the MegaRaid adapter.
+
+        NVMe namespaces are checked once per controller by the health log
+        of the controller, with --all all NVMe controllers are checked.
+
+        With --ssd-only rotational disks are left out.
+
+        @return: the disks to check as dicts with the keys 'name', 'desc',
+                 'device', 'group' (the controller), 'device_id' (MegaRaid
+                 Device Id), 'fw_state' (MegaRaid firmware state), 'nvme'
+                 (the NVMe controller), 'namespaces' (of the NVMe controller) and
+                 'media_type' (MegaRaid media type, 'HDD' or 'SSD')
+        @rtype: list of dict
+
+        """
+
+        disks = []
+        megaraid_devs = []
+        nvme_disks = {}
+
+        if self.all_disks:
+            devices = []
+            for dev in sorted(os.listdir(SYS_BLOCK_DIR)):
+                if not dev.startswith('sd'):
+                    continue
+                try:
+                    removable = self.read_file(
+                        os.path.join(SYS_BLOCK_DIR, dev, 'removable'), quiet=True)
+                    if removable.strip() == '1':
+                        log.debug("Ignoring removable device %r.", dev)
+                        continue
+                except (IOError, OSError):
+                    pass
+                devices.append(os.sep + os.path.join('dev', dev))
+        else:
+            devices = self.devices
+
+        for device in devices:
+            dev = os.path.basename(device)
+            if re_nvme_namespace.search(dev):
+                ctrl = self._nvme_controller(dev)
+                if ctrl:
+                    if ctrl not in nvme_disks:
+                        nvme_disks[ctrl] = self._new_nvme_disk(ctrl, [])
+                        disks.append(nvme_disks[ctrl])
+                    nvme_disks[ctrl]['namespaces'].append(dev)
+                    continue
+            host = self._scsi_host(dev)
+            if host and self._scsi_host_driver(host) == MEGARAID_DRIVER:
+                log.debug("Device %r is a virtual drive of a MegaRaid adapter.", device)
+                megaraid_devs.append(device)
+                if self.all_disks:
+                    continue
+            group = host
+            if not group:
+                group = dev
+            disks.append(self._new_disk(dev, device, device, group))
+
+        if self.all_disks:
+            for ctrl in self._nvme_controllers():
+                nvme_disks[ctrl] = self._new_nvme_disk(ctrl, self._nvme_namespaces(ctrl))
+                disks.append(nvme_disks[ctrl])
+
+        for disk in nvme_disks.values():
+            disk['desc'] = disk['device']
+            if disk['namespaces']:
+                disk['desc'] += " (%s)" % (', '.join(disk['namespaces']))
+
+        if self.all_disks and self._megaraid_hosts():
+            disks += self.discover_megaraid_disks(megaraid_devs)
+
+        if self.ssd_only:
+            ssds = []
+            for disk in disks:
+                if self._is_ssd(disk):
+                    ssds.append(disk)
+                else:
+                    log.debug("Ignoring rotational Drive %s.", disk['desc'])
+            disks = ssds
+
+        return disks
+
+    def _is_ssd(self, disk):
+        """
+        Detects, whether the given disk of discover_disks() is a SSD, either by
+        the media type of the MegaRaid adapter or by the rotational flag of
+        the block device. Disks of an unknown type are treated as SSD.
+        """
+
+        if disk['nvme']:
+            return True
+        if disk['device_id'] is not None:
+            return disk['media_type'] != 'HDD'
+
+        rotational_file = os.path.join(SYS_BLOCK_DIR, disk['name'], 'queue', 'rotational')
+        try:
+            return self.read_file(rotational_file, quiet=True).strip() != '1'
+        except (IOError, OSError):
+            return True
+
+    def discover_megaraid_disks(self, megaraid_devs=None):
+        """
+        Discovers all physical drives of the MegaRaid adapter with one call
+        of 'MegaCli -PdList', the Device Ids and firmware states are taken
+        from this list.
+
+        @param megaraid_devs: the block devices of the virtual drives of the
+                              MegaRaid adapter, the first one is used for
+                              the passthrough of smartctl, if none is given,
+                              '/dev/bus/<adapter_nr>' is used
+        @type megaraid_devs: list of str or None
+
+        @return: the disks to check (see discover_disks())
+        @rtype: list of dict
+
+        """
+
+        if not self.megacli_cmd:
+            self.die("Didn't found the MegaCli command to retrieve the "
+                     "physical drives of the MegaRaid adapter.")
+
+        if megaraid_devs:
+            device = megaraid_devs[0]
+        else:
+            device = os.sep + os.path.join('dev', 'bus', str(self.adapter_nr))
+
+        cmd_list = [self.megacli_cmd, '-PdList', '-a', str(self.adapter_nr), '-NoLog']
+        (ret, stdoutdata, stderrdata) = self.exec_cmd(cmd_list)
+        if not stdoutdata:
+            self.die("Got no output from '%s -PdList -a %d'." % (
+                self.megacli_cmd, self.adapter_nr))
+
+        drives = parse_pd_list(stdoutdata)
+        MegaRaidDeviceMap(self, ttl=self.map_ttl, state_dir=self.state_dir).save(drives)
+
+        group = 'megaraid%d' % (self.adapter_nr)
+        disks = []
+        for pd in drives:
+            if 'dev_id' not in pd:
+                continue
+            disks.append(self._new_disk(
+                'e%ds%d' % (pd['enclosure'], pd['slot']),
+                '[%d:%d]' % (pd['enclosure'], pd['slot']),
+                device, group, device_id=pd['dev_id'], fw_state=pd['fw_state'],
+                media_type=pd.get('media_type')))
+
+        log.debug("Found %d physical drives on MegaRaid adapter %d.", len(disks), self.adapter_nr)
+        return disks
+
+    def check_disk(self, disk):
+        """
+        Checks the SMART state of one disk of discover_disks(). It doesn't die
+        on errors, so it can be called in worker threads.
+
+        @param disk: the disk to check
+        @type disk: dict
+
+        @return: a tuple of the state, the output message and the evaluated
+                 disk data (see evaluate_smart())
+        @rtype: tuple
+
+        """
+
+        if disk['nvme'] and not self.nvme_smartctl:
+            result = self.check_nvme_health(disk)
+            if result is not None:
+                return result
+
+        smart_output = self.smartctl(disk['device'], disk['device_id'])
+        if not smart_output:
+            return (nagios.state.unknown, "Got no output from smartctl for Drive %s." % (
+                disk['desc']), None)
+
+        def spun_down():
+            if not disk['fw_state']:
+                return False
+            return bool(re_spun_down.search(disk['fw_state']))
+
+        return self.evaluate_smart(smart_output, disk['desc'], spun_down)
+
+    def check_nvme_health(self, disk):
+        """
+        Checks a NVMe controller of discover_disks() by reading its health
+        log directly from the controller, model and serial number are taken
+        from sysfs. It doesn't die on errors, so it can be called in worker
+        threads.
+
+        @param disk: the NVMe controller to check
+        @type disk: dict
+
+        @return: a tuple of the state, the output message and the evaluated
+                 disk data (see evaluate_smart()) or None, if the health log
+                 could not be read (e.g. because of missing privileges)
+        @rtype: tuple or None
+
+        """
+
+        archive = get_fixture_archive()
+        if archive and archive.mode == MODE_REPLAY:
+            return None
+
+        try:
+            health = parse_health_log(read_health_log(disk['device']))
+        except (IOError, OSError, ValueError) as e:
+            log.debug("Could not read the health log of %s, using smartctl: %s",
+                      disk['device'], e)
+            return None
+
+        disk_data = new_disk_data()
+        ctrl_dir = os.path.join(NVME_CLASS_DIR, disk['nvme'])
+        for key in ('model', 'serial'):
+            try:
+                disk_data[key] = self.read_file(os.path.join(ctrl_dir, key), quiet=True).strip()
+            except (IOError, OSError):
+                pass
+        nvme_disk_data(health, disk_data)
+
+        return self.evaluate_disk_data('NVMe', None, disk_data, disk['desc'])
+
+    def check_disks(self):
+        """
+        Checks all disks of discover_disks() concurrently and exits with
+        the aggregated state. Not more than self.per_controller disks on the
+        same controller are checked at the same time, the timeout of the
+        plugin is the deadline for all of them. Disks, which couldn't be
+        checked before the deadline, are reported as UNKNOWN.
+        """
+
+        disks = self.discover_disks()
+        if not disks:
+            self.die("No disks found to check.")
+
+        log.debug("Checking %d disks with max. %d concurrent calls (%d per controller) ...",
+                  len(disks), self.parallel, self.per_controller)
+
+        deadline = time.time() + self.timeout
+        results = run_concurrently(
+            self.check_disk, disks, max_workers=self.parallel,
+            group=lambda disk: disk['group'], max_per_group=self.per_controller,
+            deadline=deadline)
+
+        state = nagios.state.ok
+        counts = {}
+        lines = []
+        for i in range(len(disks)):
+            disk = disks[i]
+            (result, exc_info) = results[i]
+            if exc_info:
+                msg = str(exc_info[1])
+                if isinstance(exc_info[1], WorkerTimeoutError):
+                    msg = "Timeout after %d seconds on checking." % (self.timeout)
+                result = (nagios.state.unknown, "Drive %s: %s" % (disk['desc'], msg), None)
+            (disk_state, out, disk_data) = result
+
+            state = max_state_alt(state, disk_state)
+            counts[disk_state] = counts.get(disk_state, 0) + 1
+            lines.append(out)
+            if disk_data is not None:
+                self.add_disk_perfdata(disk_data, disk['name'])
+
+        summary = []
+        for disk_state in sorted(counts.keys(), reverse=True):
+            summary.append("%d %s" % (counts[disk_state], STATUS_TEXT[disk_state]))
+        out = "SMART state of %d drives checked: %s." % (len(disks), ', '.join(summary))
+        out += "\n" + "\n".join(lines)
+
+        self.exit(state, out)
@@ -8,13 +8,9 @@
 """
 
 # Standard modules
-import sys
 import re
 import logging
-import socket
 import textwrap
-import time
-import select
 import signal
 
 # Third party modules
@@ -30,9 +26,12 @@ from nagios.plugin import NagiosPluginError
 
 from nagios.plugin.extended import ExtNagiosPlugin
 
+from nagios.plugins.socket_client import SocketClient
+from nagios.plugins.socket_client import SocketTransportError, NoListeningError
+
 # Some module variables
 
-__version__ = '0.2.0'
+__version__ = '0.3.1'
 
 log = logging.getLogger(__name__)
 
@@ -78,18 +77,6 @@ re_end_of_data = re.compile(r'^\s*end_of_data\s*=\s*(\S+)', re.IGNORECASE | re.M
 re_true = re.compile(r'^(?:true|yes|[1-9])', re.IGNORECASE)
 
 
-class SocketTransportError(NagiosPluginError):
-    pass
-
-
-class SocketConnectTimeoutError(SocketTransportError):
-    pass
-
-
-class NoListeningError(SocketTransportError):
-    pass
-
-
 class RequestStatusError(NagiosPluginError):
     pass
 
@@ -557,10 +544,29 @@ class CheckVcbInstancePlugin(ExtNagiosPlugin):
 
         self.should_shutdown = True
 
+    def reply_complete(self, data):
+        """
+        Checks, whether the given received line is the true end_of_data
+        line terminating a complete reply.
+
+        @param data: a line received without its newline
+        @type data: str
+
+        @return: the reply is complete
+        @rtype: bool
+
+        """
+
+        match = re_end_of_data.search(data)
+        if match and re_true.search(match.group(1)):
+            return True
+        return False
+
     def send(self, message):
         """
         Sends the message over network socket to the recipient.
-        It waits for all replies and gives them back all.
+        It waits for the reply, until it is complete or the VCB closes
+        the connection.
 
         @raise NoListeningError: if VCB isn't listening on the given port
         @raise SocketTransportError: on some communication errors or timeouts
@@ -568,7 +574,7 @@ class CheckVcbInstancePlugin(ExtNagiosPlugin):
         @param message: the message to send over the network
         @type message: str
 
-        @return: response from server, or None
+        @return: response from server
         @rtype: str
 
         """
@@ -577,131 +583,18 @@ class CheckVcbInstancePlugin(ExtNagiosPlugin):
             msg = "Sending message to %r, port %d with a timeout of %d seconds."
             log.debug(msg, self.host_address, self.vcb_port, self.timeout)
 
-        def connect_alarm_caller(signum, sigframe):
-            '''
-            This nested function will be called in event of a timeout
-
-            @param signum:   the signal number (POSIX) which happend
-            @type signum:    int
-            @param sigframe: the frame of the signal
-            @type sigframe:  object
-            '''
-
-            raise SocketConnectTimeoutError("Timeout connecting to %r port %d." % (
-                self.host_address, self.vcb_port))
-
-        s = None
-        sa = None
-        for res in socket.getaddrinfo(self.host_address, self.vcb_port,
-                                      socket.AF_UNSPEC, socket.SOCK_STREAM):
-
-            if self.verbose > 3:
-                log.debug("Socket address info: %r", res)
-            af, socktype, proto, canonname, sa = res
-
-            # Get the socket:
-            try:
-                signal.signal(signal.SIGALRM, connect_alarm_caller)
-                signal.alarm(self.timeout)
-                s = socket.socket(af, socktype, proto)
-            except socket.error as msg:
-                s = None
-                continue
-            finally:
-                signal.alarm(0)
-
-            if self.verbose > 3:
-                log.debug("Got a socket: %r.", s)
-
-            # Connect to the socket
-            try:
-                signal.signal(signal.SIGALRM, connect_alarm_caller)
-                signal.alarm(self.timeout)
-                s.connect(sa)
-            except socket.error as msg:
-                s.close()
-                s = None
-                continue
-            finally:
-                signal.alarm(0)
-            break
-
-        if s is None:
-            msg = "VCB seems not to listen on %r, port %d." % (self.host_address, self.vcb_port)
-            raise NoListeningError(msg)
-
-        if self.verbose > 3:
-            msg = ("Got a socket address of %s." % (str(sa)))
-            log.debug(msg)
-
-        # Fileno of client socket
-        s_fn = s.fileno()
-
-        if sys.version_info[0] > 2:
-            if isinstance(message, str):
-                message = message.encode('utf-8')
-        # Sending the message
-        s.send(message)
-
-        # Wait for an answer
-        begin = time.time()
-        data = ''
-        break_on_timeout = False
-        result_line = ''
-        chunk = ''
-
-        try:
-            while not self.should_shutdown:
-
-                cur_time = time.time()
-                secs = cur_time - begin
-                if self.verbose > 2:
-                    log.debug("Current seconds: %0.2f", secs)
-
-                if secs > self.timeout:
-                    break_on_timeout = True
-                    break
-
-                rlist, _, _ = select.select([s_fn], [], [], self.polling_interval)
-
-                if s_fn in rlist:
-                    data = s.recv(self.buffer_size)
-                    if sys.version_info[0] > 2:
-                        if isinstance(data, bytes):
-                            data = data.decode('utf-8')
-                    if data == '':
-                        if self.verbose > 3:
-                            log.debug("Socket closed from remote.")
-                        if chunk != '':
-                            break
-                    if self.verbose > 3:
-                        log.debug("Got data %r.", data)
-                    result_line += data
-                    chunk += data
-                    match = re_end_of_data.search(result_line)
-                    if match:
-                        eod = match.group(1)
-                        if re_true.search(eod):
-                            log.debug("End of data reached.")
-                            result_line = re_end_of_data.sub('', result_line)
-                            break
-
-                else:
-                    if chunk != '':
-                        chunk = ''
-
-        except select.error as e:
-            if e[0] == 4:
-                pass
-            else:
-                log.error("Error in select(): " + str(e))
-
-        s.close()
-
-        if break_on_timeout:
-            secs = time.time() - begin
-            msg = 'Timeout after %0.2f seconds.' % (secs)
-            raise SocketTransportError(msg)
+        client = SocketClient(
+            self.host_address, self.vcb_port, timeout=self.timeout,
+            buffer_size=self.buffer_size, polling_interval=self.polling_interval,
+            name='VCB')
+        result_line = client.request(
+            message, is_complete=self.reply_complete,
+            should_stop=lambda: self.should_shutdown)
+
+        match = re_end_of_data.search(result_line)
+        if match and re_true.search(match.group(1)):
+            log.debug("End of data reached.")
+            result_line = re_end_of_data.sub('', result_line)
 
         if self.verbose > 3:
             log.debug("Got result line: %r", result_line)
@@ -0,0 +1,262 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@copyright: © 2010 - 2016 by Frank Brehm, Berlin
+@summary: Module for a persistent snapshot of the last reconciled state of
+          the storage volumes from API and the logical volumes from LVM,
+          so only changed volumes are compared again
+"""
+
+# Standard modules
+import time
+import logging
+
+# Third party modules
+
+# Own modules
+
+from nagios.plugin.statefile import NagiosStateFile, NagiosStateFileError
+
+# --------------------------------------------
+# Some module variables
+
+__version__ = '0.2.0'
+
+SNAPSHOT_VERSION = 2
+SNAPSHOT_FILENAME = 'pb-consistence-storage.json'
+
+# The interval in seconds of complete comparisions of all volumes,
+# regardless of the snapshot
+DEFAULT_FULL_SWEEP_INTERVAL = 3600
+
+log = logging.getLogger(__name__)
+
+
+# =============================================================================
+class ConsistenceSnapshot(object):
+    """
+    Keeps the results of the comparision of every logical volume together
+    with the data of the logical volume and of its volume from API, which
+    led to it. A result is reused, as long as both of them are unchanged.
+
+    Because the REST API gives no information about changes since a given
+    time, the complete data is fetched on every run, only the comparision
+    is incremental. All results are evaluated again after the full sweep
+    interval to guard against a drift.
+
+    The snapshot has the format::
+
+        {
+            'version': SNAPSHOT_VERSION,
+            'hostname': '<storage server>',
+            'vg': '<volume group>',
+            'full_sweep': <timestamp of the last complete comparision>,
+            'api': {
+                '<GUID as integer>': [<size>, <type>, <state>],
+            },
+            'lvs': {
+                '<VG>/<LV>': [<LV data>, <category>, <consumed>],
+            },
+        }
+
+    where the GUIDs are given as the decimal strings of their integer
+    values (JSON allows only strings as keys), <category> is the counted
+    result and <consumed> is a flag, whether the volume from API was
+    checked by this logical volume.
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(
+            self, hostname, vg, state_dir=None,
+            full_sweep_interval=DEFAULT_FULL_SWEEP_INTERVAL):
+        """
+        Constructor.
+
+        @param hostname: the hostname of the storage server
+        @type hostname: str
+        @param vg: the name of the ProfitBricks storage volume group
+        @type vg: str
+        @param state_dir: the directory of the snapshot file
+        @type state_dir: str or None
+        @param full_sweep_interval: the interval in seconds of complete
+                                    comparisions, 0 disables the reuse
+                                    of results
+        @type full_sweep_interval: int
+
+        """
+
+        self.hostname = hostname
+        self.vg = vg
+        self.full_sweep_interval = full_sweep_interval
+        self.state_file = NagiosStateFile(SNAPSHOT_FILENAME, state_dir=state_dir)
+
+        self.last_full_sweep = None
+        """
+        @ivar: the timestamp of the last complete comparision
+        @type: int or None
+        """
+
+        self.full_sweep = True
+        """
+        @ivar: all volumes have to be compared in this run
+        @type: bool
+        """
+
+        self.api = {}
+        self.lvs = {}
+        """
+        @ivar: the volumes from API and the results of the logical volumes
+               of the last snapshot
+        @type: dict
+        """
+
+        self.current_api = {}
+        self.current_lvs = {}
+        """
+        @ivar: the volumes from API and the results of the logical volumes
+               of the current run, which are saved by save()
+        @type: dict
+        """
+
+        self.hits = 0
+        self.misses = 0
+
+    # -------------------------------------------------------------------------
+    def __repr__(self):
+        """Typecasting into a string for reproduction."""
+
+        return "%s(%r, %r, state_dir=%r, full_sweep_interval=%r)" % (
+            self.__class__.__name__, self.hostname, self.vg, self.state_file.state_dir,
+            self.full_sweep_interval)
+
+    # -------------------------------------------------------------------------
+    def load(self, now=None):
+        """
+        Reads the snapshot file, an invalid snapshot is ignored. Decides,
+        whether a full sweep is necessary in the current run.
+
+        @param now: the current timestamp
+        @type now: float or None
+
+        """
+
+        if now is None:
+            now = time.time()
+
+        self.api = {}
+        self.lvs = {}
+        self.last_full_sweep = None
+        self.full_sweep = True
+
+        data = self.state_file.load()
+        if (not isinstance(data, dict) or data.get('version') != SNAPSHOT_VERSION or
+                data.get('hostname') != self.hostname or data.get('vg') != self.vg):
+            log.debug("No valid snapshot of the last reconciled state found.")
+            return
+
+        if isinstance(data.get('api'), dict):
+            self.api = data['api']
+        if isinstance(data.get('lvs'), dict):
+            self.lvs = data['lvs']
+        self.last_full_sweep = data.get('full_sweep')
+
+        if self.full_sweep_interval and isinstance(self.last_full_sweep, (int, float)):
+            if 0 <= now - self.last_full_sweep < self.full_sweep_interval:
+                self.full_sweep = False
+
+        if self.full_sweep:
+            log.debug("Executing a full sweep over all volumes.")
+
+    # -------------------------------------------------------------------------
+    def set_api_volume(self, guid, api_volume):
+        """Remembers the data of the given volume from API of the current run."""
+
+        self.current_api[str(guid)] = list(api_volume)
+
+    # -------------------------------------------------------------------------
+    def lookup(self, lv_name, lv_data, guid):
+        """
+        Gives back the result of the last comparision of the given logical
+        volume, if neither the logical volume nor its volume from API
+        (set by set_api_volume() before) have changed since then.
+
+        @param lv_name: the name of the logical volume as '<VG>/<LV>'
+        @type lv_name: str
+        @param lv_data: the compared data of the logical volume
+        @type lv_data: list
+        @param guid: the GUID of the volume from API of the logical volume
+        @type guid: int or str
+
+        @return: the category and the consumed flag or None, if the logical
+                 volume has to be compared again
+        @rtype: tuple or None
+
+        """
+
+        guid = str(guid)
+        entry = None
+        if not self.full_sweep:
+            entry = self.lvs.get(lv_name)
+        if (entry is None or len(entry) != 3 or entry[0] != lv_data or
+                self.api.get(guid) != self.current_api.get(guid)):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.current_lvs[lv_name] = entry
+        return (entry[1], entry[2])
+
+    # -------------------------------------------------------------------------
+    def add(self, lv_name, lv_data, category, consumed):
+        """Remembers the result of the comparision of the given logical volume."""
+
+        self.current_lvs[lv_name] = [lv_data, category, consumed]
+
+    # -------------------------------------------------------------------------
+    def save(self, now=None):
+        """
+        Saves the data of the current run as the new snapshot, if anything
+        has changed or a full sweep was executed. Errors on writing are
+        only logged.
+
+        @param now: the current timestamp
+        @type now: float or None
+
+        """
+
+        log.debug("Snapshot of the reconciled state: %d unchanged, %d compared volumes.",
+                  self.hits, self.misses)
+
+        if now is None:
+            now = time.time()
+
+        last_full_sweep = self.last_full_sweep
+        if self.full_sweep:
+            last_full_sweep = int(now)
+        elif self.current_lvs == self.lvs and self.current_api == self.api:
+            return
+
+        data = {
+            'version': SNAPSHOT_VERSION,
+            'hostname': self.hostname,
+            'vg': self.vg,
+            'full_sweep': last_full_sweep,
+            'api': self.current_api,
+            'lvs': self.current_lvs,
+        }
+        try:
+            self.state_file.save(data)
+        except NagiosStateFileError as e:
+            log.warning(str(e))
+
+# =============================================================================
+
+if __name__ == "__main__":
+
+    pass
+
+# =============================================================================
+
+# vim: fileencoding=utf-8 filetype=python ts=4 expandtab
@@ -0,0 +1,1088 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@copyright: © 2010 - 2016 by Frank Brehm, Berlin
+@summary: Module for the MegaRaidCollector class, which queries a LSI MegaRaid
+          adapter once (by storcli/perccli or MegaCli) and provides
+          a structured snapshot for all MegaRaid checks
+"""
+
+# Standard modules
+import re
+import json
+import time
+import logging
+
+# Third party modules
+
+# Own modules
+
+from nagios.plugin.report import ReportParser
+from nagios.plugin.report import first_word, lower_word, first_int
+
+from nagios.plugin.statefile import NagiosStateFile, NagiosStateFileError
+
+# --------------------------------------------
+# Some module variables
+
+__version__ = '0.6.0'
+
+SNAPSHOT_VERSION = 1
+DEFAULT_MAX_AGE = 120
+
+DEVICE_MAP_VERSION = 1
+DEFAULT_MAP_TTL = 3600
+
+log = logging.getLogger(__name__)
+
+# Physical drives (-PdList)
+
+# The media types of MegaCli in the notation of storcli
+pd_media_types = {
+    'hard disk device': 'HDD',
+    'solid state device': 'SSD',
+}
+
+
+# =============================================================================
+def pd_media_type(value):
+    """Converts the media type of MegaCli into the notation of storcli."""
+
+    value = value.strip()
+    return pd_media_types.get(value.lower(), value)
+
+
+# Enclosure Device ID: 0
+# Slot Number: 23
+# Device Id: 6
+# Media Error Count: 0
+# Other Error Count: 0
+# Predictive Failure Count: 0
+# Firmware state: Online, Spun Up
+# Foreign State: None
+# Media Type: Hard Disk Device
+pd_list_parser = ReportParser(
+    {
+        'Enclosure Device ID': ('enclosure', int),
+        'Slot Number': ('slot', int),
+        'Device Id': ('dev_id', int),
+        'Media Error Count': ('media_errors', int),
+        'Other Error Count': ('other_errors', int),
+        'Predictive Failure Count': ('predictive_failures', int),
+        'Firmware state': 'fw_state',
+        'Foreign State': 'foreign_state',
+        'Media Type': ('media_type', pd_media_type),
+    },
+    start_key='Enclosure Device ID',
+    defaults={
+        'media_errors': 0,
+        'other_errors': 0,
+        'predictive_failures': 0,
+        'fw_state': None,
+        'foreign_state': None,
+        'media_type': None,
+    },
+)
+
+# Logical drives (-LdInfo -Lall)
+
+# Adapter 0 -- Virtual Drive Information:
+re_ld_adapter = re.compile(
+    r'^\s*Adapter\s+(\d+)\s+--\s+Virtual\s+Drive\s+Information\s*:',
+    re.IGNORECASE | re.MULTILINE)
+# RAID Level          : Primary-1, Secondary-0, RAID Level Qualifier-0
+re_ld_raid_level = re.compile(r'^Primary-(\d+)', re.IGNORECASE)
+# Size                : 2.728 TB
+re_ld_size = re.compile(r'^(\d+(?:\.\d*)?)\s*(\S+)?')
+# Check Consistency: Completed 95%, Taken 8 min
+re_ld_consist = re.compile(r'Completed\s+(\d+)%,\s+Taken\s+(\d+)\s*min', re.IGNORECASE)
+
+
+# -----------------------------------------------------------------------------
+def _ld_raid_level(record, value):
+
+    match = re_ld_raid_level.search(value)
+    if match:
+        record['raid_level'] = int(match.group(1))
+
+
+# -----------------------------------------------------------------------------
+def _ld_size(record, value):
+
+    match = re_ld_size.search(value)
+    if match:
+        record['size_val'] = float(match.group(1))
+        record['size_unit'] = match.group(2)
+
+
+# -----------------------------------------------------------------------------
+def _ld_consist(record, value):
+
+    match = re_ld_consist.search(value)
+    if match:
+        record['consist_percent'] = int(match.group(1))
+        record['consist_min'] = int(match.group(2))
+
+
+# Virtual Drive: 0 (Target Id: 0)
+# State               : Optimal
+# Number Of Drives    : 2
+# Span Depth          : 1
+# Is VD Cached: Yes
+ld_info_parser = ReportParser(
+    {
+        'Virtual Drive': ('number', first_int),
+        'RAID Level': _ld_raid_level,
+        'Size': _ld_size,
+        'State': ('state', first_word),
+        'Number Of Drives': ('pd_number', first_int),
+        'Span Depth': ('span_depth', first_int),
+        'Is VD Cached': ('cached', first_word),
+        'Check Consistency': _ld_consist,
+    },
+    start_key='Virtual Drive',
+    defaults={
+        'raid_level': None,
+        'size_val': None,
+        'size_unit': None,
+        'state': None,
+        'pd_number': None,
+        'span_depth': None,
+        'cached': None,
+        'consist_percent': None,
+        'consist_min': None,
+    },
+)
+
+# BBU (-AdpBbuCmd -GetBbuStatus), the values are the keys of the BBU dict
+
+bbu_flag_fields = (
+    ('Voltage', 'voltage'),
+    ('Temperature', 'temperature'),
+    ('Learn Cycle Requested', 'lc_req'),
+    ('Learn Cycle Active', 'lc_act'),
+    ('Learn Cycle Status', 'lc_state'),
+    ('Learn Cycle Timeout', 'lc_timeout'),
+    ('I2c Errors Detected', 'i2c_err'),
+    ('Battery Pack Missing', 'bbu_miss'),
+    ('Battery Replacement required', 'bbu_replace'),
+    ('Remaining Capacity Low', 'capac_low'),
+    ('Periodic Learn Required', 'per_learn'),
+    ('Transparent Learn', 'trans_learn'),
+    ('No space to cache offload', 'no_space'),
+    ('Pack is about to fail & should be replaced', 'pack_fail'),
+    ('Module microcode update required', 'micro_upd'),
+)
+bbu_fields = {
+    'BatteryType': 'type',
+    'Battery State': 'state',
+    'BatteryState': 'state',
+}
+bbu_defaults = {
+    'type': 'unknown',
+    'state': None,
+}
+for (key, name) in bbu_flag_fields:
+    bbu_fields[key] = (name, lower_word)
+    bbu_defaults[name] = None
+bbu_status_parser = ReportParser(bbu_fields, defaults=bbu_defaults)
+del key, name
+
+# storcli/perccli JSON output ('J')
+
+# Mapping of the abbreviated states of physical drives of storcli
+# to the firmware states of MegaCli
+storcli_pd_states = {
+    'onln': 'Online',
+    'offln': 'Offline',
+    'ugood': 'Unconfigured(good)',
+    'ubad': 'Unconfigured(bad)',
+    'ugunsp': 'Unconfigured(good), Unsupported',
+    'ugshld': 'Unconfigured(good), Shielded',
+    'hspshld': 'Hotspare, Shielded',
+    'cfshld': 'Configured, Shielded',
+    'ghs': 'Hotspare',
+    'dhs': 'Hotspare',
+    'rbld': 'Rebuild',
+    'cpybck': 'Copyback',
+    'jbod': 'JBOD',
+    'msng': 'Missing',
+    'failed': 'Failed',
+}
+# states, which are followed by the spin state in MegaCli
+storcli_spun_pd_states = (
+    'Online', 'Offline', 'Unconfigured(good)', 'Unconfigured(bad)', 'Hotspare', 'JBOD')
+
+# Mapping of the abbreviated states of logical drives of storcli
+# to the states of MegaCli
+storcli_ld_states = {
+    'optl': 'Optimal',
+    'ofln': 'Offline',
+    'pdgd': 'Partially Degraded',
+    'dgrd': 'Degraded',
+    'rec': 'Recovery',
+    'ocr': 'OCR',
+}
+
+# Mapping of the normalized property names of the BBU/CacheVault status
+# of storcli to the keys of the BBU dict
+storcli_bbu_flags = {
+    'voltage': 'voltage',
+    'temperature': 'temperature',
+    'learn cycle requested': 'lc_req',
+    'learn cycle active': 'lc_act',
+    'learn cycle status': 'lc_state',
+    'learn cycle timeout': 'lc_timeout',
+    'i2c errors detected': 'i2c_err',
+    'battery pack missing': 'bbu_miss',
+    'replacement required': 'bbu_replace',
+    'battery replacement required': 'bbu_replace',
+    'remaining capacity low': 'capac_low',
+    'periodic learn required': 'per_learn',
+    'transparent learn': 'trans_learn',
+    'no space to cache offload': 'no_space',
+    'pack is about to fail & should be replaced': 'pack_fail',
+    'module microcode update required': 'micro_upd',
+}
+
+re_storcli_drive = re.compile(r'^Drive\s+(/c\d+/\S+)$')
+re_storcli_vd = re.compile(r'^/c\d+/v(\d+)$')
+re_storcli_vd_props = re.compile(r'^VD(\d+)\s+Properties$')
+re_storcli_raid = re.compile(r'(\d+)')
+re_storcli_size = re.compile(r'^\s*(\d+(?:\.\d*)?)\s*(\S+)?')
+
+
+# =============================================================================
+def pd_id(drive):
+    """
+    Gives back the common identifier '[<enclosure>:<slot>]' of a
+    physical drive dict.
+    """
+
+    return '[%d:%d]' % (drive['enclosure'], drive['slot'])
+
+
+# =============================================================================
+def parse_pd_list(output):
+    """
+    Parses the output of 'MegaCli -PdList'.
+
+    @param output: the output of MegaCli on STDOUT
+    @type output: str
+
+    @return: all found physical drives as dicts with the keys 'enclosure',
+             'slot', 'dev_id', 'media_errors', 'other_errors',
+             'predictive_failures', 'fw_state', 'foreign_state' and
+             'media_type' ('HDD' or 'SSD')
+    @rtype: list of dict
+
+    """
+
+    drives = []
+    for drive in pd_list_parser.parse(output):
+        if 'enclosure' in drive and 'slot' in drive:
+            drives.append(drive)
+    return drives
+
+
+# =============================================================================
+def parse_ld_info(output):
+    """
+    Parses the output of 'MegaCli -LdInfo -Lall' (or of a single LD).
+
+    @param output: the output of MegaCli on STDOUT
+    @type output: str
+
+    @return: all found logical drives as dicts with the keys 'number',
+             'raid_level', 'size_val', 'size_unit', 'state', 'pd_number',
+             'span_depth', 'cached', 'consist_percent' and 'consist_min'
+    @rtype: list of dict
+
+    """
+
+    lds = []
+    for ld in ld_info_parser.parse(output):
+        if 'number' in ld:
+            lds.append(ld)
+    return lds
+
+
+# =============================================================================
+def parse_ld_info_all(output):
+    """
+    Parses the output of 'MegaCli -LdInfo -Lall -aALL'.
+
+    @param output: the output of MegaCli on STDOUT
+    @type output: str
+
+    @return: the logical drives (see parse_ld_info()) of all adapters
+             with the number of the adapter as key
+    @rtype: dict
+
+    """
+
+    result = {}
+    parts = re_ld_adapter.split(output)
+    # parts: [<before first adapter>, <adapter>, <text>, <adapter>, <text>, ...]
+    for i in range(1, len(parts) - 1, 2):
+        adapter_nr = int(parts[i])
+        if adapter_nr not in result:
+            result[adapter_nr] = []
+        result[adapter_nr] += parse_ld_info(parts[i + 1])
+
+    return result
+
+
+# =============================================================================
+def parse_bbu_status(output):
+    """
+    Parses the output of 'MegaCli -AdpBbuCmd -GetBbuStatus'.
+
+    @param output: the output of MegaCli on STDOUT
+    @type output: str
+
+    @return: the BBU data with the keys 'type', 'state' and the values
+             of bbu_flag_fields (with lowercased values)
+    @rtype: dict
+
+    """
+
+    return bbu_status_parser.parse_record(output)
+
+
+# =============================================================================
+def _to_int(value, default=None):
+
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+# =============================================================================
+def decode_storcli_output(output):
+    """
+    Decodes the JSON output of a storcli/perccli command for one controller.
+
+    @raise ValueError: if the output is not a valid storcli JSON document
+
+    @param output: the output of storcli on STDOUT
+    @type output: str
+
+    @return: a tuple with the command status ('Success', 'Failure' ...),
+             the description of the status and the response data
+    @rtype: tuple
+
+    """
+
+    (adapter_nr, status, desc, response) = decode_storcli_outputs(output)[0]
+    return (status, desc, response)
+
+
+# =============================================================================
+def decode_storcli_outputs(output):
+    """
+    Decodes the JSON output of a storcli/perccli command for one or more
+    controllers (e.g. '/call').
+
+    @raise ValueError: if the output is not a valid storcli JSON document
+
+    @param output: the output of storcli on STDOUT
+    @type output: str
+
+    @return: a list of tuples for each controller with the number of the
+             controller, the command status ('Success', 'Failure' ...),
+             the description of the status and the response data
+    @rtype: list of tuple
+
+    """
+
+    data = json.loads(output)
+    result = []
+    try:
+        for ctrl in data['Controllers']:
+            cmd_status = ctrl['Command Status']
+            result.append((
+                _to_int(cmd_status.get('Controller')),
+                cmd_status.get('Status', 'Failure'),
+                cmd_status.get('Description', ''),
+                ctrl.get('Response Data', {})))
+    except (KeyError, TypeError, AttributeError):
+        raise ValueError("Invalid controller data found in output of storcli.")
+    if not result:
+        raise ValueError("No controller data found in output of storcli.")
+
+    return result
+
+
+# =============================================================================
+def parse_storcli_pd(response):
+    """
+    Transforms the response data of 'storcli /cX/eall/sall show all J' into
+    the same physical drive dicts as parse_pd_list().
+
+    @param response: the response data of storcli
+    @type response: dict
+
+    @return: all found physical drives
+    @rtype: list of dict
+
+    """
+
+    drives = []
+
+    for key in sorted(response.keys()):
+        m = re_storcli_drive.search(key)
+        if not m:
+            continue
+        rows = response[key]
+        if not isinstance(rows, list) or not rows:
+            continue
+        row = rows[0]
+
+        (enc, sep, slot) = str(row.get('EID:Slt', '')).partition(':')
+        enc = _to_int(enc)
+        slot = _to_int(slot)
+        if enc is None or slot is None:
+            log.debug("Ignoring drive %r without enclosure and slot.", key)
+            continue
+
+        state = str(row.get('State', '')).strip()
+        fw_state = storcli_pd_states.get(state.lower(), state)
+        spun = row.get('Sp')
+        if fw_state in storcli_spun_pd_states and spun in ('U', 'D'):
+            fw_state += ', Spun %s' % ('Up' if spun == 'U' else 'Down')
+
+        media_type = str(row.get('Med', '')).strip() or None
+
+        foreign_state = 'None'
+        if str(row.get('DG', '')).strip() == 'F':
+            foreign_state = 'Foreign'
+
+        details = response.get('Drive %s - Detailed Information' % (m.group(1)), {})
+        counters = details.get('Drive %s State' % (m.group(1)), {})
+
+        drives.append({
+            'enclosure': enc,
+            'slot': slot,
+            'dev_id': _to_int(row.get('DID')),
+            'media_errors': _to_int(counters.get('Media Error Count'), 0),
+            'other_errors': _to_int(counters.get('Other Error Count'), 0),
+            'predictive_failures': _to_int(counters.get('Predictive Failure Count'), 0),
+            'fw_state': fw_state,
+            'foreign_state': foreign_state,
+            'media_type': media_type,
+        })
+
+    drives.sort(key=lambda x: (x['enclosure'], x['slot']))
+    return drives
+
+
+# =============================================================================
+def parse_storcli_ld(response, cc_response=None):
+    """
+    Transforms the response data of 'storcli /cX/vall show all J' into
+    the same logical drive dicts as parse_ld_info().
+
+    @param response: the response data of storcli
+    @type response: dict
+    @param cc_response: the response data of 'storcli /cX/vall show cc J'
+    @type cc_response: dict or None
+
+    @return: all found logical drives
+    @rtype: list of dict
+
+    """
+
+    lds = []
+
+    consist = {}
+    if cc_response:
+        for op in cc_response.get('VD Operation Status', []):
+            if str(op.get('Status', '')).lower() != 'in progress':
+                continue
+            consist[_to_int(op.get('VD'))] = _to_int(op.get('Progress%'), 0)
+
+    for key in response.keys():
+        m = re_storcli_vd.search(key)
+        if not m:
+            continue
+        rows = response[key]
+        if not isinstance(rows, list) or not rows:
+            continue
+        row = rows[0]
+        number = int(m.group(1))
+        props = response.get('VD%d Properties' % (number), {})
+
+        span_depth = _to_int(props.get('Span Depth'))
+        raid_level = None
+        m = re_storcli_raid.search(str(row.get('TYPE', '')))
+        if m:
+            raid_level = int(m.group(1))
+            # MegaCli reports the primary RAID level of spanned drives
+            if span_depth and span_depth > 1 and raid_level >= 10:
+                raid_level = raid_level // 10
+
+        size_val = None
+        size_unit = None
+        m = re_storcli_size.search(str(row.get('Size', '')))
+        if m:
+            size_val = float(m.group(1))
+            size_unit = m.group(2)
+
+        state = str(row.get('State', '')).strip()
+        cached = 'No'
+        if str(row.get('Cac', '-')).strip() not in ('-', ''):
+            cached = 'Yes'
+
+        lds.append({
+            'number': number,
+            'raid_level': raid_level,
+            'size_val': size_val,
+            'size_unit': size_unit,
+            'state': storcli_ld_states.get(state.lower(), state) or None,
+            'pd_number': _to_int(props.get('Number of Drives Per Span')),
+            'span_depth': span_depth,
+            'cached': cached,
+            'consist_percent': consist.get(number),
+            'consist_min': None,
+        })
+
+    lds.sort(key=lambda x: x['number'])
+    return lds
+
+
+# =============================================================================
+def parse_storcli_bbu(response):
+    """
+    Transforms the response data of 'storcli /cX/bbu show all J' or
+    'storcli /cX/cv show all J' into the same BBU dict as parse_bbu_status().
+
+    @param response: the response data of storcli
+    @type response: dict
+
+    @return: the BBU data
+    @rtype: dict
+
+    """
+
+    bbu = dict(bbu_defaults)
+
+    for (section, rows) in response.items():
+        if not isinstance(rows, list):
+            continue
+        is_info = section.lower().endswith('_info')
+        for row in rows:
+            if not isinstance(row, dict) or 'Property' not in row:
+                continue
+            prop = ' '.join(str(row['Property']).lower().split())
+            value = str(row.get('Value', '')).strip()
+            if is_info:
+                if prop == 'type':
+                    bbu['type'] = value
+                elif prop in ('battery state', 'state'):
+                    bbu['state'] = value
+                continue
+            key = storcli_bbu_flags.get(prop)
+            if key:
+                bbu[key] = value.lower()
+
+    return bbu
+
+
+# =============================================================================
+class MegaRaidCollector(object):
+    """
+    Collects the physical drives, the logical drives and the BBU state of
+    a MegaRaid adapter with one call of storcli (JSON output) or MegaCli
+    (text output) each and keeps the result
+    as a snapshot in a state file, so all MegaRaid checks of the same interval
+    can share it instead of querying (and locking) the controller again.
+
+    A snapshot is a dict with the keys:
+        - 'version': the version of the snapshot format
+        - 'adapter': the number of the MegaRaid adapter
+        - 'timestamp': the UNIX timestamp of the query
+        - 'source': 'storcli' or 'megacli'
+        - 'pd': dict with 'exit_code' and 'drives' (list of dicts)
+        - 'ld': dict with 'exit_code' and 'drives' (list of dicts)
+        - 'bbu': dict with 'exit_code' and the BBU data
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, plugin, max_age=DEFAULT_MAX_AGE, state_dir=None):
+        """
+        Constructor.
+
+        @param plugin: the plugin object used to call MegaCli
+        @type plugin: CheckMegaRaidPlugin
+        @param max_age: the maximum age of a cached snapshot in seconds,
+                        0 or None disables the cache
+        @type max_age: int or None
+        @param state_dir: the directory of the snapshot file
+        @type state_dir: str or None
+
+        """
+
+        self.plugin = plugin
+        self.max_age = max_age
+        self.state_file = NagiosStateFile(
+            'megaraid-a%d.json' % (plugin.adapter_nr),
+            state_dir=state_dir, max_age=max_age)
+
+    # -------------------------------------------------------------------------
+    def _is_valid(self, snapshot):
+
+        if not isinstance(snapshot, dict):
+            return False
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            return False
+        if snapshot.get('adapter') != self.plugin.adapter_nr:
+            return False
+        return True
+
+    # -------------------------------------------------------------------------
+    def snapshot(self):
+        """
+        Gives back a current snapshot of the adapter, either from the state
+        file, if it is not older than max_age, or by querying the adapter.
+
+        @return: the snapshot
+        @rtype: dict
+
+        """
+
+        if not self.max_age:
+            return self.collect()
+
+        snapshot = self.state_file.load()
+        if self._is_valid(snapshot):
+            log.debug("Using cached snapshot from %r.", self.state_file.path)
+            return snapshot
+
+        try:
+            self.state_file.lock()
+        except (IOError, OSError, NagiosStateFileError) as e:
+            log.warning("Could not lock %r: %s", self.state_file.lock_path, e)
+            return self.collect()
+
+        try:
+            # another check could have collected in the meantime
+            snapshot = self.state_file.load()
+            if self._is_valid(snapshot):
+                log.debug("Using snapshot from %r collected concurrently.",
+                          self.state_file.path)
+                return snapshot
+
+            snapshot = self.collect()
+            try:
+                self.state_file.save(snapshot)
+            except NagiosStateFileError as e:
+                log.warning(str(e))
+        finally:
+            self.state_file.unlock()
+
+        return snapshot
+
+    # -------------------------------------------------------------------------
+    def collect(self):
+        """
+        Queries the adapter for physical drives, logical drives and the BBU,
+        preferably with storcli. If storcli is not available or gives
+        no usable JSON output, MegaCli is used.
+
+        @return: the new snapshot
+        @rtype: dict
+
+        """
+
+        snapshot = None
+        if self.plugin.storcli_cmd:
+            try:
+                snapshot = self.collect_storcli()
+            except ValueError as e:
+                if not self.plugin.megacli_cmd:
+                    self.plugin.die("Could not evaluate output of %r: %s" % (
+                        self.plugin.storcli_cmd, e))
+                log.warning(
+                    "Could not evaluate output of %r, falling back to MegaCli: %s",
+                    self.plugin.storcli_cmd, e)
+
+        if snapshot is None:
+            snapshot = self.collect_megacli()
+
+        return snapshot
+
+    # -------------------------------------------------------------------------
+    def _new_snapshot(self, source):
+
+        return {
+            'version': SNAPSHOT_VERSION,
+            'adapter': self.plugin.adapter_nr,
+            'timestamp': time.time(),
+            'source': source,
+        }
+
+    # -------------------------------------------------------------------------
+    def collect_storcli(self):
+        """
+        Queries the adapter by storcli with JSON output.
+
+        @raise ValueError: if storcli gives back an invalid output
+
+        @return: the new snapshot
+        @rtype: dict
+
+        """
+
+        snapshot = self._new_snapshot('storcli')
+
+        (response, exit_code) = self.plugin.storcli('/eall/sall show all')
+        snapshot['pd'] = {
+            'exit_code': exit_code,
+            'drives': parse_storcli_pd(response),
+        }
+
+        (response, exit_code) = self.plugin.storcli('/vall show all')
+        cc_response = None
+        if not exit_code:
+            (cc_response, cc_exit_code) = self.plugin.storcli('/vall show cc')
+        snapshot['ld'] = {
+            'exit_code': exit_code,
+            'drives': parse_storcli_ld(response, cc_response),
+        }
+
+        (response, exit_code) = self.plugin.storcli('/bbu show all')
+        if exit_code:
+            # maybe a CacheVault instead of a BBU
+            (cv_response, cv_exit_code) = self.plugin.storcli('/cv show all')
+            if not cv_exit_code:
+                (response, exit_code) = (cv_response, cv_exit_code)
+        bbu = parse_storcli_bbu(response)
+        bbu['exit_code'] = exit_code
+        snapshot['bbu'] = bbu
+
+        return snapshot
+
+    # -------------------------------------------------------------------------
+    def collect_ld_all(self):
+        """
+        Queries all adapters for their logical drives with one call
+        of storcli or MegaCli. The result is not cached.
+
+        @return: dicts with the keys 'exit_code' and 'drives' (like
+                 snapshot['ld']) with the number of the adapter as key
+        @rtype: dict
+
+        """
+
+        if self.plugin.storcli_cmd:
+            try:
+                return self._collect_ld_all_storcli()
+            except ValueError as e:
+                if not self.plugin.megacli_cmd:
+                    self.plugin.die("Could not evaluate output of %r: %s" % (
+                        self.plugin.storcli_cmd, e))
+                log.warning(
+                    "Could not evaluate output of %r, falling back to MegaCli: %s",
+                    self.plugin.storcli_cmd, e)
+
+        (stdoutdata, stderrdata, ret, exit_code) = self.plugin.megacli(
+            ('-LdInfo', '-Lall', '-aALL'), no_adapter=True)
+        if self.plugin.verbose > 3:
+            log.debug("Output of -LdInfo -Lall -aALL on StdOut:\n%s", stdoutdata)
+
+        result = {}
+        for (adapter_nr, drives) in parse_ld_info_all(stdoutdata).items():
+            result[adapter_nr] = {
+                'exit_code': exit_code,
+                'drives': drives,
+            }
+        return result
+
+    # -------------------------------------------------------------------------
+    def _collect_ld_all_storcli(self):
+
+        cc_responses = {}
+        for (adapter_nr, response, exit_code) in self.plugin.storcli_all('/vall show cc'):
+            if not exit_code:
+                cc_responses[adapter_nr] = response
+
+        result = {}
+        for (adapter_nr, response, exit_code) in self.plugin.storcli_all('/vall show all'):
+            result[adapter_nr] = {
+                'exit_code': exit_code,
+                'drives': parse_storcli_ld(response, cc_responses.get(adapter_nr)),
+            }
+        return result
+
+    # -------------------------------------------------------------------------
+    def collect_megacli(self):
+        """
+        Queries the adapter by MegaCli with text output.
+
+        @return: the new snapshot
+        @rtype: dict
+
+        """
+
+        verbose = self.plugin.verbose
+        snapshot = self._new_snapshot('megacli')
+
+        (stdoutdata, stderrdata, ret, exit_code) = self.plugin.megacli(('-PdList',))
+        if verbose > 3:
+            log.debug("Output of -PdList on StdOut:\n%s", stdoutdata)
+        snapshot['pd'] = {
+            'exit_code': exit_code,
+            'drives': parse_pd_list(stdoutdata),
+        }
+
+        (stdoutdata, stderrdata, ret, exit_code) = self.plugin.megacli(
+            ('-LdInfo', '-Lall'))
+        if verbose > 3:
+            log.debug("Output of -LdInfo -Lall on StdOut:\n%s", stdoutdata)
+        snapshot['ld'] = {
+            'exit_code': exit_code,
+            'drives': parse_ld_info(stdoutdata),
+        }
+
+        (stdoutdata, stderrdata, ret, exit_code) = self.plugin.megacli(
+            ('-AdpBbuCmd', '-GetBbuStatus'))
+        if verbose > 3:
+            log.debug("Output of -AdpBbuCmd -GetBbuStatus on StdOut:\n%s", stdoutdata)
+        bbu = parse_bbu_status(stdoutdata)
+        bbu['exit_code'] = exit_code
+        snapshot['bbu'] = bbu
+
+        return snapshot
+
+
+# =============================================================================
+def pd_device_map(drives):
+    """
+    Gives back the mapping of '<enclosure>:<slot>' to the Device Id
+    of the given physical drive dicts.
+
+    @param drives: the physical drives (see parse_pd_list())
+    @type drives: list of dict
+
+    @rtype: dict
+
+    """
+
+    device_map = {}
+    for drive in drives:
+        if drive.get('dev_id') is not None:
+            device_map['%d:%d' % (drive['enclosure'], drive['slot'])] = drive['dev_id']
+    return device_map
+
+
+# =============================================================================
+class MegaRaidDeviceMap(object):
+    """
+    Persists the mapping of enclosure/slot pairs to the Device Ids of the
+    physical drives of one MegaRaid adapter in a state file, so the SMART
+    checks of the drives need no MegaCli call to find their Device Id.
+
+    The map is invalidated after the TTL and it is taken from the snapshot
+    of the MegaRaidCollector, if there is a newer one (the PD list could
+    have been changed). A caller detecting an outdated map (e.g. because
+    smartctl fails with the mapped Device Id) can force a refresh.
+
+    The map file has the format::
+
+        {
+            'version': DEVICE_MAP_VERSION,
+            'adapter': <adapter number>,
+            'timestamp': <UNIX timestamp of the PD list>,
+            'map': {'<enclosure>:<slot>': <Device Id>, ...},
+        }
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, plugin, ttl=DEFAULT_MAP_TTL, state_dir=None):
+        """
+        Constructor.
+
+        @param plugin: the plugin object used to call MegaCli, it must have
+                       the attributes megacli_cmd and adapter_nr
+        @type plugin: ExtNagiosPlugin
+        @param ttl: the maximum age of the map in seconds,
+                    0 or None disables the cache
+        @type ttl: int or None
+        @param state_dir: the directory of the map file
+        @type state_dir: str or None
+
+        """
+
+        self.plugin = plugin
+        self.ttl = ttl
+        self.state_file = NagiosStateFile(
+            'megaraid-devids-a%d.json' % (plugin.adapter_nr),
+            state_dir=state_dir, max_age=ttl)
+        self.snapshot_file = NagiosStateFile(
+            'megaraid-a%d.json' % (plugin.adapter_nr), state_dir=state_dir)
+        self.cached = False
+
+    # -------------------------------------------------------------------------
+    def _is_valid(self, data, version=DEVICE_MAP_VERSION):
+
+        if not isinstance(data, dict):
+            return False
+        if data.get('version') != version:
+            return False
+        if data.get('adapter') != self.plugin.adapter_nr:
+            return False
+        return True
+
+    # -------------------------------------------------------------------------
+    def _new_map(self, drives, timestamp=None):
+
+        if timestamp is None:
+            timestamp = time.time()
+
+        return {
+            'version': DEVICE_MAP_VERSION,
+            'adapter': self.plugin.adapter_nr,
+            'timestamp': timestamp,
+            'map': pd_device_map(drives),
+        }
+
+    # -------------------------------------------------------------------------
+    def load(self):
+        """
+        Gives back the cached map, if it is not older than the TTL, or the
+        map of a newer snapshot of the MegaRaidCollector.
+
+        @return: the map data or None, if there is no usable cached map
+        @rtype: dict or None
+
+        """
+
+        if not self.ttl:
+            return None
+
+        data = self.state_file.load()
+        if not self._is_valid(data):
+            data = None
+
+        snapshot = self.snapshot_file.load(ignore_age=True)
+        if self._is_valid(snapshot, SNAPSHOT_VERSION) and 'pd' in snapshot:
+            if data is None or snapshot.get('timestamp', 0) > data['timestamp']:
+                if time.time() - snapshot.get('timestamp', 0) <= self.ttl:
+                    log.debug("Taking the Device Id map from snapshot %r.",
+                              self.snapshot_file.path)
+                    data = self.save(snapshot['pd']['drives'], snapshot['timestamp'])
+
+        return data
+
+    # -------------------------------------------------------------------------
+    def save(self, drives, timestamp=None):
+        """
+        Saves the map of the given physical drives, errors are only logged.
+
+        @param drives: the physical drives (see parse_pd_list())
+        @type drives: list of dict
+        @param timestamp: the UNIX timestamp of the PD list, now, if None
+        @type timestamp: float or None
+
+        @return: the map data
+        @rtype: dict
+
+        """
+
+        data = self._new_map(drives, timestamp)
+        if self.ttl:
+            try:
+                self.state_file.save(data)
+            except NagiosStateFileError as e:
+                log.warning(str(e))
+
+        return data
+
+    # -------------------------------------------------------------------------
+    def refresh(self):
+        """
+        Retrieves the PD list of the adapter by 'MegaCli -PdList' and saves
+        the new map.
+
+        @raise IOError: if MegaCli gives no output
+
+        @return: the map data
+        @rtype: dict
+
+        """
+
+        cmd_list = [
+            self.plugin.megacli_cmd, '-PdList', '-a', str(self.plugin.adapter_nr), '-NoLog']
+        (ret, stdoutdata, stderrdata) = self.plugin.exec_cmd(cmd_list)
+        if not stdoutdata:
+            raise IOError("Got no output from '%s -PdList -a %d'." % (
+                self.plugin.megacli_cmd, self.plugin.adapter_nr))
+
+        self.cached = False
+        return self.save(parse_pd_list(stdoutdata))
+
+    # -------------------------------------------------------------------------
+    def device_id(self, enclosure, slot, refresh=False):
+        """
+        Gives back the Device Id of the physical drive in the given slot,
+        from the cached map, if possible. self.cached tells afterwards,
+        whether the Device Id was taken from the cache.
+
+        @raise IOError: if MegaCli gives no output
+
+        @param enclosure: the enclosure Id
+        @type enclosure: int
+        @param slot: the slot Id
+        @type slot: int
+        @param refresh: don't use the cached map
+        @type refresh: bool
+
+        @return: the Device Id or None, if there is no drive in this slot
+        @rtype: int or None
+
+        """
+
+        key = '%d:%d' % (enclosure, slot)
+        started = time.time()
+
+        if not refresh:
+            data = self.load()
+            if data and key in data['map']:
+                log.debug("Got Device Id %d of [%s] from the cached map.", data['map'][key], key)
+                self.cached = True
+                return data['map'][key]
+
+        if not self.ttl:
+            return self.refresh()['map'].get(key)
+
+        try:
+            self.state_file.lock()
+        except (IOError, OSError, NagiosStateFileError) as e:
+            log.warning("Could not lock %r: %s", self.state_file.lock_path, e)
+            return self.refresh()['map'].get(key)
+
+        try:
+            # another check could have refreshed the map in the meantime
+            data = self.load()
+            if data and key in data['map'] and (not refresh or data['timestamp'] >= started):
+                log.debug("Using Device Id map refreshed concurrently.")
+                self.cached = not refresh
+                return data['map'][key]
+
+            return self.refresh()['map'].get(key)
+        finally:
+            self.state_file.unlock()
+
+# =============================================================================
+
+if __name__ == "__main__":
+
+    pass
+
+# =============================================================================
+
+# vim: fileencoding=utf-8 filetype=python ts=4 et
@@ -0,0 +1,174 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@copyright: © 2010 - 2016 by Frank Brehm, Berlin
+@summary: Module for reading the SMART / health information log of NVMe
+          controllers directly by the admin command ioctl of the kernel,
+          without forking smartctl for every device
+"""
+
+# Standard modules
+import os
+import struct
+import fcntl
+import ctypes
+import logging
+
+# Third party modules
+
+# Own modules
+
+# --------------------------------------------
+# Some module variables
+
+__version__ = '0.1.0'
+
+NVME_CLASS_DIR = os.sep + os.path.join('sys', 'class', 'nvme')
+
+# _IOWR('N', 0x41, struct nvme_admin_cmd)
+NVME_IOCTL_ADMIN_CMD = 0xC0484E41
+NVME_ADMIN_GET_LOG_PAGE = 0x02
+NVME_LOG_HEALTH = 0x02
+NVME_NSID_ALL = 0xFFFFFFFF
+NVME_HEALTH_LOG_SIZE = 512
+
+# struct nvme_admin_cmd: opcode, flags, rsvd1, nsid, cdw2, cdw3, metadata,
+# addr, metadata_len, data_len, cdw10 - cdw15, timeout_ms, result
+admin_cmd_format = '=BBHIIIQQII6III'
+
+# Bits of the critical warning field
+CRITICAL_WARNING_TEXTS = (
+    (0x01, 'available spare below threshold'),
+    (0x02, 'temperature above or below threshold'),
+    (0x04, 'reliability degraded'),
+    (0x08, 'media in read only mode'),
+    (0x10, 'volatile memory backup failed'),
+)
+
+log = logging.getLogger(__name__)
+
+
+# =============================================================================
+def _uint128(buf, offset):
+
+    (low, high) = struct.unpack_from('<QQ', buf, offset)
+    return (high << 64) + low
+
+
+# =============================================================================
+def parse_health_log(buf):
+    """
+    Parses the binary SMART / health information log page (log id 0x02)
+    of a NVMe controller.
+
+    @raise ValueError: if the buffer is too short
+
+    @param buf: the log page
+    @type buf: bytes
+
+    @return: the values of the log page with the keys 'critical_warning',
+             'temperature' (Celsius), 'available_spare',
+             'available_spare_threshold', 'percentage_used',
+             'data_units_read', 'data_units_written', 'power_cycles',
+             'power_on_hours', 'unsafe_shutdowns', 'media_errors' and
+             'num_err_log_entries'
+    @rtype: dict
+
+    """
+
+    if len(buf) < 192:
+        raise ValueError("The NVMe health log is too short (%d bytes)." % (len(buf)))
+
+    (critical_warning, temperature, available_spare, spare_threshold,
+        percentage_used) = struct.unpack_from('<BHBBB', buf, 0)
+
+    health = {
+        'critical_warning': critical_warning,
+        'temperature': None,
+        'available_spare': available_spare,
+        'available_spare_threshold': spare_threshold,
+        'percentage_used': percentage_used,
+        'data_units_read': _uint128(buf, 32),
+        'data_units_written': _uint128(buf, 48),
+        'power_cycles': _uint128(buf, 112),
+        'power_on_hours': _uint128(buf, 128),
+        'unsafe_shutdowns': _uint128(buf, 144),
+        'media_errors': _uint128(buf, 160),
+        'num_err_log_entries': _uint128(buf, 176),
+    }
+    # the composite temperature is given in Kelvin
+    if temperature:
+        health['temperature'] = temperature - 273
+
+    return health
+
+
+# =============================================================================
+def read_health_log(device):
+    """
+    Reads the SMART / health information log page of the given NVMe
+    controller by the NVME_IOCTL_ADMIN_CMD ioctl (needs root privileges).
+
+    @raise IOError: on errors opening the device or executing the command
+    @raise OSError: on errors opening the device
+
+    @param device: the character device of the controller (e.g. '/dev/nvme0')
+                   or a block device of one of its namespaces
+    @type device: str
+
+    @return: the log page
+    @rtype: bytes
+
+    """
+
+    data = ctypes.create_string_buffer(NVME_HEALTH_LOG_SIZE)
+    numd = NVME_HEALTH_LOG_SIZE // 4 - 1
+    cmd = bytearray(struct.pack(
+        admin_cmd_format, NVME_ADMIN_GET_LOG_PAGE, 0, 0, NVME_NSID_ALL, 0, 0, 0,
+        ctypes.addressof(data), 0, NVME_HEALTH_LOG_SIZE,
+        (numd << 16) | NVME_LOG_HEALTH, 0, 0, 0, 0, 0, 0, 0))
+
+    fd = os.open(device, os.O_RDONLY)
+    try:
+        status = fcntl.ioctl(fd, NVME_IOCTL_ADMIN_CMD, cmd)
+    finally:
+        os.close(fd)
+
+    if status:
+        raise IOError("Get Log Page of %r failed with NVMe status 0x%x." % (device, status))
+
+    return data.raw
+
+
+# =============================================================================
+def critical_warnings(critical_warning):
+    """
+    Gives back the descriptions of all set bits of the critical warning field.
+
+    @param critical_warning: the critical warning field of the health log
+    @type critical_warning: int
+
+    @rtype: list of str
+
+    """
+
+    warnings = []
+    for (bit, text) in CRITICAL_WARNING_TEXTS:
+        if critical_warning & bit:
+            warnings.append(text)
+    if critical_warning & ~0x1f:
+        warnings.append('unknown warning 0x%02x' % (critical_warning & ~0x1f))
+
+    return warnings
+
+# =============================================================================
+
+if __name__ == "__main__":
+
+    pass
+
+# =============================================================================
+
+# vim: fileencoding=utf-8 filetype=python ts=4 expandtab
@@ -0,0 +1,164 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@copyright: © 2010 - 2016 by Frank Brehm, Berlin
+@summary: Module for a persistent cache of the cluster of a storage server
+          and the pservers of this cluster with a time to live
+"""
+
+# Standard modules
+import sys
+import time
+import logging
+
+# Third party modules
+
+# Own modules
+
+from nagios.plugin.statefile import NagiosStateFile, NagiosStateFileError
+
+# --------------------------------------------
+# Some module variables
+
+__version__ = '0.1.0'
+
+CACHE_VERSION = 1
+CACHE_FILENAME = 'pb-cluster-pservers.json'
+
+# The time in seconds, the cluster and its pservers are taken from the cache
+DEFAULT_PSERVER_CACHE_TTL = 900
+
+log = logging.getLogger(__name__)
+
+
+# =============================================================================
+class PserverCache(object):
+    """
+    Keeps the cluster of a storage server and the zones of the pservers
+    of this cluster by their names, because they change rarely.
+
+    The cache file has the format::
+
+        {
+            'version': CACHE_VERSION,
+            'hostname': '<storage server>',
+            'timestamp': <time of fetching from API>,
+            'cluster': '<cluster>',
+            'pservers': {
+                '<pserver>': <zone>,
+            },
+        }
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, hostname, state_dir=None, ttl=DEFAULT_PSERVER_CACHE_TTL):
+        """
+        Constructor.
+
+        @param hostname: the hostname of the storage server
+        @type hostname: str
+        @param state_dir: the directory of the cache file
+        @type state_dir: str or None
+        @param ttl: the time to live of the cache in seconds, 0 disables it
+        @type ttl: int
+
+        """
+
+        self.hostname = hostname
+        self.ttl = ttl
+        self.state_file = NagiosStateFile(CACHE_FILENAME, state_dir=state_dir)
+
+    # -------------------------------------------------------------------------
+    def __repr__(self):
+        """Typecasting into a string for reproduction."""
+
+        return "%s(%r, state_dir=%r, ttl=%r)" % (
+            self.__class__.__name__, self.hostname, self.state_file.state_dir, self.ttl)
+
+    # -------------------------------------------------------------------------
+    def load(self, now=None):
+        """
+        Reads the cache file, an invalid or expired cache is ignored.
+
+        @param now: the current timestamp
+        @type now: float or None
+
+        @return: the cluster and the zones of the pservers by their names
+                 or None, if they have to be fetched from API
+        @rtype: tuple or None
+
+        """
+
+        if not self.ttl:
+            return None
+        if now is None:
+            now = time.time()
+
+        data = self.state_file.load()
+        if (not isinstance(data, dict) or data.get('version') != CACHE_VERSION or
+                data.get('hostname') != self.hostname):
+            log.debug("No valid cache of the pservers found.")
+            return None
+
+        timestamp = data.get('timestamp')
+        if not isinstance(timestamp, (int, float)) or not 0 <= now - timestamp < self.ttl:
+            log.debug("The cache of the pservers is expired.")
+            return None
+
+        cluster = data.get('cluster')
+        pservers = data.get('pservers')
+        if not cluster or not isinstance(pservers, dict):
+            return None
+
+        if sys.version_info[0] <= 2:
+            cluster = cluster.encode('utf-8')
+            encoded = {}
+            for name in pservers:
+                encoded[name.encode('utf-8')] = pservers[name]
+            pservers = encoded
+
+        return (cluster, pservers)
+
+    # -------------------------------------------------------------------------
+    def save(self, cluster, pservers, now=None):
+        """
+        Saves the given cluster and pservers fetched from API. Errors on
+        writing are only logged.
+
+        @param cluster: the cluster of the storage server
+        @type cluster: str
+        @param pservers: the zones of the pservers by their names
+        @type pservers: dict
+        @param now: the current timestamp
+        @type now: float or None
+
+        """
+
+        if not self.ttl:
+            return
+        if now is None:
+            now = time.time()
+
+        data = {
+            'version': CACHE_VERSION,
+            'hostname': self.hostname,
+            'timestamp': int(now),
+            'cluster': cluster,
+            'pservers': pservers,
+        }
+        try:
+            self.state_file.save(data)
+        except NagiosStateFileError as e:
+            log.warning(str(e))
+
+# =============================================================================
+
+if __name__ == "__main__":
+
+    pass
+
+# =============================================================================
+
+# vim: fileencoding=utf-8 filetype=python ts=4 expandtab
@@ -0,0 +1,171 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@copyright: © 2010 - 2016 by Frank Brehm, Berlin
+@summary: Module for a persistent cache of the names of the SCST devices
+          of ProfitBricks volumes, which are the CRC-64 digests of their
+          GUIDs
+"""
+
+# Standard modules
+import logging
+
+# Third party modules
+
+# Own modules
+
+from nagios.common import crc64_digests
+
+from nagios.plugin.statefile import NagiosStateFile, NagiosStateFileError
+
+# --------------------------------------------
+# Some module variables
+
+__version__ = '0.1.1'
+
+CACHE_VERSION = 1
+CACHE_FILENAME = 'pb-scst-digests.json'
+
+log = logging.getLogger(__name__)
+
+
+# =============================================================================
+class ScstDigestCache(object):
+    """
+    Keeps the SCST device names (the CRC-64 digests) of the GUIDs of all
+    volumes requested in the last run, because the mapping of a GUID to
+    its digest never changes. Only the digests of new GUIDs are computed.
+
+    The cache file has the format::
+
+        {
+            'version': CACHE_VERSION,
+            'digests': {
+                '<GUID>': '<SCST device name>',
+            },
+        }
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, state_dir=None):
+        """
+        Constructor.
+
+        @param state_dir: the directory of the cache file
+        @type state_dir: str or None
+
+        """
+
+        self.state_file = NagiosStateFile(CACHE_FILENAME, state_dir=state_dir)
+
+        self.cached = {}
+        """
+        @ivar: the digests of the cache file by their GUIDs
+        @type: dict
+        """
+
+        self.current = {}
+        """
+        @ivar: the digests of all requested GUIDs, which are saved by save()
+        @type: dict
+        """
+
+        self.hits = 0
+        self.misses = 0
+
+    # -------------------------------------------------------------------------
+    def __repr__(self):
+        """Typecasting into a string for reproduction."""
+
+        return "%s(state_dir=%r)" % (self.__class__.__name__, self.state_file.state_dir)
+
+    # -------------------------------------------------------------------------
+    def load(self):
+        """
+        Reads the cache file, an invalid cache is ignored.
+
+        @return: the cached digests
+        @rtype: dict
+
+        """
+
+        self.cached = {}
+        self.current = {}
+        data = self.state_file.load()
+        if not isinstance(data, dict) or data.get('version') != CACHE_VERSION:
+            return self.cached
+
+        digests = data.get('digests')
+        if isinstance(digests, dict):
+            self.cached = digests
+
+        return self.cached
+
+    # -------------------------------------------------------------------------
+    def digests(self, guids):
+        """
+        Gives back the SCST device names of all given GUIDs, the digests
+        missing in the cache are computed in one batch.
+
+        @param guids: the GUIDs of the volumes
+        @type guids: iterable of str
+
+        @return: the CRC-64 digests with the GUIDs as keys
+        @rtype: dict
+
+        """
+
+        result = {}
+        missing = []
+        for guid in guids:
+            digest = self.current.get(guid)
+            if digest is None:
+                digest = self.cached.get(guid)
+                if digest is None:
+                    missing.append(guid)
+                    continue
+                self.hits += 1
+                self.current[guid] = digest
+            result[guid] = digest
+
+        if missing:
+            computed = crc64_digests(missing)
+            self.misses += len(computed)
+            self.current.update(computed)
+            result.update(computed)
+
+        return result
+
+    # -------------------------------------------------------------------------
+    def save(self):
+        """
+        Saves the digests of all requested GUIDs as the new cache, if anything
+        has changed, so digests of removed volumes are dropped. Errors on
+        writing are only logged.
+        """
+
+        log.debug("Cache of SCST device names: %d hits, %d misses.", self.hits, self.misses)
+
+        if not self.misses and len(self.current) == len(self.cached):
+            return
+
+        data = {
+            'version': CACHE_VERSION,
+            'digests': self.current,
+        }
+        try:
+            self.state_file.save(data)
+        except NagiosStateFileError as e:
+            log.warning(str(e))
+
+# =============================================================================
+
+if __name__ == "__main__":
+
+    pass
+
+# =============================================================================
+
+# vim: fileencoding=utf-8 filetype=python ts=4 expandtab
@@ -0,0 +1,253 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@copyright: © 2010 - 2016 by Frank Brehm, Berlin
+@summary: Module for walking through the SCST devices in sysfs with
+          os.scandir() and reading their small attribute files directly
+"""
+
+# Standard modules
+import os
+import errno
+import logging
+
+try:
+    from os import scandir
+except ImportError:
+    scandir = None
+
+# Third party modules
+
+# Own modules
+
+from nagios.plugin.extended import ExtNagiosPluginError
+
+# --------------------------------------------
+# Some module variables
+
+__version__ = '0.1.0'
+
+# The maximum size of a sysfs attribute (one page)
+ATTR_READ_SIZE = 4096
+
+# The read attributes of a SCST device with their descriptions
+DEVICE_ATTRIBUTES = (
+    ('filename', 'SCST export filename file'),
+    ('fc_ph_id', 'file for fc_ph_id'),
+    ('read_only', 'file for read_only'),
+)
+
+log = logging.getLogger(__name__)
+
+
+# =============================================================================
+class ScstAttributeError(ExtNagiosPluginError):
+    """Error on reading an attribute file of a SCST device."""
+
+    # -------------------------------------------------------------------------
+    def __init__(self, filename, desc, reason):
+
+        self.filename = filename
+        self.desc = desc
+        self.reason = reason
+
+    # -------------------------------------------------------------------------
+    def __str__(self):
+
+        desc = self.desc[0].upper() + self.desc[1:]
+        if self.reason == errno.ENOENT:
+            return "%s %r doesn't exists." % (desc, self.filename)
+        if self.reason == errno.EISDIR:
+            return "%s %r is not a regular file." % (desc, self.filename)
+        if self.reason in (errno.EACCES, errno.EPERM):
+            return "No read access for %s %r." % (self.desc, self.filename)
+        if self.reason is None:
+            return "No value found in %s %r." % (self.desc, self.filename)
+        return "Could not read %s %r: %s." % (
+            self.desc, self.filename, os.strerror(self.reason))
+
+
+# =============================================================================
+class _DirEntry(object):
+    """
+    A minimal replacement of the directory entries of os.scandir(), if it
+    is not available (Python < 3.5).
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, dirname, name):
+
+        self.name = name
+        self.path = os.path.join(dirname, name)
+
+    # -------------------------------------------------------------------------
+    def is_dir(self):
+
+        return os.path.isdir(self.path)
+
+    # -------------------------------------------------------------------------
+    def is_symlink(self):
+
+        return os.path.islink(self.path)
+
+
+# =============================================================================
+def list_dir(dirname):
+    """
+    Gives back the entries of the given directory. The entries of
+    os.scandir() know already their types without additional stat() calls.
+
+    @raise OSError: if the directory could not be read
+
+    @param dirname: the directory to list
+    @type dirname: str
+
+    @return: the directory entries with the attributes 'name' and 'path'
+             and the methods is_dir() and is_symlink()
+    @rtype: list
+
+    """
+
+    if scandir is not None:
+        return list(scandir(dirname))
+
+    entries = []
+    for name in os.listdir(dirname):
+        entries.append(_DirEntry(dirname, name))
+    return entries
+
+
+# =============================================================================
+def read_attribute(filename, desc='attribute file'):
+    """
+    Reads the first line of the given sysfs attribute file with a single
+    os.read() call.
+
+    @raise ScstAttributeError: if the file could not be read or is empty
+
+    @param filename: the attribute file to read
+    @type filename: str
+    @param desc: the description of the file used in error messages
+    @type desc: str
+
+    @return: the first line of the file without surrounding whitespace
+    @rtype: str
+
+    """
+
+    try:
+        fd = os.open(filename, os.O_RDONLY)
+        try:
+            content = os.read(fd, ATTR_READ_SIZE)
+        finally:
+            os.close(fd)
+    except (IOError, OSError) as e:
+        raise ScstAttributeError(filename, desc, e.errno)
+
+    if not isinstance(content, str):
+        content = content.decode('utf-8', 'replace')
+    lines = content.splitlines()
+    if not lines or not lines[0].strip():
+        raise ScstAttributeError(filename, desc, None)
+
+    return lines[0].strip()
+
+
+# =============================================================================
+def read_lun_link(link):
+    """
+    Evaluates the initiator group and the LUN of the given link of an
+    exported SCST device to the LUN directory of the initiator group
+    ('.../ini_groups/<ini_group>/luns/<lun>') from the link target
+    without resolving it in the file system.
+
+    @param link: the path of the link in the directory 'exported'
+    @type link: str
+
+    @return: the name of the initiator group and the LUN
+    @rtype: tuple of str
+
+    """
+
+    lun_dir = os.path.normpath(os.readlink(link))
+    ini_group = os.path.basename(os.path.dirname(os.path.dirname(lun_dir)))
+    return (ini_group, os.path.basename(lun_dir))
+
+
+# =============================================================================
+def scan_device(dev_dir):
+    """
+    Reads the data of the given SCST device directory. Errors on reading
+    the attributes don't raise an exception, they are given back in the
+    key 'errors', so the caller can decide about them.
+
+    The result has the form::
+
+        {   'devicename': '5ce99e968d67ded2',
+            'filename': '/dev/storage/0001-8aa6-91a2-19f911e39d8f',
+            'fc_ph_id': '600144f000018aa691a219f911e39d8f',
+            'read_only': '0',
+            'luns': {'pserver123': '26'},
+            'errors': {}}
+
+    where the values of unreadable attributes are None and 'errors' maps
+    their names to the ScstAttributeError.
+
+    @param dev_dir: the directory of the SCST device
+    @type dev_dir: str
+
+    @return: the data of the device or None, if it is not an exported
+             device with a handler or has vanished meanwhile
+    @rtype: dict or None
+
+    """
+
+    try:
+        entries = list_dir(dev_dir)
+    except OSError as e:
+        log.debug("Could not read SCST device directory %r: %s", dev_dir, e)
+        return None
+
+    names = {}
+    for entry in entries:
+        names[entry.name] = entry
+    if 'filename' not in names or 'handler' not in names:
+        return None
+
+    device = {
+        'devicename': os.path.basename(dev_dir),
+        'luns': {},
+        'errors': {},
+    }
+
+    exported = names.get('exported')
+    if exported is not None and exported.is_dir():
+        try:
+            for entry in list_dir(exported.path):
+                if not entry.is_symlink():
+                    continue
+                (ini_group, lun) = read_lun_link(entry.path)
+                device['luns'][ini_group] = lun
+        except OSError as e:
+            log.debug("Could not read exports of SCST device %r: %s", dev_dir, e)
+
+    for (attr, desc) in DEVICE_ATTRIBUTES:
+        device[attr] = None
+        try:
+            device[attr] = read_attribute(os.path.join(dev_dir, attr), desc)
+        except ScstAttributeError as e:
+            device['errors'][attr] = e
+
+    return device
+
+# =============================================================================
+
+if __name__ == "__main__":
+
+    pass
+
+# =============================================================================
+
+# vim: fileencoding=utf-8 filetype=python ts=4 expandtab
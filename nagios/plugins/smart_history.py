@@ -0,0 +1,354 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@copyright: © 2010 - 2016 by Frank Brehm, Berlin
+@summary: Module for the SmartHistory class, which keeps timestamped samples
+          of the SMART counters of a disk in a state file and evaluates
+          their growth rates per day
+"""
+
+# Standard modules
+import re
+import time
+import logging
+
+# Third party modules
+
+# Own modules
+
+from nagios.plugin.statefile import NagiosStateFile, NagiosStateFileError
+
+# --------------------------------------------
+# Some module variables
+
+__version__ = '0.2.0'
+
+HISTORY_VERSION = 1
+
+# The evaluated SMART counters kept in the history in the order of the
+# values in a sample (after the timestamp)
+HISTORY_FIELDS = ('nr_grown_defects', 'realloc_sectors', 'current_pending_sector')
+
+# The window in seconds, over which the growth rates are evaluated
+# and samples are kept
+DEFAULT_RATE_WINDOW = 24 * 3600
+
+# The minimum distance of two samples in the history in seconds
+DEFAULT_MIN_INTERVAL = 3600
+
+# The maximum number of kept changes of the wear level
+MAX_WEAR_CHANGES = 100
+
+SECONDS_PER_DAY = 24 * 3600
+
+log = logging.getLogger(__name__)
+
+re_unsafe_chars = re.compile(r'[^\w.-]+')
+
+
+# =============================================================================
+def history_filename(serial):
+    """
+    Gives back the basename of the history file of the disk with the given
+    serial number.
+
+    @param serial: the serial number of the disk
+    @type serial: str
+
+    @rtype: str
+
+    """
+
+    return 'smart-history-%s.json' % (re_unsafe_chars.sub('_', serial.strip()))
+
+
+# =============================================================================
+def growth_rates(samples, now, window=DEFAULT_RATE_WINDOW, min_span=DEFAULT_MIN_INTERVAL):
+    """
+    Evaluates the growth rates per day of all fields of the last sample
+    against the oldest sample inside the window. Shorter spans than min_span
+    are not evaluated, because a single new defect would lead to an
+    exaggerated rate.
+
+    @param samples: the samples as lists of the timestamp and the values
+                    of HISTORY_FIELDS, sorted by the timestamp
+    @type samples: list of list
+    @param now: the timestamp of the last sample
+    @type now: float
+    @param window: the window in seconds to evaluate
+    @type window: float
+    @param min_span: the minimum span in seconds between the evaluated samples
+    @type min_span: float
+
+    @return: the growth rates per day with the names of the fields as keys,
+             fields without values are omitted. The dict is empty, if there
+             is no sample inside the window at least min_span older than
+             the last sample.
+    @rtype: dict
+
+    """
+
+    rates = {}
+    if len(samples) < 2:
+        return rates
+
+    current = samples[-1]
+    ref = None
+    for sample in samples[:-1]:
+        if sample[0] >= now - window:
+            ref = sample
+            break
+    if ref is None or current[0] - ref[0] < max(min_span, 1):
+        return rates
+
+    days = float(current[0] - ref[0]) / SECONDS_PER_DAY
+    for i in range(len(HISTORY_FIELDS)):
+        if current[i + 1] is None or ref[i + 1] is None:
+            continue
+        rates[HISTORY_FIELDS[i]] = (current[i + 1] - ref[i + 1]) / days
+
+    return rates
+
+
+# =============================================================================
+def wear_rate(changes):
+    """
+    Evaluates the change rate per day of the wear level (the remaining
+    lifetime in percent) of a SSD between its first and last change.
+
+    @param changes: the changes of the wear level as lists of the timestamp
+                    of the first observation and the wear level
+    @type changes: list of list
+
+    @return: the change rate per day (negative on wearing) or None, if
+             there are not enough changes
+    @rtype: float or None
+
+    """
+
+    if len(changes) < 2:
+        return None
+
+    days = float(changes[-1][0] - changes[0][0]) / SECONDS_PER_DAY
+    if days <= 0:
+        return None
+
+    return (changes[-1][1] - changes[0][1]) / days
+
+
+# =============================================================================
+class SmartHistory(object):
+    """
+    Keeps timestamped samples of the SMART counters of one disk, identified
+    by its serial number, in a state file.
+
+    Only one sample per min_interval is stored and only the samples inside
+    the rate window are kept, so the history of a disk keeps small
+    regardless of the check interval.
+
+    The wear level of SSDs changes too slow for the rate window, so only
+    its changes are kept (the last MAX_WEAR_CHANGES ones) to project the
+    remaining lifetime.
+
+    The history has the format::
+
+        {
+            'version': HISTORY_VERSION,
+            'serial': '<serial number>',
+            'fields': HISTORY_FIELDS,
+            'samples': [[<timestamp>, <value>, ...], ...],
+            'wear': [[<timestamp>, <wear level>], ...],
+        }
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(
+            self, serial, state_dir=None, window=DEFAULT_RATE_WINDOW,
+            min_interval=DEFAULT_MIN_INTERVAL):
+        """
+        Constructor.
+
+        @param serial: the serial number of the disk
+        @type serial: str
+        @param state_dir: the directory of the history file
+        @type state_dir: str or None
+        @param window: the window in seconds, over which the growth rates
+                       are evaluated and samples are kept
+        @type window: float
+        @param min_interval: the minimum distance of two stored samples
+                             in seconds
+        @type min_interval: float
+
+        """
+
+        self.serial = serial
+        self.window = window
+        self.min_interval = min_interval
+        self.state_file = NagiosStateFile(history_filename(serial), state_dir=state_dir)
+
+    # -------------------------------------------------------------------------
+    def __repr__(self):
+        """Typecasting into a string for reproduction."""
+
+        return "%s(%r, state_dir=%r, window=%r, min_interval=%r)" % (
+            self.__class__.__name__, self.serial, self.state_file.state_dir,
+            self.window, self.min_interval)
+
+    # -------------------------------------------------------------------------
+    def _load(self):
+
+        history = self.state_file.load()
+        if not isinstance(history, dict):
+            return None
+        if history.get('version') != HISTORY_VERSION:
+            return None
+        if history.get('serial') != self.serial:
+            log.debug("History file %r belongs to another disk.", self.state_file.path)
+            return None
+        if list(history.get('fields') or []) != list(HISTORY_FIELDS):
+            return None
+        return history
+
+    # -------------------------------------------------------------------------
+    def load(self, history=None):
+        """
+        Reads the samples of the history file.
+
+        @param history: the already read content of the history file
+        @type history: dict or None
+
+        @return: the samples sorted by their timestamps, an empty list,
+                 if there is no valid history
+        @rtype: list of list
+
+        """
+
+        if history is None:
+            history = self._load()
+            if history is None:
+                return []
+
+        samples = []
+        for sample in history.get('samples') or []:
+            if isinstance(sample, list) and len(sample) == len(HISTORY_FIELDS) + 1:
+                samples.append(sample)
+        samples.sort(key=lambda x: x[0])
+
+        return samples
+
+    # -------------------------------------------------------------------------
+    def load_wear(self, history=None):
+        """
+        Reads the changes of the wear level of the history file.
+
+        @param history: the already read content of the history file
+        @type history: dict or None
+
+        @return: the changes as lists of the timestamp and the wear level
+        @rtype: list of list
+
+        """
+
+        if history is None:
+            history = self._load()
+            if history is None:
+                return []
+
+        changes = []
+        for change in history.get('wear') or []:
+            if isinstance(change, list) and len(change) == 2:
+                changes.append(change)
+        changes.sort(key=lambda x: x[0])
+
+        return changes
+
+    # -------------------------------------------------------------------------
+    def update(self, disk_data, now=None):
+        """
+        Adds the counters of the given disk data to the history and evaluates
+        the growth rates per day. Errors on writing the history file are
+        only logged.
+
+        @param disk_data: the evaluated data of the disk
+        @type disk_data: dict
+        @param now: the timestamp of the sample, the current time, if None
+        @type now: float or None
+
+        @return: the growth rates per day (see growth_rates()) and the change
+                 rate of the wear level per day (see wear_rate()) with the
+                 key 'wear_level', if it can be evaluated
+        @rtype: dict
+
+        """
+
+        if now is None:
+            now = time.time()
+        now = int(now)
+
+        current = [now]
+        for field in HISTORY_FIELDS:
+            current.append(disk_data.get(field))
+
+        locked = True
+        try:
+            self.state_file.lock()
+        except (IOError, OSError, NagiosStateFileError) as e:
+            log.warning("Could not lock %r: %s", self.state_file.lock_path, e)
+            locked = False
+
+        try:
+            history = self._load()
+            samples = []
+            changes = []
+            if history is not None:
+                for sample in self.load(history):
+                    if sample[0] >= now - self.window and sample[0] < now:
+                        samples.append(sample)
+                changes = self.load_wear(history)
+
+            rates = growth_rates(samples + [current], now, self.window, self.min_interval)
+
+            changed = False
+            wear_level = disk_data.get('wear_level')
+            if wear_level is not None and (not changes or changes[-1][1] != wear_level):
+                changes.append([now, wear_level])
+                changes = changes[-MAX_WEAR_CHANGES:]
+                changed = True
+
+            rate = wear_rate(changes)
+            if rate is not None:
+                rates['wear_level'] = rate
+
+            if not samples or now - samples[-1][0] >= self.min_interval:
+                samples.append(current)
+                changed = True
+
+            if changed and locked:
+                history = {
+                    'version': HISTORY_VERSION,
+                    'serial': self.serial,
+                    'fields': list(HISTORY_FIELDS),
+                    'samples': samples,
+                    'wear': changes,
+                }
+                try:
+                    self.state_file.save(history)
+                except NagiosStateFileError as e:
+                    log.warning(str(e))
+        finally:
+            if locked:
+                self.state_file.unlock()
+
+        return rates
+
+# =============================================================================
+
+if __name__ == "__main__":
+
+    pass
+
+# =============================================================================
+
+# vim: fileencoding=utf-8 filetype=python ts=4 expandtab
@@ -0,0 +1,379 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@copyright: © 2010 - 2016 by Frank Brehm, Berlin
+@summary: Module for a non-blocking TCP client sending a request to a
+          daemon (e.g. PPD or VCB) and reading its reply until it is
+          complete, built on selectors
+"""
+
+# Standard modules
+import sys
+import errno
+import select
+import socket
+import logging
+
+try:
+    import selectors
+except ImportError:
+    selectors = None
+
+# Third party modules
+
+# Own modules
+
+from nagios.common import monotonic
+
+from nagios.plugin import NagiosPluginError
+
+from nagios.plugin.workers import call_with_timeout, WorkerTimeoutError
+
+# --------------------------------------------
+# Some module variables
+
+__version__ = '0.2.0'
+
+DEFAULT_TIMEOUT = 30
+DEFAULT_BUFFER_SIZE = 8192
+
+# The end of a single record of a reply (e.g. a status line)
+DEFAULT_TERMINATOR = b'\n'
+
+# The maximum time in seconds of a single wait for the socket, after it
+# the cancel callback is asked again
+DEFAULT_POLLING_INTERVAL = 0.5
+
+# The results of a non-blocking connect(), which are still in progress
+CONNECT_IN_PROGRESS = (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY)
+
+READ = 'read'
+WRITE = 'write'
+
+log = logging.getLogger(__name__)
+
+
+# =============================================================================
+class SocketTransportError(NagiosPluginError):
+    pass
+
+
+# =============================================================================
+class SocketConnectTimeoutError(SocketTransportError):
+    pass
+
+
+# =============================================================================
+class NoListeningError(SocketTransportError):
+    pass
+
+
+# =============================================================================
+class _Poller(object):
+    """
+    Waits for a single socket to become readable or writeable with a
+    selector of the selectors module or with select.select(), if it is not
+    available (Python < 3.4).
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, sock):
+
+        self.sock = sock
+        self.event = None
+        self.selector = None
+        if selectors is not None:
+            self.selector = selectors.DefaultSelector()
+
+    # -------------------------------------------------------------------------
+    def wait(self, event, timeout):
+        """
+        Waits for the given event (READ or WRITE).
+
+        @return: whether the socket is ready
+        @rtype: bool
+
+        """
+
+        try:
+            if self.selector is None:
+                if event == READ:
+                    ready = select.select([self.sock], [], [], timeout)[0]
+                else:
+                    ready = select.select([], [self.sock], [], timeout)[1]
+                return bool(ready)
+
+            sel_event = selectors.EVENT_READ
+            if event == WRITE:
+                sel_event = selectors.EVENT_WRITE
+            if self.event is None:
+                self.selector.register(self.sock, sel_event)
+            elif self.event != sel_event:
+                self.selector.modify(self.sock, sel_event)
+            self.event = sel_event
+            return bool(self.selector.select(timeout))
+
+        except (select.error, OSError) as e:
+            if e.args and e.args[0] == errno.EINTR:
+                return False
+            raise
+
+    # -------------------------------------------------------------------------
+    def close(self):
+
+        if self.selector is not None:
+            self.selector.close()
+            self.selector = None
+
+
+# =============================================================================
+class SocketClient(object):
+    """
+    Sends a request to a daemon over TCP and gives back its reply. All
+    socket operations and the name resolution are limited by a common
+    timeout, the reply is read into a bytearray until the given callback
+    finds a received record complete or the daemon closes the connection,
+    so the request takes only the round trip time of the daemon. Only the
+    newly received data is searched for the end of a record, so every
+    record is decoded and given to the callback once.
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(
+            self, host_address, port, timeout=DEFAULT_TIMEOUT, buffer_size=DEFAULT_BUFFER_SIZE,
+            polling_interval=DEFAULT_POLLING_INTERVAL, name='Daemon'):
+        """
+        Constructor.
+
+        @param host_address: the DNS name or IP address of the host
+        @type host_address: str
+        @param port: the TCP port of the daemon
+        @type port: int
+        @param timeout: the timeout of the whole request in seconds
+        @type timeout: float
+        @param buffer_size: the maximum size of a single read
+        @type buffer_size: int
+        @param polling_interval: the maximum time of a single wait, after
+                                 it the cancel callback is asked again
+        @type polling_interval: float
+        @param name: the name of the daemon used in error messages
+        @type name: str
+
+        """
+
+        self.host_address = host_address
+        self.port = port
+        self.timeout = timeout
+        self.buffer_size = buffer_size
+        self.polling_interval = polling_interval
+        self.name = name
+
+    # -------------------------------------------------------------------------
+    def __repr__(self):
+        """Typecasting into a string for reproduction."""
+
+        return "%s(%r, %r, timeout=%r, buffer_size=%r, polling_interval=%r, name=%r)" % (
+            self.__class__.__name__, self.host_address, self.port, self.timeout,
+            self.buffer_size, self.polling_interval, self.name)
+
+    # -------------------------------------------------------------------------
+    def _wait(self, poller, event, deadline, should_stop):
+        """
+        Waits for the given event in slices of the polling interval.
+
+        @raise SocketTransportError: if the request was canceled
+
+        @return: whether the socket is ready, False after the deadline
+        @rtype: bool
+
+        """
+
+        while True:
+            if should_stop is not None and should_stop():
+                raise SocketTransportError("Canceled.")
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                return False
+            if poller.wait(event, min(remaining, self.polling_interval)):
+                return True
+
+    # -------------------------------------------------------------------------
+    def connect(self, deadline, should_stop=None):
+        """
+        Connects to the daemon with non-blocking sockets, all addresses of
+        the host are tried until the deadline. The blocking name resolution
+        is waited for until the deadline only.
+
+        @raise NoListeningError: if the daemon isn't listening on any address
+        @raise SocketConnectTimeoutError: if the deadline expired
+
+        @return: the connected non-blocking socket
+        @rtype: socket.socket
+
+        """
+
+        def resolve():
+            return socket.getaddrinfo(
+                self.host_address, self.port, socket.AF_UNSPEC, socket.SOCK_STREAM)
+
+        try:
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                raise WorkerTimeoutError(self.host_address)
+            addresses = call_with_timeout(resolve, remaining)
+        except WorkerTimeoutError:
+            raise SocketConnectTimeoutError("Timeout resolving %r." % (self.host_address))
+        except socket.gaierror as e:
+            raise SocketTransportError("Could not resolve %r: %s" % (self.host_address, e))
+
+        for res in addresses:
+
+            log.debug("Socket address info: %r", res)
+            (af, socktype, proto, canonname, sa) = res
+
+            try:
+                sock = socket.socket(af, socktype, proto)
+            except socket.error as e:
+                log.debug("Could not create socket: %s", e)
+                continue
+
+            poller = _Poller(sock)
+            try:
+                sock.setblocking(0)
+                err = sock.connect_ex(sa)
+                if err in CONNECT_IN_PROGRESS:
+                    if not self._wait(poller, WRITE, deadline, should_stop):
+                        raise SocketConnectTimeoutError("Timeout connecting to %r port %d." % (
+                            self.host_address, self.port))
+                    err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            except Exception:
+                sock.close()
+                raise
+            finally:
+                poller.close()
+
+            if not err:
+                log.debug("Connected to %s.", str(sa))
+                return sock
+            log.debug("Could not connect to %s: %s", str(sa), errno.errorcode.get(err, err))
+            sock.close()
+
+        raise NoListeningError("%s seems not to listen on %r, port %d." % (
+            self.name, self.host_address, self.port))
+
+    # -------------------------------------------------------------------------
+    def request(
+            self, message, is_complete=None, should_stop=None,
+            terminator=DEFAULT_TERMINATOR):
+        """
+        Sends the message to the daemon and reads its reply.
+
+        @raise NoListeningError: if the daemon isn't listening on the given port
+        @raise SocketTransportError: on some communication errors or timeouts
+
+        @param message: the message to send
+        @type message: str
+        @param is_complete: a function getting every received record without
+                            its terminator, which gives back True, if the
+                            reply is complete with it, without it the reply
+                            is read until the daemon closes the connection
+        @type is_complete: callable or None
+        @param should_stop: a function giving back True, if the request
+                            should be canceled
+        @type should_stop: callable or None
+        @param terminator: the end of a record of the reply
+        @type terminator: bytes
+
+        @return: the reply of the daemon
+        @rtype: str
+
+        """
+
+        begin = monotonic()
+        deadline = begin + self.timeout
+
+        if not isinstance(message, bytes):
+            message = message.encode('utf-8')
+
+        sock = self.connect(deadline, should_stop)
+        poller = _Poller(sock)
+        try:
+
+            # Sending the message
+            pos = 0
+            while pos < len(message):
+                if not self._wait(poller, WRITE, deadline, should_stop):
+                    raise SocketTransportError(
+                        'Timeout after %0.2f seconds.' % (monotonic() - begin))
+                try:
+                    pos += sock.send(message[pos:])
+                except socket.error as e:
+                    if e.args[0] not in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                        raise SocketTransportError("Could not send to %r port %d: %s" % (
+                            self.host_address, self.port, e))
+
+            # Reading the reply
+            buf = bytearray()
+            record_start = 0
+            complete = False
+            while not complete:
+                if not self._wait(poller, READ, deadline, should_stop):
+                    raise SocketTransportError(
+                        'Timeout after %0.2f seconds.' % (monotonic() - begin))
+                try:
+                    data = sock.recv(self.buffer_size)
+                except socket.error as e:
+                    if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                        continue
+                    if e.args[0] == errno.ECONNRESET and buf:
+                        log.debug("Connection reset by remote.")
+                        break
+                    raise SocketTransportError("Could not read from %r port %d: %s" % (
+                        self.host_address, self.port, e))
+                if not data:
+                    log.debug("Socket closed from remote.")
+                    break
+                log.debug("Got data %r.", data)
+                search_start = max(record_start, len(buf) - len(terminator) + 1)
+                buf.extend(data)
+                if is_complete is None:
+                    continue
+
+                # searching only the new data for the end of a record
+                end = buf.find(terminator, search_start)
+                while end >= 0:
+                    record = self.decode(buf[record_start:end])
+                    record_start = end + len(terminator)
+                    if is_complete(record):
+                        log.debug("Got a complete reply.")
+                        complete = True
+                        break
+                    end = buf.find(terminator, record_start)
+
+        finally:
+            poller.close()
+            sock.close()
+
+        log.debug("Got reply after %0.4f seconds.", monotonic() - begin)
+        return self.decode(buf)
+
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def decode(buf):
+        """The given received bytes as a native string."""
+
+        if sys.version_info[0] > 2:
+            return buf.decode('utf-8', 'replace')
+        return str(buf)
+
+# =============================================================================
+
+if __name__ == "__main__":
+
+    pass
+
+# =============================================================================
+
+# vim: fileencoding=utf-8 filetype=python ts=4 expandtab
@@ -0,0 +1,377 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@copyright: © 2010 - 2016 by Frank Brehm, Berlin
+@summary: Module for reading the remove timestamps of the configuration
+          files (.ini) of ProfitBricks storage volumes with a persistent
+          cache of the already parsed files
+"""
+
+# Standard modules
+import os
+import re
+import logging
+
+try:
+    from os import scandir
+except ImportError:
+    scandir = None
+
+# Third party modules
+
+# Own modules
+
+from nagios.plugin.extended import ExtNagiosPluginError
+from nagios.plugin.statefile import NagiosStateFile, NagiosStateFileError
+
+# --------------------------------------------
+# Some module variables
+
+__version__ = '0.1.0'
+
+CACHE_VERSION = 1
+CACHE_FILENAME = 'pb-volume-configs.json'
+
+log = logging.getLogger(__name__)
+
+re_section = re.compile(r'^\[([^\]]+)\]')
+
+
+# =============================================================================
+class CfgFileNotValidError(ExtNagiosPluginError):
+
+    # -------------------------------------------------------------------------
+    def __init__(self, cfg_file, msg):
+
+        self.cfg_file = cfg_file
+        self.msg = None
+        if msg:
+            m = str(msg).strip()
+            if m:
+                self.msg = m
+
+    # -------------------------------------------------------------------------
+    def __str__(self):
+
+        msg = "Invalid configuration file %r" % (self.cfg_file)
+        if self.msg:
+            msg += ": %s" % (self.msg)
+        msg += "."
+        return msg
+
+
+# =============================================================================
+def scan_remove_timestamp(content, cfg_file='<string>'):
+    """
+    Scans the content of a volume configuration file for the option
+    'remove_object' in the section [Volume] in a single pass, without
+    building a complete ConfigParser object. Files, which ConfigParser
+    would reject (lines outside of a section, lines without a delimiter,
+    duplicate sections or options), are invalid like before.
+
+    @raise CfgFileNotValidError: if the content is not valid or the timestamp
+                                 is not an integer
+
+    @param content: the content of the configuration file
+    @type content: str
+    @param cfg_file: the name of the file used in error messages
+    @type cfg_file: str
+
+    @return: the remove timestamp or None, if there is none
+    @rtype: int or None
+
+    """
+
+    section = None
+    sections = set()
+    options = set()
+    option = None
+    value = None
+
+    for line in content.splitlines():
+
+        stripped = line.strip()
+        if not stripped or stripped[0] in '#;':
+            continue
+
+        # continuation line of a multi line value
+        if line[0].isspace() and option is not None:
+            if option == 'remove_object' and section == 'Volume':
+                value += '\n' + stripped
+            continue
+
+        if stripped.startswith('['):
+            match = re_section.search(stripped)
+            if not match:
+                raise CfgFileNotValidError(cfg_file, "Invalid section header %r" % (stripped))
+            section = match.group(1)
+            if section in sections:
+                raise CfgFileNotValidError(cfg_file, "Duplicate section %r" % (section))
+            sections.add(section)
+            options = set()
+            option = None
+            continue
+
+        if section is None:
+            raise CfgFileNotValidError(cfg_file, "File contains no section headers")
+
+        pos = -1
+        for delimiter in ('=', ':'):
+            i = stripped.find(delimiter)
+            if i > 0 and (pos < 0 or i < pos):
+                pos = i
+        if pos < 0:
+            raise CfgFileNotValidError(cfg_file, "Invalid line %r" % (stripped))
+
+        option = stripped[:pos].strip().lower()
+        if option in options:
+            raise CfgFileNotValidError(cfg_file, "Duplicate option %r in section %r" % (
+                option, section))
+        options.add(option)
+        if option == 'remove_object' and section == 'Volume':
+            value = stripped[pos + 1:].strip()
+
+    if value is None:
+        return None
+
+    try:
+        return int(value)
+    except ValueError as e:
+        raise CfgFileNotValidError(cfg_file, "%s: %s" % (e.__class__.__name__, e))
+
+
+# =============================================================================
+def read_remove_timestamp(cfg_file):
+    """
+    Reads the remove timestamp of the given volume configuration file.
+    Unreadable files are treated like files without a remove timestamp,
+    like ConfigParser.read() does.
+
+    @raise CfgFileNotValidError: if the file is not valid
+
+    @param cfg_file: the configuration file
+    @type cfg_file: str
+
+    @return: the remove timestamp or None, if there is none
+    @rtype: int or None
+
+    """
+
+    try:
+        fh = open(cfg_file, 'r')
+        try:
+            content = fh.read()
+        finally:
+            fh.close()
+    except (IOError, OSError) as e:
+        log.debug("Could not read %r: %s", cfg_file, e)
+        return None
+    except ValueError as e:
+        # e.g. an UnicodeDecodeError
+        raise CfgFileNotValidError(cfg_file, "%s: %s" % (e.__class__.__name__, e))
+
+    return scan_remove_timestamp(content, cfg_file)
+
+
+# =============================================================================
+class VolumeConfigCache(object):
+    """
+    Gives the remove timestamps of the configuration files of storage volumes
+    from a persistent cache, only new or changed files (by their modification
+    time and size) are parsed again.
+
+    The configuration directory is listed once by scan(), so the existence
+    of the configuration file of a volume needs no additional system call.
+
+    The cache has the format::
+
+        {
+            'version': CACHE_VERSION,
+            'config_dir': '<configuration directory>',
+            'files': {
+                '<filename>': [<mtime>, <size>, <timestamp>, <error>],
+            },
+        }
+
+    where <error> is the reason, why the file is not valid, or None.
+    """
+
+    # -------------------------------------------------------------------------
+    def __init__(self, config_dir, state_dir=None):
+        """
+        Constructor.
+
+        @param config_dir: the directory of the volume configuration files
+        @type config_dir: str
+        @param state_dir: the directory of the cache file
+        @type state_dir: str or None
+
+        """
+
+        self.config_dir = config_dir
+        self.state_file = NagiosStateFile(CACHE_FILENAME, state_dir=state_dir)
+
+        self.files = {}
+        """
+        @ivar: the files of the configuration directory as directory entries
+               (of os.scandir()) or None (if os.scandir() is not available)
+        @type: dict
+        """
+
+        self.cached = {}
+        """
+        @ivar: the entries of the cache file
+        @type: dict
+        """
+
+        self.current = {}
+        """
+        @ivar: the entries of all requested files, which are saved by save()
+        @type: dict
+        """
+
+        self.hits = 0
+        self.misses = 0
+
+    # -------------------------------------------------------------------------
+    def __repr__(self):
+        """Typecasting into a string for reproduction."""
+
+        return "%s(%r, state_dir=%r)" % (
+            self.__class__.__name__, self.config_dir, self.state_file.state_dir)
+
+    # -------------------------------------------------------------------------
+    def load(self):
+        """
+        Reads the cache file, an invalid cache is ignored.
+
+        @return: the cached entries
+        @rtype: dict
+
+        """
+
+        self.cached = {}
+        data = self.state_file.load()
+        if not isinstance(data, dict):
+            return self.cached
+        if data.get('version') != CACHE_VERSION:
+            return self.cached
+        if data.get('config_dir') != self.config_dir:
+            return self.cached
+
+        files = data.get('files')
+        if isinstance(files, dict):
+            for filename in files:
+                entry = files[filename]
+                if isinstance(entry, list) and len(entry) == 4:
+                    self.cached[filename] = entry
+
+        return self.cached
+
+    # -------------------------------------------------------------------------
+    def scan(self):
+        """
+        Reads the cache and lists the configuration directory.
+        A missing configuration directory is treated as an empty one.
+        """
+
+        self.load()
+        self.files = {}
+        self.current = {}
+
+        try:
+            if scandir is not None:
+                for entry in scandir(self.config_dir):
+                    self.files[entry.name] = entry
+            else:
+                for filename in os.listdir(self.config_dir):
+                    self.files[filename] = None
+        except (IOError, OSError) as e:
+            log.debug("Could not list %r: %s", self.config_dir, e)
+
+        log.debug("Found %d files in %r.", len(self.files), self.config_dir)
+
+    # -------------------------------------------------------------------------
+    def exists(self, filename):
+        """Checks, whether the given file was found by scan()."""
+
+        return filename in self.files
+
+    # -------------------------------------------------------------------------
+    def remove_timestamp(self, filename):
+        """
+        Gives back the remove timestamp of the given configuration file,
+        which must be found by scan() before.
+
+        @raise CfgFileNotValidError: if the file is not valid
+        @raise KeyError: if the file was not found by scan()
+
+        @param filename: the name of the file in the configuration directory
+        @type filename: str
+
+        @return: the remove timestamp or None, if there is none
+        @rtype: int or None
+
+        """
+
+        dir_entry = self.files[filename]
+        cfg_file = os.path.join(self.config_dir, filename)
+
+        try:
+            if dir_entry is not None:
+                st = dir_entry.stat()
+            else:
+                st = os.stat(cfg_file)
+        except (IOError, OSError) as e:
+            log.debug("Could not stat %r: %s", cfg_file, e)
+            return read_remove_timestamp(cfg_file)
+
+        entry = self.cached.get(filename)
+        if entry is not None and entry[0] == st.st_mtime and entry[1] == st.st_size:
+            self.hits += 1
+        else:
+            self.misses += 1
+            try:
+                entry = [st.st_mtime, st.st_size, read_remove_timestamp(cfg_file), None]
+            except CfgFileNotValidError as e:
+                entry = [st.st_mtime, st.st_size, None, e.msg or '']
+        self.current[filename] = entry
+
+        if entry[3] is not None:
+            raise CfgFileNotValidError(cfg_file, entry[3])
+        return entry[2]
+
+    # -------------------------------------------------------------------------
+    def save(self):
+        """
+        Saves the entries of all requested files as the new cache, if anything
+        has changed, so entries of removed volumes are dropped. Errors on
+        writing are only logged.
+        """
+
+        log.debug("Cache of volume configurations: %d hits, %d misses.", self.hits, self.misses)
+
+        if not self.misses and len(self.current) == len(self.cached):
+            return
+
+        data = {
+            'version': CACHE_VERSION,
+            'config_dir': self.config_dir,
+            'files': self.current,
+        }
+        try:
+            self.state_file.save(data)
+        except NagiosStateFileError as e:
+            log.warning(str(e))
+
+# =============================================================================
+
+if __name__ == "__main__":
+
+    pass
+
+# =============================================================================
+
+# vim: fileencoding=utf-8 filetype=python ts=4 expandtab
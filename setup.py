@@ -65,7 +65,4 @@ setup(
         'Topic :: Software Development :: Libraries :: Python Modules',
     ],
     data_files=datafiles,
-    requires=[
-        'pb_base (>= 0.5.4)',
-    ]
 )
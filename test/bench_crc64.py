@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: benchmark of the ways to get the names of the SCST devices
+          (the CRC-64 digests) of many GUIDs: pb_base.crc (if installed),
+          the table driven CRC-64 of nagios.common single and batched and
+          the persistent cache ScstDigestCache
+'''
+
+import os
+import sys
+import shutil
+import timeit
+import argparse
+import tempfile
+
+libdir = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), '..'))
+sys.path.insert(0, libdir)
+
+import lvm_samples
+
+from nagios.common import crc64_digest, crc64_digests
+
+from nagios.plugins.scst_digests import ScstDigestCache
+
+#==============================================================================
+def cache_run(guids, state_dir):
+
+    cache = ScstDigestCache(state_dir=state_dir)
+    cache.load()
+    cache.digests(guids)
+    cache.save()
+
+    def run():
+        cache = ScstDigestCache(state_dir=state_dir)
+        cache.load()
+        cache.digests(guids)
+        cache.save()
+
+    return run
+
+#==============================================================================
+
+if __name__ == '__main__':
+
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument(
+        '-g', '--guids', type=int, default=10000,
+        help='Number of GUIDs (Default: %(default)d).')
+    arg_parser.add_argument(
+        '-n', '--number', type=int, default=3,
+        help='Number of runs per measurement (Default: %(default)d).')
+    arg_parser.add_argument(
+        '-r', '--repeat', type=int, default=3,
+        help='Number of measurements, the best is taken (Default: %(default)d).')
+    args = arg_parser.parse_args()
+
+    guids = []
+    for nr in range(args.guids):
+        guids.append('600144f0-' + lvm_samples.lv_name(nr))
+
+    tmp_dir = tempfile.mkdtemp(prefix='bench-crc64-')
+    try:
+        runs = []
+        try:
+            from pb_base.crc import crc64_digest as pb_crc64_digest
+            runs.append(('pb_base.crc', lambda: [pb_crc64_digest(x) for x in guids]))
+        except ImportError as e:
+            print("Skipping pb_base.crc: %s" % (e))
+        runs.append(('crc64_digest', lambda: [crc64_digest(x) for x in guids]))
+        runs.append(('crc64_digests', lambda: crc64_digests(guids)))
+        runs.append(('ScstDigestCache (warm)', cache_run(guids, tmp_dir)))
+
+        print("%-24s %8s %14s %14s" % ('method', 'GUIDs', 'ms per run', 'us per GUID'))
+        for (name, func) in runs:
+            timer = timeit.Timer(func)
+            t = min(timer.repeat(repeat=args.repeat, number=args.number)) / args.number * 1000.0
+            print("%-24s %8d %14.3f %14.3f" % (name, args.guids, t, t * 1000.0 / args.guids))
+
+    finally:
+        shutil.rmtree(tmp_dir, True)
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: end-to-end benchmark of the DCManager client plugins against the
+          local DCManager API stand-in (see dcm_server) with synthetic
+          datasets of different sizes, every plugin run is executed in its
+          own process to report its wall time and its peak RSS
+'''
+
+import os
+import sys
+import time
+import atexit
+import shutil
+import argparse
+import tempfile
+import resource
+import subprocess
+
+libdir = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), '..'))
+sys.path.insert(0, libdir)
+
+import lvm_samples
+import dcm_samples
+
+from dcm_server import DcmStandInServer
+
+from nagios.common import crc64_digest
+
+from nagios.plugin.fixtures import FixtureArchive, ENV_REPLAY
+
+PLUGINS = ('dcmanager_api', 'consistence_storage', 'storage_exports')
+
+#==============================================================================
+def build_root(root, volumes, data, hostname):
+    """
+    Builds the fixture archive with the output of 'lvm lvs', the volume
+    configuration directory and the SCST sysfs tree below root.
+    """
+
+    archive = FixtureArchive(os.path.join(root, 'fixtures.json.gz'), mode='record')
+    archive.add_command(
+        ['lvm', 'lvs', '--nosuffix', '--noheadings', '--units', 'b', '--separator', ';',
+            '-o', ','.join(lvm_samples.LV_FIELDS)], 0, lvm_samples.lvs_output(volumes))
+    archive.save()
+
+    dcm_samples.build_config_dir(os.path.join(root, 'config'), volumes)
+    os.mkdir(os.path.join(root, 'state'))
+
+    dcm_samples.build_scst_tree(os.path.join(root, 'scst'), data, crc64_digest, hostname)
+
+#------------------------------------------------------------------------------
+def peak_rss():
+    """
+    The peak RSS of the current process in KiB. The high water mark of
+    /proc/self/status is taken, because ru_maxrss keeps the RSS of the
+    forking benchmark process over the exec().
+    """
+
+    try:
+        fh = open('/proc/self/status')
+        try:
+            for line in fh:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+        finally:
+            fh.close()
+    except (IOError, OSError):
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+#------------------------------------------------------------------------------
+def write_peak_rss(filename):
+
+    fh = open(filename, 'w')
+    try:
+        fh.write("%d\n" % (peak_rss()))
+    finally:
+        fh.close()
+
+#------------------------------------------------------------------------------
+def run_plugin(name, root, plugin_args):
+    """
+    Executes the given plugin in the current process with the given root,
+    the peak RSS is written at exit into the file 'rss' in root.
+    """
+
+    atexit.register(write_peak_rss, os.path.join(root, 'rss'))
+
+    if name == 'dcmanager_api':
+        from nagios.plugins.check_dcmanager_api import CheckDcmanagerApiPlugin
+        plugin = CheckDcmanagerApiPlugin()
+
+    elif name == 'consistence_storage':
+        from nagios.plugins import check_pb_consistence_storage as module
+        module.STORAGE_CONFIG_DIR = os.path.join(root, 'config')
+        plugin = module.CheckPbConsistenceStoragePlugin()
+
+    else:
+        from nagios.plugins import check_pb_storage_exports as module
+        scst_dir = os.path.join(root, 'scst')
+        module.SCST_DEV_DIR = os.path.join(scst_dir, dcm_samples.SCST_DEV_SUBDIR)
+        module.SCST_INI_GROUP_DIR = os.path.join(scst_dir, dcm_samples.SCST_INI_GROUP_SUBDIR)
+        plugin = module.CheckPbStorageExportsPlugin()
+
+    sys.argv = [name] + plugin_args
+    plugin()
+
+#------------------------------------------------------------------------------
+def bench_plugin(name, root, plugin_args):
+    """
+    Executes the given plugin in a child process.
+
+    @return: the exit code, the last line of the output, the wall time in
+             seconds and the peak RSS in KiB
+    @rtype: tuple
+
+    """
+
+    env = dict(os.environ)
+    env[ENV_REPLAY] = os.path.join(root, 'fixtures.json.gz')
+    env['NAGIOS_STATE_DIR'] = os.path.join(root, 'state')
+    cmd = [sys.executable, os.path.abspath(__file__), '--run', name, '--root', root, '--']
+    cmd += plugin_args
+
+    start = time.time()
+    proc = subprocess.Popen(
+        cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        universal_newlines=True)
+    output = proc.stdout.read()
+    proc.stdout.close()
+    proc.wait()
+    wall = time.time() - start
+
+    rss = 0
+    rss_file = os.path.join(root, 'rss')
+    if os.path.exists(rss_file):
+        fh = open(rss_file)
+        try:
+            rss = int(fh.read())
+        finally:
+            fh.close()
+        os.remove(rss_file)
+
+    lines = output.strip().splitlines() or ['']
+    return (proc.returncode, lines[-1], wall, rss)
+
+#==============================================================================
+
+if __name__ == '__main__':
+
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument(
+        '-n', '--volumes', default='1000,10000,100000',
+        help='Comma separated numbers of volumes of the datasets (Default: %(default)s).')
+    arg_parser.add_argument(
+        '-l', '--latency', type=float, default=0.0,
+        help='Latency of every API request in seconds (Default: %(default)s).')
+    arg_parser.add_argument(
+        '-H', '--hostname', default=dcm_samples.HOSTNAME,
+        help='The hostname of the storage server (Default: %(default)r).')
+    arg_parser.add_argument(
+        '-p', '--plugins', default=','.join(PLUGINS),
+        help='Comma separated names of the plugins to run (Default: %(default)s).')
+    arg_parser.add_argument('--run', help='Internal: executes the plugin in this process.')
+    arg_parser.add_argument('--root', help='Internal: the root of the fixture trees.')
+    arg_parser.add_argument('plugin_args', nargs='*', help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    if args.run:
+        run_plugin(args.run, args.root, args.plugin_args)
+        sys.exit(0)
+
+    print("%-20s %8s %5s %10s %12s  %s" % (
+        'plugin', 'volumes', 'exit', 'wall [s]', 'RSS [KiB]', 'output'))
+
+    for volumes in [int(x) for x in args.volumes.split(',')]:
+
+        data = dcm_samples.dataset(volumes, args.hostname)
+        tmp_dir = tempfile.mkdtemp(prefix='bench-dcm-plugins-')
+        server = DcmStandInServer(data, latency=args.latency)
+        server.start()
+        try:
+            build_root(tmp_dir, volumes, data, args.hostname)
+            for name in args.plugins.split(','):
+                plugin_args = ['--api-url', server.url]
+                if name != 'dcmanager_api':
+                    plugin_args += ['-H', args.hostname]
+                (ret, out, wall, rss) = bench_plugin(name, tmp_dir, plugin_args)
+                print("%-20s %8d %5d %10.3f %12d  %s" % (name, volumes, ret, wall, rss, out[:60]))
+        finally:
+            server.stop()
+            shutil.rmtree(tmp_dir, True)
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: benchmark of parsing MegaCli text outputs against storcli JSON
+          outputs of adapters with 24 and 60 drives
+'''
+
+import os
+import sys
+import timeit
+import argparse
+
+libdir = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), '..'))
+sys.path.insert(0, libdir)
+
+import megaraid_samples
+
+from nagios.plugins.megaraid_collector import parse_pd_list
+from nagios.plugins.megaraid_collector import parse_ld_info
+from nagios.plugins.megaraid_collector import parse_bbu_status
+from nagios.plugins.megaraid_collector import decode_storcli_output
+from nagios.plugins.megaraid_collector import parse_storcli_pd
+from nagios.plugins.megaraid_collector import parse_storcli_ld
+from nagios.plugins.megaraid_collector import parse_storcli_bbu
+
+#==============================================================================
+def megacli_parse(outputs):
+
+    parse_pd_list(outputs['pd'])
+    parse_ld_info(outputs['ld'])
+    parse_bbu_status(outputs['bbu'])
+
+#------------------------------------------------------------------------------
+def storcli_parse(outputs):
+
+    parse_storcli_pd(decode_storcli_output(outputs['pd'])[2])
+    parse_storcli_ld(
+        decode_storcli_output(outputs['ld'])[2],
+        decode_storcli_output(outputs['cc'])[2])
+    parse_storcli_bbu(decode_storcli_output(outputs['bbu'])[2])
+
+#------------------------------------------------------------------------------
+def bench(func, outputs, repeat, number):
+
+    timer = timeit.Timer(lambda: func(outputs))
+    best = min(timer.repeat(repeat=repeat, number=number))
+    return best / number * 1000.0
+
+#==============================================================================
+
+if __name__ == '__main__':
+
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument(
+        '-n', '--number', type=int, default=200,
+        help='Number of parsing runs per measurement (Default: %(default)d).')
+    arg_parser.add_argument(
+        '-r', '--repeat', type=int, default=5,
+        help='Number of measurements, the best is taken (Default: %(default)d).')
+    args = arg_parser.parse_args()
+
+    print("%-8s %8s %14s %14s %8s" % (
+        'drives', 'backend', 'output bytes', 'ms per parse', 'speedup'))
+
+    for drives in (24, 60):
+
+        megacli_outputs = {
+            'pd': megaraid_samples.megacli_pd_list(drives),
+            'ld': megaraid_samples.megacli_ld_info(drives),
+            'bbu': megaraid_samples.megacli_bbu_status(),
+        }
+        storcli_outputs = {
+            'pd': megaraid_samples.storcli_pd_show_all(drives),
+            'ld': megaraid_samples.storcli_vd_show_all(drives),
+            'cc': megaraid_samples.storcli_vd_show_cc(drives),
+            'bbu': megaraid_samples.storcli_bbu_show_all(),
+        }
+
+        t_megacli = bench(megacli_parse, megacli_outputs, args.repeat, args.number)
+        t_storcli = bench(storcli_parse, storcli_outputs, args.repeat, args.number)
+
+        print("%-8d %8s %14d %14.3f %8s" % (
+            drives, 'megacli', sum([len(x) for x in megacli_outputs.values()]),
+            t_megacli, ''))
+        print("%-8d %8s %14d %14.3f %7.1fx" % (
+            drives, 'storcli', sum([len(x) for x in storcli_outputs.values()]),
+            t_storcli, t_megacli / t_storcli))
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: benchmark of the parse and evaluate times of the MegaRaid, SMART
+          and LVM plugins by replaying a synthetic fixture archive of a host
+          with a large JBOD and a volume group with many logical volumes
+'''
+
+import os
+import sys
+import shutil
+import timeit
+import argparse
+import tempfile
+
+libdir = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), '..'))
+sys.path.insert(0, libdir)
+
+import megaraid_samples
+import smart_samples
+import lvm_samples
+
+from nagios.plugin.fixtures import FixtureArchive, set_fixture_archive
+
+from nagios.plugins.check_megaraid_pd import CheckMegaRaidPdPlugin
+from nagios.plugins.check_smart_state import CheckSmartStatePlugin
+from nagios.plugins.check_lvm_vg import CheckLvmVgPlugin, LvmVgState
+
+#==============================================================================
+def build_archive(filename, drives, lvs):
+
+    archive = FixtureArchive(filename, mode='record')
+
+    adapter = ['-a', '0', '-NoLog']
+    archive.add_command(
+        ['MegaCli64', '-PdList'] + adapter, 0, megaraid_samples.megacli_pd_list(drives))
+    archive.add_command(
+        ['MegaCli64', '-LdInfo', '-Lall'] + adapter, 0, megaraid_samples.megacli_ld_info(0))
+    archive.add_command(
+        ['MegaCli64', '-AdpBbuCmd', '-GetBbuStatus'] + adapter, 0,
+        megaraid_samples.megacli_bbu_status())
+
+    archive.add_command(
+        ['storcli64', '/c0/eall/sall', 'show', 'all', 'J'], 0,
+        megaraid_samples.storcli_pd_show_all(drives))
+    archive.add_command(
+        ['storcli64', '/c0/vall', 'show', 'all', 'J'], 0,
+        megaraid_samples.storcli_vd_show_all(0))
+    archive.add_command(
+        ['storcli64', '/c0/vall', 'show', 'cc', 'J'], 0,
+        megaraid_samples.storcli_vd_show_cc(0))
+    archive.add_command(
+        ['storcli64', '/c0/bbu', 'show', 'all', 'J'], 0,
+        megaraid_samples.storcli_bbu_show_all())
+
+    archive.add_command(
+        ['smartctl', '--version'], 0,
+        "smartctl 7.1 2019-12-30 r5022 [x86_64-linux-4.19.0] (local build)\n")
+    for nr in range(drives):
+        if nr % 4 == 0:
+            output = smart_samples.smartctl_sas(nr)
+            json_output = smart_samples.smartctl_sas_json(nr)
+        else:
+            output = smart_samples.smartctl_sata(nr)
+            json_output = smart_samples.smartctl_sata_json(nr)
+        archive.add_command(
+            ['smartctl', '-x', '-d', 'megaraid,%d' % (nr), '/dev/sda'], 0, output)
+        archive.add_command(
+            ['smartctl', '-x', '--json', '-d', 'megaraid,%d' % (nr), '/dev/sda'], 0,
+            json_output)
+
+    archive.add_command(
+        ['vgs', '--unit', 'm', '--noheadings', '--nosuffix', '--separator', ';',
+            '--unbuffered', '-o',
+            'vg_fmt,vg_name,vg_attr,vg_extent_size,vg_extent_count,vg_free_count',
+            lvm_samples.VG_NAME], 0, lvm_samples.vgs_output(lvs))
+    archive.add_command(
+        ['lvm', 'lvs', '--nosuffix', '--noheadings', '--units', 'b', '--separator', ';',
+            '-o', ','.join(lvm_samples.LV_FIELDS)], 0, lvm_samples.lvs_output(lvs))
+
+    archive.save()
+
+#------------------------------------------------------------------------------
+def megaraid_pd_run(backend, state_dir):
+
+    args = ['-a', '0', '--max-age', '0', '--state-dir', state_dir]
+    if backend == 'megacli':
+        args.append('--no-storcli')
+    plugin = CheckMegaRaidPdPlugin()
+    plugin.parse_args(args)
+
+    def run():
+        plugin.perfdata = []
+        plugin.evaluate(plugin.get_snapshot())
+
+    return run
+
+#------------------------------------------------------------------------------
+def smart_run(drives, backend):
+
+    plugin = CheckSmartStatePlugin()
+    plugin._device = '/dev/sda'
+    plugin._megaraid = True
+    if backend == 'json':
+        plugin._init_smartctl_json()
+
+    def run():
+        for nr in range(drives):
+            plugin._device_id = nr
+            plugin._megaraid_slot = (megaraid_samples.ENCLOSURE, nr)
+            plugin.evaluate_smart(plugin._exec_smartctl(), '[%d:%d]' % plugin._megaraid_slot)
+
+    return run
+
+#------------------------------------------------------------------------------
+def lvm_vg_run():
+
+    plugin = CheckLvmVgPlugin()
+    vg_state = LvmVgState(plugin, lvm_samples.VG_NAME, vgs_cmd=plugin.vgs_cmd)
+
+    def run():
+        vg_state.get_data(force=True)
+
+    return run
+
+#------------------------------------------------------------------------------
+def consistence_storage_run():
+
+    from nagios.plugins.check_pb_consistence_storage import CheckPbConsistenceStoragePlugin
+
+    plugin = CheckPbConsistenceStoragePlugin()
+
+    def run():
+        plugin.get_lvm_lvs()
+
+    return run
+
+#------------------------------------------------------------------------------
+def consistence_compare_run(lvs, tmp_dir):
+
+    import dcm_samples
+    from nagios.plugins import check_pb_consistence_storage as module
+
+    module.STORAGE_CONFIG_DIR = os.path.join(tmp_dir, 'config')
+    dcm_samples.build_config_dir(module.STORAGE_CONFIG_DIR, lvs)
+    os.environ['NAGIOS_STATE_DIR'] = tmp_dir
+
+    data = dcm_samples.dataset(lvs)
+    plugin = module.CheckPbConsistenceStoragePlugin()
+    plugin._hostname = dcm_samples.HOSTNAME
+    plugin._pb_vg = lvm_samples.VG_NAME
+    plugin._full_sweep_interval = 0
+    plugin.all_api_volumes = plugin.get_api_storage_volumes(iter(data['vstorages']))
+    plugin.all_api_volumes.update(plugin.get_api_image_volumes(iter(data['vimages'])))
+    plugin.all_api_volumes.update(plugin.get_api_snapshot_volumes(iter(data['vsnapshots'])))
+    plugin.get_lvm_lvs()
+
+    def run():
+        plugin.count = {
+            'total': 0, 'missing': 0, 'alien': 0, 'orphans': 0, 'zombies': 0,
+            'snapshots': 0, 'ok': 0, 'dummy': 0, 'error': 0}
+        plugin.compare()
+
+    return run
+
+#------------------------------------------------------------------------------
+def bench(func, repeat, number):
+
+    timer = timeit.Timer(func)
+    best = min(timer.repeat(repeat=repeat, number=number))
+    return best / number * 1000.0
+
+#==============================================================================
+
+if __name__ == '__main__':
+
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument(
+        '-d', '--drives', type=int, default=256,
+        help='Number of drives of the JBOD (Default: %(default)d).')
+    arg_parser.add_argument(
+        '-l', '--lvs', type=int, default=100000,
+        help='Number of logical volumes of the volume group (Default: %(default)d).')
+    arg_parser.add_argument(
+        '-n', '--number', type=int, default=5,
+        help='Number of runs per measurement (Default: %(default)d).')
+    arg_parser.add_argument(
+        '-r', '--repeat', type=int, default=3,
+        help='Number of measurements, the best is taken (Default: %(default)d).')
+    args = arg_parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix='bench-plugins-')
+    try:
+        filename = os.path.join(tmp_dir, 'fixtures.json.gz')
+        build_archive(filename, args.drives, args.lvs)
+        print("Fixture archive of %d drives and %d LVs: %d bytes compressed." % (
+            args.drives, args.lvs, os.path.getsize(filename)))
+        set_fixture_archive(FixtureArchive(filename))
+
+        runs = [
+            ('megaraid_pd (megacli)', args.drives, megaraid_pd_run('megacli', tmp_dir)),
+            ('megaraid_pd (storcli)', args.drives, megaraid_pd_run('storcli', tmp_dir)),
+            ('smart_state (text)', args.drives, smart_run(args.drives, 'text')),
+            ('smart_state (json)', args.drives, smart_run(args.drives, 'json')),
+            ('lvm_vg', 1, lvm_vg_run()),
+        ]
+        try:
+            runs.append(('consistence_storage', args.lvs, consistence_storage_run()))
+            runs.append(
+                ('consistence_compare', args.lvs, consistence_compare_run(args.lvs, tmp_dir)))
+        except ImportError as e:
+            print("Skipping consistence_storage: %s" % (e))
+
+        print("%-24s %8s %14s %14s" % ('plugin', 'items', 'ms per run', 'us per item'))
+        for (name, items, func) in runs:
+            t = bench(func, args.repeat, args.number)
+            print("%-24s %8d %14.3f %14.3f" % (name, items, t, t * 1000.0 / items))
+
+    finally:
+        set_fixture_archive(None)
+        shutil.rmtree(tmp_dir, True)
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
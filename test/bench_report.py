@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: micro benchmark of the costs per line of a cascade of regular
+          expressions against the ReportParser depending on the number
+          of fields of a report
+'''
+
+import os
+import re
+import sys
+import timeit
+import argparse
+
+libdir = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), '..'))
+sys.path.insert(0, libdir)
+
+from nagios.plugin.report import ReportParser
+
+#==============================================================================
+def field_name(i):
+    return 'Some Field Number %d' % (i)
+
+#------------------------------------------------------------------------------
+def make_report(fields, records):
+
+    lines = []
+    for rec in range(records):
+        for i in range(fields):
+            lines.append('%s : %d' % (field_name(i), rec * i))
+        lines.append('')
+    return '\n'.join(lines) + '\n'
+
+#------------------------------------------------------------------------------
+def make_regex_cascade(fields):
+
+    regexes = []
+    for i in range(fields):
+        pattern = r'^\s*' + r'\s+'.join(field_name(i).split()) + r'\s*:\s*(\d+)'
+        regexes.append(('field%d' % (i), re.compile(pattern, re.IGNORECASE)))
+
+    def parse(text):
+        record = {}
+        for line in text.splitlines():
+            line = line.strip()
+            for (name, regex) in regexes:
+                match = regex.search(line)
+                if match:
+                    record[name] = int(match.group(1))
+                    break
+        return record
+
+    return parse
+
+#------------------------------------------------------------------------------
+def make_report_parser(fields):
+
+    handlers = {}
+    for i in range(fields):
+        handlers[field_name(i)] = ('field%d' % (i), int)
+    return ReportParser(handlers).parse_record
+
+#==============================================================================
+
+if __name__ == '__main__':
+
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument(
+        '-l', '--lines', type=int, default=2000,
+        help='Approximate number of lines of each report (Default: %(default)d).')
+    arg_parser.add_argument(
+        '-r', '--repeat', type=int, default=5,
+        help='Number of measurements, the best is taken (Default: %(default)d).')
+    args = arg_parser.parse_args()
+
+    print("%-8s %8s %18s %18s" % ('fields', 'lines', 'regex us/line', 'parser us/line'))
+
+    for fields in (5, 10, 20, 50, 100):
+
+        records = max(1, args.lines // (fields + 1))
+        report = make_report(fields, records)
+        nr_lines = len(report.splitlines())
+
+        results = []
+        for func in (make_regex_cascade(fields), make_report_parser(fields)):
+            timer = timeit.Timer(lambda: func(report))
+            best = min(timer.repeat(repeat=args.repeat, number=3)) / 3
+            results.append(best / nr_lines * 1000000.0)
+
+        print("%-8d %8d %18.2f %18.2f" % (fields, nr_lines, results[0], results[1]))
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
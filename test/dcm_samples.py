@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: generators of synthetic DCManager API datasets of a storage server
+          with a given number of volumes and of the matching volume
+          configuration files and SCST sysfs trees, used for unit tests and
+          benchmarks of the DCManager client plugins
+"""
+
+import os
+
+import lvm_samples
+
+#==============================================================================
+
+HOSTNAME = 'storage201'
+PEER_HOSTNAME = 'storage103'
+CLUSTER = 'de-ka-cluster-01'
+PSERVERS = 16
+
+# The LUNs are exported by SCST under this base directory
+SCST_DEV_SUBDIR = 'devices'
+SCST_INI_GROUP_SUBDIR = os.path.join(
+    'targets', 'ib_srpt', 'ib_srpt_target_0', 'ini_groups')
+
+#------------------------------------------------------------------------------
+def volume_type(nr):
+    """Every 10th volume is an image, every 20th a snapshot."""
+
+    if nr % 10 == 3:
+        return 'img'
+    if nr % 20 == 7:
+        return 'snap'
+    return 'vol'
+
+#------------------------------------------------------------------------------
+def volume_guid(nr):
+    """The GUID of the volume on HOSTNAME, matching the LV of lvm_samples."""
+
+    return '600144f0-' + lvm_samples.lv_name(nr)
+
+#------------------------------------------------------------------------------
+def volume_uuid(nr):
+
+    return '%08x-%04x-4%03x-a%03x-%012x' % (
+        nr, nr & 0xffff, nr & 0xfff, (nr * 3) & 0xfff, nr * 40503 & 0xffffffffffff)
+
+#------------------------------------------------------------------------------
+def volume_size(nr):
+    """The size in MiB of the LV of lvm_samples."""
+
+    return lvm_samples.lv_extents(nr) * lvm_samples.EXTENT_SIZE // (1024 * 1024)
+
+#------------------------------------------------------------------------------
+def pserver_name(nr):
+
+    return 'pserver%03d' % (nr)
+
+#------------------------------------------------------------------------------
+def replicas(nr, hostname):
+
+    peer_guid = '600144f0-0001-%04x-%04x-%012x' % (
+        nr & 0xffff, (nr >> 16) & 0xffff, nr * 2654435761 & 0xffffffffffff)
+    return [
+        {'guid': peer_guid, 'storage_server': PEER_HOSTNAME, 'virtual_state': 'AVAILABLE'},
+        {'guid': volume_guid(nr), 'storage_server': hostname, 'virtual_state': 'AVAILABLE'},
+    ]
+
+#------------------------------------------------------------------------------
+def dataset(volumes, hostname=HOSTNAME, pservers=PSERVERS):
+    """
+    Gives back the objects of all API resources used by the DCManager client
+    plugins of a storage server with the given number of volumes. Every
+    second storage and image volume is mapped to a pserver.
+    """
+
+    data = {
+        'clusters': [{'name': CLUSTER, 'region': 'europe'}],
+        'pstorages': [],
+        'pservers': [],
+        'vstorages': [],
+        'vimages': [],
+        'vsnapshots': [],
+        'vstorage_maps': [],
+        'vimage_maps': [],
+    }
+
+    for name in (hostname, PEER_HOSTNAME):
+        data['pstorages'].append({'name': name, 'cluster': CLUSTER, 'region': 'europe'})
+
+    for nr in range(pservers):
+        data['pservers'].append({
+            'name': pserver_name(nr),
+            'cluster': CLUSTER,
+            'region': 'europe',
+            'zone': 1 + nr % 2,
+            'up': True,
+            'uuid': '48385147-3600-0030-48ff-%012x' % (nr),
+        })
+
+    for nr in range(volumes):
+
+        vtype = volume_type(nr)
+        uuid = volume_uuid(nr)
+        size = volume_size(nr)
+        mapping = None
+        if nr % 2 == 0:
+            mapping = {
+                'mount_state': 'AVAILABLE',
+                'mount_type': 'VIRTIO',
+                'pserver_name': pserver_name(nr % pservers),
+                'pstorage_name': hostname,
+                'size_mb': size,
+                'vm_uuid': '001f75f0-fa36-40cc-a628-%012x' % (nr),
+            }
+
+        if vtype == 'vol':
+            # the provisioned size of a replicated volume is 4 MiB smaller
+            data['vstorages'].append({
+                'uuid': uuid,
+                'name': 'Storage %d' % (nr),
+                'cluster': CLUSTER,
+                'replicated': True,
+                'size': size - 4,
+                'replicas': replicas(nr, hostname),
+            })
+            if mapping:
+                mapping['vstorage_uuid'] = uuid
+                data['vstorage_maps'].append(mapping)
+
+        elif vtype == 'img':
+            data['vimages'].append({
+                'uuid': uuid,
+                'image_type': 'HDD',
+                'replicate': False,
+                'size': size,
+                'virtual_state': 'AVAILABLE',
+                'replicas': replicas(nr, hostname)[1:],
+            })
+            if mapping:
+                mapping['image_uuid'] = uuid
+                data['vimage_maps'].append(mapping)
+
+        else:
+            data['vsnapshots'].append({
+                'uuid': uuid,
+                'guid': volume_guid(nr),
+                'storage_server': hostname,
+                'size': size,
+                'virtual_state': 'AVAILABLE',
+            })
+
+    return data
+
+#------------------------------------------------------------------------------
+def write_file(filename, content):
+
+    fh = open(filename, 'w')
+    try:
+        fh.write(content)
+    finally:
+        fh.close()
+
+#------------------------------------------------------------------------------
+def build_config_dir(config_dir, volumes):
+    """Writes the configuration files of all volumes into config_dir."""
+
+    if not os.path.isdir(config_dir):
+        os.makedirs(config_dir)
+    for nr in range(volumes):
+        write_file(
+            os.path.join(config_dir, lvm_samples.lv_name(nr) + '.ini'),
+            "[Volume]\nguid = %s\nsize = %d\n" % (volume_guid(nr), volume_size(nr)))
+
+#------------------------------------------------------------------------------
+def build_scst_tree(scst_dir, data, digest, hostname=HOSTNAME, vg=lvm_samples.VG_NAME):
+    """
+    Builds the SCST sysfs tree with the exports of all mappings of the given
+    dataset below scst_dir. The names of the SCST devices are evaluated by
+    the given digest function (crc64_digest) from the GUID of the volume.
+    """
+
+    dev_dir = os.path.join(scst_dir, SCST_DEV_SUBDIR)
+    ini_group_dir = os.path.join(scst_dir, SCST_INI_GROUP_SUBDIR)
+    handler_dir = os.path.join(scst_dir, 'handlers', 'vdisk_blockio')
+    for dirname in (dev_dir, ini_group_dir, handler_dir):
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+
+    guids = {}
+    for key in ('vstorages', 'vimages'):
+        for vol in data[key]:
+            for replica in vol['replicas']:
+                if replica['storage_server'] == hostname:
+                    guids[vol['uuid']] = (replica['guid'], key == 'vimages')
+
+    luns = {}
+    for (key, uuid_key) in (('vstorage_maps', 'vstorage_uuid'), ('vimage_maps', 'image_uuid')):
+        for mapping in data[key]:
+            if mapping['pstorage_name'] != hostname:
+                continue
+            (guid, read_only) = guids[mapping[uuid_key]]
+            pserver = mapping['pserver_name']
+            lun = luns.get(pserver, 0)
+            luns[pserver] = lun + 1
+
+            lun_dir = os.path.join(ini_group_dir, pserver, 'luns', str(lun))
+            os.makedirs(lun_dir)
+
+            devname = digest(guid)
+            device = os.path.join(dev_dir, devname)
+            os.makedirs(os.path.join(device, 'exported'))
+            os.symlink(handler_dir, os.path.join(device, 'handler'))
+            os.symlink(lun_dir, os.path.join(device, 'exported', 'export0'))
+            write_file(
+                os.path.join(device, 'filename'), "/dev/%s/%s\n" % (vg, guid[9:]))
+            write_file(os.path.join(device, 'fc_ph_id'), guid.replace('-', '') + "\n")
+            write_file(os.path.join(device, 'read_only'), read_only and "1\n" or "0\n")
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: a local HTTP stand-in of the DCManager REST API serving a synthetic
+          dataset (see dcm_samples) with a configurable latency, for tests
+          and benchmarks of the DCManager client plugins without a live
+          DCManager
+
+Every resource is served as a JSON array under its name as used by the
+methods of the REST client (e.g. GET <prefix>/vstorages/?pstorage=storage201),
+the path prefix of the API URL is ignored. The query parameters filter the
+objects by their fields, 'pstorage' filters by the storage server of the
+object or of one of its replicas, boolean parameters only switch details.
+
+Like the DCManager the stand-in doesn't ignore anything it doesn't know:
+unknown query parameters and invalid boolean values are answered by
+'400 Bad Request', and if credentials are given, requests without them by
+'401 Unauthorized', so tests against it notice a client sending requests
+the DCManager would refuse.
+'''
+
+import json
+import time
+import base64
+import logging
+import argparse
+import threading
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlsplit, parse_qsl
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlsplit, parse_qsl
+
+import dcm_samples
+
+log = logging.getLogger(__name__)
+
+# The size of the chunks of a written response
+CHUNK_SIZE = 64 * 1024
+
+# The query parameters of the resources, which filter their objects
+QUERY_PARAMS = {
+    'clusters': (),
+    'pservers': ('cluster',),
+    'pstorages': ('name',),
+    'vstorages': ('pstorage',),
+    'vimages': ('pstorage',),
+    'vsnapshots': ('pstorage',),
+    'vstorage_maps': ('pstorage',),
+    'vimage_maps': ('pstorage',),
+}
+
+# The boolean query parameters of the resources
+BOOL_PARAMS = {
+    'vstorages': ('contract_infos',),
+}
+BOOL_VALUES = ('true', 'false', '1', '0')
+
+#==============================================================================
+def matches(obj, key, value):
+    """Checks, whether the given object matches the given query parameter."""
+
+    if key == 'pstorage':
+        if obj.get('storage_server') == value or obj.get('pstorage_name') == value:
+            return True
+        for replica in obj.get('replicas') or []:
+            if replica.get('storage_server') == value:
+                return True
+        return False
+
+    if key not in obj:
+        return True
+    return str(obj[key]) == value
+
+#==============================================================================
+class DcmRequestHandler(BaseHTTPRequestHandler):
+
+    #--------------------------------------------------------------------------
+    def log_message(self, format, *args):
+
+        log.debug("%s - %s", self.address_string(), format % args)
+
+    #--------------------------------------------------------------------------
+    def send_json(self, code, body, headers=None):
+
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        for (name, value) in sorted((headers or {}).items()):
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        for pos in range(0, len(body), CHUNK_SIZE):
+            self.wfile.write(body[pos:pos + CHUNK_SIZE])
+
+    #--------------------------------------------------------------------------
+    def send_error_json(self, code, message, headers=None):
+
+        self.server.count('rejected')
+        body = json.dumps({'error': message})
+        self.send_json(code, body.encode('utf-8'), headers)
+
+    #--------------------------------------------------------------------------
+    def do_GET(self):
+
+        server = self.server
+        server.count('requests')
+        if server.latency:
+            time.sleep(server.latency)
+
+        if server.authorization and self.headers.get('Authorization') != server.authorization:
+            self.send_error_json(
+                401, 'Authentication required.',
+                {'WWW-Authenticate': 'Basic realm="DCManager"'})
+            return
+
+        url = urlsplit(self.path)
+        parts = [x for x in url.path.split('/') if x]
+        resource = parts and parts[-1] or ''
+        if resource not in server.data:
+            self.send_error_json(404, 'Unknown resource %r.' % (resource))
+            return
+
+        for (name, value) in parse_qsl(url.query, True):
+            if name in BOOL_PARAMS.get(resource, ()):
+                if value.lower() not in BOOL_VALUES:
+                    self.send_error_json(
+                        400, 'Invalid value %r of parameter %r.' % (value, name))
+                    return
+            elif name not in QUERY_PARAMS.get(resource, ()):
+                self.send_error_json(
+                    400, 'Unknown parameter %r of resource %r.' % (name, resource))
+                return
+
+        self.send_json(200, server.get_body(resource, url.query))
+
+#==============================================================================
+class DcmStandInServer(ThreadingMixIn, HTTPServer):
+    """
+    The stand-in of the DCManager API serving the given dataset, the encoded
+    responses are cached per resource and query.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    #--------------------------------------------------------------------------
+    def __init__(self, data, address=('127.0.0.1', 0), latency=0.0, auth=None):
+
+        HTTPServer.__init__(self, address, DcmRequestHandler)
+        self.data = data
+        self.latency = latency
+        self.authorization = None
+        if auth:
+            credentials = ('%s:%s' % auth).encode('utf-8')
+            self.authorization = 'Basic ' + base64.b64encode(credentials).decode('ascii')
+        self.requests = 0
+        self.rejected = 0
+        self._bodies = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    #--------------------------------------------------------------------------
+    @property
+    def url(self):
+        """The base URL of the served API."""
+
+        return 'http://%s:%d/' % self.server_address[:2]
+
+    #--------------------------------------------------------------------------
+    def count(self, counter):
+        """Increments the given counter ('requests' or 'rejected')."""
+
+        self._lock.acquire()
+        try:
+            setattr(self, counter, getattr(self, counter) + 1)
+        finally:
+            self._lock.release()
+
+    #--------------------------------------------------------------------------
+    def get_body(self, resource, query):
+        """Gives back the encoded objects of the resource matching the query."""
+
+        key = (resource, query)
+        body = self._bodies.get(key)
+        if body is not None:
+            return body
+
+        objects = self.data[resource]
+        for (name, value) in sorted(parse_qsl(query)):
+            if name in BOOL_PARAMS.get(resource, ()):
+                continue
+            objects = [x for x in objects if matches(x, name, value)]
+        body = json.dumps(objects).encode('utf-8')
+
+        self._lock.acquire()
+        try:
+            self._bodies[key] = body
+        finally:
+            self._lock.release()
+        return body
+
+    #--------------------------------------------------------------------------
+    def start(self):
+        """Serves the requests in a background thread."""
+
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        log.debug("Serving the DCManager stand-in on %r.", self.url)
+
+    #--------------------------------------------------------------------------
+    def stop(self):
+
+        self.shutdown()
+        self.server_close()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+#==============================================================================
+
+if __name__ == '__main__':
+
+    arg_parser = argparse.ArgumentParser(
+        description="Serves a synthetic dataset as local DCManager API stand-in.")
+    arg_parser.add_argument(
+        '-n', '--volumes', type=int, default=1000,
+        help='Number of volumes of the storage server (Default: %(default)d).')
+    arg_parser.add_argument(
+        '-H', '--hostname', default=dcm_samples.HOSTNAME,
+        help='The hostname of the storage server (Default: %(default)r).')
+    arg_parser.add_argument(
+        '-l', '--latency', type=float, default=0.0,
+        help='Latency of every request in seconds (Default: %(default)s).')
+    arg_parser.add_argument(
+        '-a', '--address', default='127.0.0.1',
+        help='The address to listen on (Default: %(default)r).')
+    arg_parser.add_argument(
+        '-p', '--port', type=int, default=8080,
+        help='The port to listen on (Default: %(default)d).')
+    arg_parser.add_argument(
+        '-u', '--auth', metavar='USER:PASSWORD',
+        help='Requires the given credentials by HTTP basic authentication.')
+    args = arg_parser.parse_args()
+
+    auth = None
+    if args.auth:
+        (user, sep, password) = args.auth.partition(':')
+        auth = (user, password)
+
+    logging.basicConfig(level=logging.DEBUG)
+
+    server = DcmStandInServer(
+        dcm_samples.dataset(args.volumes, args.hostname),
+        address=(args.address, args.port), latency=args.latency, auth=auth)
+    print("Serving %d volumes of %r on %s ..." % (args.volumes, args.hostname, server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
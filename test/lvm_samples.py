@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: generators of 'vgs' and 'lvm lvs' outputs of a volume group with
+          a given number of logical volumes, used for unit tests and
+          benchmarks of the LVM checks
+"""
+
+#==============================================================================
+
+VG_NAME = 'storage'
+EXTENT_SIZE = 4 * 1024 * 1024
+EXTENT_COUNT = 7630000
+
+LV_FIELDS = (
+    'lv_name', 'vg_name', 'stripes', 'stripesize', 'lv_attr', 'lv_uuid', 'devices',
+    'lv_path', 'vg_extent_size', 'lv_size', 'origin')
+
+#------------------------------------------------------------------------------
+def lv_name(nr):
+    """The name of a ProfitBricks volume in the form of an UUID."""
+
+    return '%04x-%04x-%04x-%012x' % (
+        (nr >> 8) & 0xffff, nr & 0xffff, (nr * 7) & 0xffff, nr * 2654435761 & 0xffffffffffff)
+
+#------------------------------------------------------------------------------
+def lv_extents(nr):
+
+    return 256 * (1 + nr % 40)
+
+#------------------------------------------------------------------------------
+def vgs_output(lvs, vg=VG_NAME):
+    """
+    Output of 'vgs --unit m --noheadings --nosuffix --separator ;
+    --unbuffered -o vg_fmt,vg_name,vg_attr,vg_extent_size,vg_extent_count,
+    vg_free_count <vg>' of a VG with the given number of LVs.
+    """
+
+    used = 0
+    for nr in range(lvs):
+        used += lv_extents(nr)
+    free = max(EXTENT_COUNT - used, 0)
+    return "  lvm2;%s;wz--n-;%.2f;%d;%d\n" % (
+        vg, EXTENT_SIZE / 1024.0 / 1024.0, EXTENT_COUNT, free)
+
+#------------------------------------------------------------------------------
+def lvs_output(lvs, vg=VG_NAME):
+    """
+    Output of 'lvm lvs --nosuffix --noheadings --units b --separator ;
+    -o <LV_FIELDS>' of a VG with the given number of LVs, every 10th LV
+    has a snapshot.
+    """
+
+    lines = []
+    for nr in range(lvs):
+        name = lv_name(nr)
+        size = lv_extents(nr) * EXTENT_SIZE
+        lines.append("  %s;%s;1;0;-wi-ao----;Lv%07d-uuid;/dev/sdb(%d);/dev/%s/%s;%d;%d;" % (
+            name, vg, nr, nr * 256, vg, name, EXTENT_SIZE, size))
+        if nr % 10 == 0:
+            lines.append("  %s-snap;%s;1;0;swi-a-s---;Sn%07d-uuid;/dev/sdb(%d);"
+                         "/dev/%s/%s-snap;%d;%d;%s" % (
+                             name, vg, nr, nr * 256 + 1, vg, name, EXTENT_SIZE,
+                             EXTENT_SIZE * 64, name))
+    return "\n".join(lines) + "\n"
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
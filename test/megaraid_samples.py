@@ -0,0 +1,358 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: generators of MegaCli text and storcli JSON outputs of MegaRaid
+          adapters with a given number of drives, modelled after recorded
+          outputs, used for unit tests and benchmarks of the MegaRaid collector
+"""
+
+import json
+
+#==============================================================================
+
+ENCLOSURE = 32
+
+#------------------------------------------------------------------------------
+def pd_state(slot, drives):
+    """Gives back the storcli state and the spin state of the given slot,
+    the last two slots are hotspares."""
+
+    if slot >= drives - 2:
+        return ('GHS', 'U')
+    return ('Onln', 'U')
+
+#------------------------------------------------------------------------------
+def megacli_pd_list(drives):
+
+    states = {'Onln': 'Online', 'GHS': 'Hotspare'}
+    lines = []
+    for slot in range(drives):
+        (state, spun) = pd_state(slot, drives)
+        lines += [
+            "Enclosure Device ID: %d" % (ENCLOSURE),
+            "Slot Number: %d" % (slot),
+            "Drive's position: DiskGroup: %d, Span: 0, Arm: 0" % (slot // 2),
+            "Enclosure position: 1",
+            "Device Id: %d" % (slot + 10),
+            "WWN: 5000C500%08X" % (slot),
+            "Sequence Number: 2",
+            "Media Error Count: %d" % (slot % 3 == 1 and 1 or 0),
+            "Other Error Count: 0",
+            "Predictive Failure Count: 0",
+            "Last Predictive Failure Event Seq Number: 0",
+            "PD Type: SAS",
+            "",
+            "Raw Size: 3.638 TB [0x1d1c0beb0 Sectors]",
+            "Non Coerced Size: 3.637 TB [0x1d1b0beb0 Sectors]",
+            "Coerced Size: 3.637 TB [0x1d1a94800 Sectors]",
+            "Sector Size:  512",
+            "Firmware state: %s, Spun Up" % (states[state]),
+            "Device Firmware Level: 0004",
+            "Shield Counter: 0",
+            "Successful diagnostics completion on :  N/A",
+            "SAS Address(0): 0x5000c500%08x" % (slot),
+            "SAS Address(1): 0x0",
+            "Connected Port Number: 0(path0) ",
+            "Inquiry Data: SEAGATE ST4000NM0023    0004Z1Z0ABCD",
+            "FDE Capable: Not Capable",
+            "FDE Enable: Disable",
+            "Secured: Unsecured",
+            "Locked: Unlocked",
+            "Needs EKM Attention: No",
+            "Foreign State: None ",
+            "Device Speed: 6.0Gb/s ",
+            "Link Speed: 6.0Gb/s ",
+            "Media Type: Hard Disk Device",
+            "Drive Temperature :30C (86.00 F)",
+            "PI Eligibility:  No ",
+            "Drive is formatted for PI information:  No",
+            "PI: No PI",
+            "Port-0 :",
+            "Port status: Active",
+            "Port's Linkspeed: 6.0Gb/s ",
+            "Drive has flagged a S.M.A.R.T alert : No",
+            "",
+            "",
+            "",
+        ]
+    lines.append("Exit Code: 0x00")
+    return "\n".join(lines) + "\n"
+
+#------------------------------------------------------------------------------
+def megacli_ld_info(drives):
+
+    lines = []
+    for ld in range(drives // 2 - 1):
+        lines += [
+            "",
+            "Adapter 0 -- Virtual Drive Information:",
+            "Virtual Drive: %d (Target Id: %d)" % (ld, ld),
+            "Name                :",
+            "RAID Level          : Primary-1, Secondary-0, RAID Level Qualifier-0",
+            "Size                : 3.637 TB",
+            "Sector Size         : 512",
+            "Mirror Data         : 3.637 TB",
+            "State               : Optimal",
+            "Strip Size          : 256 KB",
+            "Number Of Drives    : 2",
+            "Span Depth          : 1",
+            "Default Cache Policy: WriteBack, ReadAhead, Direct, No Write Cache if Bad BBU",
+            "Current Cache Policy: WriteBack, ReadAhead, Direct, No Write Cache if Bad BBU",
+            "Default Access Policy: Read/Write",
+            "Current Access Policy: Read/Write",
+            "Disk Cache Policy   : Disk's Default",
+            "Encryption Type     : None",
+            "Is VD Cached: No",
+        ]
+    lines += ["", "Exit Code: 0x00"]
+    return "\n".join(lines) + "\n"
+
+#------------------------------------------------------------------------------
+bbu_props = (
+    ('Voltage', 'OK'),
+    ('Temperature', 'OK'),
+    ('Learn Cycle Requested', 'No'),
+    ('Learn Cycle Active', 'No'),
+    ('Learn Cycle Status', 'OK'),
+    ('Learn Cycle Timeout', 'No'),
+    ('I2c Errors Detected', 'No'),
+    ('Battery Pack Missing', 'No'),
+    ('Battery Replacement required', 'No'),
+    ('Remaining Capacity Low', 'No'),
+    ('Periodic Learn Required', 'No'),
+    ('Transparent Learn', 'No'),
+    ('No space to cache offload', 'No'),
+    ('Pack is about to fail & should be replaced', 'No'),
+    ('Cache Offload premium feature required', 'No'),
+    ('Module microcode update required', 'No'),
+)
+
+#------------------------------------------------------------------------------
+def megacli_bbu_status():
+
+    lines = [
+        "",
+        "BBU status for Adapter: 0",
+        "",
+        "BatteryType: iBBU",
+        "Voltage: 4033 mV",
+        "Current: 0 mA",
+        "Temperature: 31 C",
+        "Battery State: Optimal",
+        "BBU Firmware Status:",
+        "",
+        "  Charging Status              : None",
+    ]
+    for (prop, value) in bbu_props:
+        lines.append("  %-40s: %s" % (prop, value))
+    lines += ["", "Exit Code: 0x00"]
+    return "\n".join(lines) + "\n"
+
+#------------------------------------------------------------------------------
+def storcli_output(response, status='Success', description='None'):
+
+    data = {'Controllers': [{
+        'Command Status': {
+            'CLI Version': '007.0709.0000.0000 Aug 14, 2018',
+            'Operating system': 'Linux 4.9.0',
+            'Controller': 0,
+            'Status': status,
+            'Description': description,
+        },
+        'Response Data': response,
+    }]}
+    return json.dumps(data, indent=1)
+
+#------------------------------------------------------------------------------
+def storcli_pd_show_all(drives):
+
+    response = {}
+    for slot in range(drives):
+        (state, spun) = pd_state(slot, drives)
+        drive = '/c0/e%d/s%d' % (ENCLOSURE, slot)
+        dg = '-'
+        if state == 'Onln':
+            dg = slot // 2
+        response['Drive ' + drive] = [{
+            'EID:Slt': '%d:%d' % (ENCLOSURE, slot),
+            'DID': slot + 10,
+            'State': state,
+            'DG': dg,
+            'Size': '3.637 TB',
+            'Intf': 'SAS',
+            'Med': 'HDD',
+            'SED': 'N',
+            'PI': 'N',
+            'SeSz': '512B',
+            'Model': 'ST4000NM0023    ',
+            'Sp': spun,
+            'Type': '-',
+        }]
+        response['Drive %s - Detailed Information' % (drive)] = {
+            'Drive %s State' % (drive): {
+                'Shield Counter': 0,
+                'Media Error Count': (slot % 3 == 1 and 1 or 0),
+                'Other Error Count': 0,
+                'Drive Temperature': ' 30C (86.00 F)',
+                'Predictive Failure Count': 0,
+                'S.M.A.R.T alert flagged by drive': 'No',
+            },
+            'Drive %s Device attributes' % (drive): {
+                'SN': 'Z1Z0ABCD',
+                'WWN': '5000C500%08X' % (slot),
+                'Firmware Revision': '0004',
+                'Raw size': '3.638 TB [0x1d1c0beb0 Sectors]',
+                'Coerced size': '3.637 TB [0x1d1a94800 Sectors]',
+                'Device Speed': '6.0Gb/s',
+                'Link Speed': '6.0Gb/s',
+                'Logical Sector Size': '512B',
+            },
+            'Drive %s Policies/Settings' % (drive): {
+                'Drive position': 'DriveGroup:%s, Span:0, Row:0' % (dg),
+                'Enclosure position': '1',
+                'Connected Port Number': '0(path0) ',
+                'Sequence Number': 2,
+                'Commissioned Spare': 'No',
+                'Emergency Spare': 'No',
+            },
+        }
+    return storcli_output(response)
+
+#------------------------------------------------------------------------------
+def storcli_vd_show_all(drives):
+
+    response = {}
+    for ld in range(drives // 2 - 1):
+        response['/c0/v%d' % (ld)] = [{
+            'DG/VD': '%d/%d' % (ld, ld),
+            'TYPE': 'RAID1',
+            'State': 'Optl',
+            'Access': 'RW',
+            'Consist': 'Yes',
+            'Cache': 'RWBD',
+            'Cac': '-',
+            'sCC': 'ON',
+            'Size': '3.637 TB',
+            'Name': '',
+        }]
+        response['PDs for VD %d' % (ld)] = [
+            {'EID:Slt': '%d:%d' % (ENCLOSURE, ld * 2), 'DID': ld * 2 + 10, 'State': 'Onln'},
+            {'EID:Slt': '%d:%d' % (ENCLOSURE, ld * 2 + 1), 'DID': ld * 2 + 11, 'State': 'Onln'},
+        ]
+        response['VD%d Properties' % (ld)] = {
+            'Strip Size': '256 KB',
+            'Number of Blocks': 7812939776,
+            'Span Depth': 1,
+            'Number of Drives Per Span': 2,
+            'Write Cache(initial setting)': 'WriteBack',
+            'Disk Cache Policy': 'Disk\'s Default',
+            'Encryption': 'None',
+        }
+    return storcli_output(response)
+
+#------------------------------------------------------------------------------
+def storcli_vd_show_cc(drives):
+
+    ops = []
+    for ld in range(drives // 2 - 1):
+        ops.append({
+            'VD': ld, 'Operation': 'CC', 'Progress%': '-',
+            'Status': 'Not in progress', 'Estimated Time Left': '-'})
+    return storcli_output({'VD Operation Status': ops})
+
+#------------------------------------------------------------------------------
+def storcli_bbu_show_all():
+
+    info = [
+        {'Property': 'Type', 'Value': 'iBBU'},
+        {'Property': 'Voltage', 'Value': '4033 mV'},
+        {'Property': 'Current', 'Value': '0 mA'},
+        {'Property': 'Temperature', 'Value': '31 C'},
+        {'Property': 'Battery State', 'Value': 'Optimal'},
+    ]
+    status = [{'Property': 'Charging Status', 'Value': 'None'}]
+    for (prop, value) in bbu_props:
+        if prop == 'Battery Replacement required':
+            prop = 'Replacement required'
+        status.append({'Property': prop, 'Value': value})
+    return storcli_output({'BBU_Info': info, 'BBU_Firmware_Status': status})
+
+#------------------------------------------------------------------------------
+def megacli_event_log_info(newest, oldest=0):
+
+    lines = [
+        "",
+        "Adapter #0",
+        "",
+        "********************************************",
+        "Event Information",
+        "********************************************",
+        "",
+        "Newest sequence number : %d" % (newest),
+        "Oldest sequence number : %d" % (oldest),
+        "Clear sequence number  : 65535",
+        "Shutdown sequence number : 14439",
+        "Reboot sequence number : 14443",
+        "Exit Code: 0x00",
+    ]
+    return "\n".join(lines) + "\n"
+
+#------------------------------------------------------------------------------
+def storcli_event_log_info(newest, oldest=0):
+
+    return storcli_output({
+        'Newest sequence number': newest,
+        'Oldest sequence number': oldest,
+        'Clear sequence number': 65535,
+        'Shutdown sequence number': 14439,
+        'Reboot sequence number': 14443,
+    })
+
+#------------------------------------------------------------------------------
+def event_class(seq):
+    """Gives back the class of the event with the given sequence number,
+    every tenth event is a warning, every hundredth a critical one."""
+
+    if not seq % 100:
+        return 2
+    if not seq % 10:
+        return 1
+    return 0
+
+#------------------------------------------------------------------------------
+def event_log(seqs):
+    """The content of the file written by 'MegaCli -AdpEventLog -GetLatest'
+    or 'storcli /c0 show events type=latest', with the events of the given
+    sequence numbers, the newest first."""
+
+    lines = []
+    for seq in sorted(seqs, reverse=True):
+        slot = seq % 24
+        lines += [
+            "",
+            "",
+            "seqNum: 0x%08x" % (seq),
+            "Time: Mon Jan 11 10:12:13 2016",
+            "",
+            "Code: 0x00000071",
+            "Class: %d" % (event_class(seq)),
+            "Locale: 0x02",
+            ("Event Description: Unexpected sense: PD %02x(e0x%x/s%d) "
+                "Path 5000c50056f2ec1d, CDB: 28 00, Sense: 6/29/02") % (
+                slot + 10, ENCLOSURE, slot),
+            "Event Data:",
+            "===========",
+            "Device ID: %d" % (slot + 10),
+            "Enclosure Index: %d" % (ENCLOSURE),
+            "Slot Number: %d" % (slot),
+        ]
+    return "\n".join(lines) + "\n"
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,422 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: generators of 'smartctl -x' outputs of SATA, SAS and NVMe disks
+          and of NVMe health log pages, modelled after recorded outputs,
+          used for unit tests and benchmarks of the SMART checks
+"""
+
+import json
+import struct
+
+#==============================================================================
+
+SATA_ATTRIBUTES = (
+    (1, 'Raw_Read_Error_Rate', 'POSR--', '082', '063', '044', '-', '158761832'),
+    (3, 'Spin_Up_Time', 'PO----', '092', '091', '000', '-', '0'),
+    (4, 'Start_Stop_Count', '-O--CK', '100', '100', '020', '-', '12'),
+    (5, 'Reallocated_Sector_Ct', 'PO--CK', '100', '100', '010', '-', '%(realloc)d'),
+    (7, 'Seek_Error_Rate', 'POSR--', '088', '060', '030', '-', '634586126'),
+    (9, 'Power_On_Hours', '-O--CK', '075', '075', '000', '-', '%(hours)d'),
+    (10, 'Spin_Retry_Count', 'PO--C-', '100', '100', '097', '-', '0'),
+    (12, 'Power_Cycle_Count', '-O--CK', '100', '100', '020', '-', '12'),
+    (184, 'End-to-End_Error', '-O--CK', '100', '100', '099', '-', '0'),
+    (187, 'Reported_Uncorrect', '-O--CK', '100', '100', '000', '-', '0'),
+    (188, 'Command_Timeout', '-O--CK', '100', '100', '000', '-', '0 0 0'),
+    (189, 'High_Fly_Writes', '-O-RCK', '100', '100', '000', '-', '0'),
+    (190, 'Airflow_Temperature_Cel', '-O---K', '075', '062', '045', '-',
+        '%(temp)d (Min/Max 21/%(temp)d)'),
+    (191, 'G-Sense_Error_Rate', '-O--CK', '100', '100', '000', '-', '0'),
+    (192, 'Power-Off_Retract_Count', '-O--CK', '100', '100', '000', '-', '11'),
+    (193, 'Load_Cycle_Count', '-O--CK', '100', '100', '000', '-', '13'),
+    (194, 'Temperature_Celsius', '-O---K', '025', '040', '000', '-',
+        '%(temp)d (0 14 0 0 0)'),
+    (197, 'Current_Pending_Sector', '-O--C-', '100', '100', '000', '-', '%(pending)d'),
+    (198, 'Offline_Uncorrectable', '----C-', '100', '100', '000', '-', '0'),
+    (199, 'UDMA_CRC_Error_Count', '-OSRCK', '200', '200', '000', '-', '0'),
+)
+
+# Wear attributes of SSDs, the normalized value is the remaining lifetime
+SSD_WEAR_ATTRIBUTES = (
+    (177, 'Wear_Leveling_Count', 'PO--C-', '%(wear)03d', '%(wear)03d', '000', '-', '1043'),
+    (233, 'Media_Wearout_Indicator', '-O--CK', '%(wearout)03d', '%(wearout)03d', '000', '-',
+        '0'),
+)
+
+# Vendor specific names of attributes of SSDs (e.g. of Micron or Intel)
+SSD_ATTRIBUTE_NAMES = {
+    5: 'Reallocate_NAND_Blk_Cnt',
+    194: 'Temperature_Case',
+    197: 'Current_Pending_ECC_Cnt',
+    198: 'Offline_Uncorrectable_Cnt',
+}
+
+#------------------------------------------------------------------------------
+def sata_values(nr):
+
+    return {
+        'serial': 'Z1Z%05d' % (nr),
+        'realloc': (nr % 7 == 3) and nr or 0,
+        'pending': (nr % 11 == 5) and 1 or 0,
+        'hours': 20000 + nr * 13,
+        'temp': 25 + nr % 10,
+        'wear': 100 - nr % 50,
+        'wearout': 100 - nr % 40,
+    }
+
+#------------------------------------------------------------------------------
+def sata_attributes(ssd=False):
+
+    if ssd:
+        return SATA_ATTRIBUTES + SSD_WEAR_ATTRIBUTES
+    return SATA_ATTRIBUTES
+
+#------------------------------------------------------------------------------
+def smartctl_sata(nr=0, names=None, ssd=False):
+    """
+    Output of 'smartctl -x' of the SATA disk (or SSD) with the given number,
+    the names of the attributes may be overridden by their IDs.
+    """
+
+    if names is None:
+        names = {}
+    values = sata_values(nr)
+    lines = [
+        "smartctl 6.2 2013-07-26 r3841 [x86_64-linux-3.16.0] (local build)",
+        "Copyright (C) 2002-13, Bruce Allen, Christian Franke, www.smartmontools.org",
+        "",
+        "=== START OF INFORMATION SECTION ===",
+        "Model Family:     Seagate Constellation ES.3",
+        "Device Model:     ST4000NM0033-9ZM170",
+        "Serial Number:    %(serial)s" % values,
+        "LU WWN Device Id: 5 000c50 0%07x" % (nr),
+        "Firmware Version: SN04",
+        "User Capacity:    4,000,787,030,016 bytes [4.00 TB]",
+        "Sector Size:      512 bytes logical/physical",
+        "Rotation Rate:    7200 rpm",
+        "Device is:        In smartctl database [for details use: -P show]",
+        "ATA Version is:   ACS-2 (minor revision not indicated)",
+        "SATA Version is:  SATA 3.0, 6.0 Gb/s (current: 6.0 Gb/s)",
+        "Local Time is:    Mon Mar 14 10:12:03 2016 CET",
+        "SMART support is: Available - device has SMART capability.",
+        "SMART support is: Enabled",
+        "",
+        "=== START OF READ SMART DATA SECTION ===",
+        "SMART overall-health self-assessment test result: PASSED",
+        "",
+        "General SMART Values:",
+        "Offline data collection status:  (0x82)\tOffline data collection activity",
+        "\t\t\t\t\twas completed without error.",
+        "Total time to complete Offline ",
+        "data collection: \t\t(  584) seconds.",
+        "",
+        "SMART Attributes Data Structure revision number: 10",
+        "Vendor Specific SMART Attributes with Thresholds:",
+        "ID# ATTRIBUTE_NAME          FLAGS    VALUE WORST THRESH FAIL RAW_VALUE",
+    ]
+    for attr in sata_attributes(ssd):
+        raw = attr[7] % values
+        lines.append("%3d %-23s %s   %s   %s   %s    %s    %s" % (
+            attr[0], names.get(attr[0], attr[1]), attr[2], attr[3] % values,
+            attr[4] % values, attr[5], attr[6], raw))
+    lines += [
+        "                            ||||||_ K auto-keep",
+        "                            |||||__ C event count",
+        "                            ||||___ R error rate",
+        "                            |||____ S speed/performance",
+        "                            ||_____ O updated online",
+        "                            |______ P prefailure warning",
+        "",
+        "SMART Extended Comprehensive Error Log Version: 1 (5 sectors)",
+        "No Errors Logged",
+        "",
+        "SMART Extended Self-test Log Version: 1 (1 sectors)",
+        "Num  Test_Description    Status                  Remaining  LifeTime(hours)",
+        "# 1  Short offline       Completed without error       00%%     %(hours)d" % values,
+        "",
+        "SCT Status Version:                  3",
+        "Device State:                        Active (0)",
+        "Current Temperature:                    %(temp)d Celsius" % values,
+        "Power Cycle Min/Max Temperature:     21/%(temp)d Celsius" % values,
+        "",
+    ]
+    return "\n".join(lines) + "\n"
+
+#------------------------------------------------------------------------------
+def smartctl_sas(nr=0, ssd=False):
+    """Output of 'smartctl -x' of the SAS disk (or SSD) with the given number."""
+
+    lines = [
+        "smartctl 6.2 2013-07-26 r3841 [x86_64-linux-3.16.0] (local build)",
+        "Copyright (C) 2002-13, Bruce Allen, Christian Franke, www.smartmontools.org",
+        "",
+        "=== START OF INFORMATION SECTION ===",
+        "Vendor:               SEAGATE",
+        "Product:              ST600MM0006",
+        "Revision:             LS08",
+        "User Capacity:        600,127,266,816 bytes [600 GB]",
+        "Logical block size:   512 bytes",
+        "Rotation Rate:        10000 rpm",
+        "Logical Unit id:      0x5000c5005d%06x" % (nr),
+        "Serial number:        S0M%05d" % (nr),
+        "Device type:          disk",
+        "Transport protocol:   SAS",
+        "Local Time is:        Mon Mar 14 10:12:03 2016 CET",
+        "SMART support is:     Available - device has SMART capability.",
+        "SMART support is:     Enabled",
+        "Temperature Warning:  Enabled",
+        "",
+        "=== START OF READ SMART DATA SECTION ===",
+        "SMART Health Status: OK",
+        "",
+        "Current Drive Temperature:     %d C" % (30 + nr % 8),
+        "Drive Trip Temperature:        68 C",
+        "",
+        "Manufactured in week 06 of year 2012",
+        "Specified cycle count over device lifetime:  10000",
+        "Accumulated start-stop cycles:  33",
+        "Elements in grown defect list: %d" % ((nr % 13 == 7) and 3 or 0),
+        "",
+    ]
+    if ssd:
+        lines += [
+            "Percentage used endurance indicator: %d%%" % (nr % 30),
+            "",
+        ]
+    lines += [
+        "Error counter log:",
+        "           Errors Corrected by           Total   Correction     Gigabytes    Total",
+        "               ECC          rereads/    errors   algorithm      processed    uncorrected",
+        "           fast | delayed   rewrites  corrected  invocations   [10^9 bytes]  errors",
+        "read:   41962337        0         0  41962337   41962337      47823.081           0",
+        "write:         0        0         0         0          0      15627.553           0",
+        "verify:     1451        0         0      1451       1451          0.000           0",
+        "",
+        "Non-medium error count:        5",
+        "",
+        "SMART Self-test log",
+        ("Num  Test              Status                 segment  LifeTime  "
+            "LBA_first_err [SK ASC ASQ]"),
+        "     Description                              number   (hours)",
+        ("# 1  Background short  Completed                   -   %d                 "
+            "- [-   -    -]") % (30000 + nr),
+        "",
+        "Long (extended) Self Test duration: 5000 seconds [83.3 minutes]",
+        "",
+        "Background scan results log",
+        "  Status: waiting until BMS interval timer expires",
+        "    Accumulated power on time, hours:minutes %d:%02d [%d minutes]" % (
+            30000 + nr, nr % 60, (30000 + nr) * 60 + nr % 60),
+        "",
+        "Protocol Specific port log page for SAS SSP",
+        "relative target port id = 1",
+        "  generation code = 0",
+        "  number of phys = 1",
+        "",
+        "Device Statistics",
+        "  number of hours powered up = %d.%02d" % (30000 + nr, nr % 100),
+        "",
+    ]
+    return "\n".join(lines) + "\n"
+
+#------------------------------------------------------------------------------
+def smartctl_sata_json(nr=0, names=None, ssd=False):
+    """
+    Output of 'smartctl -x --json' of the SATA disk (or SSD) with the given number,
+    the names of the attributes may be overridden by their IDs.
+    """
+
+    if names is None:
+        names = {}
+    values = sata_values(nr)
+
+    table = []
+    for attr in sata_attributes(ssd):
+        raw = attr[7] % values
+        flags = attr[2]
+        table.append({
+            'id': attr[0],
+            'name': names.get(attr[0], attr[1]),
+            'value': int(attr[3] % values),
+            'worst': int(attr[4] % values),
+            'thresh': int(attr[5]),
+            'when_failed': '',
+            'flags': {
+                'string': flags + ' ',
+                'prefailure': flags[0] == 'P',
+                'updated_online': flags[1] == 'O',
+                'performance': flags[2] == 'S',
+                'error_rate': flags[3] == 'R',
+                'event_count': flags[4] == 'C',
+                'auto_keep': flags[5] == 'K',
+            },
+            'raw': {'value': int(raw.split()[0]), 'string': raw},
+        })
+
+    data = {
+        'json_format_version': [1, 0],
+        'smartctl': {'version': [7, 1], 'exit_status': 0},
+        'device': {'name': '/dev/sda', 'type': 'sat', 'protocol': 'ATA'},
+        'model_family': 'Seagate Constellation ES.3',
+        'model_name': 'ST4000NM0033-9ZM170',
+        'serial_number': values['serial'],
+        'firmware_version': 'SN04',
+        'user_capacity': {'blocks': 7814037168, 'bytes': 4000787030016},
+        'smart_support': {'available': True, 'enabled': True},
+        'smart_status': {'passed': True},
+        'ata_smart_attributes': {'revision': 10, 'table': table},
+        'power_on_time': {'hours': values['hours']},
+        'power_cycle_count': 12,
+        'temperature': {'current': values['temp']},
+    }
+    return json.dumps(data, indent=2) + "\n"
+
+#------------------------------------------------------------------------------
+def smartctl_sas_json(nr=0, ssd=False):
+    """Output of 'smartctl -x --json' of the SAS disk (or SSD) with the given number."""
+
+    data = {
+        'json_format_version': [1, 0],
+        'smartctl': {'version': [7, 1], 'exit_status': 0},
+        'device': {'name': '/dev/sda', 'type': 'scsi', 'protocol': 'SCSI'},
+        'vendor': 'SEAGATE',
+        'product': 'ST600MM0006',
+        'model_name': 'SEAGATE ST600MM0006',
+        'scsi_vendor': 'SEAGATE',
+        'scsi_product': 'ST600MM0006',
+        'scsi_model_name': 'SEAGATE ST600MM0006',
+        'serial_number': 'S0M%05d' % (nr),
+        'user_capacity': {'blocks': 1172123568, 'bytes': 600127266816},
+        'smart_support': {'available': True, 'enabled': True},
+        'smart_status': {'passed': True},
+        'temperature': {'current': 30 + nr % 8, 'drive_trip': 68},
+        'scsi_grown_defect_list': (nr % 13 == 7) and 3 or 0,
+        'power_on_time': {'hours': 30000 + nr, 'minutes': nr % 60},
+    }
+    if ssd:
+        data['scsi_percentage_used_endurance_indicator'] = nr % 30
+    return json.dumps(data, indent=2) + "\n"
+
+#------------------------------------------------------------------------------
+def smartctl_no_smart_json():
+    """Output of 'smartctl -x --json' of a device without SMART."""
+
+    data = {
+        'json_format_version': [1, 0],
+        'smartctl': {'version': [7, 1], 'exit_status': 4},
+        'device': {'name': '/dev/sdc', 'type': 'scsi', 'protocol': 'SCSI'},
+        'smart_support': {'available': False},
+    }
+    return json.dumps(data, indent=2) + "\n"
+
+#------------------------------------------------------------------------------
+def nvme_values(nr):
+    """The values of the health log of the NVMe controller with the given number."""
+
+    return {
+        'critical_warning': (nr % 11 == 9) and 0x04 or 0,
+        'temperature': 30 + nr % 10,
+        'available_spare': 100 - nr % 5,
+        'available_spare_threshold': 10,
+        'percentage_used': nr % 20,
+        'power_on_hours': 1200 + nr,
+        'media_errors': (nr % 13 == 7) and 5 or 0,
+        'num_err_log_entries': nr,
+    }
+
+#------------------------------------------------------------------------------
+def smartctl_nvme(nr=0):
+    """Output of 'smartctl -x' of the NVMe controller with the given number."""
+
+    values = nvme_values(nr)
+    health = 'PASSED'
+    if values['critical_warning']:
+        health = 'FAILED!'
+    lines = [
+        "smartctl 6.6 2017-11-05 r4594 [x86_64-linux-4.19.0] (local build)",
+        "",
+        "=== START OF INFORMATION SECTION ===",
+        "Model Number:                       SAMSUNG MZVLB512HAJQ-00000",
+        "Serial Number:                      S3W8NX0M%06d" % (nr),
+        "Firmware Version:                   EXA7301Q",
+        "PCI Vendor/Subsystem ID:            0x144d",
+        "Number of Namespaces:               1",
+        "",
+        "=== START OF SMART DATA SECTION ===",
+        "SMART overall-health self-assessment test result: %s" % (health),
+        "",
+        "SMART/Health Information (NVMe Log 0x02)",
+        "Critical Warning:                   0x%02x" % (values['critical_warning']),
+        "Temperature:                        %d Celsius" % (values['temperature']),
+        "Available Spare:                    %d%%" % (values['available_spare']),
+        "Available Spare Threshold:          %d%%" % (values['available_spare_threshold']),
+        "Percentage Used:                    %d%%" % (values['percentage_used']),
+        "Data Units Read:                    9,437,421 [4.83 TB]",
+        "Data Units Written:                 12,193,087 [6.24 TB]",
+        "Power Cycles:                       1,019",
+        "Power On Hours:                     %d,%03d" % divmod(values['power_on_hours'], 1000),
+        "Unsafe Shutdowns:                   52",
+        "Media and Data Integrity Errors:    %d" % (values['media_errors']),
+        "Error Information Log Entries:      %d" % (values['num_err_log_entries']),
+        "Temperature Sensor 1:               %d Celsius" % (values['temperature'] + 2),
+        "",
+    ]
+    return "\n".join(lines) + "\n"
+
+#------------------------------------------------------------------------------
+def smartctl_nvme_json(nr=0):
+    """Output of 'smartctl -x --json' of the NVMe controller with the given number."""
+
+    values = nvme_values(nr)
+    data = {
+        'json_format_version': [1, 0],
+        'smartctl': {'version': [7, 1], 'exit_status': 0},
+        'device': {'name': '/dev/nvme%d' % (nr), 'type': 'nvme', 'protocol': 'NVMe'},
+        'model_name': 'SAMSUNG MZVLB512HAJQ-00000',
+        'serial_number': 'S3W8NX0M%06d' % (nr),
+        'smart_status': {'passed': not values['critical_warning']},
+        'nvme_smart_health_information_log': {
+            'critical_warning': values['critical_warning'],
+            'temperature': values['temperature'],
+            'available_spare': values['available_spare'],
+            'available_spare_threshold': values['available_spare_threshold'],
+            'percentage_used': values['percentage_used'],
+            'data_units_read': 9437421,
+            'data_units_written': 12193087,
+            'power_cycles': 1019,
+            'power_on_hours': values['power_on_hours'],
+            'unsafe_shutdowns': 52,
+            'media_errors': values['media_errors'],
+            'num_err_log_entries': values['num_err_log_entries'],
+        },
+        'temperature': {'current': values['temperature']},
+        'power_on_time': {'hours': values['power_on_hours']},
+    }
+    return json.dumps(data, indent=2) + "\n"
+
+#------------------------------------------------------------------------------
+def nvme_health_log(nr=0):
+    """The binary health log page (512 bytes) of the NVMe controller with the given number."""
+
+    values = nvme_values(nr)
+    buf = struct.pack(
+        '<BHBBB', values['critical_warning'], values['temperature'] + 273,
+        values['available_spare'], values['available_spare_threshold'],
+        values['percentage_used'])
+    buf += b'\0' * (32 - len(buf))
+    counters = (
+        9437421, 12193087, 0, 0, 0, 1019, values['power_on_hours'], 52,
+        values['media_errors'], values['num_err_log_entries'])
+    for counter in counters:
+        buf += struct.pack('<QQ', counter, 0)
+    buf += b'\0' * (512 - len(buf))
+    return buf
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
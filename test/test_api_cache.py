@@ -0,0 +1,399 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: test script (and module) for unit tests on the shared cache of
+          the responses of the DcManager API in front of a REST client
+'''
+
+import unittest
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+libdir = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), '..'))
+sys.path.insert(0, libdir)
+
+import general
+from general import ColoredFormatter, get_arg_verbose, init_root_logger
+from general import NagiosPluginTestcase
+
+import dcm_samples
+
+from dcm_server import matches, DcmStandInServer
+
+try:
+    import dcmanagerclient
+    HAS_DCMANAGERCLIENT = True
+except ImportError:
+    HAS_DCMANAGERCLIENT = False
+
+log = logging.getLogger(__name__)
+
+API_URL = 'https://dcmanager.example.com/api/'
+
+#==============================================================================
+class ListingApiError(Exception):
+    pass
+
+#==============================================================================
+class ListingApi(object):
+    """
+    A client object with listing methods like the RestApi of the DcManager
+    client, which records its calls instead of doing requests.
+    """
+
+    #--------------------------------------------------------------------------
+    def __init__(self, data, calls, url=API_URL, delay=0.0, result_type=list):
+
+        self.data = data
+        self.calls = calls
+        self.url = url
+        self.delay = delay
+        self.result_type = result_type
+
+    #--------------------------------------------------------------------------
+    def ping(self):
+        return 'pong'
+
+    #--------------------------------------------------------------------------
+    def __getattr__(self, name):
+
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def listing(**params):
+            self.calls.append((name, params))
+            if self.delay:
+                time.sleep(self.delay)
+            if name not in self.data:
+                raise ListingApiError("Unknown resource %r." % (name))
+            objects = self.data[name]
+            for (key, value) in params.items():
+                if not isinstance(value, bool):
+                    objects = [x for x in objects if matches(x, key, value)]
+            if self.result_type is list:
+                return objects
+            return self.result_type(json.dumps(objects))
+
+        return listing
+
+#==============================================================================
+class TestApiCache(NagiosPluginTestcase):
+
+    #--------------------------------------------------------------------------
+    def setUp(self):
+        self.state_dir = tempfile.mkdtemp(prefix='test-api-cache-')
+        self.data = dcm_samples.dataset(100)
+        self.calls = []
+
+    #--------------------------------------------------------------------------
+    def tearDown(self):
+        shutil.rmtree(self.state_dir, True)
+
+    #--------------------------------------------------------------------------
+    def new_api(self, ttl=60, lock_timeout=10.0, **kwargs):
+
+        from nagios.plugins.api_cache import ResponseCache, CachedRestApi
+
+        client = ListingApi(self.data, self.calls, **kwargs)
+        cache = ResponseCache(state_dir=self.state_dir, ttl=ttl, lock_timeout=lock_timeout)
+        return CachedRestApi(client, cache)
+
+    #--------------------------------------------------------------------------
+    def test_import_modules(self):
+
+        log.info("Test importing all appropriate modules ...")
+
+        log.debug("Importing %r from %r ...", 'CachedRestApi', 'nagios.plugins.api_cache')
+        from nagios.plugins.api_cache import ResponseCache, CachedRestApi
+
+    #--------------------------------------------------------------------------
+    def test_client_calls(self):
+
+        log.info("Testing the requests by the methods of the client.")
+
+        api = self.new_api(ttl=0)
+        log.debug("Client: %r", api)
+        self.assertEqual(api.url, API_URL)
+        for i in range(3):
+            vstorages = api.vstorages(pstorage=dcm_samples.HOSTNAME, contract_infos=False)
+            self.assertEqual(len(vstorages), 85)
+        self.assertEqual(api.clusters(), self.data['clusters'])
+        body = api.get('vsnapshots', pstorage=dcm_samples.HOSTNAME).read()
+        self.assertEqual(len(json.loads(body.decode('utf-8'))), 5)
+        storages = api.pstorages(name=dcm_samples.HOSTNAME)
+        self.assertEqual([x['cluster'] for x in storages], [dcm_samples.CLUSTER])
+
+        # the parameters are given unchanged to the client, its errors too
+        self.assertEqual(self.calls[0], (
+            'vstorages', {'pstorage': dcm_samples.HOSTNAME, 'contract_infos': False}))
+        self.assertEqual(self.calls[-1], ('pstorages', {'name': dcm_samples.HOSTNAME}))
+        self.assertRaises(ListingApiError, api.nothing)
+        self.assertEqual(len(self.calls), 7)
+        self.assertEqual((api.requests, api.cache_hits), (5, 0))
+
+        # other attributes than the listing methods are the ones of the client
+        self.assertEqual(api.ping, api.api.ping)
+        self.assertEqual(api.ping(), 'pong')
+        self.assertEqual((api.requests, api.cache_hits), (5, 0))
+
+        # responses given back by the client as text or file
+        for result_type in (str, lambda x: io.BytesIO(x.encode('utf-8'))):
+            api = self.new_api(ttl=0, result_type=result_type)
+            self.assertEqual(len(api.vimages(pstorage=dcm_samples.HOSTNAME)), 10)
+
+    #--------------------------------------------------------------------------
+    def test_ttl(self):
+
+        log.info("Testing the time to live of cached responses.")
+
+        api = self.new_api()
+        body = api.get('vstorages', pstorage=dcm_samples.HOSTNAME, contract_infos=False).read()
+
+        # another check takes the response without a request
+        api = self.new_api()
+        self.assertEqual(
+            api.get('vstorages', pstorage=dcm_samples.HOSTNAME, contract_infos=False).read(),
+            body)
+        vstorages = api.vstorages(pstorage=dcm_samples.HOSTNAME, contract_infos=False)
+        self.assertEqual(len(vstorages), 85)
+        self.assertEqual((api.requests, api.cache_hits), (0, 2))
+        self.assertEqual(len(self.calls), 1)
+
+        # other parameters and another API are requested separately
+        api.vstorages(pstorage=dcm_samples.HOSTNAME, contract_infos=True)
+        api.vstorages(pstorage=dcm_samples.HOSTNAME)
+        api.pstorages(name=dcm_samples.HOSTNAME)
+        self.new_api(url='https://other.example.com/api/').vstorages(
+            pstorage=dcm_samples.HOSTNAME, contract_infos=False)
+        self.assertEqual(len(self.calls), 5)
+        self.assertEqual(len(self.new_api().pstorages(name=dcm_samples.HOSTNAME)), 1)
+        self.assertEqual(len(self.calls), 5)
+
+        # an expired response is requested again
+        key = api.cache_key('vstorages', {
+            'pstorage': dcm_samples.HOSTNAME, 'contract_infos': False})
+        os.utime(api.cache.filename(key), (1000, 1000))
+        self.assertEqual(
+            api.get('vstorages', pstorage=dcm_samples.HOSTNAME, contract_infos=False).read(),
+            body)
+        self.assertEqual(len(self.calls), 6)
+        self.assertEqual(
+            api.get('vstorages', pstorage=dcm_samples.HOSTNAME, contract_infos=False).read(),
+            body)
+        self.assertEqual(len(self.calls), 6)
+
+        # other methods than the listing methods are always requested
+        self.assertEqual(api.clusters(), self.data['clusters'])
+        self.assertEqual(api.clusters(), self.data['clusters'])
+        self.assertEqual(len(self.calls), 8)
+        self.assertFalse(os.path.exists(api.cache.filename(api.cache_key('clusters', {}))))
+
+        # failed requests aren't cached
+        del self.data['vsnapshots']
+        self.assertRaises(ListingApiError, api.vsnapshots, pstorage=dcm_samples.HOSTNAME)
+        self.assertRaises(ListingApiError, api.vsnapshots, pstorage=dcm_samples.HOSTNAME)
+        self.assertEqual(len(self.calls), 10)
+        self.assertEqual((api.requests, api.cache_hits), (6, 3))
+
+    #--------------------------------------------------------------------------
+    def test_single_flight(self):
+
+        log.info("Testing a single request of concurrent checks.")
+
+        apis = []
+        results = []
+        for i in range(4):
+            apis.append(self.new_api(delay=0.3))
+
+        def fetch(api):
+            results.append(api.get('vimages', pstorage=dcm_samples.HOSTNAME).read())
+
+        threads = []
+        for api in apis:
+            thread = threading.Thread(target=fetch, args=(api,))
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 4)
+        self.assertEqual(len(json.loads(results[0].decode('utf-8'))), 10)
+        for body in results[1:]:
+            self.assertEqual(body, results[0])
+        self.assertEqual(len(self.calls), 1)
+
+    #--------------------------------------------------------------------------
+    def test_stream(self):
+
+        log.info("Testing the caching of large responses chunk by chunk.")
+
+        from nagios.plugin.jsonstream import iter_objects
+        from nagios.plugins.api_cache import CHUNK_SIZE
+
+        self.data = dcm_samples.dataset(1000)
+        sizes = []
+
+        class Stream(io.BytesIO):
+            def read(self, size=-1):
+                sizes.append(size)
+                return io.BytesIO.read(self, size)
+
+        api = self.new_api(result_type=lambda x: Stream(x.encode('utf-8')))
+        expected = []
+        for vstorage in self.data['vstorages']:
+            if matches(vstorage, 'pstorage', dcm_samples.HOSTNAME):
+                expected.append(vstorage)
+        self.assertTrue(len(json.dumps(expected)) > 4 * CHUNK_SIZE)
+
+        # the response stream of the client is read in chunks into the cache
+        response = api.get('vstorages', pstorage=dcm_samples.HOSTNAME)
+        self.assertEqual(set(sizes), set([CHUNK_SIZE]))
+        self.assertEqual(list(iter_objects(response)), expected)
+
+        # the cached response is decompressed while reading
+        response = self.new_api().get('vstorages', pstorage=dcm_samples.HOSTNAME)
+        self.assertEqual(len(self.calls), 1)
+        head = response.read(10)
+        self.assertEqual(len(head), 10)
+        self.assertTrue(len(response.buf) <= 16 * CHUNK_SIZE)
+        self.assertEqual(json.loads((head + response.read()).decode('utf-8')), expected)
+        self.assertEqual(response.read(10), b'')
+
+        # a decoded response of the client is encoded in chunks
+        chunks = list(api._encode(expected))
+        self.assertTrue(len(chunks) > 4)
+        self.assertEqual(json.loads(b''.join(chunks).decode('utf-8')), expected)
+
+    #--------------------------------------------------------------------------
+    @unittest.skipIf(fcntl is None, "The module fcntl is not available.")
+    def test_lock_timeout(self):
+
+        log.info("Testing the bounded wait for the lock of a hanging check.")
+
+        api = self.new_api(lock_timeout=0.3)
+        key = api.cache_key('vimages', {'pstorage': dcm_samples.HOSTNAME})
+
+        # another check holds the lock without refreshing the response
+        fd = api.cache.lock(key)
+        self.assertNotEqual(fd, None)
+        try:
+            start = time.time()
+            self.assertEqual(api.cache.lock(key), None)
+            body = api.get('vimages', pstorage=dcm_samples.HOSTNAME).read()
+            duration = time.time() - start
+        finally:
+            api.cache.unlock(fd)
+
+        self.assertEqual(len(json.loads(body.decode('utf-8'))), 10)
+        self.assertEqual(len(self.calls), 1)
+        self.assertTrue(0.5 <= duration < 5, "Waited %0.2f seconds." % (duration))
+
+        # the response fetched without the lock is cached nevertheless
+        self.assertEqual(api.get('vimages', pstorage=dcm_samples.HOSTNAME).read(), body)
+        self.assertEqual(len(self.calls), 1)
+
+    #--------------------------------------------------------------------------
+    @unittest.skipIf(not HAS_DCMANAGERCLIENT, "The module dcmanagerclient is not available.")
+    def test_no_cache(self):
+
+        log.info("Testing the rejection of --api-cache-ttl by the check of the API.")
+
+        from nagios.plugins.api_cache import CachedRestApi
+        from nagios.plugins.check_dcmanager_api import CheckDcmanagerApiPlugin
+        from nagios.plugins.base_dcm_client_check import BaseDcmClientPlugin
+
+        plugin = BaseDcmClientPlugin(
+            usage='%(prog)s [options]', shortname='PB_DCM_TEST', blurb='Test of the cache.')
+        plugin.parse_args(['--api-url', API_URL, '--api-cache-ttl', '60'])
+        self.assertTrue(plugin.api_cache)
+        self.assertTrue(isinstance(plugin.create_api(), CachedRestApi))
+
+        plugin = CheckDcmanagerApiPlugin()
+        self.assertFalse(plugin.api_cache)
+        try:
+            plugin.parse_args(['-w', '10', '-c', '20', '--api-cache-ttl', '60'])
+        except SystemExit as e:
+            self.assertEqual(e.code, 3)
+        else:
+            self.fail("--api-cache-ttl was not rejected.")
+
+    #--------------------------------------------------------------------------
+    @unittest.skipIf(not HAS_DCMANAGERCLIENT, "The module dcmanagerclient is not available.")
+    def test_api_check_deadline(self):
+
+        log.info("Testing the timeout of the check of the API with serial requests.")
+
+        from nagios.plugins.check_dcmanager_api import CheckDcmanagerApiPlugin
+
+        server = DcmStandInServer(self.data, latency=0.4)
+        server.start()
+        try:
+            plugin = CheckDcmanagerApiPlugin()
+            plugin.parse_args([
+                '--api-url', server.url, '-w', '10', '-c', '20', '-t', '1',
+                '--requests', '10', '--concurrency', '1'])
+            plugin.parse_args_second()
+            plugin.api = plugin.create_api()
+            start = time.time()
+            try:
+                plugin.run()
+            except SystemExit as e:
+                code = e.code
+            else:
+                self.fail("The check didn't exit.")
+            duration = time.time() - start
+        finally:
+            server.stop()
+
+        log.debug("Check exited with %r after %0.2f seconds, %d requests.",
+                  code, duration, server.requests)
+        self.assertTrue(duration < 2.0, "The check ran %0.2f seconds." % (duration))
+        self.assertTrue(server.requests < 10)
+        self.assertNotEqual(code, 0)
+
+#==============================================================================
+
+if __name__ == '__main__':
+
+    verbose = get_arg_verbose()
+    if verbose is None:
+        verbose = 0
+    init_root_logger(verbose)
+
+    log.info("Starting tests ...")
+
+    suite = unittest.TestSuite()
+
+    suite.addTest(TestApiCache('test_import_modules', verbose))
+    suite.addTest(TestApiCache('test_client_calls', verbose))
+    suite.addTest(TestApiCache('test_ttl', verbose))
+    suite.addTest(TestApiCache('test_single_flight', verbose))
+    suite.addTest(TestApiCache('test_stream', verbose))
+    suite.addTest(TestApiCache('test_lock_timeout', verbose))
+    suite.addTest(TestApiCache('test_no_cache', verbose))
+    suite.addTest(TestApiCache('test_api_check_deadline', verbose))
+
+    runner = unittest.TextTestRunner(verbosity = verbose)
+
+    result = runner.run(suite)
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: test script (and module) for unit tests on the common used
+          routines of nagios.common
+'''
+
+import unittest
+import os
+import sys
+import logging
+
+libdir = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), '..'))
+sys.path.insert(0, libdir)
+
+import general
+from general import ColoredFormatter, get_arg_verbose, init_root_logger
+from general import NagiosPluginTestcase
+
+log = logging.getLogger(__name__)
+
+#==============================================================================
+class TestCommon(NagiosPluginTestcase):
+
+    #--------------------------------------------------------------------------
+    def test_import_modules(self):
+
+        log.info("Test importing all appropriate modules ...")
+
+        log.debug("Importing %r from %r ...", 'percentile', 'nagios.common')
+        from nagios.common import monotonic, percentile
+
+    #--------------------------------------------------------------------------
+    def test_percentile(self):
+
+        log.info("Testing percentiles by the nearest rank method.")
+
+        from nagios.common import percentile
+
+        values = list(range(100, 0, -1))
+        self.assertEqual(percentile(values, 0), 1)
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99.5), 100)
+        self.assertEqual(percentile(values, 100), 100)
+
+        self.assertEqual(percentile([0.3], 95), 0.3)
+        self.assertEqual(percentile([0.4, 0.1, 0.2], 50), 0.2)
+        self.assertEqual(percentile(iter([0.4, 0.1, 0.2]), 95), 0.4)
+        self.assertRaises(ValueError, percentile, [], 50)
+
+    #--------------------------------------------------------------------------
+    def test_monotonic(self):
+
+        log.info("Testing the monotonic clock.")
+
+        from nagios.common import monotonic
+
+        start = monotonic()
+        self.assertTrue(monotonic() - start >= 0)
+
+#==============================================================================
+
+if __name__ == '__main__':
+
+    verbose = get_arg_verbose()
+    if verbose is None:
+        verbose = 0
+    init_root_logger(verbose)
+
+    log.info("Starting tests ...")
+
+    suite = unittest.TestSuite()
+
+    suite.addTest(TestCommon('test_import_modules', verbose))
+    suite.addTest(TestCommon('test_percentile', verbose))
+    suite.addTest(TestCommon('test_monotonic', verbose))
+
+    runner = unittest.TextTestRunner(verbosity = verbose)
+
+    result = runner.run(suite)
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
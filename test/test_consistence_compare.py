@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: test script (and module) for unit tests on the comparision of
+          the logical volumes with the volumes from API of the storage
+          consistence check
+'''
+
+import unittest
+import os
+import sys
+import uuid
+import shutil
+import logging
+import tempfile
+
+libdir = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), '..'))
+sys.path.insert(0, libdir)
+
+import general
+from general import ColoredFormatter, get_arg_verbose, init_root_logger
+from general import NagiosPluginTestcase
+
+import lvm_samples
+
+try:
+    import dcmanagerclient
+    HAS_DCMANAGERCLIENT = True
+except ImportError:
+    HAS_DCMANAGERCLIENT = False
+
+log = logging.getLogger(__name__)
+
+VG = lvm_samples.VG_NAME
+MIB = 1024 * 1024
+REMOVE_TS = 1452507133
+
+#------------------------------------------------------------------------------
+def short_guid(nr):
+    return '0001-0002-0003-%012x' % (nr)
+
+#------------------------------------------------------------------------------
+def guid_key(nr):
+    return uuid.UUID('600144f0-' + short_guid(nr)).int
+
+#------------------------------------------------------------------------------
+def lvs_line(name, size=1024, attr='-wi-ao----', origin='', vg=VG):
+    return "  %s;%s;1;0;%s;%s-uuid;/dev/sdb(0);/dev/%s/%s;4194304;%d;%s" % (
+        name, vg, attr, name, vg, name, size * MIB, origin)
+
+#------------------------------------------------------------------------------
+def cfg_content(nr, remove_ts=None):
+    content = "[Volume]\nguid = 600144f0-%s\nsize = 1024\n" % (short_guid(nr))
+    if remove_ts:
+        content += "remove_object = %d\n" % (remove_ts)
+    return content
+
+#==============================================================================
+@unittest.skipIf(not HAS_DCMANAGERCLIENT, "The module dcmanagerclient is not available.")
+class TestConsistenceCompare(NagiosPluginTestcase):
+
+    #--------------------------------------------------------------------------
+    def setUp(self):
+
+        from nagios.plugins import check_pb_consistence_storage as module
+
+        self.tmp_dir = tempfile.mkdtemp(prefix='test-consistence-compare-')
+        self.old_env = os.environ.get('NAGIOS_STATE_DIR')
+        os.environ['NAGIOS_STATE_DIR'] = self.tmp_dir
+        self.old_config_dir = module.STORAGE_CONFIG_DIR
+        module.STORAGE_CONFIG_DIR = os.path.join(self.tmp_dir, 'config')
+        os.makedirs(module.STORAGE_CONFIG_DIR)
+
+    #--------------------------------------------------------------------------
+    def tearDown(self):
+
+        from nagios.plugins import check_pb_consistence_storage as module
+        from nagios.plugin.fixtures import set_fixture_archive
+
+        set_fixture_archive(None)
+        module.STORAGE_CONFIG_DIR = self.old_config_dir
+        if self.old_env is None:
+            del os.environ['NAGIOS_STATE_DIR']
+        else:
+            os.environ['NAGIOS_STATE_DIR'] = self.old_env
+        shutil.rmtree(self.tmp_dir, True)
+
+    #--------------------------------------------------------------------------
+    def write_cfg(self, name, content):
+
+        from nagios.plugins import check_pb_consistence_storage as module
+
+        fh = open(os.path.join(module.STORAGE_CONFIG_DIR, name + '.ini'), 'w')
+        fh.write(content)
+        fh.close()
+
+    #--------------------------------------------------------------------------
+    def new_plugin(self, lines):
+        """
+        Gives back a consistence plugin, which takes the output of 'lvm lvs'
+        from a replayed fixture archive.
+        """
+
+        from nagios.plugin.fixtures import FixtureArchive, set_fixture_archive
+        from nagios.plugins import check_pb_consistence_storage as module
+
+        filename = os.path.join(self.tmp_dir, 'fixtures.json')
+        archive = FixtureArchive(filename, mode='record')
+        archive.add_command(
+            ['lvm', 'lvs', '--nosuffix', '--noheadings', '--units', 'b', '--separator', ';',
+                '-o', ','.join(lvm_samples.LV_FIELDS)], 0, "\n".join(lines) + "\n")
+        archive.save()
+        set_fixture_archive(FixtureArchive(filename))
+
+        plugin = module.CheckPbConsistenceStoragePlugin()
+        plugin._hostname = 'storage201'
+        plugin._pb_vg = VG
+        plugin._full_sweep_interval = 3600
+        return plugin
+
+    #--------------------------------------------------------------------------
+    def test_import_modules(self):
+
+        log.info("Test importing all appropriate modules ...")
+
+        log.debug("Importing %r from %r ...", 'CheckPbConsistenceStoragePlugin',
+                  'nagios.plugins.check_pb_consistence_storage')
+        from nagios.plugins.check_pb_consistence_storage import CheckPbConsistenceStoragePlugin
+        from nagios.plugins.check_pb_consistence_storage import lv_guid_key, guid_str
+
+    #--------------------------------------------------------------------------
+    def test_guid_key(self):
+
+        log.info("Testing the keys of the names of logical volumes.")
+
+        from nagios.plugins.check_pb_consistence_storage import lv_guid_key, guid_str
+
+        self.assertEqual(lv_guid_key(short_guid(1)), guid_key(1))
+        self.assertEqual(guid_str(guid_key(1)), '600144f0-' + short_guid(1))
+
+        # upper case names match the (lower case) GUIDs from API, before the
+        # comparision by integer keys they were orphans
+        self.assertEqual(lv_guid_key(short_guid(0xabc).upper()), guid_key(0xabc))
+
+        # names with an extension never match a volume from API
+        for name in (short_guid(1) + '-snap', short_guid(1) + '-del-20160101-120000',
+                     'zzz_backup', 'xxxx-0002-0003-000000000001'):
+            self.assertEqual(lv_guid_key(name), name)
+            self.assertEqual(guid_str(name), name)
+
+    #--------------------------------------------------------------------------
+    def test_compare(self):
+
+        log.info("Testing the categories of the comparision and the reuse of the "
+                 "snapshot of the last run.")
+
+        from nagios.plugins.base_dcm_client_check import DUMMY_LV, BACKUP_LV
+        from nagios.plugins.check_pb_consistence_storage import ApiVolume
+
+        lines = []
+        api = {}
+
+        # 1: ok
+        lines.append(lvs_line(short_guid(1)))
+        self.write_cfg(short_guid(1), cfg_content(1))
+        api[guid_key(1)] = ApiVolume(1024, 'vol', 'available')
+        # 2: error, wrong size
+        lines.append(lvs_line(short_guid(2), size=2048))
+        self.write_cfg(short_guid(2), cfg_content(2))
+        api[guid_key(2)] = ApiVolume(1024, 'vol', 'available')
+        # 3: error, no config file
+        lines.append(lvs_line(short_guid(3)))
+        api[guid_key(3)] = ApiVolume(1024, 'img', 'available')
+        # 4: zombie, removed and on deletion
+        lines.append(lvs_line(short_guid(4)))
+        self.write_cfg(short_guid(4), cfg_content(4, REMOVE_TS))
+        api[guid_key(4)] = ApiVolume(1024, 'vol', 'to_be_deleted')
+        # 5: error, removed, but not on deletion
+        lines.append(lvs_line(short_guid(5)))
+        self.write_cfg(short_guid(5), cfg_content(5, REMOVE_TS))
+        api[guid_key(5)] = ApiVolume(1024, 'vol', 'available')
+        # 6: zombie, removed and not in API
+        lines.append(lvs_line(short_guid(6)))
+        self.write_cfg(short_guid(6), cfg_content(6, REMOVE_TS))
+        # 7 - 9: orphans without a remove timestamp, without or with an
+        # invalid config file
+        lines.append(lvs_line(short_guid(7)))
+        self.write_cfg(short_guid(7), cfg_content(7))
+        lines.append(lvs_line(short_guid(8)))
+        lines.append(lvs_line(short_guid(9)))
+        self.write_cfg(short_guid(9), "no section\n")
+        # 10, 11: an opened '-snap' volume and a LVM snapshot
+        lines.append(lvs_line(short_guid(10) + '-snap'))
+        lines.append(lvs_line(
+            short_guid(11) + '-snap', attr='swi-a-s---', origin=short_guid(1)))
+        # 12: a not opened '-snap' volume is an orphan
+        lines.append(lvs_line(short_guid(12) + '-snap', attr='-wi-a-----'))
+        # 13: a removed '-del-' volume is a zombie
+        del_name = short_guid(13) + '-del-20160101-120000'
+        lines.append(lvs_line(del_name))
+        self.write_cfg(del_name, cfg_content(13, REMOVE_TS))
+        # 14: an upper case name matches its volume from API
+        lines.append(lvs_line(short_guid(14).upper()))
+        self.write_cfg(short_guid(14).upper(), cfg_content(14))
+        api[guid_key(14)] = ApiVolume(1024, 'vol', 'available')
+        # aliens and dummies
+        lines.append(lvs_line('root', vg='vg00'))
+        lines.append(lvs_line('foo'))
+        lines.append(lvs_line(DUMMY_LV))
+        lines.append(lvs_line(BACKUP_LV))
+        # 20 - 22: volumes from API without a logical volume
+        api[guid_key(20)] = ApiVolume(1024, 'vol', 'available')
+        api[guid_key(21)] = ApiVolume(1024, 'img', 'to_be_deleted')
+        api[guid_key(22)] = ApiVolume(1024, 'snap', 'to_be_created')
+
+        # the zombie 4 isn't consumed, so it's counted again as volume from
+        # API on deletion (like before the reconciliation by set operations)
+        expected = {
+            'total': 18, 'missing': 1, 'alien': 2, 'orphans': 4, 'zombies': 5,
+            'snapshots': 2, 'ok': 3, 'dummy': 2, 'error': 3}
+        uncached = set([guid_key(2), guid_key(3), guid_key(5), guid_key(7), guid_key(8),
+                        guid_key(9), short_guid(12) + '-snap'])
+
+        reconciled = []
+        for run in range(2):
+            plugin = self.new_plugin(lines)
+            plugin.all_api_volumes = dict(api)
+            plugin.get_lvm_lvs()
+            plugin.count = dict((x, 0) for x in expected)
+
+            def reconcile(lvs, keys, plugin=plugin, orig=plugin.reconcile):
+                reconciled.append(set(keys))
+                return orig(lvs, keys)
+
+            plugin.reconcile = reconcile
+            plugin.compare()
+            log.debug("Counts of run %d: %r", run, plugin.count)
+            self.assertEqual(plugin.count, expected)
+
+        # the first run reconciles all volumes, the second one only the
+        # erroneous and orphaned volumes, the others are taken from the snapshot
+        self.assertEqual(len(reconciled[0]), 12)
+        self.assertEqual(reconciled[1], uncached)
+
+#==============================================================================
+
+if __name__ == '__main__':
+
+    verbose = get_arg_verbose()
+    if verbose is None:
+        verbose = 0
+    init_root_logger(verbose)
+
+    log.info("Starting tests ...")
+
+    suite = unittest.TestSuite()
+
+    suite.addTest(TestConsistenceCompare('test_import_modules', verbose))
+    suite.addTest(TestConsistenceCompare('test_guid_key', verbose))
+    suite.addTest(TestConsistenceCompare('test_compare', verbose))
+
+    runner = unittest.TextTestRunner(verbosity = verbose)
+
+    result = runner.run(suite)
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: test script (and module) for unit tests on the snapshot of the
+          last reconciled state of the storage volumes
+'''
+
+import unittest
+import os
+import sys
+import shutil
+import logging
+import tempfile
+
+libdir = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), '..'))
+sys.path.insert(0, libdir)
+
+import general
+from general import ColoredFormatter, get_arg_verbose, init_root_logger
+from general import NagiosPluginTestcase
+
+log = logging.getLogger(__name__)
+
+GUID1 = '600144f0-0001-0002-0003-000000000001'
+GUID2 = '600144f0-0001-0002-0003-000000000002'
+LV1 = 'storage/0001-0002-0003-000000000001'
+LV2 = 'storage/0001-0002-0003-000000000002'
+LV_DATA = ['-wi-ao----', 1024, None, True, True, None]
+
+#==============================================================================
+class TestConsistenceSnapshot(NagiosPluginTestcase):
+
+    #--------------------------------------------------------------------------
+    def setUp(self):
+        self.state_dir = tempfile.mkdtemp(prefix='test-consistence-snapshot-')
+
+    #--------------------------------------------------------------------------
+    def tearDown(self):
+        shutil.rmtree(self.state_dir, True)
+
+    #--------------------------------------------------------------------------
+    def new_snapshot(self, now, **kwargs):
+
+        from nagios.plugins.consistence_snapshot import ConsistenceSnapshot
+
+        snapshot = ConsistenceSnapshot('storage201', 'storage', state_dir=self.state_dir, **kwargs)
+        snapshot.load(now)
+        snapshot.set_api_volume(GUID1, (1024, 'vol', 'available'))
+        snapshot.set_api_volume(GUID2, (2048, 'img', 'available'))
+        return snapshot
+
+    #--------------------------------------------------------------------------
+    def test_import_modules(self):
+
+        log.info("Test importing all appropriate modules ...")
+
+        log.debug("Importing %r from %r ...", 'ConsistenceSnapshot',
+                  'nagios.plugins.consistence_snapshot')
+        from nagios.plugins.consistence_snapshot import ConsistenceSnapshot
+
+    #--------------------------------------------------------------------------
+    def test_incremental(self):
+
+        log.info("Testing the reuse of unchanged results.")
+
+        snapshot = self.new_snapshot(1000)
+        log.debug("Snapshot: %r", snapshot)
+        self.assertTrue(snapshot.full_sweep)
+        self.assertIsNone(snapshot.lookup(LV1, LV_DATA, GUID1))
+        snapshot.add(LV1, LV_DATA, 'ok', True)
+        self.assertIsNone(snapshot.lookup(LV2, LV_DATA, GUID2))
+        snapshot.add(LV2, LV_DATA, 'error', True)
+        snapshot.save(1000)
+
+        snapshot = self.new_snapshot(1300)
+        self.assertFalse(snapshot.full_sweep)
+        self.assertEqual(snapshot.lookup(LV1, LV_DATA, GUID1), ('ok', True))
+
+        # a changed LV and a changed volume from API are compared again
+        self.assertIsNone(snapshot.lookup(LV1, LV_DATA[:1] + [2048] + LV_DATA[2:], GUID1))
+        snapshot.set_api_volume(GUID2, (4096, 'img', 'available'))
+        self.assertIsNone(snapshot.lookup(LV2, LV_DATA, GUID2))
+        self.assertEqual((snapshot.hits, snapshot.misses), (1, 2))
+
+        # the full sweep interval is exceeded
+        snapshot = self.new_snapshot(1000 + 3600)
+        self.assertTrue(snapshot.full_sweep)
+        self.assertIsNone(snapshot.lookup(LV1, LV_DATA, GUID1))
+
+        # a full sweep on every run
+        snapshot = self.new_snapshot(1300, full_sweep_interval=0)
+        self.assertTrue(snapshot.full_sweep)
+
+#==============================================================================
+
+if __name__ == '__main__':
+
+    verbose = get_arg_verbose()
+    if verbose is None:
+        verbose = 0
+    init_root_logger(verbose)
+
+    log.info("Starting tests ...")
+
+    suite = unittest.TestSuite()
+
+    suite.addTest(TestConsistenceSnapshot('test_import_modules', verbose))
+    suite.addTest(TestConsistenceSnapshot('test_incremental', verbose))
+
+    runner = unittest.TextTestRunner(verbosity = verbose)
+
+    result = runner.run(suite)
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: test script (and module) for unit tests on the synthetic
+          DCManager datasets and the local DCManager API stand-in
+'''
+
+import unittest
+import os
+import sys
+import json
+import base64
+import logging
+
+try:
+    from urllib.request import urlopen, Request
+    from urllib.error import HTTPError
+except ImportError:
+    from urllib2 import urlopen, Request, HTTPError
+
+libdir = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), '..'))
+sys.path.insert(0, libdir)
+
+import general
+from general import ColoredFormatter, get_arg_verbose, init_root_logger
+from general import NagiosPluginTestcase
+
+import lvm_samples
+import dcm_samples
+
+from dcm_server import DcmStandInServer
+
+log = logging.getLogger(__name__)
+
+#==============================================================================
+class TestDcmServer(NagiosPluginTestcase):
+
+    #--------------------------------------------------------------------------
+    def setUp(self):
+        self.server = None
+
+    #--------------------------------------------------------------------------
+    def tearDown(self):
+        if self.server:
+            self.server.stop()
+
+    #--------------------------------------------------------------------------
+    def get(self, path, auth=None):
+
+        request = Request(self.server.url + path)
+        if auth:
+            credentials = ('%s:%s' % auth).encode('utf-8')
+            request.add_header(
+                'Authorization', 'Basic ' + base64.b64encode(credentials).decode('ascii'))
+        fh = urlopen(request, timeout=10)
+        try:
+            return json.loads(fh.read().decode('utf-8'))
+        finally:
+            fh.close()
+
+    #--------------------------------------------------------------------------
+    def test_dataset(self):
+
+        log.info("Testing the synthetic dataset.")
+
+        data = dcm_samples.dataset(100)
+        nr_volumes = len(data['vstorages']) + len(data['vimages']) + len(data['vsnapshots'])
+        self.assertEqual(nr_volumes, 100)
+        self.assertEqual(len(data['vimages']), 10)
+        self.assertEqual(len(data['vsnapshots']), 5)
+        self.assertEqual(len(data['vstorage_maps']) + len(data['vimage_maps']), 50)
+
+        # the GUIDs on the storage server are the names of the LVs
+        lv_names = set()
+        for nr in range(100):
+            lv_names.add('600144f0-' + lvm_samples.lv_name(nr))
+        guids = set()
+        for vol in data['vstorages'] + data['vimages']:
+            for replica in vol['replicas']:
+                if replica['storage_server'] == dcm_samples.HOSTNAME:
+                    guids.add(replica['guid'])
+        for snapshot in data['vsnapshots']:
+            guids.add(snapshot['guid'])
+        self.assertEqual(guids, lv_names)
+
+    #--------------------------------------------------------------------------
+    def test_server(self):
+
+        log.info("Testing the DCManager API stand-in.")
+
+        data = dcm_samples.dataset(100)
+        self.server = DcmStandInServer(data)
+        self.server.start()
+
+        self.assertEqual(self.get('clusters/'), data['clusters'])
+        self.assertEqual(len(self.get('api/vstorages/?pstorage=storage201')), 85)
+        self.assertEqual(self.get('vstorages/?pstorage=storage999'), [])
+        self.assertEqual(len(self.get('vsnapshots/?pstorage=storage201')), 5)
+        storages = self.get('pstorages/?name=storage201')
+        self.assertEqual([x['cluster'] for x in storages], [dcm_samples.CLUSTER])
+        pservers = self.get('pservers/?cluster=%s' % (dcm_samples.CLUSTER))
+        self.assertEqual(len(pservers), dcm_samples.PSERVERS)
+
+        self.assertEqual(
+            len(self.get('vstorages/?pstorage=storage201&contract_infos=false')), 85)
+
+        self.assertRaises(HTTPError, self.get, 'nothing/')
+        self.assertEqual(self.server.requests, 8)
+
+    #--------------------------------------------------------------------------
+    def test_rejected(self):
+
+        log.info("Testing the rejection of unknown parameters and missing credentials.")
+
+        self.server = DcmStandInServer(dcm_samples.dataset(10), auth=('nagios', 'secret'))
+        self.server.start()
+
+        auth = ('nagios', 'secret')
+        self.assertEqual(len(self.get('clusters/', auth=auth)), 1)
+
+        for (path, code) in (
+                ('clusters/', 401),
+                ('vstorages/?pstorage=storage201&contract_infos=no', 400),
+                ('vstorages/?pstorage=storage201&contract_infos', 400),
+                ('vimages/?pstorage=storage201&contract_infos=false', 400),
+                ('pstorages/?hostname=storage201', 400)):
+            try:
+                self.get(path, auth=(code != 401 and auth or None))
+            except HTTPError as e:
+                self.assertEqual(e.code, code, path)
+            else:
+                self.fail("%r was not rejected." % (path))
+        self.assertEqual(self.server.rejected, 5)
+
+#==============================================================================
+
+if __name__ == '__main__':
+
+    verbose = get_arg_verbose()
+    if verbose is None:
+        verbose = 0
+    init_root_logger(verbose)
+
+    log.info("Starting tests ...")
+
+    suite = unittest.TestSuite()
+
+    suite.addTest(TestDcmServer('test_dataset', verbose))
+    suite.addTest(TestDcmServer('test_server', verbose))
+    suite.addTest(TestDcmServer('test_rejected', verbose))
+
+    runner = unittest.TextTestRunner(verbosity = verbose)
+
+    result = runner.run(suite)
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
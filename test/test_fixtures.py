@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: test script (and module) for unit tests on recording and
+          replaying fixture archives
+'''
+
+import unittest
+import os
+import sys
+import shutil
+import logging
+import tempfile
+
+libdir = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), '..'))
+sys.path.insert(0, libdir)
+
+import general
+from general import ColoredFormatter, get_arg_verbose, init_root_logger
+from general import NagiosPluginTestcase
+
+log = logging.getLogger(__name__)
+
+#==============================================================================
+class TestFixtureArchive(NagiosPluginTestcase):
+
+    #--------------------------------------------------------------------------
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='test-fixtures-')
+
+    #--------------------------------------------------------------------------
+    def tearDown(self):
+        from nagios.plugin.fixtures import set_fixture_archive
+        set_fixture_archive(None)
+        shutil.rmtree(self.tmp_dir, True)
+
+    #--------------------------------------------------------------------------
+    def test_import_modules(self):
+
+        log.info("Test importing all appropriate modules ...")
+
+        log.debug("Importing %r from %r ...", 'FixtureError', 'nagios.plugin.fixtures')
+        from nagios.plugin.fixtures import FixtureError
+
+        log.debug("Importing %r from %r ...", 'FixtureNotFoundError', 'nagios.plugin.fixtures')
+        from nagios.plugin.fixtures import FixtureNotFoundError
+
+        log.debug("Importing %r from %r ...", 'FixtureArchive', 'nagios.plugin.fixtures')
+        from nagios.plugin.fixtures import FixtureArchive
+
+    #--------------------------------------------------------------------------
+    def test_command_key(self):
+
+        log.info("Testing the keys of commands.")
+
+        from nagios.plugin.fixtures import command_key
+
+        self.assertEqual(command_key(['/usr/sbin/smartctl', '-x', '/dev/sda']),
+                         'smartctl -x /dev/sda')
+        self.assertEqual(command_key(['MegaCli64', '-PdList', '-a', 0]), 'MegaCli64 -PdList -a 0')
+        self.assertEqual(command_key('/sbin/vgs'), 'vgs')
+
+        # temporary output files with random names
+        self.assertEqual(
+            command_key(['MegaCli64', '-AdpEventLog', '-GetLatest', 10,
+                         '-f', '/var/lib/nagios/megaraid-events-x1Yz_9ab.log', '-a', 0]),
+            'MegaCli64 -AdpEventLog -GetLatest 10 -f <file> -a 0')
+        self.assertEqual(
+            command_key(['storcli64', '/c0', 'show', 'events', 'type=latest=10',
+                         'file=/tmp/megaraid-events-q2w3e4r5.log', 'J']),
+            'storcli64 /c0 show events type=latest=10 file=<file> J')
+        self.assertEqual(command_key(['smartctl', '-f', 'brief', '-A', '/dev/sda']),
+                         'smartctl -f brief -A /dev/sda')
+
+    #--------------------------------------------------------------------------
+    def test_save_load(self):
+
+        log.info("Testing saving and loading a fixture archive.")
+
+        from nagios.plugin.fixtures import FixtureArchive, FixtureNotFoundError
+
+        for name in ('fixtures.json', 'fixtures.json.gz'):
+            filename = os.path.join(self.tmp_dir, name)
+            archive = FixtureArchive(filename, mode='record')
+            archive.record_command(['/opt/bin/MegaCli64', '-PdList'], 0, 'first\n', '')
+            archive.record_command(['/opt/bin/MegaCli64', '-PdList'], 0, 'second\n', '')
+            archive.record_file('/proc/mdstat', 'Personalities : \n')
+
+            archive = FixtureArchive(filename)
+            log.debug("Loaded archive: %r", archive)
+            self.assertTrue(archive.has_command('/usr/sbin/MegaCli64'))
+            self.assertFalse(archive.has_command('MegaCli'))
+            self.assertEqual(archive.replay_command(['MegaCli64', '-PdList']), (0, 'first\n', ''))
+            self.assertEqual(archive.replay_command(['MegaCli64', '-PdList']), (0, 'second\n', ''))
+            self.assertEqual(archive.replay_command(['MegaCli64', '-PdList']), (0, 'second\n', ''))
+            self.assertEqual(archive.replay_file('/proc/mdstat'), 'Personalities : \n')
+            self.assertRaises(FixtureNotFoundError, archive.replay_command, ['MegaCli64'])
+            self.assertRaises(FixtureNotFoundError, archive.replay_file, '/etc/fstab')
+
+    #--------------------------------------------------------------------------
+    def test_invalid_archive(self):
+
+        log.info("Testing invalid fixture archives.")
+
+        from nagios.plugin.fixtures import FixtureArchive, FixtureError
+
+        filename = os.path.join(self.tmp_dir, 'fixtures.json')
+        self.assertRaises(FixtureError, FixtureArchive, filename)
+        self.assertRaises(FixtureError, FixtureArchive, filename, 'play')
+
+        fh = open(filename, 'w')
+        fh.write('[1, 2]')
+        fh.close()
+        self.assertRaises(FixtureError, FixtureArchive, filename)
+
+    #--------------------------------------------------------------------------
+    def test_record_replay_plugin(self):
+
+        log.info("Testing recording and replaying of a plugin.")
+
+        from nagios.plugin.extended import ExtNagiosPlugin
+        from nagios.plugin.fixtures import FixtureArchive, FixtureNotFoundError
+        from nagios.plugin.fixtures import set_fixture_archive
+
+        filename = os.path.join(self.tmp_dir, 'fixtures.json')
+        src_file = os.path.join(self.tmp_dir, 'content.txt')
+        fh = open(src_file, 'w')
+        fh.write('Some content.\n')
+        fh.close()
+
+        plugin = ExtNagiosPlugin(usage='%(prog)s', verbose=self.verbose)
+
+        set_fixture_archive(FixtureArchive(filename, mode='record'))
+        (ret, stdoutdata, stderrdata) = plugin.exec_cmd(['echo', 'hello'])
+        self.assertEqual(ret, 0)
+        self.assertEqual(stdoutdata, 'hello\n')
+        self.assertEqual(plugin.read_file(src_file), 'Some content.\n')
+
+        os.remove(src_file)
+        set_fixture_archive(FixtureArchive(filename))
+        self.assertEqual(plugin.get_command('echo'), 'echo')
+        self.assertIsNone(plugin.get_command('no-such-command-xyz', quiet=True))
+        self.assertEqual(plugin.exec_cmd(['/no/where/echo', 'hello']), (0, 'hello\n', ''))
+        self.assertEqual(plugin.read_file(src_file), 'Some content.\n')
+        self.assertRaises(FixtureNotFoundError, plugin.exec_cmd, ['echo', 'bye'])
+
+#==============================================================================
+
+if __name__ == '__main__':
+
+    verbose = get_arg_verbose()
+    if verbose is None:
+        verbose = 0
+    init_root_logger(verbose)
+
+    log.info("Starting tests ...")
+
+    suite = unittest.TestSuite()
+
+    suite.addTest(TestFixtureArchive('test_import_modules', verbose))
+    suite.addTest(TestFixtureArchive('test_command_key', verbose))
+    suite.addTest(TestFixtureArchive('test_save_load', verbose))
+    suite.addTest(TestFixtureArchive('test_invalid_archive', verbose))
+    suite.addTest(TestFixtureArchive('test_record_replay_plugin', verbose))
+
+    runner = unittest.TextTestRunner(verbosity = verbose)
+
+    result = runner.run(suite)
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: test script (and module) for unit tests on the incremental
+          decoding of JSON arrays
+'''
+
+import unittest
+import os
+import sys
+import io
+import json
+import logging
+
+libdir = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), '..'))
+sys.path.insert(0, libdir)
+
+import general
+from general import ColoredFormatter, get_arg_verbose, init_root_logger
+from general import NagiosPluginTestcase
+
+log = logging.getLogger(__name__)
+
+OBJECTS = [
+    {
+        'uuid': 'e7abbe07-3d3e-4468-9af4-1bfe8af418dc',
+        'size': 716800,
+        'replicated': True,
+        'name': 'Storage äöü \\ "quoted"',
+        'replicas': [
+            {'guid': '600144f0-0001-dc9b-0121-e09d11e3920c', 'storage_server': 'storage201'},
+            {'guid': '600144f0-0001-dc98-6910-e09d11e3920c', 'storage_server': 'storage103'},
+        ],
+    },
+    12345,
+    -1.5e3,
+    None,
+    False,
+    'text with , and ]',
+    [],
+    {},
+]
+
+
+#==============================================================================
+class TestJsonStream(NagiosPluginTestcase):
+
+    #--------------------------------------------------------------------------
+    def test_import_modules(self):
+
+        log.info("Test importing all appropriate modules ...")
+
+        log.debug("Importing %r from %r ...", 'iter_json_array', 'nagios.plugin.jsonstream')
+        from nagios.plugin.jsonstream import iter_json_array
+
+    #--------------------------------------------------------------------------
+    def test_decode(self):
+
+        log.info("Testing the decoding in chunks of different sizes.")
+
+        from nagios.plugin.jsonstream import iter_json_array
+
+        text = json.dumps(OBJECTS, indent=2, ensure_ascii=False)
+        if sys.version_info[0] <= 2:
+            text = text.decode('utf-8')
+        data = text.encode('utf-8')
+
+        for chunk_size in (1, 2, 3, 7, 100, 65536):
+            log.debug("Decoding with a chunk size of %d ...", chunk_size)
+            result = list(iter_json_array(io.BytesIO(data), chunk_size))
+            self.assertEqual(result, OBJECTS)
+            result = list(iter_json_array(io.StringIO(text), chunk_size))
+            self.assertEqual(result, OBJECTS)
+
+        self.assertEqual(list(iter_json_array(io.BytesIO(b' [ ] '))), [])
+
+    #--------------------------------------------------------------------------
+    def test_invalid(self):
+
+        log.info("Testing the decoding of invalid JSON arrays.")
+
+        from nagios.plugin.jsonstream import iter_json_array
+
+        for data in (b'', b'{}', b'[1,', b'[1 2]', b'[1,]', b'[1x]', b'[1] x', b'[1'):
+            log.debug("Decoding %r ...", data)
+            self.assertRaises(ValueError, list, iter_json_array(io.BytesIO(data), 1))
+
+    #--------------------------------------------------------------------------
+    def test_iter_objects(self):
+
+        log.info("Testing iter_objects() on the different types of responses.")
+
+        from nagios.plugin.jsonstream import iter_objects
+
+        data = json.dumps(OBJECTS)
+        self.assertEqual(list(iter_objects(io.BytesIO(data.encode('utf-8')))), OBJECTS)
+        self.assertEqual(list(iter_objects(data)), OBJECTS)
+
+        # a decoded list is emptied by the iteration
+        objects = list(OBJECTS)
+        result = []
+        for obj in iter_objects(objects):
+            result.append(obj)
+            self.assertEqual(len(objects), len(OBJECTS) - len(result))
+        self.assertEqual(result, OBJECTS)
+
+        self.assertRaises(ValueError, iter_objects, 5)
+
+#==============================================================================
+
+if __name__ == '__main__':
+
+    verbose = get_arg_verbose()
+    if verbose is None:
+        verbose = 0
+    init_root_logger(verbose)
+
+    log.info("Starting tests ...")
+
+    suite = unittest.TestSuite()
+
+    suite.addTest(TestJsonStream('test_import_modules', verbose))
+    suite.addTest(TestJsonStream('test_decode', verbose))
+    suite.addTest(TestJsonStream('test_invalid', verbose))
+    suite.addTest(TestJsonStream('test_iter_objects', verbose))
+
+    runner = unittest.TextTestRunner(verbosity = verbose)
+
+    result = runner.run(suite)
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: test script (and module) for unit tests on the parsers
+          of the MegaRaid collector
+'''
+
+import unittest
+import os
+import sys
+import logging
+
+libdir = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), '..'))
+sys.path.insert(0, libdir)
+
+import general
+from general import ColoredFormatter, get_arg_verbose, init_root_logger
+from general import NagiosPluginTestcase
+
+import megaraid_samples
+
+log = logging.getLogger(__name__)
+
+#==============================================================================
+class TestMegaRaidCollector(NagiosPluginTestcase):
+
+    #--------------------------------------------------------------------------
+    def setUp(self):
+        pass
+
+    #--------------------------------------------------------------------------
+    def test_import_modules(self):
+
+        log.info("Test importing all appropriate modules ...")
+
+        log.debug("Importing module %r ...", 'nagios.plugins.megaraid_collector')
+        import nagios.plugins.megaraid_collector
+
+        log.debug("Importing %r from %r ...", 'MegaRaidCollector',
+                'nagios.plugins.megaraid_collector')
+        from nagios.plugins.megaraid_collector import MegaRaidCollector
+
+    #--------------------------------------------------------------------------
+    def test_pd_list(self):
+
+        log.info("Testing parsing of physical drives.")
+
+        from nagios.plugins.megaraid_collector import parse_pd_list
+        from nagios.plugins.megaraid_collector import parse_storcli_pd
+        from nagios.plugins.megaraid_collector import decode_storcli_output
+
+        drives_megacli = parse_pd_list(megaraid_samples.megacli_pd_list(24))
+        self.assertEqual(len(drives_megacli), 24)
+        self.assertEqual(drives_megacli[1]['media_errors'], 1)
+        self.assertEqual(drives_megacli[0]['fw_state'], 'Online, Spun Up')
+        self.assertEqual(drives_megacli[23]['fw_state'], 'Hotspare, Spun Up')
+        self.assertEqual(drives_megacli[0]['media_type'], 'HDD')
+
+        (status, desc, response) = decode_storcli_output(
+                megaraid_samples.storcli_pd_show_all(24))
+        self.assertEqual(status, 'Success')
+        drives_storcli = parse_storcli_pd(response)
+        log.debug("Drives: %r", drives_storcli[:2])
+
+        self.assertEqual(drives_megacli, drives_storcli)
+
+    #--------------------------------------------------------------------------
+    def test_ld_info(self):
+
+        log.info("Testing parsing of logical drives.")
+
+        from nagios.plugins.megaraid_collector import parse_ld_info
+        from nagios.plugins.megaraid_collector import parse_storcli_ld
+        from nagios.plugins.megaraid_collector import decode_storcli_output
+
+        lds_megacli = parse_ld_info(megaraid_samples.megacli_ld_info(24))
+        self.assertEqual(len(lds_megacli), 11)
+        self.assertEqual(lds_megacli[0]['raid_level'], 1)
+        self.assertEqual(lds_megacli[0]['state'], 'Optimal')
+
+        (status, desc, response) = decode_storcli_output(
+                megaraid_samples.storcli_vd_show_all(24))
+        (status, desc, cc_response) = decode_storcli_output(
+                megaraid_samples.storcli_vd_show_cc(24))
+        lds_storcli = parse_storcli_ld(response, cc_response)
+
+        self.assertEqual(lds_megacli, lds_storcli)
+
+    #--------------------------------------------------------------------------
+    def test_ld_info_all(self):
+
+        log.info("Testing parsing of logical drives of all adapters.")
+
+        import json
+
+        from nagios.plugins.megaraid_collector import parse_ld_info
+        from nagios.plugins.megaraid_collector import parse_ld_info_all
+        from nagios.plugins.megaraid_collector import decode_storcli_outputs
+
+        output = megaraid_samples.megacli_ld_info(8)
+        output = output.replace('Exit Code: 0x00', '')
+        output += output.replace('Adapter 0 --', 'Adapter 1 --') + "Exit Code: 0x00\n"
+
+        lds = parse_ld_info_all(output)
+        self.assertEqual(sorted(lds.keys()), [0, 1])
+        self.assertEqual(lds[0], parse_ld_info(megaraid_samples.megacli_ld_info(8)))
+        self.assertEqual(lds[0], lds[1])
+
+        data = json.loads(megaraid_samples.storcli_vd_show_all(8))
+        ctrl = dict(data['Controllers'][0])
+        ctrl['Command Status'] = {'Controller': 1, 'Status': 'Failure',
+                'Description': 'No VDs have been configured'}
+        data['Controllers'].append(ctrl)
+
+        results = decode_storcli_outputs(json.dumps(data))
+        self.assertEqual([(x[0], x[1]) for x in results], [(0, 'Success'), (1, 'Failure')])
+
+    #--------------------------------------------------------------------------
+    def test_bbu_status(self):
+
+        log.info("Testing parsing of the BBU status.")
+
+        from nagios.plugins.megaraid_collector import parse_bbu_status
+        from nagios.plugins.megaraid_collector import parse_storcli_bbu
+        from nagios.plugins.megaraid_collector import decode_storcli_output
+
+        bbu_megacli = parse_bbu_status(megaraid_samples.megacli_bbu_status())
+        self.assertEqual(bbu_megacli['type'], 'iBBU')
+        self.assertEqual(bbu_megacli['state'], 'Optimal')
+        self.assertEqual(bbu_megacli['pack_fail'], 'no')
+
+        (status, desc, response) = decode_storcli_output(
+                megaraid_samples.storcli_bbu_show_all())
+        bbu_storcli = parse_storcli_bbu(response)
+
+        self.assertEqual(bbu_megacli, bbu_storcli)
+
+    #--------------------------------------------------------------------------
+    def test_storcli_failure(self):
+
+        log.info("Testing failed and invalid storcli outputs.")
+
+        from nagios.plugins.megaraid_collector import decode_storcli_output
+
+        (status, desc, response) = decode_storcli_output(
+                megaraid_samples.storcli_output(
+                    {}, status='Failure', description='Controller 1 not found'))
+        self.assertEqual(status, 'Failure')
+        self.assertEqual(desc, 'Controller 1 not found')
+
+        self.assertRaises(ValueError, decode_storcli_output, 'Exit Code: 0x00')
+        self.assertRaises(ValueError, decode_storcli_output, '{"Controllers": []}')
+
+    #--------------------------------------------------------------------------
+    def test_device_map(self):
+
+        log.info("Testing the cached map of enclosure/slot pairs to Device Ids.")
+
+        import time
+        import shutil
+        import tempfile
+
+        from nagios.plugin.statefile import NagiosStateFile
+        from nagios.plugins.megaraid_collector import MegaRaidDeviceMap, SNAPSHOT_VERSION
+        from nagios.plugins.megaraid_collector import parse_pd_list
+
+        class Adapter(object):
+            adapter_nr = 0
+            megacli_cmd = 'MegaCli64'
+            drives = 4
+            calls = 0
+
+            def exec_cmd(self, cmd_list):
+                self.calls += 1
+                return (0, megaraid_samples.megacli_pd_list(self.drives), '')
+
+        enc = megaraid_samples.ENCLOSURE
+        state_dir = tempfile.mkdtemp(prefix='test-megaraid-')
+        try:
+            adapter = Adapter()
+            device_map = MegaRaidDeviceMap(adapter, state_dir=state_dir)
+            self.assertEqual(device_map.device_id(enc, 1), 11)
+            self.assertFalse(device_map.cached)
+            self.assertEqual(adapter.calls, 1)
+
+            # steady state without MegaCli
+            device_map = MegaRaidDeviceMap(adapter, state_dir=state_dir)
+            self.assertEqual(device_map.device_id(enc, 2), 12)
+            self.assertTrue(device_map.cached)
+            self.assertEqual(adapter.calls, 1)
+
+            # unknown slots and forced refreshes query the adapter
+            adapter.drives = 6
+            self.assertEqual(device_map.device_id(enc, 5), 15)
+            self.assertEqual(device_map.device_id(enc, 5, refresh=True), 15)
+            self.assertEqual(adapter.calls, 3)
+            self.assertIsNone(device_map.device_id(enc, 8))
+
+            # a newer snapshot of the collector replaces the map
+            drives = parse_pd_list(megaraid_samples.megacli_pd_list(2))
+            drives[1]['dev_id'] = 42
+            NagiosStateFile('megaraid-a0.json', state_dir=state_dir).save({
+                'version': SNAPSHOT_VERSION, 'adapter': 0, 'timestamp': time.time() + 1,
+                'source': 'megacli', 'pd': {'exit_code': 0, 'drives': drives}})
+            calls = adapter.calls
+            self.assertEqual(device_map.device_id(enc, 1), 42)
+            self.assertEqual(adapter.calls, calls)
+
+            # without TTL the adapter is always queried
+            device_map = MegaRaidDeviceMap(adapter, ttl=0, state_dir=state_dir)
+            self.assertEqual(device_map.device_id(enc, 1), 11)
+            self.assertEqual(adapter.calls, calls + 1)
+        finally:
+            shutil.rmtree(state_dir, True)
+
+#==============================================================================
+
+if __name__ == '__main__':
+
+    verbose = get_arg_verbose()
+    if verbose is None:
+        verbose = 0
+    init_root_logger(verbose)
+
+    log.info("Starting tests ...")
+
+    suite = unittest.TestSuite()
+
+    suite.addTest(TestMegaRaidCollector('test_import_modules', verbose))
+    suite.addTest(TestMegaRaidCollector('test_pd_list', verbose))
+    suite.addTest(TestMegaRaidCollector('test_ld_info', verbose))
+    suite.addTest(TestMegaRaidCollector('test_ld_info_all', verbose))
+    suite.addTest(TestMegaRaidCollector('test_bbu_status', verbose))
+    suite.addTest(TestMegaRaidCollector('test_storcli_failure', verbose))
+    suite.addTest(TestMegaRaidCollector('test_device_map', verbose))
+
+    runner = unittest.TextTestRunner(verbosity = verbose)
+
+    result = runner.run(suite)
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: test script (and module) for unit tests on the incremental check
+          of the event log of a MegaRaid adapter
+'''
+
+import unittest
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+
+libdir = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), '..'))
+sys.path.insert(0, libdir)
+
+import general
+from general import ColoredFormatter, get_arg_verbose, init_root_logger
+from general import NagiosPluginTestcase
+
+import megaraid_samples
+
+log = logging.getLogger(__name__)
+
+#==============================================================================
+class TestMegaRaidEvents(NagiosPluginTestcase):
+
+    #--------------------------------------------------------------------------
+    def setUp(self):
+        self.state_dir = tempfile.mkdtemp(prefix='test-megaraid-events-')
+
+    #--------------------------------------------------------------------------
+    def tearDown(self):
+        shutil.rmtree(self.state_dir, True)
+
+    #--------------------------------------------------------------------------
+    def new_plugin(self, newest, oldest=0, storcli=False, max_events=None):
+        """
+        Gives back an events plugin, which takes the outputs of MegaCli or
+        storcli from the samples of an event log with the sequence numbers
+        from oldest to newest instead of executing them.
+        """
+
+        from nagios.plugins.check_megaraid_events import CheckMegaRaidEventsPlugin
+
+        class Plugin(CheckMegaRaidEventsPlugin):
+
+            commands = []
+
+            def exec_cmd(self, cmd_list):
+                self.commands.append(cmd_list)
+                if 'show' in cmd_list and 'eventloginfo' in cmd_list:
+                    return (0, megaraid_samples.storcli_event_log_info(newest, oldest), '')
+                if '-GetEventLogInfo' in cmd_list:
+                    return (0, megaraid_samples.megacli_event_log_info(newest, oldest), '')
+
+                if storcli:
+                    count = int(cmd_list[4].split('=')[-1])
+                    filename = cmd_list[5].split('=', 1)[1]
+                else:
+                    count = int(cmd_list[3])
+                    filename = cmd_list[5]
+                first = max(newest - count + 1, oldest)
+                fh = open(filename, 'w')
+                fh.write(megaraid_samples.event_log(range(first, newest + 1)))
+                fh.close()
+                if storcli:
+                    return (0, megaraid_samples.storcli_output({}), '')
+                return (0, 'Exit Code: 0x00\n', '')
+
+        plugin = Plugin()
+        plugin._state_dir = self.state_dir
+        if storcli:
+            plugin._storcli_cmd = 'storcli64'
+        else:
+            plugin._megacli_cmd = 'MegaCli64'
+            plugin._storcli_cmd = None
+        if max_events is not None:
+            plugin._max_events = max_events
+        return plugin
+
+    #--------------------------------------------------------------------------
+    def test_import_modules(self):
+
+        log.info("Test importing all appropriate modules ...")
+
+        log.debug("Importing %r from %r ...", 'CheckMegaRaidEventsPlugin',
+                  'nagios.plugins.check_megaraid_events')
+        from nagios.plugins.check_megaraid_events import CheckMegaRaidEventsPlugin
+
+    #--------------------------------------------------------------------------
+    def test_parse(self):
+
+        log.info("Testing parsing of sequence numbers and events.")
+
+        from nagios.plugins.check_megaraid_events import seq_number
+        from nagios.plugins.check_megaraid_events import event_info_parser, event_parser
+
+        self.assertEqual(seq_number('0x00003039'), 12345)
+        self.assertEqual(seq_number('0X38D2'), 14546)
+        self.assertEqual(seq_number('14546'), 14546)
+        self.assertEqual(seq_number(' 14546 (reboot)'), 14546)
+        self.assertEqual(seq_number(42), 42)
+        self.assertRaises(ValueError, seq_number, 'none')
+
+        info = event_info_parser.parse_record(megaraid_samples.megacli_event_log_info(14546))
+        self.assertEqual(info['newest'], 14546)
+        self.assertEqual(info['oldest'], 0)
+        self.assertEqual(info['reboot'], 14443)
+
+        events = event_parser.parse(megaraid_samples.event_log([99, 100, 101]))
+        self.assertEqual([x['seq'] for x in events], [101, 100, 99])
+        self.assertEqual([x['class'] for x in events], [0, 2, 0])
+        self.assertEqual(events[0]['code'], 0x71)
+        self.assertEqual(events[0]['time'], 'Mon Jan 11 10:12:13 2016')
+        self.assertTrue(events[0]['description'].startswith('Unexpected sense: PD 0f(e0x20/s5)'))
+
+    #--------------------------------------------------------------------------
+    def test_first_run(self):
+
+        log.info("Testing the first run only setting the checkpoint.")
+
+        for storcli in (False, True):
+            plugin = self.new_plugin(14546, storcli=storcli)
+            info = plugin.get_event_log_info()
+            self.assertEqual(info['newest'], 14546)
+            self.assertEqual(info['oldest'], 0)
+
+            (checkpoint, events, skipped) = plugin.read_new_events(info, None)
+            self.assertEqual(checkpoint['seq'], 14546)
+            self.assertEqual(checkpoint['alarms'], [])
+            self.assertEqual((events, skipped), ([], 0))
+            # no events were read
+            self.assertEqual(len(plugin.commands), 1)
+
+            (state, out) = plugin.evaluate_events(checkpoint, events, skipped)
+            self.assertEqual(state, 0)
+            self.assertTrue(out.startswith('0 new events'), out)
+
+    #--------------------------------------------------------------------------
+    def test_new_events(self):
+
+        log.info("Testing reading of the events since the checkpoint.")
+
+        for storcli in (False, True):
+            plugin = self.new_plugin(1005, storcli=storcli)
+            checkpoint = {'seq': 985, 'timestamp': time.time() - 300, 'alarms': []}
+            (checkpoint, events, skipped) = plugin.read_new_events(
+                plugin.get_event_log_info(), checkpoint)
+            log.debug("Commands: %r", plugin.commands)
+
+            self.assertEqual(checkpoint['seq'], 1005)
+            self.assertEqual([x['seq'] for x in events], list(range(986, 1006)))
+            self.assertEqual(skipped, 0)
+            if storcli:
+                self.assertIn('type=latest=20', plugin.commands[1])
+            else:
+                self.assertEqual(plugin.commands[1][3], '20')
+
+            (state, out) = plugin.evaluate_events(checkpoint, events, skipped)
+            self.assertEqual(state, 2)
+            self.assertIn('(1 warning, 1 critical)', out)
+            self.assertEqual([x['seq'] for x in checkpoint['alarms']], [990, 1000])
+
+    #--------------------------------------------------------------------------
+    def test_log_reset(self):
+
+        log.info("Testing a reset event log with a newest sequence number "
+                 "below the checkpoint.")
+
+        plugin = self.new_plugin(25, oldest=20)
+        checkpoint = {'seq': 14546, 'timestamp': time.time() - 300, 'alarms': []}
+        (checkpoint, events, skipped) = plugin.read_new_events(
+            plugin.get_event_log_info(), checkpoint)
+        self.assertEqual(checkpoint['seq'], 25)
+        self.assertEqual([x['seq'] for x in events], list(range(20, 26)))
+        self.assertEqual(skipped, 0)
+
+        # without a valid oldest sequence number the whole log is read
+        plugin = self.new_plugin(5, storcli=True)
+        info = plugin.get_event_log_info()
+        info['oldest'] = None
+        (checkpoint, events, skipped) = plugin.read_new_events(info, {'seq': 14546})
+        self.assertEqual([x['seq'] for x in events], list(range(0, 6)))
+        self.assertEqual(checkpoint['alarms'], [])
+
+    #--------------------------------------------------------------------------
+    def test_max_events(self):
+
+        log.info("Testing skipping of events beyond --max-events.")
+
+        plugin = self.new_plugin(1300, max_events=50)
+        checkpoint = {'seq': 1000, 'timestamp': time.time() - 300, 'alarms': []}
+        (checkpoint, events, skipped) = plugin.read_new_events(
+            plugin.get_event_log_info(), checkpoint)
+
+        self.assertEqual(checkpoint['seq'], 1300)
+        self.assertEqual(skipped, 250)
+        self.assertEqual(plugin.commands[1][3], '50')
+        self.assertEqual([x['seq'] for x in events], list(range(1251, 1301)))
+
+        (state, out) = plugin.evaluate_events(checkpoint, events, skipped)
+        self.assertEqual(state, 2)
+        self.assertIn(', 250 events skipped', out)
+
+    #--------------------------------------------------------------------------
+    def test_hold_time(self):
+
+        log.info("Testing the expiry of held events after the hold time.")
+
+        import nagios
+
+        plugin = self.new_plugin(1005)
+        plugin._hold_time = 3600
+        now = time.time()
+
+        def alarm(seq, cls, age):
+            return {
+                'seq': seq, 'time': None, 'code': 0x71, 'class': cls,
+                'description': 'Event %d' % (seq), 'found': now - age}
+
+        # the critical event is expired, the warning is still held
+        checkpoint = {
+            'seq': 1005, 'timestamp': now - 300,
+            'alarms': [alarm(900, 2, 3700), alarm(990, 1, 3500)]}
+        (state, out) = plugin.evaluate_events(checkpoint, [])
+        self.assertEqual(state, nagios.state.warning)
+        self.assertEqual([x['seq'] for x in checkpoint['alarms']], [990])
+        self.assertIn('1 held events of the last 3600 seconds', out)
+        self.assertIn('#990 - [warning]: Event 990', out)
+        self.assertNotIn('#900', out)
+
+        # after the hold time the state is OK again
+        checkpoint['alarms'][0]['found'] = now - 3601
+        (state, out) = plugin.evaluate_events(checkpoint, [])
+        self.assertEqual(state, nagios.state.ok)
+        self.assertEqual(checkpoint['alarms'], [])
+        self.assertTrue(out.endswith('(0 warning, 0 critical).'), out)
+
+#==============================================================================
+
+if __name__ == '__main__':
+
+    verbose = get_arg_verbose()
+    if verbose is None:
+        verbose = 0
+    init_root_logger(verbose)
+
+    log.info("Starting tests ...")
+
+    suite = unittest.TestSuite()
+
+    suite.addTest(TestMegaRaidEvents('test_import_modules', verbose))
+    suite.addTest(TestMegaRaidEvents('test_parse', verbose))
+    suite.addTest(TestMegaRaidEvents('test_first_run', verbose))
+    suite.addTest(TestMegaRaidEvents('test_new_events', verbose))
+    suite.addTest(TestMegaRaidEvents('test_log_reset', verbose))
+    suite.addTest(TestMegaRaidEvents('test_max_events', verbose))
+    suite.addTest(TestMegaRaidEvents('test_hold_time', verbose))
+
+    runner = unittest.TextTestRunner(verbosity = verbose)
+
+    result = runner.run(suite)
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
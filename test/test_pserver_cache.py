@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: test script (and module) for unit tests on the cache of the
+          cluster of a storage server and its pservers
+'''
+
+import unittest
+import os
+import sys
+import shutil
+import logging
+import tempfile
+
+libdir = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), '..'))
+sys.path.insert(0, libdir)
+
+import general
+from general import ColoredFormatter, get_arg_verbose, init_root_logger
+from general import NagiosPluginTestcase
+
+log = logging.getLogger(__name__)
+
+CLUSTER = 'de-ka-cluster-01'
+PSERVERS = {'pserver101': 1, 'pserver102': 2}
+
+#==============================================================================
+class TestPserverCache(NagiosPluginTestcase):
+
+    #--------------------------------------------------------------------------
+    def setUp(self):
+        self.state_dir = tempfile.mkdtemp(prefix='test-pserver-cache-')
+
+    #--------------------------------------------------------------------------
+    def tearDown(self):
+        shutil.rmtree(self.state_dir, True)
+
+    #--------------------------------------------------------------------------
+    def test_import_modules(self):
+
+        log.info("Test importing all appropriate modules ...")
+
+        log.debug("Importing %r from %r ...", 'PserverCache', 'nagios.plugins.pserver_cache')
+        from nagios.plugins.pserver_cache import PserverCache
+
+    #--------------------------------------------------------------------------
+    def test_ttl(self):
+
+        log.info("Testing the time to live of the cache.")
+
+        from nagios.plugins.pserver_cache import PserverCache
+
+        cache = PserverCache('storage201', state_dir=self.state_dir, ttl=900)
+        log.debug("Cache: %r", cache)
+        self.assertIsNone(cache.load(1000))
+        cache.save(CLUSTER, PSERVERS, 1000)
+
+        self.assertEqual(cache.load(1000 + 899), (CLUSTER, PSERVERS))
+        self.assertIsNone(cache.load(1000 + 900))
+        self.assertIsNone(cache.load(999))
+
+        # the cache of another storage server
+        cache = PserverCache('storage202', state_dir=self.state_dir, ttl=900)
+        self.assertIsNone(cache.load(1000))
+
+        # a disabled cache
+        cache = PserverCache('storage201', state_dir=self.state_dir, ttl=0)
+        self.assertIsNone(cache.load(1000))
+
+#==============================================================================
+
+if __name__ == '__main__':
+
+    verbose = get_arg_verbose()
+    if verbose is None:
+        verbose = 0
+    init_root_logger(verbose)
+
+    log.info("Starting tests ...")
+
+    suite = unittest.TestSuite()
+
+    suite.addTest(TestPserverCache('test_import_modules', verbose))
+    suite.addTest(TestPserverCache('test_ttl', verbose))
+
+    runner = unittest.TextTestRunner(verbosity = verbose)
+
+    result = runner.run(suite)
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: test script (and module) for unit tests on ReportParser objects
+'''
+
+import unittest
+import os
+import sys
+import logging
+import textwrap
+
+libdir = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), '..'))
+sys.path.insert(0, libdir)
+
+import general
+from general import ColoredFormatter, get_arg_verbose, init_root_logger
+from general import NagiosPluginTestcase
+
+log = logging.getLogger(__name__)
+
+#==============================================================================
+class TestReportParser(NagiosPluginTestcase):
+
+    #--------------------------------------------------------------------------
+    def setUp(self):
+        pass
+
+    #--------------------------------------------------------------------------
+    def test_import_modules(self):
+
+        log.info("Test importing all appropriate modules ...")
+
+        log.debug("Importing %r from %r ...", 'ReportParser', 'nagios.plugin.report')
+        from nagios.plugin.report import ReportParser
+
+        log.debug("Importing %r from %r ...", 'normalize_key', 'nagios.plugin.report')
+        from nagios.plugin.report import normalize_key
+
+    #--------------------------------------------------------------------------
+    def test_normalize_key(self):
+
+        log.info("Testing normalizing of keys.")
+
+        from nagios.plugin.report import normalize_key
+
+        self.assertEqual(normalize_key('  Media   Error Count '), 'media error count')
+        self.assertEqual(normalize_key('BatteryType'), 'batterytype')
+
+    #--------------------------------------------------------------------------
+    def test_converters(self):
+
+        log.info("Testing the value converters.")
+
+        from nagios.plugin.report import first_word, lower_word
+        from nagios.plugin.report import first_int, first_number
+
+        self.assertEqual(first_word('Optimal  now'), 'Optimal')
+        self.assertEqual(lower_word('No'), 'no')
+        self.assertEqual(first_int('0 (Target Id: 0)'), 0)
+        self.assertEqual(first_number('2139.45 h'), 2139.45)
+        self.assertRaises(ValueError, first_word, '  ')
+        self.assertRaises(ValueError, first_int, 'N/A')
+
+    #--------------------------------------------------------------------------
+    def test_records(self):
+
+        log.info("Testing parsing into records.")
+
+        from nagios.plugin.report import ReportParser
+
+        report = textwrap.dedent('''\
+            Adapter #0
+
+            Enclosure Device ID: 32
+            Slot Number: 0
+            Media Error Count: 3
+            Firmware state: Online, Spun Up
+
+            Enclosure Device ID: 32
+            Slot Number: 1
+            Media Error Count: N/A
+            Drive's position: DiskGroup: 0, Span: 0, Arm: 1
+            Firmware state: Hotspare, Spun Down
+            ''')
+
+        parser = ReportParser(
+            {
+                'Enclosure Device ID': ('enclosure', int),
+                'Slot  Number': ('slot', int),
+                'media error count': ('media_errors', int),
+                'Firmware state': 'fw_state',
+            },
+            start_key='Enclosure Device ID',
+            defaults={'media_errors': 0},
+        )
+        log.debug("Parser: %r", parser)
+
+        records = parser.parse(report)
+        log.debug("Records: %r", records)
+        self.assertEqual(records, [
+            {'enclosure': 32, 'slot': 0, 'media_errors': 3,
+                'fw_state': 'Online, Spun Up'},
+            {'enclosure': 32, 'slot': 1, 'media_errors': 0,
+                'fw_state': 'Hotspare, Spun Down'},
+        ])
+
+    #--------------------------------------------------------------------------
+    def test_table_and_separators(self):
+
+        log.info("Testing table rows and several separators.")
+
+        from nagios.plugin.report import ReportParser
+
+        report = textwrap.dedent('''\
+            SMART Health Status: OK
+            number of hours powered up = 2139.45
+              5 Reallocated_Sector_Ct   PO--CK   100   100   010    -    3
+            ''')
+
+        def realloc(record, columns):
+            record['realloc'] = int(columns[7])
+
+        parser = ReportParser(
+            {
+                'SMART Health Status': 'health',
+                'number of hours powered up': ('hours', float),
+                'reallocated_sector_ct': realloc,
+            },
+            separators=(':', '='),
+            table_column=1,
+        )
+
+        record = {'health': None}
+        self.assertIs(parser.parse_record(report, record), record)
+        self.assertEqual(record, {'health': 'OK', 'hours': 2139.45, 'realloc': 3})
+        self.assertEqual(len(parser.parse(report)), 1)
+
+#==============================================================================
+
+if __name__ == '__main__':
+
+    verbose = get_arg_verbose()
+    if verbose is None:
+        verbose = 0
+    init_root_logger(verbose)
+
+    log.info("Starting tests ...")
+
+    suite = unittest.TestSuite()
+
+    suite.addTest(TestReportParser('test_import_modules', verbose))
+    suite.addTest(TestReportParser('test_normalize_key', verbose))
+    suite.addTest(TestReportParser('test_converters', verbose))
+    suite.addTest(TestReportParser('test_records', verbose))
+    suite.addTest(TestReportParser('test_table_and_separators', verbose))
+
+    runner = unittest.TextTestRunner(verbosity = verbose)
+
+    result = runner.run(suite)
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: test script (and module) for unit tests on the CRC-64 digests
+          and the persistent cache of the names of the SCST devices
+'''
+
+import unittest
+import os
+import sys
+import shutil
+import logging
+import tempfile
+
+libdir = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), '..'))
+sys.path.insert(0, libdir)
+
+import general
+from general import ColoredFormatter, get_arg_verbose, init_root_logger
+from general import NagiosPluginTestcase
+
+log = logging.getLogger(__name__)
+
+# A GUID with the name of its SCST device of a real storage server
+GUID = '600144f0-0001-8aa6-91a2-19f911e39d8f'
+SCST_DEVNAME = '5ce99e968d67ded2'
+
+#==============================================================================
+class TestScstDigests(NagiosPluginTestcase):
+
+    #--------------------------------------------------------------------------
+    def setUp(self):
+        self.state_dir = tempfile.mkdtemp(prefix='test-scst-digests-')
+
+    #--------------------------------------------------------------------------
+    def tearDown(self):
+        shutil.rmtree(self.state_dir, True)
+
+    #--------------------------------------------------------------------------
+    def test_import_modules(self):
+
+        log.info("Test importing all appropriate modules ...")
+
+        log.debug("Importing %r from %r ...", 'ScstDigestCache', 'nagios.plugins.scst_digests')
+        from nagios.plugins.scst_digests import ScstDigestCache
+
+    #--------------------------------------------------------------------------
+    def test_crc64(self):
+
+        log.info("Testing the CRC-64 digests.")
+
+        from nagios.common import crc64, crc64_digest, crc64_digests
+
+        self.assertEqual(crc64_digest(GUID), SCST_DEVNAME)
+        self.assertEqual(crc64_digest(GUID.encode('utf-8')), SCST_DEVNAME)
+        # the test vector of the CRC-64 of SWISS-PROT
+        self.assertEqual(crc64_digest('IHATEMATH'), 'e3dcadd69b01add1')
+        self.assertEqual(crc64(''), 0)
+        self.assertEqual(crc64(GUID[9:], crc64(GUID[:9])), crc64(GUID))
+
+        guids = [GUID, '600144f0-0000-0000-0000-000000000001', '']
+        digests = crc64_digests(guids)
+        self.assertEqual(len(digests), 3)
+        for guid in guids:
+            self.assertEqual(digests[guid], crc64_digest(guid))
+
+    #--------------------------------------------------------------------------
+    def test_cache(self):
+
+        log.info("Testing the cache of the SCST device names.")
+
+        from nagios.plugins.scst_digests import ScstDigestCache
+
+        other = '600144f0-0000-0000-0000-000000000001'
+
+        cache = ScstDigestCache(state_dir=self.state_dir)
+        cache.load()
+        self.assertEqual(cache.digests([GUID, other])[GUID], SCST_DEVNAME)
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+        cache.save()
+
+        cache = ScstDigestCache(state_dir=self.state_dir)
+        self.assertEqual(len(cache.load()), 2)
+        self.assertEqual(cache.digests([GUID]), {GUID: SCST_DEVNAME})
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+        cache.save()
+
+        # the digest of the volume, which was not requested, is dropped
+        cache = ScstDigestCache(state_dir=self.state_dir)
+        self.assertEqual(cache.load(), {GUID: SCST_DEVNAME})
+
+#==============================================================================
+
+if __name__ == '__main__':
+
+    verbose = get_arg_verbose()
+    if verbose is None:
+        verbose = 0
+    init_root_logger(verbose)
+
+    log.info("Starting tests ...")
+
+    suite = unittest.TestSuite()
+
+    suite.addTest(TestScstDigests('test_import_modules', verbose))
+    suite.addTest(TestScstDigests('test_crc64', verbose))
+    suite.addTest(TestScstDigests('test_cache', verbose))
+
+    runner = unittest.TextTestRunner(verbosity = verbose)
+
+    result = runner.run(suite)
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: test script (and module) for unit tests on the walker through
+          the SCST devices in sysfs
+'''
+
+import unittest
+import os
+import sys
+import shutil
+import logging
+import tempfile
+
+libdir = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), '..'))
+sys.path.insert(0, libdir)
+
+import general
+from general import ColoredFormatter, get_arg_verbose, init_root_logger
+from general import NagiosPluginTestcase
+
+import dcm_samples
+
+from nagios.common import crc64_digest
+
+log = logging.getLogger(__name__)
+
+#==============================================================================
+class TestScstSysfs(NagiosPluginTestcase):
+
+    #--------------------------------------------------------------------------
+    def setUp(self):
+        self.scst_dir = tempfile.mkdtemp(prefix='test-scst-sysfs-')
+        self.data = dcm_samples.dataset(20)
+        dcm_samples.build_scst_tree(self.scst_dir, self.data, crc64_digest)
+        self.dev_dir = os.path.join(self.scst_dir, dcm_samples.SCST_DEV_SUBDIR)
+
+    #--------------------------------------------------------------------------
+    def tearDown(self):
+        shutil.rmtree(self.scst_dir, True)
+
+    #--------------------------------------------------------------------------
+    def scan_all(self):
+
+        from nagios.plugins.scst_sysfs import list_dir, scan_device
+
+        devices = {}
+        for entry in list_dir(self.dev_dir):
+            device = scan_device(entry.path)
+            if device is not None:
+                devices[device['devicename']] = device
+        return devices
+
+    #--------------------------------------------------------------------------
+    def test_import_modules(self):
+
+        log.info("Test importing all appropriate modules ...")
+
+        log.debug("Importing %r from %r ...", 'scan_device', 'nagios.plugins.scst_sysfs')
+        from nagios.plugins.scst_sysfs import scan_device
+
+    #--------------------------------------------------------------------------
+    def test_scan_device(self):
+
+        log.info("Testing the scan of SCST devices.")
+
+        devices = self.scan_all()
+        self.assertEqual(len(devices), 10)
+
+        mapping = self.data['vstorage_maps'][0]
+        guid = None
+        for vol in self.data['vstorages']:
+            if vol['uuid'] != mapping['vstorage_uuid']:
+                continue
+            for replica in vol['replicas']:
+                if replica['storage_server'] == dcm_samples.HOSTNAME:
+                    guid = replica['guid']
+        device = devices[crc64_digest(guid)]
+        log.debug("Device: %r", device)
+        self.assertEqual(device['filename'], '/dev/storage/' + guid[9:])
+        self.assertEqual(device['fc_ph_id'], guid.replace('-', ''))
+        self.assertEqual(device['read_only'], '0')
+        self.assertEqual(device['luns'], {mapping['pserver_name']: '0'})
+        self.assertEqual(device['errors'], {})
+
+    #--------------------------------------------------------------------------
+    def test_errors(self):
+
+        log.info("Testing errors on reading SCST devices.")
+
+        from nagios.plugins.scst_sysfs import scan_device, ScstAttributeError
+
+        dev_dir = os.path.join(self.dev_dir, sorted(os.listdir(self.dev_dir))[0])
+        os.remove(os.path.join(dev_dir, 'fc_ph_id'))
+        open(os.path.join(dev_dir, 'read_only'), 'w').close()
+
+        device = scan_device(dev_dir)
+        self.assertIsNone(device['fc_ph_id'])
+        self.assertIsNone(device['read_only'])
+        self.assertIsInstance(device['errors']['fc_ph_id'], ScstAttributeError)
+        log.debug("Errors: %s, %s", device['errors']['fc_ph_id'], device['errors']['read_only'])
+        self.assertIn("doesn't exists", str(device['errors']['fc_ph_id']))
+        self.assertIn("No value found", str(device['errors']['read_only']))
+
+        # not an exported device
+        os.remove(os.path.join(dev_dir, 'handler'))
+        self.assertIsNone(scan_device(dev_dir))
+        self.assertIsNone(scan_device(os.path.join(self.dev_dir, 'nothing')))
+
+    #--------------------------------------------------------------------------
+    def test_without_scandir(self):
+
+        log.info("Testing the scan of SCST devices without os.scandir().")
+
+        from nagios.plugins import scst_sysfs
+
+        expected = self.scan_all()
+        saved = scst_sysfs.scandir
+        scst_sysfs.scandir = None
+        try:
+            self.assertEqual(self.scan_all(), expected)
+        finally:
+            scst_sysfs.scandir = saved
+
+#==============================================================================
+
+if __name__ == '__main__':
+
+    verbose = get_arg_verbose()
+    if verbose is None:
+        verbose = 0
+    init_root_logger(verbose)
+
+    log.info("Starting tests ...")
+
+    suite = unittest.TestSuite()
+
+    suite.addTest(TestScstSysfs('test_import_modules', verbose))
+    suite.addTest(TestScstSysfs('test_scan_device', verbose))
+    suite.addTest(TestScstSysfs('test_errors', verbose))
+    suite.addTest(TestScstSysfs('test_without_scandir', verbose))
+
+    runner = unittest.TextTestRunner(verbosity = verbose)
+
+    result = runner.run(suite)
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: test script (and module) for unit tests on the history
+          of SMART counters
+'''
+
+import unittest
+import os
+import sys
+import shutil
+import logging
+import tempfile
+
+libdir = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), '..'))
+sys.path.insert(0, libdir)
+
+import general
+from general import ColoredFormatter, get_arg_verbose, init_root_logger
+from general import NagiosPluginTestcase
+
+log = logging.getLogger(__name__)
+
+#==============================================================================
+class TestSmartHistory(NagiosPluginTestcase):
+
+    #--------------------------------------------------------------------------
+    def setUp(self):
+        self.state_dir = tempfile.mkdtemp(prefix='test-smart-history-')
+
+    #--------------------------------------------------------------------------
+    def tearDown(self):
+        shutil.rmtree(self.state_dir, True)
+
+    #--------------------------------------------------------------------------
+    def test_import_modules(self):
+
+        log.info("Test importing all appropriate modules ...")
+
+        log.debug("Importing %r from %r ...", 'SmartHistory', 'nagios.plugins.smart_history')
+        from nagios.plugins.smart_history import SmartHistory
+
+    #--------------------------------------------------------------------------
+    def test_filename(self):
+
+        log.info("Testing the filenames of the history of a disk.")
+
+        from nagios.plugins.smart_history import history_filename
+
+        self.assertEqual(history_filename('Z1Z00003'), 'smart-history-Z1Z00003.json')
+        self.assertEqual(history_filename(' WD-WCC4/N0 '), 'smart-history-WD-WCC4_N0.json')
+
+    #--------------------------------------------------------------------------
+    def test_rates(self):
+
+        log.info("Testing the growth rates of the SMART counters.")
+
+        from nagios.plugins.smart_history import SmartHistory
+
+        hour = 3600
+        start = 1000000000
+        history = SmartHistory('Z1Z00003', state_dir=self.state_dir)
+        log.debug("History: %r", history)
+
+        disk_data = {'nr_grown_defects': 200, 'realloc_sectors': 200}
+        self.assertEqual(history.update(disk_data, start), {})
+
+        # too early for a new sample and for a meaningful rate
+        disk_data = {'nr_grown_defects': 210, 'realloc_sectors': 200}
+        self.assertEqual(history.update(disk_data, start + hour / 2), {})
+        self.assertEqual(len(history.load()), 1)
+
+        rates = history.update(disk_data, start + 2 * hour)
+        self.assertAlmostEqual(rates['nr_grown_defects'], 120.0)
+        self.assertAlmostEqual(rates['realloc_sectors'], 0.0)
+        self.assertNotIn('current_pending_sector', rates)
+        self.assertEqual(len(history.load()), 2)
+
+        disk_data = {'nr_grown_defects': 212, 'realloc_sectors': 201}
+        rates = history.update(disk_data, start + 12 * hour)
+        self.assertAlmostEqual(rates['nr_grown_defects'], 24.0)
+        self.assertEqual(len(history.load()), 3)
+
+        # The first sample is outside the window now
+        disk_data = {'nr_grown_defects': 224, 'realloc_sectors': 201}
+        rates = history.update(disk_data, start + 30 * hour)
+        self.assertAlmostEqual(rates['nr_grown_defects'], 16.0)
+        samples = history.load()
+        self.assertEqual([x[0] for x in samples],
+                         [start + 12 * hour, start + 30 * hour])
+
+        # another disk with the same history file name
+        other = SmartHistory('Z1Z/00003', state_dir=self.state_dir)
+        other.state_file = history.state_file
+        self.assertEqual(other.load(), [])
+
+    #--------------------------------------------------------------------------
+    def test_wear(self):
+
+        log.info("Testing the change rate of the wear level of SSDs.")
+
+        from nagios.plugins.smart_history import SmartHistory
+
+        day = 24 * 3600
+        start = 1000000000
+        history = SmartHistory('S3W8NX0M000001', state_dir=self.state_dir)
+
+        disk_data = {'nr_grown_defects': 0, 'wear_level': 90}
+        self.assertNotIn('wear_level', history.update(disk_data, start))
+        self.assertNotIn('wear_level', history.update(disk_data, start + 5 * day))
+        self.assertEqual(history.load_wear(), [[start, 90]])
+
+        # the rate is evaluated beyond the rate window
+        disk_data['wear_level'] = 89
+        rates = history.update(disk_data, start + 10 * day)
+        self.assertAlmostEqual(rates['wear_level'], -0.1)
+
+        disk_data['wear_level'] = 87
+        rates = history.update(disk_data, start + 20 * day)
+        self.assertAlmostEqual(rates['wear_level'], -0.15)
+        self.assertEqual(len(history.load_wear()), 3)
+
+#==============================================================================
+
+if __name__ == '__main__':
+
+    verbose = get_arg_verbose()
+    if verbose is None:
+        verbose = 0
+    init_root_logger(verbose)
+
+    log.info("Starting tests ...")
+
+    suite = unittest.TestSuite()
+
+    suite.addTest(TestSmartHistory('test_import_modules', verbose))
+    suite.addTest(TestSmartHistory('test_filename', verbose))
+    suite.addTest(TestSmartHistory('test_rates', verbose))
+    suite.addTest(TestSmartHistory('test_wear', verbose))
+
+    runner = unittest.TextTestRunner(verbosity = verbose)
+
+    result = runner.run(suite)
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: test script (and module) for unit tests on parsing the text
+          and the JSON output of smartctl and NVMe health logs
+'''
+
+import unittest
+import os
+import sys
+import logging
+
+libdir = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), '..'))
+sys.path.insert(0, libdir)
+
+import general
+from general import ColoredFormatter, get_arg_verbose, init_root_logger
+from general import NagiosPluginTestcase
+
+import smart_samples
+
+log = logging.getLogger(__name__)
+
+#==============================================================================
+class TestSmartParsers(NagiosPluginTestcase):
+
+    #--------------------------------------------------------------------------
+    def parse_sata_text(self, output):
+
+        from nagios.plugins.check_smart_state import sata_parser
+        from nagios.plugins.check_smart_state import new_disk_data, sata_grown_defects
+
+        disk_data = sata_parser.parse_record(output, new_disk_data())
+        sata_grown_defects(disk_data)
+        return disk_data
+
+    #--------------------------------------------------------------------------
+    def test_import_modules(self):
+
+        log.info("Test importing all appropriate modules ...")
+
+        log.debug("Importing %r from %r ...", 'parse_smartctl_json',
+                  'nagios.plugins.check_smart_state')
+        from nagios.plugins.check_smart_state import parse_smartctl_json
+
+    #--------------------------------------------------------------------------
+    def test_sata_json(self):
+
+        log.info("Testing the JSON output of SATA disks against the text output.")
+
+        from nagios.plugins.check_smart_state import parse_smartctl_json
+
+        for nr in (0, 3, 5, 10):
+            text_data = self.parse_sata_text(smart_samples.smartctl_sata(nr))
+            (transport, reason, json_data) = parse_smartctl_json(
+                smart_samples.smartctl_sata_json(nr))
+            log.debug("Disk data of SATA disk %d: %r", nr, json_data)
+            self.assertEqual(transport, 'SATA')
+            self.assertIsNone(reason)
+            self.assertEqual(json_data['health_state'], 'PASSED')
+            self.assertEqual(json_data['serial'], 'Z1Z%05d' % (nr))
+            for key in ('nr_grown_defects', 'temperature', 'hours_on', 'realloc_sectors',
+                        'current_pending_sector', 'model'):
+                self.assertEqual(json_data[key], text_data[key])
+
+    #--------------------------------------------------------------------------
+    def test_vendor_names(self):
+
+        log.info("Testing vendor specific names of SATA attributes.")
+
+        from nagios.plugins.check_smart_state import parse_smartctl_json
+
+        names = smart_samples.SSD_ATTRIBUTE_NAMES
+        nr = 5
+        (transport, reason, json_data) = parse_smartctl_json(
+            smart_samples.smartctl_sata_json(nr, names))
+        self.assertEqual(json_data['current_pending_sector'], 1)
+        self.assertEqual(json_data['nr_grown_defects'], 1)
+
+        # The text parser depends on the names and misses the renamed attributes
+        text_data = self.parse_sata_text(smart_samples.smartctl_sata(nr, names))
+        self.assertNotIn('current_pending_sector', text_data)
+
+    #--------------------------------------------------------------------------
+    def test_sas_json(self):
+
+        log.info("Testing the JSON output of SAS disks.")
+
+        from nagios.plugins.check_smart_state import parse_smartctl_json
+
+        (transport, reason, disk_data) = parse_smartctl_json(smart_samples.smartctl_sas_json(7))
+        log.debug("Disk data of SAS disk: %r", disk_data)
+        self.assertEqual(transport, 'SAS')
+        self.assertIsNone(reason)
+        self.assertEqual(disk_data['health_state'], 'OK')
+        self.assertEqual(disk_data['model'], 'SEAGATE ST600MM0006')
+        self.assertEqual(disk_data['nr_grown_defects'], 3)
+        self.assertEqual(disk_data['temperature'], 37)
+        self.assertEqual(disk_data['hours_on'], 30007)
+
+        (transport, reason, disk_data) = parse_smartctl_json(
+            smart_samples.smartctl_no_smart_json())
+        self.assertTrue(reason.startswith('SMART support is: Unavailable'))
+        self.assertIsNone(disk_data)
+
+        self.assertRaises(ValueError, parse_smartctl_json, '{"a": ')
+        self.assertRaises(ValueError, parse_smartctl_json, '[1, 2]')
+
+    #--------------------------------------------------------------------------
+    def test_nvme(self):
+
+        log.info("Testing the health log of NVMe controllers from all sources.")
+
+        from nagios.plugins.check_smart_state import parse_smartctl_json
+        from nagios.plugins.check_smart_state import nvme_parser, nvme_disk_data
+        from nagios.plugins.nvme_health import parse_health_log, critical_warnings
+
+        keys = ('critical_warning', 'temperature', 'available_spare', 'percentage_used',
+                'media_errors', 'nr_grown_defects', 'hours_on', 'health_state')
+
+        for nr in (0, 7, 9):
+            log.debug("Testing NVMe controller %d ...", nr)
+            values = smart_samples.nvme_values(nr)
+
+            ioctl_data = nvme_disk_data(parse_health_log(smart_samples.nvme_health_log(nr)))
+            self.assertEqual(ioctl_data['temperature'], values['temperature'])
+            self.assertEqual(ioctl_data['hours_on'], values['power_on_hours'])
+            self.assertEqual(ioctl_data['nr_grown_defects'], values['media_errors'])
+
+            (transport, reason, json_data) = parse_smartctl_json(
+                smart_samples.smartctl_nvme_json(nr))
+            self.assertEqual(transport, 'NVMe')
+            self.assertIsNone(reason)
+
+            text_data = nvme_disk_data(nvme_parser.parse_record(
+                smart_samples.smartctl_nvme(nr), {}))
+
+            for key in keys:
+                self.assertEqual(json_data[key], ioctl_data[key])
+                self.assertEqual(text_data[key], ioctl_data[key])
+
+        self.assertEqual(critical_warnings(0), [])
+        self.assertEqual(critical_warnings(0x05), [
+            'available spare below threshold', 'reliability degraded'])
+        self.assertRaises(ValueError, parse_health_log, b'\0' * 16)
+
+    #--------------------------------------------------------------------------
+    def test_ssd_wear(self):
+
+        log.info("Testing the wear level of SSDs.")
+
+        from nagios.plugins.check_smart_state import parse_smartctl_json
+        from nagios.plugins.check_smart_state import sas_parser, lifetime_days
+
+        for nr in (0, 3, 45):
+            values = smart_samples.sata_values(nr)
+            wear_level = min(values['wear'], values['wearout'])
+            text_data = self.parse_sata_text(smart_samples.smartctl_sata(nr, ssd=True))
+            (transport, reason, json_data) = parse_smartctl_json(
+                smart_samples.smartctl_sata_json(nr, ssd=True))
+            self.assertEqual(text_data['wear_level'], wear_level)
+            self.assertEqual(json_data['wear_level'], wear_level)
+
+            sas_data = sas_parser.parse_record(smart_samples.smartctl_sas(nr, ssd=True), {})
+            (transport, reason, json_data) = parse_smartctl_json(
+                smart_samples.smartctl_sas_json(nr, ssd=True))
+            self.assertEqual(sas_data['wear_level'], 100 - nr % 30)
+            self.assertEqual(json_data['wear_level'], 100 - nr % 30)
+
+            (transport, reason, json_data) = parse_smartctl_json(
+                smart_samples.smartctl_nvme_json(nr))
+            self.assertEqual(json_data['wear_level'],
+                             100 - smart_samples.nvme_values(nr)['percentage_used'])
+
+        # Hard disks have no wear level
+        self.assertNotIn('wear_level', self.parse_sata_text(smart_samples.smartctl_sata(3)))
+        (transport, reason, json_data) = parse_smartctl_json(smart_samples.smartctl_sas_json(3))
+        self.assertNotIn('wear_level', json_data)
+
+        # by the change rate from the history
+        self.assertAlmostEqual(lifetime_days(80, -0.1, 10000), 800.0)
+        # by the average wear since power on
+        self.assertAlmostEqual(lifetime_days(80, None, 24 * 100), 400.0)
+        self.assertAlmostEqual(lifetime_days(80, 0.5, 24 * 100), 400.0)
+        self.assertIsNone(lifetime_days(100, None, 24 * 100))
+        self.assertEqual(lifetime_days(0, -0.1, 10000), 0.0)
+
+#==============================================================================
+
+if __name__ == '__main__':
+
+    verbose = get_arg_verbose()
+    if verbose is None:
+        verbose = 0
+    init_root_logger(verbose)
+
+    log.info("Starting tests ...")
+
+    suite = unittest.TestSuite()
+
+    suite.addTest(TestSmartParsers('test_import_modules', verbose))
+    suite.addTest(TestSmartParsers('test_sata_json', verbose))
+    suite.addTest(TestSmartParsers('test_vendor_names', verbose))
+    suite.addTest(TestSmartParsers('test_sas_json', verbose))
+    suite.addTest(TestSmartParsers('test_nvme', verbose))
+    suite.addTest(TestSmartParsers('test_ssd_wear', verbose))
+
+    runner = unittest.TextTestRunner(verbosity = verbose)
+
+    result = runner.run(suite)
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: test script (and module) for unit tests on the non-blocking
+          socket client of the PPD and VCB checks against a local daemon
+          stand-in
+'''
+
+import unittest
+import os
+import sys
+import time
+import socket
+import logging
+import threading
+
+libdir = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), '..'))
+sys.path.insert(0, libdir)
+
+import general
+from general import ColoredFormatter, get_arg_verbose, init_root_logger
+from general import NagiosPluginTestcase
+
+log = logging.getLogger(__name__)
+
+REPLY = '1,5,0,PPD Version [0.9.48], Operation type [storage]\n'
+
+#==============================================================================
+class DaemonStandIn(object):
+    """
+    Accepts one connection, reads the request and sends the given reply
+    chunks with a delay between them, then it keeps the connection open
+    until the client closes it or closes it itself.
+    """
+
+    #--------------------------------------------------------------------------
+    def __init__(self, chunks, delay=0.0, close=False):
+
+        self.chunks = chunks
+        self.delay = delay
+        self.close = close
+        self.request = b''
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(1)
+        self.port = self.sock.getsockname()[1]
+        self.thread = threading.Thread(target=self.serve)
+        self.thread.daemon = True
+        self.thread.start()
+
+    #--------------------------------------------------------------------------
+    def serve(self):
+
+        (conn, address) = self.sock.accept()
+        try:
+            self.request = conn.recv(8192)
+            for chunk in self.chunks:
+                if self.delay:
+                    time.sleep(self.delay)
+                conn.sendall(chunk.encode('utf-8'))
+            if not self.close:
+                conn.recv(8192)
+        finally:
+            conn.close()
+
+    #--------------------------------------------------------------------------
+    def stop(self):
+
+        self.thread.join(10)
+        self.sock.close()
+
+#==============================================================================
+class TestSocketClient(NagiosPluginTestcase):
+
+    #--------------------------------------------------------------------------
+    def setUp(self):
+        self.daemon = None
+
+    #--------------------------------------------------------------------------
+    def tearDown(self):
+        if self.daemon:
+            self.daemon.stop()
+
+    #--------------------------------------------------------------------------
+    def new_client(self, timeout=10):
+
+        from nagios.plugins.socket_client import SocketClient
+
+        client = SocketClient('127.0.0.1', self.daemon.port, timeout=timeout, name='PPD')
+        log.debug("Client: %r", client)
+        return client
+
+    #--------------------------------------------------------------------------
+    def test_import_modules(self):
+
+        log.info("Test importing all appropriate modules ...")
+
+        log.debug("Importing %r from %r ...", 'SocketClient', 'nagios.plugins.socket_client')
+        from nagios.plugins.socket_client import SocketClient
+        from nagios.plugins.socket_client import SocketTransportError, NoListeningError
+
+    #--------------------------------------------------------------------------
+    def test_complete_reply(self):
+
+        log.info("Testing the end of a request on a complete reply.")
+
+        self.daemon = DaemonStandIn(['1,5,0,PPD Vers', 'ion [0.9.48], Operation type [storage]\n'],
+                                    delay=0.1)
+        client = self.new_client()
+
+        start = time.time()
+        result = client.request('<pjd/>', is_complete=lambda line: line.startswith('1,5,'))
+        duration = time.time() - start
+
+        self.assertEqual(result, REPLY)
+        self.assertEqual(self.daemon.request, b'<pjd/>')
+        # the daemon keeps the connection open, so the request ends by the
+        # complete reply instead of a polling interval or the timeout
+        self.assertTrue(duration < 0.45, "The request took %0.2f seconds." % (duration))
+
+    #--------------------------------------------------------------------------
+    def test_records(self):
+
+        log.info("Testing the search for complete records only in the received data.")
+
+        lines = ['key%d = value%d\n' % (i, i) for i in range(200)]
+        reply = ''.join(lines) + 'end_of_data = true\n'
+        chunks = [reply[i:i + 7] for i in range(0, len(reply), 7)]
+        self.daemon = DaemonStandIn(chunks)
+        client = self.new_client()
+        client.buffer_size = 7
+
+        records = []
+
+        def is_complete(line):
+            records.append(line)
+            return line.startswith('end_of_data')
+
+        self.assertEqual(client.request('<vcb/>', is_complete=is_complete), reply)
+        # every record is given once to the callback, regardless of the chunks
+        self.assertEqual(records, [x.rstrip('\n') for x in lines] + ['end_of_data = true'])
+
+        self.daemon.stop()
+        self.daemon = DaemonStandIn(['1,5,0,ok\r', '\n'])
+        client = self.new_client()
+        self.assertEqual(client.request(
+            '<pjd/>', is_complete=lambda line: line == '1,5,0,ok', terminator=b'\r\n'),
+            '1,5,0,ok\r\n')
+
+    #--------------------------------------------------------------------------
+    def test_resolve_timeout(self):
+
+        log.info("Testing the timeout of the name resolution.")
+
+        from nagios.plugins.socket_client import SocketClient, SocketConnectTimeoutError
+
+        getaddrinfo = socket.getaddrinfo
+
+        def slow_getaddrinfo(*args):
+            time.sleep(2)
+            return getaddrinfo(*args)
+
+        client = SocketClient('localhost', 1, timeout=0.3, name='PPD')
+        socket.getaddrinfo = slow_getaddrinfo
+        try:
+            start = time.time()
+            self.assertRaises(SocketConnectTimeoutError, client.request, '<pjd/>')
+            duration = time.time() - start
+        finally:
+            socket.getaddrinfo = getaddrinfo
+
+        self.assertTrue(duration < 1.0, "The request took %0.2f seconds." % (duration))
+
+    #--------------------------------------------------------------------------
+    def test_closed_by_remote(self):
+
+        log.info("Testing the end of a request by closing of the connection.")
+
+        self.daemon = DaemonStandIn([REPLY], close=True)
+        client = self.new_client()
+        self.assertEqual(client.request('<pjd/>'), REPLY)
+
+    #--------------------------------------------------------------------------
+    def test_errors(self):
+
+        log.info("Testing timeouts and a not listening daemon.")
+
+        from nagios.plugins.socket_client import SocketTransportError, NoListeningError
+
+        self.daemon = DaemonStandIn(['1,3,0,in progress\n'])
+        client = self.new_client(timeout=0.5)
+        self.assertRaises(
+            SocketTransportError, client.request, '<pjd/>',
+            is_complete=lambda line: line.startswith('1,5,'))
+
+        client = self.new_client()
+        self.assertRaises(
+            SocketTransportError, client.request, '<pjd/>', should_stop=lambda: True)
+
+        self.daemon.stop()
+        self.daemon = None
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+
+        from nagios.plugins.socket_client import SocketClient
+        client = SocketClient('127.0.0.1', port, timeout=5, name='PPD')
+        self.assertRaises(NoListeningError, client.request, '<pjd/>')
+
+#==============================================================================
+
+if __name__ == '__main__':
+
+    verbose = get_arg_verbose()
+    if verbose is None:
+        verbose = 0
+    init_root_logger(verbose)
+
+    log.info("Starting tests ...")
+
+    suite = unittest.TestSuite()
+
+    suite.addTest(TestSocketClient('test_import_modules', verbose))
+    suite.addTest(TestSocketClient('test_complete_reply', verbose))
+    suite.addTest(TestSocketClient('test_records', verbose))
+    suite.addTest(TestSocketClient('test_resolve_timeout', verbose))
+    suite.addTest(TestSocketClient('test_closed_by_remote', verbose))
+    suite.addTest(TestSocketClient('test_errors', verbose))
+
+    runner = unittest.TextTestRunner(verbosity = verbose)
+
+    result = runner.run(suite)
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: test script (and module) for unit tests on NagiosStateFile objects
+'''
+
+import unittest
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+
+libdir = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), '..'))
+sys.path.insert(0, libdir)
+
+import general
+from general import ColoredFormatter, get_arg_verbose, init_root_logger
+from general import NagiosPluginTestcase
+
+log = logging.getLogger(__name__)
+
+#==============================================================================
+class TestNagiosStateFile(NagiosPluginTestcase):
+
+    #--------------------------------------------------------------------------
+    def setUp(self):
+        self.state_dir = tempfile.mkdtemp(prefix='test-statefile-')
+
+    #--------------------------------------------------------------------------
+    def tearDown(self):
+        shutil.rmtree(self.state_dir, True)
+
+    #--------------------------------------------------------------------------
+    def test_import_modules(self):
+
+        log.info("Test importing all appropriate modules ...")
+
+        log.debug("Importing %r from %r ...", 'NagiosStateFileError', 'nagios.plugin.statefile')
+        from nagios.plugin.statefile import NagiosStateFileError
+
+        log.debug("Importing %r from %r ...", 'NagiosStateFile', 'nagios.plugin.statefile')
+        from nagios.plugin.statefile import NagiosStateFile
+
+    #--------------------------------------------------------------------------
+    def test_save_load(self):
+
+        log.info("Testing saving and loading a state file.")
+
+        from nagios.plugin.statefile import NagiosStateFile
+
+        sfile = NagiosStateFile('test.json', state_dir=self.state_dir)
+        log.debug("NagiosStateFile object: %r", sfile)
+        self.assertIsNone(sfile.load())
+
+        data = {'a': 1, 'b': [1, 2, 3], 'c': None}
+        sfile.save(data)
+        self.assertTrue(os.path.exists(sfile.path))
+        self.assertEqual(sfile.load(), data)
+
+        sfile.remove()
+        self.assertIsNone(sfile.load())
+        sfile.remove()
+
+    #--------------------------------------------------------------------------
+    def test_max_age(self):
+
+        log.info("Testing expiring of a state file.")
+
+        from nagios.plugin.statefile import NagiosStateFile
+
+        sfile = NagiosStateFile('test.json', state_dir=self.state_dir, max_age=60)
+        sfile.save([1, 2])
+        self.assertTrue(sfile.is_fresh())
+
+        past = time.time() - 120
+        os.utime(sfile.path, (past, past))
+        self.assertFalse(sfile.is_fresh())
+        self.assertIsNone(sfile.load())
+        self.assertEqual(sfile.load(ignore_age=True), [1, 2])
+
+    #--------------------------------------------------------------------------
+    def test_invalid_content(self):
+
+        log.info("Testing a state file with invalid content.")
+
+        from nagios.plugin.statefile import NagiosStateFile
+
+        sfile = NagiosStateFile('test.json', state_dir=self.state_dir)
+        fh = open(sfile.path, 'w')
+        fh.write('{"a": ')
+        fh.close()
+        self.assertIsNone(sfile.load())
+
+    #--------------------------------------------------------------------------
+    def test_lock(self):
+
+        log.info("Testing locking of a state file.")
+
+        from nagios.plugin.statefile import NagiosStateFile
+
+        sfile = NagiosStateFile('test.json', state_dir=os.path.join(self.state_dir, 'sub'))
+        with sfile:
+            self.assertTrue(os.path.exists(sfile.lock_path))
+            sfile.save({'x': 'y'})
+        self.assertEqual(sfile.load(), {'x': 'y'})
+
+#==============================================================================
+
+if __name__ == '__main__':
+
+    verbose = get_arg_verbose()
+    if verbose is None:
+        verbose = 0
+    init_root_logger(verbose)
+
+    log.info("Starting tests ...")
+
+    suite = unittest.TestSuite()
+
+    suite.addTest(TestNagiosStateFile('test_import_modules', verbose))
+    suite.addTest(TestNagiosStateFile('test_save_load', verbose))
+    suite.addTest(TestNagiosStateFile('test_max_age', verbose))
+    suite.addTest(TestNagiosStateFile('test_invalid_content', verbose))
+    suite.addTest(TestNagiosStateFile('test_lock', verbose))
+
+    runner = unittest.TextTestRunner(verbosity = verbose)
+
+    result = runner.run(suite)
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: test script (and module) for unit tests on reading the remove
+          timestamps of the configuration files of storage volumes
+'''
+
+import unittest
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+
+try:
+    import configparser as cfgparser
+except ImportError:
+    import ConfigParser as cfgparser
+
+libdir = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), '..'))
+sys.path.insert(0, libdir)
+
+import general
+from general import ColoredFormatter, get_arg_verbose, init_root_logger
+from general import NagiosPluginTestcase
+
+log = logging.getLogger(__name__)
+
+VOLUME_CONFIGS = (
+    "[Volume]\nguid = 600144f0-0001\nsize = 4096\n",
+    "[Volume]\nguid = 600144f0-0002\nremove_object = 1458000000\n",
+    "[General]\nremove_object = 1\n\n[Volume]\n# comment\nRemove_Object: 1458000001\n",
+    "[Volume]\nremove_object = tomorrow\n",
+    "[Volume]\nremove_object =\n",
+    "[Volume]\nremove_object = 1458000002\n    1458000003\n",
+    "guid = 600144f0-0003\n[Volume]\nremove_object = 1458000004\n",
+    "[Volume]\nremove_object = 1458000005\n[Volume]\nsize = 1\n",
+    "[Volume]\nremove_object = 1458000006\nremove_object = 1458000007\n",
+    "[Volume]\nno delimiter here\n",
+    "",
+)
+
+
+#==============================================================================
+class TestVolumeConfig(NagiosPluginTestcase):
+
+    #--------------------------------------------------------------------------
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='test-volume-config-')
+        self.config_dir = os.path.join(self.tmp_dir, 'config')
+        self.state_dir = os.path.join(self.tmp_dir, 'state')
+        os.mkdir(self.config_dir)
+
+    #--------------------------------------------------------------------------
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, True)
+
+    #--------------------------------------------------------------------------
+    def configparser_timestamp(self, cfg_file):
+        """The former evaluation of the remove timestamp by ConfigParser."""
+
+        cfg = cfgparser.ConfigParser()
+        try:
+            cfg.read(cfg_file)
+        except Exception as e:
+            return ('invalid', None)
+        if not cfg.has_section('Volume'):
+            return ('valid', None)
+        if not cfg.has_option('Volume', "remove_object"):
+            return ('valid', None)
+        try:
+            return ('valid', int(cfg.get('Volume', "remove_object")))
+        except Exception as e:
+            return ('invalid', None)
+
+    #--------------------------------------------------------------------------
+    def write_config(self, filename, content):
+
+        fh = open(os.path.join(self.config_dir, filename), 'w')
+        fh.write(content)
+        fh.close()
+
+    #--------------------------------------------------------------------------
+    def test_import_modules(self):
+
+        log.info("Test importing all appropriate modules ...")
+
+        log.debug("Importing %r from %r ...", 'VolumeConfigCache',
+                  'nagios.plugins.volume_config')
+        from nagios.plugins.volume_config import VolumeConfigCache
+
+    #--------------------------------------------------------------------------
+    def test_scanner(self):
+
+        log.info("Testing the scanner against ConfigParser.")
+
+        from nagios.plugins.volume_config import read_remove_timestamp
+        from nagios.plugins.volume_config import CfgFileNotValidError
+
+        for i in range(len(VOLUME_CONFIGS)):
+            filename = 'vol%02d.ini' % (i)
+            self.write_config(filename, VOLUME_CONFIGS[i])
+            cfg_file = os.path.join(self.config_dir, filename)
+            try:
+                result = ('valid', read_remove_timestamp(cfg_file))
+            except CfgFileNotValidError as e:
+                log.debug("Config %d: %s", i, e)
+                result = ('invalid', None)
+            self.assertEqual(result, self.configparser_timestamp(cfg_file))
+
+        # Not existing files are treated like files without a timestamp
+        self.assertIsNone(read_remove_timestamp(os.path.join(self.config_dir, 'none.ini')))
+
+    #--------------------------------------------------------------------------
+    def test_cache(self):
+
+        log.info("Testing the cache of the remove timestamps.")
+
+        from nagios.plugins.volume_config import VolumeConfigCache
+        from nagios.plugins.volume_config import CfgFileNotValidError
+
+        self.write_config('a.ini', VOLUME_CONFIGS[0])
+        self.write_config('b.ini', VOLUME_CONFIGS[1])
+        self.write_config('c.ini', VOLUME_CONFIGS[3])
+
+        cache = VolumeConfigCache(self.config_dir, state_dir=self.state_dir)
+        log.debug("Cache: %r", cache)
+        cache.scan()
+        self.assertTrue(cache.exists('a.ini'))
+        self.assertFalse(cache.exists('d.ini'))
+        self.assertIsNone(cache.remove_timestamp('a.ini'))
+        self.assertEqual(cache.remove_timestamp('b.ini'), 1458000000)
+        self.assertRaises(CfgFileNotValidError, cache.remove_timestamp, 'c.ini')
+        self.assertEqual((cache.hits, cache.misses), (0, 3))
+        cache.save()
+
+        cache = VolumeConfigCache(self.config_dir, state_dir=self.state_dir)
+        cache.scan()
+        self.assertEqual(cache.remove_timestamp('b.ini'), 1458000000)
+        self.assertRaises(CfgFileNotValidError, cache.remove_timestamp, 'c.ini')
+        self.assertEqual((cache.hits, cache.misses), (2, 0))
+
+        # a changed file is parsed again
+        self.write_config('b.ini', VOLUME_CONFIGS[2])
+        mtime = time.time() + 10
+        os.utime(os.path.join(self.config_dir, 'b.ini'), (mtime, mtime))
+        cache.scan()
+        self.assertEqual(cache.remove_timestamp('b.ini'), 1458000001)
+        self.assertEqual(cache.misses, 1)
+        cache.save()
+
+        # entries of files not requested anymore are dropped
+        cache = VolumeConfigCache(self.config_dir, state_dir=self.state_dir)
+        self.assertEqual(sorted(cache.load().keys()), ['b.ini'])
+
+#==============================================================================
+
+if __name__ == '__main__':
+
+    verbose = get_arg_verbose()
+    if verbose is None:
+        verbose = 0
+    init_root_logger(verbose)
+
+    log.info("Starting tests ...")
+
+    suite = unittest.TestSuite()
+
+    suite.addTest(TestVolumeConfig('test_import_modules', verbose))
+    suite.addTest(TestVolumeConfig('test_scanner', verbose))
+    suite.addTest(TestVolumeConfig('test_cache', verbose))
+
+    runner = unittest.TextTestRunner(verbosity = verbose)
+
+    result = runner.run(suite)
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@author: Frank Brehm
+@contact: frank.brehm@profitbricks.com
+@organization: Profitbricks GmbH
+@copyright: © 2010 - 2016 by Profitbricks GmbH
+@license: GPL3
+@summary: test script (and module) for unit tests on the WorkerPool
+'''
+
+import unittest
+import os
+import sys
+import time
+import logging
+import threading
+
+libdir = os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), '..'))
+sys.path.insert(0, libdir)
+
+import general
+from general import ColoredFormatter, get_arg_verbose, init_root_logger
+from general import NagiosPluginTestcase
+
+log = logging.getLogger(__name__)
+
+#==============================================================================
+class TestWorkerPool(NagiosPluginTestcase):
+
+    #--------------------------------------------------------------------------
+    def test_import_modules(self):
+
+        log.info("Test importing all appropriate modules ...")
+
+        log.debug("Importing %r from %r ...", 'WorkerPool', 'nagios.plugin.workers')
+        from nagios.plugin.workers import WorkerPool
+
+        log.debug("Importing %r from %r ...", 'run_concurrently', 'nagios.plugin.workers')
+        from nagios.plugin.workers import run_concurrently, call_with_timeout
+
+    #--------------------------------------------------------------------------
+    def test_results(self):
+
+        log.info("Testing the order of the results and catched errors.")
+
+        from nagios.plugin.workers import run_concurrently, in_main_thread
+
+        self.assertTrue(in_main_thread())
+
+        def square(x):
+            if x == 3:
+                raise ValueError("Three.")
+            if x == 5:
+                sys.exit(5)
+            time.sleep(0.01 * (x % 3))
+            return x * x
+
+        results = run_concurrently(square, range(10), max_workers=4)
+        self.assertEqual(len(results), 10)
+        for x in range(10):
+            (value, exc_info) = results[x]
+            if x == 3:
+                self.assertIsNone(value)
+                self.assertTrue(isinstance(exc_info[1], ValueError))
+            elif x == 5:
+                self.assertTrue(isinstance(exc_info[1], SystemExit))
+            else:
+                self.assertIsNone(exc_info)
+                self.assertEqual(value, x * x)
+
+        self.assertEqual(run_concurrently(square, []), [])
+        self.assertEqual(run_concurrently(square, [2], max_workers=1), [(4, None)])
+
+    #--------------------------------------------------------------------------
+    def test_group_limit(self):
+
+        log.info("Testing the limit of concurrent items per group.")
+
+        from nagios.plugin.workers import run_concurrently
+
+        lock = threading.Lock()
+        active = {}
+        max_active = {}
+        total = {'cur': 0, 'max': 0}
+
+        def task(item):
+            grp = item[0]
+            lock.acquire()
+            active[grp] = active.get(grp, 0) + 1
+            max_active[grp] = max(max_active.get(grp, 0), active[grp])
+            total['cur'] += 1
+            total['max'] = max(total['max'], total['cur'])
+            lock.release()
+            time.sleep(0.02)
+            lock.acquire()
+            active[grp] -= 1
+            total['cur'] -= 1
+            lock.release()
+            return item
+
+        items = []
+        for i in range(12):
+            items.append(('ctrl0', i))
+        for i in range(4):
+            items.append(('ctrl1', i))
+
+        results = run_concurrently(
+            task, items, max_workers=6, group=lambda item: item[0], max_per_group=2)
+        self.assertEqual([x[0] for x in results], items)
+        log.debug("Max. active per group: %r, total: %d", max_active, total['max'])
+        self.assertEqual(max_active['ctrl0'], 2)
+        self.assertEqual(max_active['ctrl1'], 2)
+        self.assertTrue(total['max'] <= 4)
+
+    #--------------------------------------------------------------------------
+    def test_deadline(self):
+
+        log.info("Testing the deadline of the worker pool.")
+
+        from nagios.plugin.workers import run_concurrently, WorkerTimeoutError
+
+        def task(delay):
+            time.sleep(delay)
+            return delay
+
+        start = time.time()
+        results = run_concurrently(
+            task, [0.0, 2.0, 0.01, 2.0], max_workers=2, deadline=start + 0.3)
+        duration = time.time() - start
+        log.debug("Results: %r, duration: %0.3f s", results, duration)
+        self.assertTrue(duration < 1.0)
+        self.assertEqual(results[0], (0.0, None))
+        self.assertEqual(results[2], (0.01, None))
+        for idx in (1, 3):
+            self.assertIsNone(results[idx][0])
+            self.assertTrue(isinstance(results[idx][1][1], WorkerTimeoutError))
+
+        # a single worker doesn't start any task after the deadline
+        start = time.time()
+        results = run_concurrently(
+            task, [0.0, 0.5, 0.5, 0.5], max_workers=1, deadline=start + 0.3)
+        duration = time.time() - start
+        log.debug("Results: %r, duration: %0.3f s", results, duration)
+        self.assertTrue(duration < 1.0)
+        self.assertEqual(results[0], (0.0, None))
+        self.assertEqual(results[1], (0.5, None))
+        for idx in (2, 3):
+            self.assertIsNone(results[idx][0])
+            self.assertTrue(isinstance(results[idx][1][1], WorkerTimeoutError))
+
+    #--------------------------------------------------------------------------
+    def test_call_with_timeout(self):
+
+        log.info("Testing calls with a timeout outside of the main thread.")
+
+        from nagios.plugin.workers import call_with_timeout, WorkerTimeoutError
+
+        self.assertEqual(call_with_timeout(lambda: 42, 1), 42)
+        self.assertRaises(ZeroDivisionError, call_with_timeout, lambda: 1 / 0, 1)
+
+        start = time.time()
+        self.assertRaises(WorkerTimeoutError, call_with_timeout, lambda: time.sleep(2), 0.2)
+        self.assertTrue(time.time() - start < 1.0)
+
+    #--------------------------------------------------------------------------
+    def test_exec_timeout(self):
+
+        log.info("Testing the timeout of commands executed in worker threads.")
+
+        from nagios.plugin.extended import ExtNagiosPlugin, ExecutionTimeoutError
+        from nagios.plugin.workers import run_concurrently
+
+        plugin = ExtNagiosPlugin(usage='%(prog)s', verbose=self.verbose)
+        plugin._timeout = 1
+
+        start = time.time()
+        results = run_concurrently(
+            plugin.exec_cmd, [['sleep', '10'], ['echo', 'hello']], max_workers=2)
+        duration = time.time() - start
+        log.debug("Results: %r, duration: %0.3f s", results, duration)
+
+        self.assertTrue(duration < 3.0)
+        self.assertTrue(isinstance(results[0][1][1], ExecutionTimeoutError))
+        self.assertEqual(results[1], ((0, 'hello\n', ''), None))
+
+#==============================================================================
+
+if __name__ == '__main__':
+
+    verbose = get_arg_verbose()
+    if verbose is None:
+        verbose = 0
+    init_root_logger(verbose)
+
+    log.info("Starting tests ...")
+
+    suite = unittest.TestSuite()
+
+    suite.addTest(TestWorkerPool('test_import_modules', verbose))
+    suite.addTest(TestWorkerPool('test_results', verbose))
+    suite.addTest(TestWorkerPool('test_group_limit', verbose))
+    suite.addTest(TestWorkerPool('test_deadline', verbose))
+    suite.addTest(TestWorkerPool('test_call_with_timeout', verbose))
+    suite.addTest(TestWorkerPool('test_exec_timeout', verbose))
+
+    runner = unittest.TextTestRunner(verbosity = verbose)
+
+    result = runner.run(suite)
+
+#==============================================================================
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4